@@ -0,0 +1,80 @@
+"""
+Benchmark: decoding and encoding time of the JSON codecs on me/networks and me/spheres-like payloads.
+
+Decoding goes through parse_result, as for every API response, from the raw response bytes.
+
+Usage:
+    python benchmarks/bench_codec.py [number_of_items] [repeat]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from whaller_client.api import parse_result
+from whaller_client.codec import CODECS, JsonCodec
+
+
+def make_sphere(index: int) -> dict:
+    return {
+        'id': index,
+        'external_id': f'{index:08x}-4a1e-4c2b-9d1f-{index:012x}',
+        'name': f'Sphère de travail n°{index}',
+        'description': 'Espace d’échange de l’équipe, documents partagés et annonces. ' * 2,
+        'type': 'private' if index % 3 else 'public',
+        'created_at': '2024-03-18T09:12:44+01:00',
+        'updated_at': '2025-01-07T17:45:02+01:00',
+        'nb_members': index * 7 % 500,
+        'unread': index % 11,
+        'is_admin': index % 5 == 0,
+        'notifications': {'email': True, 'push': index % 2 == 0, 'digest': 'daily'},
+        'avatar': {'url': f'https://cdn.whaller.com/spheres/{index}/avatar.png', 'width': 128, 'height': 128},
+        'tags': ['projet', 'interne', f'equipe-{index % 12}'],
+        'score': index / 3,
+    }
+
+
+def make_payloads(count: int) -> dict:
+    spheres = [make_sphere(index) for index in range(count)]
+    networks = [
+        {
+            'id': index,
+            'name': f'Organisation {index}',
+            'domain': f'org{index}.whaller.com',
+            'spheres': spheres[index::max(count // 20, 1)][:20],
+        }
+        for index in range(max(count // 20, 1))
+    ]
+    return {'me/spheres': {'result': spheres}, 'me/networks': {'result': networks}}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    codecs = []
+    for codec_cls in CODECS.values():
+        try:
+            codecs.append(codec_cls())
+        except ImportError:
+            print(f'{codec_cls.name:<8} not installed')
+
+    for endpoint, payload in make_payloads(count).items():
+        content = JsonCodec().dumps(payload)
+        print(f'\n{endpoint}: {len(content) / 1024:.0f} KiB, best of 3 x {repeat} iterations')
+
+        timings = {}
+        for json_codec in codecs:
+            decode = min(timeit.repeat(lambda: parse_result(content, endpoint, json_codec), number=repeat, repeat=3))
+            encode = min(timeit.repeat(lambda: json_codec.dumps(payload), number=repeat, repeat=3))
+            timings[json_codec.name] = (decode / repeat, encode / repeat)
+
+        stdlib_decode, stdlib_encode = timings['json']
+        for name, (decode, encode) in timings.items():
+            print(f'{name:<8} decode {decode * 1000:8.2f} ms ({stdlib_decode / decode:5.2f}x)'
+                  f'   encode {encode * 1000:8.2f} ms ({stdlib_encode / encode:5.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: cost of the middleware chain of ApiClient.call_json.
+
+The client overhead is first measured in-process, against a session answering instantly with a
+canned response, then end to end against the local stub server. Without middleware the requests
+go straight to the session, as before the chain existed: its cost is a single attribute check.
+
+Usage:
+    python benchmarks/bench_middleware.py [number_of_requests]
+"""
+import os
+import sys
+import time
+import timeit
+from datetime import timedelta
+from requests import Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from whaller_client.api import ApiClient, parse_result
+from stub_server import StubServer
+
+
+class CannedSession:
+    """ Session answering every request with the same response, without any I/O. """
+    def __init__(self):
+        self.response = Response()
+        self.response.status_code = 200
+        self.response._content = b'{"result": {"id": 1}}'
+        self.response._content_consumed = True
+        self.response.elapsed = timedelta(0)
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        return self.response
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None):
+        return self.response
+
+    def close(self):
+        pass
+
+
+def passthrough(request, call_next):
+    return call_next(request)
+
+
+CONFIGURATIONS = {
+    'no middleware': [],
+    '1 middleware': [passthrough],
+    '5 middleware': [passthrough] * 5,
+}
+
+
+def bench_in_process(count: int) -> None:
+    session = CannedSession()
+    raw = min(timeit.repeat(lambda: parse_result(session.get('me').content, 'me'), number=count, repeat=5))
+    print(f'in-process, best of 5 x {count} calls')
+    print(f'{"session + parse only":<22} {raw / count * 1e6:8.2f} us/call')
+    for name, middleware in CONFIGURATIONS.items():
+        api_client = ApiClient('http://localhost', middleware=middleware)
+        api_client._session = session
+        api_client.keepalive_timeout = None
+        elapsed = min(timeit.repeat(lambda: api_client.call_json('me', 'GET'), number=count, repeat=5))
+        print(f'{name:<22} {elapsed / count * 1e6:8.2f} us/call')
+
+
+def bench_stub_server(count: int) -> None:
+    print(f'\nstub server, {count} requests')
+    with StubServer() as server:
+        for name, middleware in CONFIGURATIONS.items():
+            with ApiClient(server.base_url, middleware=middleware) as api_client:
+                api_client.call_json('me', 'GET')  # Opens the connection
+                start = time.perf_counter()
+                for _ in range(count):
+                    api_client.call_json('me', 'GET')
+                elapsed = time.perf_counter() - start
+            print(f'{name:<22} {count / elapsed:8.1f} req/s')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench_in_process(count * 10)
+    bench_stub_server(count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: requests/sec of ApiClient.call_json with and without connection pooling.
+
+Usage:
+    python benchmarks/bench_pooling.py [number_of_requests]
+"""
+import os
+import sys
+import time
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from whaller_client.api import ApiClient
+from stub_server import StubServer
+
+
+class UnpooledApiClient(ApiClient):
+    """ ApiClient opening a brand new connection for every request (previous behaviour). """
+    @property
+    def session(self):
+        return requests
+
+
+def run(api_client: ApiClient, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        api_client.call_json('me', 'GET')
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with StubServer() as server:
+        unpooled = run(UnpooledApiClient(server.base_url), count)
+        with ApiClient(server.base_url) as api_client:
+            pooled = run(api_client, count)
+
+    print(f'requests:            {count}')
+    print(f'without pooling:     {unpooled:10.1f} req/s')
+    print(f'with pooling:        {pooled:10.1f} req/s')
+    print(f'speedup:             {pooled / unpooled:10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
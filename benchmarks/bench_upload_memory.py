@@ -0,0 +1,69 @@
+"""
+Benchmark: peak memory of Upload.boxresource for a large file, loaded as bytes or streamed from its path.
+
+Each mode runs in its own process and reports its peak RSS, while the stub server
+runs in the parent process.
+
+Usage:
+    python benchmarks/bench_upload_memory.py [file_size_mb] [chunk_size_mb] [max_workers]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from stub_server import StubServer
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def upload(base_url: str, path: str, mode: str, chunk_mb: int, max_workers: int) -> None:
+    from whaller_client.client import Client
+    from whaller_client.endpoints.upload import Upload
+
+    baseline = peak_rss_mb()
+    with Client(base_url, 'client_id', 'client_token') as client:
+        client.authenticator.token = 'token'
+        uploader = Upload(client, max_workers=max_workers)
+        uploader.chunksize = chunk_mb * 1024 * 1024
+        if mode == 'bytes':
+            with open(path, 'rb') as f:
+                content = f.read()
+        else:
+            content = path
+        uploader.boxresource('archive.bin', content, 'application/octet-stream', 'sphere')
+
+    print(f'{mode:8} peak RSS above baseline: {peak_rss_mb() - baseline:8.1f} MB   ({uploader.last_stats.mbps:.0f} MB/s)')
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    chunk_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+    try:
+        print(f'file: {size_mb} MB, chunks: {chunk_mb} MB, in flight: {max_workers}')
+        with StubServer() as server:
+            for mode in ('bytes', 'path'):
+                subprocess.run([sys.executable, __file__, '--run', server.base_url, f.name, mode,
+                                str(chunk_mb), str(max_workers)], check=True)
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        upload(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]), int(sys.argv[6]))
+    else:
+        main()
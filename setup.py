@@ -7,6 +7,10 @@ setup(
     install_requires=[
         "requests"
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "speedups": ["orjson"]
+    },
     author="Whaller",
     author_email="contact@whaller.com",
     description="Python SDK for interacting with the Whaller API",
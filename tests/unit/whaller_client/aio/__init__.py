@@ -0,0 +1,11 @@
+"""
+Unit tests for the asynchronous modules of whaller_client.
+
+They are skipped when the `async` extra (aiohttp) is not installed.
+"""
+import unittest
+
+try:
+    import aiohttp  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest("aiohttp is not installed: pip install whaller-client[async]")
@@ -0,0 +1,3 @@
+"""
+Unit tests for the asynchronous endpoints of whaller_client.
+"""
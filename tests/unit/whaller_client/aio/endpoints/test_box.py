@@ -0,0 +1,205 @@
+"""
+Unit tests for the AsyncBox class.
+"""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from whaller_client.aio.client import gather
+from whaller_client.aio.endpoints.box import AsyncBox
+from whaller_client.exceptions import ApiError
+
+
+class TestAsyncBox(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncBox class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.mock_client = AsyncMock()
+        self.box = AsyncBox(self.mock_client, "sphere")
+
+    async def test_create_folder(self):
+        """Test the create_folder method."""
+        self.mock_client.call_auth_post.return_value = {"id": 12}
+
+        result = await self.box.create_folder("Folder", 4)
+
+        self.mock_client.call_auth_post.assert_awaited_once_with(
+            'spheres/sphere/boxresources', {'name': 'Folder', 'type': 1, 'parent_id': 4}
+        )
+        self.assertEqual(result, 12)
+
+    async def test_create_folder_error(self):
+        """Test the create_folder method without id in the response."""
+        self.mock_client.call_auth_post.return_value = {}
+        self.assertEqual(await self.box.create_folder("Folder"), -1)
+
+    @patch('whaller_client.aio.endpoints.upload.AsyncUpload.boxresource', new_callable=AsyncMock)
+    async def test_create_file(self, mock_boxresource):
+        """Test the create_file method."""
+        mock_boxresource.return_value = {"id": 123}
+        self.mock_client.call_auth_post.return_value = {"id": 456}
+
+        result = await self.box.create_file("Test.txt", b"content", "text/plain", 7)
+
+        mock_boxresource.assert_awaited_once_with("Test.txt", b"content", "text/plain", "sphere")
+        self.mock_client.call_auth_post.assert_awaited_once_with(
+            'spheres/sphere/boxresources',
+            {'name': 'Test', 'ext': 'txt', 'cloudfile_id': 123, 'type': 2, 'parent_id': 7}
+        )
+        self.assertEqual(result, {"id": 456})
+
+    async def test_create_file_deduplicated_gone(self):
+        """Test that a deduplicated cloudfile which cannot be referenced anymore is uploaded again."""
+        upload_client = AsyncMock()
+        upload_client.boxresource.side_effect = [{"id": 1, "hash": "abc", "deduplicated": True}, {"id": 2}]
+        upload_client.dedup = unittest.mock.MagicMock()
+        box = AsyncBox(self.mock_client, "sphere", upload_client)
+        self.mock_client.call_auth_post.side_effect = [ApiError("Unknown cloudfile"), {"id": 10}]
+
+        self.assertEqual(await box.create_file("file.txt", b"content", "text/plain"), {"id": 10})
+        upload_client.dedup.discard.assert_called_once_with("abc")
+
+        self.mock_client.call_auth_post.side_effect = ApiError("Denied")
+        upload_client.boxresource.side_effect = None
+        upload_client.boxresource.return_value = {"id": 3}
+        with self.assertRaises(ApiError):
+            await box.create_file("file.txt", b"content", "text/plain")
+
+    async def test_create_tree(self):
+        """Test that the folders of a level are created concurrently, under the ID of their parent."""
+        created = {}
+        in_flight = []
+
+        async def create_folder(name, parent_id=None):
+            in_flight.append(name)
+            await asyncio.sleep(0)
+            folder_id = len(created) + 1
+            created[folder_id] = (name, parent_id, len(in_flight))
+            return folder_id
+
+        self.box.create_folder = AsyncMock(side_effect=create_folder)
+        async def gather_folders(aws, limit, return_exceptions=False):
+            return await gather(aws, limit or 10, return_exceptions)
+
+        self.mock_client.gather.side_effect = gather_folders
+
+        ids = await self.box.create_tree({'a': {'b': {}}, 'c': None}, parent_id=7)
+
+        self.assertEqual(ids, {'a': 1, 'c': 2, 'a/b': 3})
+        self.assertEqual(created[1], ('a', 7, 2))
+        self.assertEqual(created[2], ('c', 7, 2))
+        self.assertEqual(created[3], ('b', 1, 3))
+        self.mock_client.gather.assert_awaited_with(unittest.mock.ANY, None, return_exceptions=True)
+
+    async def test_create_tree_error(self):
+        """Test that the error tells which folders were created, those of its level included."""
+        async def create_folder(name, parent_id=None):
+            if name == 'c':
+                raise RuntimeError("API down")
+            return name.upper()
+
+        self.box.create_folder = AsyncMock(side_effect=create_folder)
+        async def gather_folders(aws, limit, return_exceptions=False):
+            return await gather(aws, 10, return_exceptions)
+
+        self.mock_client.gather.side_effect = gather_folders
+
+        with self.assertRaises(RuntimeError) as context:
+            await self.box.create_tree({'a': {'b': {}}, 'c': {}})
+        self.assertEqual(context.exception.folders, {'a': 'A'})
+        self.assertEqual(self.box.create_folder.await_count, 2)
+
+
+    async def test_create_files(self):
+        """Test that the results are in input order, with the errors in place of the failed files."""
+        async def boxresource(name, content, mimes, sphere_external_id):
+            await asyncio.sleep(0.01 if name == 'a.txt' else 0)
+            if name == 'b.txt':
+                raise RuntimeError("API down")
+            return {'id': content}
+        upload_client = AsyncMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = AsyncBox(self.mock_client, "sphere", upload_client)
+        self.mock_client.call_auth_post.side_effect = lambda endpoint, resource: dict(resource)
+        self.mock_client.concurrency = 2
+        progress = MagicMock()
+
+        files = [('a.txt', 1, 'text/plain'), ('b.txt', 2, 'text/plain'), ('c.txt', 3, 'text/plain', 9)]
+        results = await box.create_files(iter(files), parent_id=7, progress=progress)
+
+        self.assertEqual(results[0], {'name': 'a', 'ext': 'txt', 'cloudfile_id': 1, 'type': 2, 'parent_id': 7})
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(results[2]['parent_id'], 9)
+        self.assertEqual(sorted(call[0][0] for call in progress.call_args_list), [0, 1, 2])
+        self.assertEqual(progress.call_args_list[-1][0][0], 0)  # The slowest upload
+        self.assertEqual([call[0][2] for call in progress.call_args_list], [1, 2, 3])
+
+    async def test_create_files_lanes(self):
+        """Test that uploads and resource creations are bounded separately, and overlap."""
+        created = asyncio.Event()
+        uploading = 0
+        peak = 0
+
+        async def boxresource(name, content, mimes, sphere_external_id):
+            nonlocal uploading, peak
+            uploading += 1
+            peak = max(peak, uploading)
+            # With a single upload lane, the second upload holds it until the first resource is created
+            if name == 'b.txt':
+                await asyncio.wait_for(created.wait(), 5)
+            uploading -= 1
+            return {'id': content}
+
+        async def call_auth_post(endpoint, resource):
+            created.set()
+            return {'id': resource['cloudfile_id']}
+        upload_client = AsyncMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = AsyncBox(self.mock_client, "sphere", upload_client)
+        self.mock_client.call_auth_post.side_effect = call_auth_post
+
+        files = [(f'{name}.txt', i, 'text/plain') for i, name in enumerate('abcd')]
+        results = await box.create_files(files, limit=1, metadata_limit=2)
+
+        self.assertEqual(results, [{'id': i} for i in range(4)])
+        self.assertEqual(peak, 1)
+
+    async def test_create_files_deduplicated_gone(self):
+        """Test that a deduplicated cloudfile which cannot be referenced anymore is uploaded again."""
+        upload_client = AsyncMock()
+        upload_client.boxresource.side_effect = [{"id": 1, "hash": "abc", "deduplicated": True}, {"id": 2}]
+        upload_client.dedup = MagicMock()
+        box = AsyncBox(self.mock_client, "sphere", upload_client)
+        self.mock_client.call_auth_post.side_effect = [ApiError("Unknown cloudfile"), {"id": 10}]
+
+        results = await box.create_files([("file.txt", b"content", "text/plain")], limit=1, metadata_limit=1)
+
+        self.assertEqual(results, [{"id": 10}])
+        upload_client.dedup.discard.assert_called_once_with("abc")
+
+    async def test_create_files_cancelled(self):
+        """Test that the files in progress are cancelled with the batch."""
+        started = asyncio.Event()
+        cancelled = []
+
+        async def boxresource(name, content, mimes, sphere_external_id):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+        upload_client = AsyncMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = AsyncBox(self.mock_client, "sphere", upload_client)
+
+        batch = asyncio.ensure_future(box.create_files([('a.txt', b'a', 'text/plain')], limit=4, metadata_limit=4))
+        await asyncio.wait_for(started.wait(), 5)
+        batch.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await batch
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, ['a.txt'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+"""
+Unit tests for the AsyncInvitation class.
+"""
+import unittest
+from unittest.mock import AsyncMock
+from whaller_client.aio.endpoints.invitation import AsyncInvitation
+
+
+class TestAsyncInvitation(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncInvitation class."""
+
+    async def test_remove_one(self):
+        """Test the remove_one method."""
+        mock_client = AsyncMock()
+        invitation = AsyncInvitation(mock_client)
+
+        await invitation.remove_one(123)
+
+        mock_client.call_auth_post.assert_awaited_once_with('invitation', data={"id": 123})
+
+
+if __name__ == '__main__':
+    unittest.main()
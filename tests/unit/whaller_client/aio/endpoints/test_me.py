@@ -0,0 +1,97 @@
+"""
+Unit tests for the AsyncMe class.
+"""
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+from whaller_client.aio.endpoints.me import AsyncMe
+
+
+class TestAsyncMe(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncMe class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.mock_client = AsyncMock()
+        self.me = AsyncMe(self.mock_client)
+
+    async def test_get(self):
+        """Test the get method."""
+        self.mock_client.call_get.return_value = {"id": 123}
+
+        result = await self.me.get()
+
+        self.mock_client.call_get.assert_awaited_once_with("me", {}, True)
+        self.assertEqual(result, {"id": 123})
+
+    async def test_get_notifications(self):
+        """Test the get_notifications method."""
+        await self.me.get_notifications("test_login")
+        self.mock_client.call_get.assert_awaited_once_with("persons/test_login/notifications", {}, True)
+
+    async def test_list_spheres(self):
+        """Test the list_spheres method."""
+        await self.me.list_spheres({"limit": 10})
+        self.mock_client.call_get.assert_awaited_once_with("me/spheres", {"limit": 10}, True)
+
+    async def test_list_networks(self):
+        """Test the list_networks method."""
+        await self.me.list_networks()
+        self.mock_client.call_get.assert_awaited_once_with("me/networks", {}, True)
+
+    async def test_stream_spheres(self):
+        """Test the stream_spheres method."""
+        async def stream_get(endpoint, data, with_auth):
+            for item in [{"id": 1}, {"id": 2}]:
+                yield item
+        self.mock_client.stream_get = MagicMock(side_effect=stream_get)
+
+        result = [item async for item in self.me.stream_spheres({"limit": 10})]
+
+        self.mock_client.stream_get.assert_called_once_with("me/spheres", {"limit": 10}, True)
+        self.assertEqual(result, [{"id": 1}, {"id": 2}])
+
+    async def test_stream_networks(self):
+        """Test the stream_networks method."""
+        async def stream_get(endpoint, data, with_auth):
+            yield {"id": 1}
+        self.mock_client.stream_get = MagicMock(side_effect=stream_get)
+
+        result = [item async for item in self.me.stream_networks()]
+
+        self.mock_client.stream_get.assert_called_once_with("me/networks", {}, True)
+        self.assertEqual(result, [{"id": 1}])
+
+    async def test_iter_spheres(self):
+        """Test that iter_spheres fetches the pages of list_spheres."""
+        self.mock_client.call_get.side_effect = [[{"id": 1}, {"id": 2}], []]
+
+        result = [item async for item in self.me.iter_spheres(page_size=2)]
+
+        self.assertEqual(result, [{"id": 1}, {"id": 2}])
+        self.mock_client.call_get.assert_awaited_with("me/spheres", {"limit": 2, "offset": 2}, True)
+
+    async def test_iter_networks(self):
+        """Test that iter_networks fetches the pages of list_networks."""
+        self.mock_client.call_get.return_value = [{"id": 1}]
+
+        self.assertEqual([item async for item in self.me.iter_networks()], [{"id": 1}])
+        self.mock_client.call_get.assert_awaited_once_with("me/networks", {"limit": 50, "offset": 0}, True)
+
+    async def test_iter_notifications(self):
+        """Test that iter_notifications fetches the pages of the notifications."""
+        self.mock_client.call_get.return_value = []
+
+        self.assertEqual([item async for item in self.me.iter_notifications("test_login", page_size=10)], [])
+        self.mock_client.call_get.assert_awaited_once_with(
+            "persons/test_login/notifications", {"limit": 10, "offset": 0}, True)
+
+    async def test_list_phones(self):
+        """Test the list_phones method with and without status."""
+        await self.me.list_phones()
+        self.mock_client.call_get.assert_awaited_with("me/phones", {}, True)
+        await self.me.list_phones("verified")
+        self.mock_client.call_get.assert_awaited_with("me/phones", {"status": "verified"}, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
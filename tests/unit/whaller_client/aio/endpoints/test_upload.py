@@ -0,0 +1,242 @@
+"""
+Unit tests for the AsyncUpload class.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from whaller_client.aio.endpoints.upload import AsyncUpload
+from whaller_client.content import open_content
+from whaller_client.dedup import DedupIndex
+from whaller_client.endpoints.upload import AdaptiveChunking
+from whaller_client.journal import UploadJournal
+from whaller_client.metrics import MetricsRegistry
+
+
+class TestAsyncUpload(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncUpload class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.mock_client = AsyncMock()
+        self.mock_client.api.metrics = None
+        self.mock_client.send_post_content.return_value = {"id": 123}
+        self.upload = AsyncUpload(self.mock_client)
+        self.upload.chunksize = 10
+
+    async def test_boxresource_small_file(self):
+        """Test the boxresource method with a small file."""
+        result = await self.upload.boxresource("test.txt", b"small", "text/plain", "sphere")
+
+        self.mock_client.send_post_content.assert_awaited_once_with(
+            'upload/box_resource',
+            {'sphere_id': 'sphere'},
+            {'userfile': ('test.txt', b"small", 'text/plain')}
+        )
+        self.assertEqual(result, {"id": 123})
+
+    async def test_boxresource_large_file(self):
+        """Test the boxresource method splits large files into chunks."""
+        result = await self.upload.boxresource("test.txt", b"a" * 25, "text/plain", "sphere")
+
+        calls = self.mock_client.send_post_content.await_args_list
+        self.assertEqual(len(calls), 3)
+        params = [call.args[1] for call in calls]
+        self.assertEqual([p['dzchunkindex'] for p in params], [0, 1, 2])
+        self.assertEqual([p['dzchunkbyteoffset'] for p in params], [0, 10, 20])
+        self.assertEqual([p['dzchunksize'] for p in params], [10, 10, 5])
+        self.assertTrue(all(p['dztotalchunkcount'] == 3 and p['sphere_id'] == 'sphere' for p in params))
+        self.assertEqual(len({p['dzuuid'] for p in params}), 1)
+        self.assertEqual(result, {"id": 123})
+
+
+    async def test_boxresource_parallel_chunks(self):
+        """Test that chunks are sent concurrently, bounded by max_workers, with the last one sent last."""
+        upload = AsyncUpload(self.mock_client, max_workers=3)
+        upload.chunksize = 10
+        started = []
+        running = 0
+        peak = 0
+
+        async def send_post_content(endpoint, params, files):
+            nonlocal running, peak
+            started.append(params['dzchunkindex'])
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return {"chunk": params['dzchunkindex']}
+        self.mock_client.send_post_content.side_effect = send_post_content
+
+        result = await upload.boxresource("test.txt", b"a" * 95, "text/plain", "sphere")
+
+        self.assertEqual(sorted(started), list(range(10)))
+        self.assertEqual(started[-1], 9)
+        self.assertEqual(peak, 3)
+        self.assertEqual(result, {"chunk": 9})
+        self.assertEqual(upload.last_stats.chunks, 10)
+
+    async def test_boxresource_parallel_unordered(self):
+        """Test that unordered mode refills free slots while a slow chunk is in flight."""
+        upload = AsyncUpload(self.mock_client, max_workers=2, ordered=False, last_chunk_last=False)
+        upload.chunksize = 10
+        finished = []
+
+        async def send_post_content(endpoint, params, files):
+            await asyncio.sleep(0.05 if params['dzchunkindex'] == 0 else 0.001)
+            finished.append(params['dzchunkindex'])
+            return {}
+        self.mock_client.send_post_content.side_effect = send_post_content
+
+        await upload.boxresource("test.txt", b"a" * 50, "text/plain", "sphere")
+
+        self.assertEqual(finished[-1], 0)
+
+    async def test_boxresource_parallel_error(self):
+        """Test that a failing chunk cancels in-flight chunks and is raised."""
+        upload = AsyncUpload(self.mock_client, max_workers=2)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.side_effect = RuntimeError("chunk failed")
+
+        with self.assertRaises(RuntimeError):
+            await upload.boxresource("test.txt", b"a" * 100, "text/plain", "sphere")
+
+    async def test_boxresource_from_file_object(self):
+        """Test that a file object is streamed chunk by chunk."""
+        result = await self.upload.boxresource("test.bin", io.BytesIO(b"0123456789abcdefghij!"), "application/octet-stream", "sphere")
+
+        chunks = [call.args[2]['userfile'][1] for call in self.mock_client.send_post_content.await_args_list]
+        self.assertEqual(chunks, [b"0123456789", b"abcdefghij", b"!"])
+        self.assertEqual(result, {"id": 123})
+
+    async def test_boxresource_off_event_loop(self):
+        """Test that spooling a file object which cannot seek, and reading a small file, happen in a thread."""
+        stream = MagicMock(spec=['read'])
+        stream.read.side_effect = [b"0123456789", b"abcdefghij", b"!", b""]
+        with patch('whaller_client.aio.endpoints.upload.asyncio.to_thread', wraps=asyncio.to_thread) as mock_to_thread:
+            await self.upload.boxresource("a.bin", stream, "application/octet-stream", "sphere")
+            await self.upload.boxresource("b.bin", io.BytesIO(b"small"), "application/octet-stream", "sphere")
+
+        chunks = [call.args[2]['userfile'][1] for call in self.mock_client.send_post_content.await_args_list]
+        self.assertEqual(chunks, [b"0123456789", b"abcdefghij", b"!", b"small"])
+        functions = [call.args[0].__name__ for call in mock_to_thread.call_args_list]
+        self.assertEqual(functions, ['open_content', 'read', 'read', 'read', 'open_content', 'read_all'])
+
+    async def test_boxresource_concurrent_same_content(self):
+        """Test that concurrent uploads of the same content to the same sphere do not share their dzuuid."""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        journal = UploadJournal(os.path.join(temp_dir, 'uploads.json'))
+        upload = AsyncUpload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+        sent = []
+
+        async def send(endpoint, params, files):
+            sent.append((files['userfile'][0], params['dzuuid']))
+            await asyncio.sleep(0.01)
+            return {"id": files['userfile'][0]}
+        self.mock_client.send_post_content.side_effect = send
+
+        results = await asyncio.gather(upload.boxresource("a.bin", b"a" * 25, "text/plain", "sphere"),
+                                       upload.boxresource("b.bin", b"a" * 25, "text/plain", "sphere"))
+
+        self.assertEqual(results, [{"id": "a.bin"}, {"id": "b.bin"}])
+        self.assertEqual(len(set(sent)), 2)
+        self.assertEqual(journal._uploads, {})
+
+    async def test_boxresource_resume(self):
+        """Test that a journaled upload only sends the missing chunks, with the recorded dzuuid and chunk size."""
+        journal = MagicMock()
+        journal.open.return_value = ("resumed-uuid", 10, {0, 2})
+        upload = AsyncUpload(self.mock_client, journal=journal)
+        upload.chunksize = 5
+
+        await upload.boxresource("test.bin", io.BytesIO(b"a" * 35), "application/octet-stream", "sphere")
+
+        params = [call.args[1] for call in self.mock_client.send_post_content.await_args_list]
+        self.assertEqual([p['dzchunkindex'] for p in params], [1, 3])
+        self.assertTrue(all(p['dzuuid'] == "resumed-uuid" for p in params))
+        self.assertEqual([p['dzchunkbyteoffset'] for p in params], [10, 30])
+        self.assertEqual(journal.open.call_args[0][0], f"upload/box_resource:sphere:{hashlib.sha256(b'a' * 35).hexdigest()}")
+        self.assertEqual(journal.open.call_args[0][1], 5)
+        journal.ack.assert_called_once_with(journal.open.call_args[0][0], 1)
+        journal.discard.assert_called_once()
+    async def test_boxresource_journal_iterable(self):
+        """Test that an iterable, which can only be read once, is uploaded without being journaled."""
+        journal = MagicMock()
+        upload = AsyncUpload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+
+        await upload.boxresource("a.txt", open_content(iter([b"a" * 15, b"a" * 10]), size=25), "text/plain", "sphere")
+
+        self.assertEqual(self.mock_client.send_post_content.await_count, 3)
+        journal.open.assert_not_called()
+
+    async def test_boxresource_dedup(self):
+        """Test that a content already uploaded is not sent again, contents being hashed in a thread."""
+        dedup = DedupIndex()
+        upload = AsyncUpload(self.mock_client, dedup=dedup)
+        upload.chunksize = 10
+
+        with patch('whaller_client.aio.endpoints.upload.asyncio.to_thread', wraps=asyncio.to_thread) as mock_to_thread:
+            await upload.boxresource("a.txt", b"a" * 25, "text/plain", "sphere")
+            second = await upload.boxresource("b.txt", io.BytesIO(b"a" * 25), "text/plain", "sphere")
+            await upload.boxresource("c.txt", b"small", "text/plain", "sphere")
+            third = await upload.boxresource("d.txt", b"small", "text/plain", "sphere")
+
+        self.assertTrue(second["deduplicated"])
+        self.assertEqual(third["id"], 123)
+        self.assertTrue(third["deduplicated"])
+        self.assertEqual(self.mock_client.send_post_content.await_count, 4)
+        hashes = [call for call in mock_to_thread.call_args_list if call.args[0].__name__ == 'hash_content']
+        self.assertEqual(len(hashes), 4)
+
+    async def test_boxresource_adaptive(self):
+        """Test that the chunk size comes from the adaptive chunking, which measures every chunk."""
+        adaptive = AdaptiveChunking(min_size=10, max_size=40, initial_size=20, step=10, max_workers=2)
+        upload = AsyncUpload(self.mock_client, adaptive=adaptive)
+
+        await upload.boxresource("a.bin", b"a" * 50, "application/octet-stream", "sphere")
+
+        sizes = [call.args[1]['dzchunksize'] for call in self.mock_client.send_post_content.await_args_list]
+        self.assertEqual(sizes, [20, 20, 10])
+        self.assertEqual(upload.last_stats.chunksize, 20)
+        self.assertEqual(adaptive.snapshot()['uploads'], 1)
+        self.assertEqual(adaptive.workers, 2)
+
+        chunksize = adaptive.chunksize
+        self.mock_client.send_post_content.side_effect = RuntimeError("Connection reset")
+        with self.assertRaises(RuntimeError):
+            await upload.boxresource("b.bin", b"b" * 50, "application/octet-stream", "sphere")
+        self.assertEqual(adaptive.chunksize, chunksize // 2)
+
+    async def test_boxresource_metrics(self):
+        """Test that the duration and size of the chunks, and their failures, are recorded."""
+        metrics = MetricsRegistry()
+        upload = AsyncUpload(self.mock_client, metrics=metrics)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.side_effect = [{"id": 1}, {"id": 1}, RuntimeError("Connection reset")]
+
+        await upload.boxresource("a.bin", b"a" * 15, "application/octet-stream", "sphere")
+        with self.assertRaises(RuntimeError):
+            await upload.boxresource("b.bin", b"b" * 15, "application/octet-stream", "sphere")
+
+        snapshot = metrics.snapshot()
+        counters = {counter['name']: counter['value'] for counter in snapshot['counters']}
+        self.assertEqual(counters, {'upload_bytes_total': 15, 'upload_chunk_failures_total': 1})
+        self.assertEqual(snapshot['histograms'][0]['count'], 2)
+
+    def test_metrics_default_to_the_client(self):
+        """Test that the chunks are recorded in the registry of the client, unless another one is given."""
+        metrics = MetricsRegistry()
+        self.mock_client.api.metrics = metrics
+
+        self.assertIs(AsyncUpload(self.mock_client).metrics, metrics)
+        self.assertIsNot(AsyncUpload(self.mock_client, metrics=MetricsRegistry()).metrics, metrics)
+
+if __name__ == '__main__':
+    unittest.main()
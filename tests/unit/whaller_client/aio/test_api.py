@@ -0,0 +1,624 @@
+"""
+Unit tests for the AsyncApiClient class.
+"""
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from whaller_client.aio.api import AsyncApiClient, encode_params
+from whaller_client.aio.client import AsyncClient
+from whaller_client.aio.endpoints.me import AsyncMe
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.deadline import deadline
+from whaller_client.exceptions import (MethodError, ApiError, CircuitOpenError, DeadlineExceededError, HttpError,
+                                       InvalidResponseError)
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.middleware import Response
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
+
+
+class TestAsyncApiClient(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncApiClient class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.api_client = AsyncApiClient("https://api.whaller.com")
+        self.mock_session = MagicMock()
+        self.mock_session.closed = False
+        self.mock_session.close = AsyncMock()
+        self.api_client._session = self.mock_session
+
+    def mock_response(self, content):
+        """Configure the session to answer with the given body."""
+        response = MagicMock()
+        response.read = AsyncMock(return_value=content)
+        self.mock_session.request.return_value.__aenter__.return_value = response
+        return response
+
+    def test_init(self):
+        """Test AsyncApiClient initialization."""
+        api_client = AsyncApiClient("https://api.whaller.com/", limit=20, limit_per_host=5, keepalive_timeout=30)
+        self.assertEqual(api_client.api_base_url, "https://api.whaller.com/api/")
+        self.assertEqual(api_client.limit, 20)
+        self.assertEqual(api_client.limit_per_host, 5)
+        self.assertEqual(api_client.keepalive_timeout, 30)
+        self.assertIsNone(api_client._session)
+
+    @patch('whaller_client.aio.api.aiohttp', None)
+    def test_init_without_aiohttp(self):
+        """Test that a clear error is raised when aiohttp is missing."""
+        with self.assertRaises(ImportError):
+            AsyncApiClient("https://api.whaller.com")
+
+    async def test_session_is_created_once(self):
+        """Test that the session is shared between calls and configured with the pool limits."""
+        api_client = AsyncApiClient("https://api.whaller.com", limit=20, limit_per_host=5, keepalive_timeout=30)
+        with patch('whaller_client.aio.api.aiohttp.TCPConnector') as mock_connector, \
+                patch('whaller_client.aio.api.aiohttp.ClientSession') as mock_session_cls:
+            mock_session_cls.return_value.closed = False
+            session = api_client.session
+            self.assertIs(api_client.session, session)
+
+        mock_connector.assert_called_once_with(limit=20, limit_per_host=5, keepalive_timeout=30)
+        mock_session_cls.assert_called_once_with(
+            connector=mock_connector.return_value,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10.0, sock_read=60.0)
+        )
+
+    async def test_call_json_post_success(self):
+        """Test the call_json method with POST and success."""
+        self.mock_response(b'{"result": {"success": true}}')
+
+        result = await self.api_client.call_json("test/endpoint", "POST", {"data": "value"}, {"Custom-Header": "value"})
+
+        self.mock_session.request.assert_called_once_with(
+            "POST",
+            "https://api.whaller.com/api/test/endpoint",
+            headers={"Content-Type": "application/json", "Custom-Header": "value"},
+            data=b'{"data":"value"}'
+        )
+        self.assertEqual(result, {"success": True})
+
+    async def test_call_json_get_success(self):
+        """Test the call_json method with GET and success."""
+        response = self.mock_response(b'{"result": {"success": true}}')
+
+        result = await self.api_client.call_json("test/endpoint", "GET", {"data": "value"})
+
+        self.mock_session.request.assert_called_once_with(
+            "GET",
+            "https://api.whaller.com/api/test/endpoint",
+            headers={"Content-Type": "application/json"},
+            params=[("data", "value")]
+        )
+        response.raise_for_status.assert_called_once()
+        self.assertEqual(result, {"success": True})
+
+    async def test_call_json_invalid_method(self):
+        """Test the call_json method with an invalid HTTP method."""
+        with self.assertRaises(MethodError):
+            await self.api_client.call_json("test/endpoint", "INVALID")
+
+    async def test_call_json_http_error(self):
+        """Test the call_json method with an HTTP error."""
+        self.mock_session.request.side_effect = aiohttp.ClientError("HTTP Error")
+
+        with self.assertRaises(HttpError):
+            await self.api_client.call_json("test/endpoint", "POST")
+
+    async def test_call_json_invalid_json(self):
+        """Test the call_json method with an invalid JSON response."""
+        self.mock_response(b'Invalid JSON')
+
+        with self.assertRaises(InvalidResponseError):
+            await self.api_client.call_json("test/endpoint", "POST")
+
+    async def test_call_json_api_error(self):
+        """Test the call_json method with an API error."""
+        self.mock_response(b'{"error": {"message": "API Error"}}')
+
+        with self.assertRaises(ApiError):
+            await self.api_client.call_json("test/endpoint", "POST")
+
+    async def test_send_content(self):
+        """Test the send_content method sends a multipart form."""
+        self.mock_response(b'{"result": {"id": 123}}')
+
+        result = await self.api_client.send_content(
+            "upload/box_resource",
+            {"sphere_id": "sphere", "dzchunkindex": 0},
+            {'userfile': ('test.txt', b'content', 'text/plain')},
+            {"Authorization": "Bearer token"}
+        )
+
+        args, kwargs = self.mock_session.request.call_args
+        self.assertEqual(args, ("POST", "https://api.whaller.com/api/upload/box_resource"))
+        self.assertEqual(kwargs['headers'], {"Authorization": "Bearer token"})
+        self.assertIsInstance(kwargs['data'], aiohttp.FormData)
+        self.assertEqual(result, {"id": 123})
+
+    async def test_close(self):
+        """Test that close closes the session, and that the context manager calls it."""
+        async with self.api_client:
+            pass
+
+        self.mock_session.close.assert_awaited_once()
+        self.assertIsNone(self.api_client._session)
+        await self.api_client.close()
+
+    def make_request(self, status, content=b'{"result": {"id": 1}}', headers=None):
+        """Build the context manager returned by session.request for a response with the given status."""
+        response = MagicMock()
+        response.status = status
+        response.headers = headers or {}
+        response.read = AsyncMock(return_value=content)
+        if status >= 400:
+            response.raise_for_status.side_effect = aiohttp.ClientResponseError(MagicMock(), (), status=status)
+        request = MagicMock()
+        request.__aenter__.return_value = response
+        return request
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_call_json_retries_transient_status(self, mock_sleep):
+        """Test that a GET is retried on transient statuses, honouring Retry-After."""
+        self.mock_session.request.side_effect = [
+            self.make_request(503), self.make_request(429, headers={'Retry-After': '2'}), self.make_request(200)
+        ]
+
+        result = await self.api_client.call_json("test/endpoint", "GET")
+
+        self.assertEqual(result, {"id": 1})
+        self.assertEqual(self.mock_session.request.call_count, 3)
+        self.assertEqual(mock_sleep.await_args_list[1][0][0], 2.0)
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_call_json_gives_up_after_max_attempts(self, mock_sleep):
+        """Test that the last failure is raised once every attempt was made."""
+        self.mock_session.request.side_effect = [self.make_request(502) for _ in range(3)]
+
+        with self.assertRaises(HttpError):
+            await self.api_client.call_json("test/endpoint", "GET")
+
+        self.assertEqual(self.mock_session.request.call_count, 3)
+        self.assertEqual(self.api_client.retry_policy.stats.snapshot()['exhausted'], 1)
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_call_json_network_errors(self, mock_sleep):
+        """Test that connection failures are retried, but a POST is not sent again once it may have been processed."""
+        connector_error = aiohttp.ClientConnectorError(MagicMock(), OSError(111, "Connection refused"))
+        self.mock_session.request.side_effect = [
+            connector_error, aiohttp.ServerDisconnectedError(), self.make_request(200)
+        ]
+        self.assertEqual(await self.api_client.call_json("test/endpoint", "GET"), {"id": 1})
+
+        self.mock_session.request.side_effect = [connector_error, aiohttp.ServerDisconnectedError()]
+        with self.assertRaises(HttpError):
+            await self.api_client.call_json("test/endpoint", "POST")
+        self.assertEqual(self.mock_session.request.call_count, 5)
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_send_content_retry_builds_new_form(self, mock_sleep):
+        """Test that a throttled upload is sent again with a new form."""
+        self.mock_session.request.side_effect = [self.make_request(429), self.make_request(200)]
+
+        result = await self.api_client.send_content("upload/box_resource", {}, {'userfile': ('a.txt', b'a', 'text/plain')})
+
+        self.assertEqual(result, {"id": 1})
+        forms = [call[1]['data'] for call in self.mock_session.request.call_args_list]
+        self.assertIsNot(forms[0], forms[1])
+
+    async def test_retries_disabled(self):
+        """Test that a single attempt is made with max_attempts=1."""
+        api_client = AsyncApiClient("https://api.whaller.com", retry_policy=RetryPolicy(max_attempts=1))
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [self.make_request(503)]
+
+        with self.assertRaises(HttpError):
+            await api_client.call_json("test/endpoint", "GET")
+        self.assertEqual(self.mock_session.request.call_count, 1)
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_rate_limiter(self, mock_sleep):
+        """Test that each attempt waits for the rate limiter, which learns from the responses."""
+        rate_limiter = MagicMock(spec=RateLimiter)
+        api_client = AsyncApiClient("https://api.whaller.com", rate_limiter=rate_limiter)
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [self.make_request(429, headers={'Retry-After': '1'}), self.make_request(200)]
+
+        await api_client.call_json("me/spheres", "GET")
+
+        self.assertEqual(rate_limiter.acquire_async.await_args_list, [(("me/spheres",),)] * 2)
+        rate_limiter.update.assert_any_call("me/spheres", 429, {'Retry-After': '1'})
+        rate_limiter.update.assert_called_with("me/spheres", 200, {})
+
+    async def test_call_json_get_cached(self):
+        """Test that a fresh cached response is served without any request, per user."""
+        api_client = AsyncApiClient("https://api.whaller.com", cache=ResponseCache(ttl=60))
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [
+            self.make_request(200, b'{"result": {"login": "alice"}}'),
+            self.make_request(200, b'{"result": {"login": "bob"}}')
+        ]
+
+        first = await api_client.call_json("me", "GET", {}, {"Authorization": "Bearer alice"})
+        second = await api_client.call_json("me", "GET", {}, {"Authorization": "Bearer alice"})
+        other = await api_client.call_json("me", "GET", {}, {"Authorization": "Bearer bob"})
+
+        self.assertEqual(first, {"login": "alice"})
+        # Each caller gets its own copy, and modifying it does not alter the cache
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+        first['changed'] = second['changed'] = True
+        self.assertEqual(await api_client.call_json("me", "GET", {}, {"Authorization": "Bearer alice"}), {"login": "alice"})
+        self.assertEqual(other, {"login": "bob"})
+        self.assertEqual(self.mock_session.request.call_count, 2)
+
+    async def test_call_json_get_revalidated(self):
+        """Test that a stale response is revalidated with a conditional request."""
+        api_client = AsyncApiClient("https://api.whaller.com", cache=ResponseCache(ttl=0))
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [
+            self.make_request(200, headers={'ETag': '"v1"'}),
+            self.make_request(304, b''),
+            self.make_request(200, b'{"result": {"id": 2}}')
+        ]
+
+        self.assertEqual(await api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(await api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(await api_client.call_json("me", "GET"), {"id": 2})
+
+        headers = [call[1]['headers'] for call in self.mock_session.request.call_args_list]
+        self.assertNotIn('If-None-Match', headers[0])
+        self.assertEqual(headers[1]['If-None-Match'], '"v1"')
+        self.assertEqual(api_client.cache.snapshot()['revalidated'], 1)
+
+    def make_stream(self, status, chunks):
+        """Build the context manager of a response whose body is received in the given chunks."""
+        async def iter_any():
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        request = self.make_request(status)
+        request.__aenter__.return_value.content.iter_any = iter_any
+        return request
+
+    async def test_stream_json(self):
+        """Test that the items of the result are streamed."""
+        self.mock_session.request.return_value = self.make_stream(200, [b'{"result": [{"id"', b': 1}, 2]}'])
+
+        items = [item async for item in self.api_client.stream_json("me/spheres", {"limit": 10}, {"Authorization": "Bearer token"})]
+
+        self.assertEqual(items, [{"id": 1}, 2])
+        self.mock_session.request.assert_called_once_with(
+            'GET',
+            "https://api.whaller.com/api/me/spheres",
+            params=[("limit", "10")],
+            headers={"Content-Type": "application/json", "Authorization": "Bearer token"}
+        )
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_stream_json_retry(self, mock_sleep):
+        """Test that the request is retried before the response is streamed, with the rate limiter."""
+        rate_limiter = MagicMock(spec=RateLimiter)
+        api_client = AsyncApiClient("https://api.whaller.com", rate_limiter=rate_limiter)
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [
+            aiohttp.ClientConnectorError(MagicMock(), OSError("Connection refused")),
+            self.make_stream(503, []),
+            self.make_stream(200, [b'{"result": [1]}'])
+        ]
+
+        self.assertEqual([item async for item in api_client.stream_json("me/spheres")], [1])
+        self.assertEqual(mock_sleep.await_count, 2)
+        self.assertEqual(rate_limiter.acquire_async.await_count, 3)
+        self.assertEqual(rate_limiter.update.call_count, 2)
+
+    async def test_stream_json_errors(self):
+        """Test that HTTP errors are raised as HttpError, and not retried once streaming started."""
+        self.mock_session.request.return_value = self.make_stream(404, [])
+        with self.assertRaises(HttpError):
+            [item async for item in self.api_client.stream_json("me/spheres")]
+
+        self.mock_session.request.reset_mock()
+        self.mock_session.request.return_value = self.make_stream(
+            200, [b'{"result": [1, ', aiohttp.ClientPayloadError("Connection reset")])
+        items = []
+        with self.assertRaises(HttpError):
+            async for item in self.api_client.stream_json("me/spheres"):
+                items.append(item)
+        self.assertEqual(items, [1])
+        self.mock_session.request.assert_called_once()
+
+
+    def make_metrics_client(self):
+        """Build a client recording into a new registry."""
+        metrics = MetricsRegistry()
+        api_client = AsyncApiClient("https://api.whaller.com", metrics=metrics)
+        api_client._session = self.mock_session
+        return api_client, metrics
+
+    def get_counters(self, metrics):
+        """Return the counters of a registry by name and labels."""
+        return {(c['name'], tuple(sorted(c['labels'].items()))): c['value'] for c in metrics.snapshot()['counters']}
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_metrics(self, mock_sleep):
+        """Test that the attempts, retries, byte counts and decoding are recorded."""
+        api_client, metrics = self.make_metrics_client()
+        self.mock_session.request.side_effect = [
+            aiohttp.ClientConnectorError(MagicMock(), OSError(111, "Connection refused")),
+            self.make_request(503), self.make_request(200), self.make_request(404)
+        ]
+
+        await api_client.call_json("spheres/12/boxresources", "GET")
+        with self.assertRaises(HttpError):
+            await api_client.call_json("spheres/12/boxresources", "POST", {"name": "x"})
+
+        counters = self.get_counters(metrics)
+        endpoint = ('endpoint', 'spheres/{id}/boxresources')
+        for status in ('error', '503', '200'):
+            self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'GET'), ('status', status)))], 1)
+        self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'POST'), ('status', '404')))], 1)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', 'connect')))], 1)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', '503')))], 1)
+        self.assertEqual(counters[('http_request_bytes_total', (endpoint,))], 12)
+        self.assertEqual(counters[('http_response_bytes_total', (endpoint,))], 21)
+        histograms = {}
+        for histogram in metrics.snapshot()['histograms']:
+            histograms[histogram['name']] = histograms.get(histogram['name'], 0) + histogram['count']
+        self.assertEqual(histograms, {'http_request_seconds': 4, 'http_ttfb_seconds': 3, 'json_decode_seconds': 1})
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_metrics_stream(self, mock_sleep):
+        """Test that streamed responses and their retries are recorded."""
+        api_client, metrics = self.make_metrics_client()
+        self.mock_session.request.side_effect = [
+            aiohttp.ServerDisconnectedError(), self.make_stream(503, []), self.make_stream(200, [b'{"result": [1,', b' 2]}'])
+        ]
+
+        self.assertEqual([item async for item in api_client.stream_json("me/spheres")], [1, 2])
+
+        counters = self.get_counters(metrics)
+        endpoint = ('endpoint', 'me/spheres')
+        self.assertEqual(counters[('http_response_bytes_total', (endpoint,))], 18)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', 'read')))], 1)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', '503')))], 1)
+        self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'GET'), ('status', '200')))], 1)
+
+    async def test_metrics_trace_config(self):
+        """Test that the session times DNS resolutions and new connections."""
+        api_client = AsyncApiClient("https://api.whaller.com", metrics=MetricsRegistry())
+        with patch('whaller_client.aio.api.aiohttp.ClientSession') as mock_session_cls:
+            api_client.session
+        trace_config = mock_session_cls.call_args[1]['trace_configs'][0]
+        context = MagicMock()
+
+        with patch('whaller_client.aio.api.perf_counter', side_effect=[1.0, 1.25, 2.0, 2.5]):
+            await trace_config.on_dns_resolvehost_start[0](None, context, None)
+            await trace_config.on_dns_resolvehost_end[0](None, context, MagicMock(host='api.whaller.com'))
+            await trace_config.on_connection_create_start[0](None, context, None)
+            await trace_config.on_connection_create_end[0](None, context, None)
+
+        histograms = {h['name']: h for h in api_client.metrics.snapshot()['histograms']}
+        self.assertEqual(histograms['http_dns_seconds']['labels'], {'host': 'api.whaller.com'})
+        self.assertEqual(histograms['http_dns_seconds']['sum'], 0.25)
+        self.assertEqual(histograms['http_connect_seconds']['sum'], 0.5)
+
+    async def test_middleware(self):
+        """Test that the middleware wrap the transport in order, and may modify the request and the response."""
+        calls = []
+        async def add_header(request, call_next):
+            calls.append(('add_header', request.method, request.endpoint))
+            request.headers['X-Trace'] = 'abc'
+            return await call_next(request)
+        async def rewrite(request, call_next):
+            calls.append(('rewrite', request.headers['X-Trace']))
+            response = await call_next(request)
+            return Response(response.status, response.headers, response.content.replace(b'1', b'2'))
+        self.api_client.add_middleware(add_header)
+        self.api_client.add_middleware(rewrite)
+        self.mock_session.request.return_value = self.make_request(200)
+
+        result = await self.api_client.call_json("me/spheres", "GET", {"limit": 10})
+
+        self.assertEqual(result, {"id": 2})
+        self.assertEqual(calls, [('add_header', 'GET', 'me/spheres'), ('rewrite', 'abc')])
+        self.mock_session.request.assert_called_once_with(
+            "GET", "https://api.whaller.com/api/me/spheres", params=[("limit", "10")], data=None,
+            headers={"Content-Type": "application/json", "X-Trace": "abc"}
+        )
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_middleware_short_circuit_and_retries(self, mock_sleep):
+        """Test that a middleware may answer without sending the request, and sees every attempt."""
+        statuses = [503, 200, 404]
+        async def stub(request, call_next):
+            return Response(statuses.pop(0), {}, b'{"result": {"stubbed": true}}')
+        rate_limiter = MagicMock(acquire_async=AsyncMock())
+        api_client = AsyncApiClient("https://api.whaller.com", rate_limiter=rate_limiter, middleware=[stub])
+        api_client._session = self.mock_session
+
+        self.assertEqual(await api_client.call_json("me", "GET"), {"stubbed": True})
+        with self.assertRaises(HttpError):
+            await api_client.call_json("me", "POST", {"name": "x"})
+
+        mock_sleep.assert_awaited_once()
+        self.mock_session.request.assert_not_called()
+        self.assertEqual([call.args[1] for call in rate_limiter.update.call_args_list], [503, 200, 404])
+
+    async def test_without_middleware(self):
+        """Test that no middleware chain is built when none is installed."""
+        self.assertIsNone(self.api_client._chain)
+
+    async def test_timeouts(self):
+        """Test that the attempts within a deadline are given the time left as their timeouts."""
+        timeouts = []
+        async def record(request, call_next):
+            timeouts.append(request.timeout)
+            return await call_next(request)
+        self.mock_session.request.side_effect = lambda *args, **kwargs: self.make_stream(200, [b'{"result": []}'])
+
+        await self.api_client.call_json("me", "GET")
+        self.assertNotIn('timeout', self.mock_session.request.call_args.kwargs)
+
+        with patch('whaller_client.deadline.monotonic', return_value=100.0):
+            with deadline(5):
+                await self.api_client.call_json("me", "GET")
+                self.assertEqual([item async for item in self.api_client.stream_json("me/spheres")], [])
+                self.api_client.add_middleware(record)
+                await self.api_client.call_json("me", "GET")
+
+        expected = aiohttp.ClientTimeout(total=5, sock_connect=5, sock_read=5)
+        self.assertEqual([call.kwargs['timeout'] for call in self.mock_session.request.call_args_list[1:]],
+                         [expected] * 3)
+        self.assertEqual(timeouts, [expected])
+
+    async def test_deadline_exceeded(self):
+        """Test that no request is sent once the deadline has passed."""
+        with deadline(0):
+            with self.assertRaises(DeadlineExceededError):
+                await self.api_client.call_json("me", "GET")
+            with self.assertRaises(DeadlineExceededError):
+                [item async for item in self.api_client.stream_json("me/spheres")]
+
+        self.mock_session.request.assert_not_called()
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_deadline_stops_retries(self, mock_sleep):
+        """Test that a request is not retried when the deadline would pass while waiting."""
+        self.mock_session.request.side_effect = lambda *args, **kwargs: self.make_request(503, headers={'Retry-After': '10'})
+
+        with deadline(5):
+            with self.assertRaises(DeadlineExceededError) as context:
+                await self.api_client.call_json("me", "GET")
+            with self.assertRaises(DeadlineExceededError):
+                [item async for item in self.api_client.stream_json("me/spheres")]
+
+        self.assertEqual(context.exception.message, "Deadline exceeded: no time left to retry after 503 on me")
+        mock_sleep.assert_not_awaited()
+
+    async def test_deadline_timeout(self):
+        """Test that a timeout due to the deadline raises a DeadlineExceededError, and any other an HttpError."""
+        self.mock_session.request.side_effect = asyncio.TimeoutError()
+
+        with self.assertRaises(HttpError) as context:
+            await self.api_client.call_json("me", "POST")
+        self.assertNotIsInstance(context.exception, DeadlineExceededError)
+
+        with deadline(5), patch('whaller_client.aio.api.is_expired', return_value=True):
+            with self.assertRaises(DeadlineExceededError):
+                await self.api_client.call_json("me", "POST")
+            with self.assertRaises(DeadlineExceededError):
+                [item async for item in self.api_client.stream_json("me/spheres")]
+
+    @patch('whaller_client.aio.api.asyncio.sleep', new_callable=AsyncMock)
+    async def test_circuit_breaker(self, mock_sleep):
+        """Test that requests to an unhealthy group of endpoints fail at once, without stopping the others."""
+        breaker = CircuitBreaker(window_size=4, min_calls=2, slow_call_duration=1.0)
+        api_client = AsyncApiClient("https://api.whaller.com", circuit_breaker=breaker)
+        api_client._session = self.mock_session
+        self.mock_session.request.side_effect = [
+            aiohttp.ClientConnectorError(MagicMock(), OSError(111, "Connection refused")), self.make_request(503),
+            self.make_request(404), self.make_stream(200, [b'{"result": [1]}'])
+        ]
+
+        with self.assertRaises(CircuitOpenError):
+            await api_client.call_json("upload/box_resource", "GET")
+        self.assertEqual(self.mock_session.request.call_count, 2)  # The last attempt was not sent
+        with self.assertRaises(CircuitOpenError):
+            [item async for item in api_client.stream_json("upload/chunks")]
+
+        with self.assertRaises(HttpError):
+            await api_client.call_json("me", "GET")
+        self.assertEqual([item async for item in api_client.stream_json("me/spheres")], [1])
+        self.assertEqual(breaker.get_states(), {'upload': 'open', 'me': 'closed'})
+
+    @patch('whaller_client.circuit.monotonic', return_value=100.0)
+    async def test_circuit_breaker_trial_not_sent(self, mock_monotonic):
+        """Test that the trial call of a half-open circuit is given back when the request is not sent."""
+        breaker = CircuitBreaker(window_size=1, min_calls=1, half_open_calls=1, open_timeout=10.0)
+        circuit = breaker.acquire("me")
+        circuit.record(True, 0.1)
+        mock_monotonic.return_value = 110.0
+        async def failing(request, call_next):
+            raise ValueError("Broken middleware")
+        api_client = AsyncApiClient("https://api.whaller.com", circuit_breaker=breaker, middleware=[failing])
+        api_client._session = self.mock_session
+
+        with deadline(0), self.assertRaises(DeadlineExceededError):
+            await api_client.call_json("me", "GET")
+        with self.assertRaises(ValueError):
+            await api_client.call_json("me", "GET")
+        self.assertEqual(breaker.get_states(), {'me': 'half_open'})
+
+        api_client._chain = None
+        self.mock_session.request.return_value = self.make_request(200)
+        self.assertEqual(await api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(breaker.get_states(), {'me': 'closed'})
+
+    @patch('whaller_client.circuit.monotonic', return_value=100.0)
+    async def test_circuit_breaker_before_rate_limiter(self, mock_monotonic):
+        """Test that an open circuit fails at once, without waiting for the rate limiter."""
+        breaker = CircuitBreaker(window_size=1, min_calls=1)
+        breaker.acquire("upload").record(True, 0.1)
+        rate_limiter = MagicMock(spec=RateLimiter)
+        api_client = AsyncApiClient("https://api.whaller.com", rate_limiter=rate_limiter, circuit_breaker=breaker)
+        api_client._session = self.mock_session
+
+        with self.assertRaises(CircuitOpenError):
+            await api_client.call_json("upload/chunk", "POST")
+        with self.assertRaises(CircuitOpenError):
+            [item async for item in api_client.stream_json("upload/chunks")]
+        rate_limiter.acquire_async.assert_not_awaited()
+        self.mock_session.request.assert_not_called()
+
+
+class TestEncodeParams(unittest.TestCase):
+    """Tests for the encode_params helper."""
+
+    def test_encode_params(self):
+        """Test that query parameters are encoded as requests encodes them."""
+        self.assertIsNone(encode_params(None))
+        self.assertEqual(encode_params({'archived': True, 'limit': 10, 'ids': [1, 2], 'q': b'caf\xc3\xa9', 'skip': None}),
+                         [('archived', 'True'), ('limit', '10'), ('ids', '1'), ('ids', '2'), ('q', 'café')])
+
+
+class TestAsyncClientOnServer(unittest.IsolatedAsyncioTestCase):
+    """Tests of the AsyncClient against a local HTTP server, through a real aiohttp session."""
+
+    async def asyncSetUp(self):
+        """Start a server answering the login and the list of spheres."""
+        self.requests = []
+
+        async def login(request):
+            self.requests.append(request)
+            return web.json_response({'result': {'auth_token': 'token', 'expires_in': 3600}})
+
+        async def spheres(request):
+            self.requests.append(request)
+            return web.json_response({'result': dict(request.query)})
+
+        app = web.Application()
+        app.router.add_post('/api/person/login', login)
+        app.router.add_get('/api/me/spheres', spheres)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+
+    async def test_authenticated_get(self):
+        """Test that the login headers and the query parameters are accepted by aiohttp."""
+        async with AsyncClient(str(self.server.make_url('')), "id", "tok", coalesce=False) as client:
+            client.set_credentials("login", "password")
+            result = await AsyncMe(client).list_spheres({'archived': True, 'limit': 10})
+
+        self.assertEqual(result, {'archived': 'True', 'limit': '10'})
+        self.assertEqual(self.requests[0].headers['X-Application'], 'aWQ6Ojp0b2s=')
+        self.assertEqual(self.requests[1].headers['Authorization'], 'Bearer token')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,277 @@
+"""
+Unit tests for the AsyncAuthenticator class.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, AsyncMock
+from base64 import b64encode
+from whaller_client.aio.auth import AsyncAuthenticator
+from whaller_client.exceptions import HttpError
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.token_store import MemoryTokenStore
+
+
+class RecordingTokenStore(MemoryTokenStore):
+    """Memory token store recording the calls it gets and the threads they come from."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.threads = set()
+        self.lock_entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def _record(self, name):
+        self.calls.append(name)
+        self.threads.add(threading.get_ident())
+
+    def load(self, key):
+        self._record('load')
+        return super().load(key)
+
+    def save(self, key, record):
+        self._record('save')
+        super().save(key, record)
+
+    @contextmanager
+    def lock(self, key):
+        with super().lock(key):
+            self._record('lock')
+            self.lock_entered.set()
+            self.release.wait(5)
+            try:
+                yield
+            finally:
+                self._record('unlock')
+
+
+class TestAsyncAuthenticator(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncAuthenticator class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.authenticator = AsyncAuthenticator("test_client_id", "test_client_token")
+        self.authenticator.set_credentials("test_login", "test_password")
+        self.mock_api_client = MagicMock()
+        self.mock_api_client.call_json = AsyncMock(return_value={"auth_token": "test_auth_token"})
+
+    async def test_authenticate(self):
+        """Test the authenticate method."""
+        await self.authenticator.authenticate(self.mock_api_client)
+
+        expected_header = {"X-Application": b64encode(b"test_client_id:::test_client_token").decode("ascii")}
+        self.mock_api_client.call_json.assert_awaited_once_with(
+            'person/login',
+            'POST',
+            {'signin-login': 'test_login', 'signin-password': 'test_password'},
+            expected_header
+        )
+        self.assertEqual(self.authenticator.token, "test_auth_token")
+
+    async def test_get_bearer_token_with_existing_token(self):
+        """Test the get_bearer_token method with an existing token."""
+        self.authenticator.token = "existing_token"
+
+        result = await self.authenticator.get_bearer_token(self.mock_api_client)
+
+        self.assertEqual(result, {"Authorization": "Bearer existing_token"})
+        self.mock_api_client.call_json.assert_not_awaited()
+
+    async def test_get_bearer_token_single_login(self):
+        """Test that concurrent coroutines without a token trigger a single login."""
+        async def slow_login(*args):
+            await asyncio.sleep(0.01)
+            return {"auth_token": "new_token"}
+        self.mock_api_client.call_json.side_effect = slow_login
+
+        results = await asyncio.gather(*(self.authenticator.get_bearer_token(self.mock_api_client) for _ in range(20)))
+
+        self.assertEqual(self.mock_api_client.call_json.await_count, 1)
+        self.assertTrue(all(result == {"Authorization": "Bearer new_token"} for result in results))
+
+    async def test_get_bearer_token_metrics(self):
+        """Test that the time spent getting a token is recorded."""
+        self.mock_api_client.metrics = MetricsRegistry()
+
+        await self.authenticator.get_bearer_token(self.mock_api_client)
+        await self.authenticator.get_bearer_token(self.mock_api_client)
+
+        histogram = self.mock_api_client.metrics.snapshot()['histograms'][0]
+        self.assertEqual((histogram['name'], histogram['count']), ('auth_wait_seconds', 1))
+
+    async def test_refresh_token(self):
+        """Test the refresh_token method."""
+        self.authenticator.token = "existing_token"
+        self.mock_api_client.call_json.return_value = {"auth_token": "refreshed_token"}
+
+        await self.authenticator.refresh_token(self.mock_api_client)
+
+        self.mock_api_client.call_json.assert_awaited_once_with(
+            'person/status_auth_by_token',
+            'POST',
+            {"auth_token": "existing_token", "login": "test_login", "renew": True},
+            {"Authorization": "Bearer existing_token"}
+        )
+        self.assertEqual(self.authenticator.token, "refreshed_token")
+
+
+    async def test_refresh_token_without_token(self):
+        """Test that refresh_token logs in first when there is no token."""
+        self.mock_api_client.call_json.side_effect = [{"auth_token": "initial_token"}, {"auth_token": "refreshed_token"}]
+
+        await self.authenticator.refresh_token(self.mock_api_client)
+
+        self.assertEqual(self.mock_api_client.call_json.await_args_list[0].args[0], 'person/login')
+        self.assertEqual(self.authenticator.token, "refreshed_token")
+
+    async def test_get_bearer_token_refreshes_before_expiry(self):
+        """Test that a token close to its expiry is renewed, or replaced by a new login if renewal fails."""
+        self.authenticator.token = "old_token"
+        self.authenticator.expires_at = time.time() + 10
+        self.mock_api_client.call_json.return_value = {"auth_token": "renewed_token"}
+
+        result = await self.authenticator.get_bearer_token(self.mock_api_client)
+
+        self.assertEqual(self.mock_api_client.call_json.await_args.args[0], 'person/status_auth_by_token')
+        self.assertEqual(result, {"Authorization": "Bearer renewed_token"})
+
+        self.authenticator.expires_at = time.time() - 10
+        self.mock_api_client.call_json.side_effect = [HttpError("expired"), {"auth_token": "new_token"}]
+
+        result = await self.authenticator.get_bearer_token(self.mock_api_client)
+
+        self.assertEqual(self.mock_api_client.call_json.await_args.args[0], 'person/login')
+        self.assertEqual(result, {"Authorization": "Bearer new_token"})
+
+    async def test_auto_refresh(self):
+        """Test that the token is refreshed in the background before it expires."""
+        authenticator = AsyncAuthenticator("id", "token", token_ttl=0.05, refresh_margin=0.04, auto_refresh=True)
+        self.mock_api_client.call_json.side_effect = [
+            {"auth_token": "token"},
+            {"auth_token": "refreshed_token", "expires_in": None}
+        ]
+
+        await authenticator.authenticate(self.mock_api_client)
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(authenticator.token, "refreshed_token")
+        authenticator.cancel_refresh()
+
+    async def test_auto_refresh_failure_is_ignored(self):
+        """Test that a failing background refresh does not raise."""
+        self.authenticator.token = "token"
+        self.authenticator.expires_at = time.time()
+        self.mock_api_client.call_json.side_effect = RuntimeError("network down")
+
+        await self.authenticator._background_refresh(self.mock_api_client)
+
+        self.assertEqual(self.authenticator.token, "token")
+        self.mock_api_client.call_json.assert_awaited_once()
+
+    async def test_auto_refresh_shared_store(self):
+        """Test that authenticators sharing a store refresh their common token only once."""
+        store = MemoryTokenStore()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        self.mock_api_client.call_json.return_value = {"auth_token": "refreshed_token"}
+        expires_at = time.time() + 30
+        authenticators = []
+        for _ in range(4):
+            authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+            authenticator.token, authenticator.expires_at = 'token', expires_at
+            authenticators.append(authenticator)
+        store.save(authenticators[0].get_store_key(self.mock_api_client),
+                   {'token': 'token', 'issued_at': expires_at - 3600, 'expires_at': expires_at})
+
+        await asyncio.gather(*(authenticator._background_refresh(self.mock_api_client)
+                               for authenticator in authenticators))
+
+        self.assertEqual([c[0][0] for c in self.mock_api_client.call_json.await_args_list],
+                         ['person/status_auth_by_token'])
+        self.assertEqual([authenticator.token for authenticator in authenticators], ['refreshed_token'] * 4)
+
+    async def test_cancel_refresh(self):
+        """Test that cancel_refresh stops the pending background refresh."""
+        authenticator = AsyncAuthenticator("id", "token", auto_refresh=True)
+
+        await authenticator.authenticate(self.mock_api_client)
+        handle = authenticator._refresh_timer
+        authenticator.cancel_refresh()
+
+        self.assertTrue(handle.cancelled())
+        self.assertIsNone(authenticator._refresh_timer)
+    async def test_token_store_reuses_valid_token(self):
+        """Test that a valid token of the token store is reused without logging in."""
+        store = MemoryTokenStore()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+        authenticator.set_credentials("test_login", "test_password")
+        store.save(authenticator.get_store_key(self.mock_api_client),
+                   {'token': 'stored_token', 'issued_at': time.time(), 'expires_at': time.time() + 3600})
+
+        result = await authenticator.get_bearer_token(self.mock_api_client)
+
+        self.assertEqual(result, {"Authorization": "Bearer stored_token"})
+        self.mock_api_client.call_json.assert_not_awaited()
+
+    async def test_token_store_saves_token(self):
+        """Test that a new token is saved in the token store."""
+        store = MemoryTokenStore()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+
+        await authenticator.get_bearer_token(self.mock_api_client)
+
+        self.assertEqual(store.load(authenticator.get_store_key(self.mock_api_client))['token'], "test_auth_token")
+
+    async def test_token_store_off_event_loop(self):
+        """Test that the token store is used from its own thread, its lock being held around the login."""
+        store = RecordingTokenStore()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+        async def login(*args):
+            store.calls.append('login')
+            return {"auth_token": "new_token"}
+        self.mock_api_client.call_json.side_effect = login
+
+        results = await asyncio.gather(*(authenticator.get_bearer_token(self.mock_api_client) for _ in range(5)))
+
+        self.assertTrue(all(result == {"Authorization": "Bearer new_token"} for result in results))
+        self.assertEqual(store.calls, ['load', 'lock', 'load', 'login', 'save', 'unlock'])
+        self.assertEqual(len(store.threads), 1)
+        self.assertNotIn(threading.get_ident(), store.threads)
+
+    async def test_token_store_lock_released_on_cancel(self):
+        """Test that a coroutine cancelled while waiting for the store's lock does not keep it."""
+        store = RecordingTokenStore()
+        store.release.clear()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+
+        task = asyncio.ensure_future(authenticator.get_bearer_token(self.mock_api_client))
+        await asyncio.to_thread(store.lock_entered.wait, 5)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        store.release.set()
+
+        await authenticator.get_bearer_token(self.mock_api_client)
+        self.assertEqual(store.calls, ['load', 'lock', 'unlock', 'load', 'lock', 'load', 'save', 'unlock'])
+
+    async def test_token_store_lock_released_on_error(self):
+        """Test that the store's lock is released when the login fails."""
+        store = RecordingTokenStore()
+        self.mock_api_client.api_base_url = "https://api.test/"
+        authenticator = AsyncAuthenticator("test_client_id", "test_client_token", token_store=store)
+        self.mock_api_client.call_json.side_effect = HttpError("Connection refused")
+
+        with self.assertRaises(HttpError):
+            await authenticator.get_bearer_token(self.mock_api_client)
+        self.assertEqual(store.calls, ['load', 'lock', 'load', 'unlock'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+"""
+Unit tests for the AsyncClient class.
+"""
+import asyncio
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+from whaller_client.aio.client import AsyncClient, gather
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
+
+
+class TestGather(unittest.IsolatedAsyncioTestCase):
+    """Tests for the gather helper."""
+
+    async def test_gather_keeps_order_and_bounds_concurrency(self):
+        """Test that gather returns results in order and never exceeds the limit."""
+        running = 0
+        peak = 0
+
+        async def work(value):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return value
+
+        results = await gather((work(i) for i in range(50)), limit=5)
+
+        self.assertEqual(results, list(range(50)))
+        self.assertEqual(peak, 5)
+
+    async def test_gather_return_exceptions(self):
+        """Test that gather can collect exceptions instead of raising them."""
+        async def fail():
+            raise ValueError("boom")
+
+        results = await gather([fail()], return_exceptions=True)
+
+        self.assertIsInstance(results[0], ValueError)
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncClient class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", limit=50, concurrency=4)
+
+    def test_init(self):
+        """Test client initialization."""
+        self.assertEqual(self.client.api.api_base_url, "https://api.whaller.com/api/")
+        self.assertEqual(self.client.api.limit, 50)
+        self.assertEqual(self.client.authenticator.client_id, "test_client_id")
+        self.assertEqual(self.client.concurrency, 4)
+        self.assertIsNotNone(self.client.logger)
+
+    def test_metrics(self):
+        """Test that the metrics registry is forwarded to the API client."""
+        metrics = MetricsRegistry()
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", metrics=metrics)
+        self.assertIs(client.api.metrics, metrics)
+
+    def test_middleware(self):
+        """Test that the middleware are forwarded to the API client."""
+        middleware = MagicMock()
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", middleware=[middleware])
+        self.assertEqual(client.api.middleware, [middleware])
+
+    def test_token_refresh(self):
+        """Test that the token lifecycle settings are forwarded to the authenticator."""
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", auto_refresh=True,
+                             token_ttl=600.0, refresh_margin=30.0)
+        authenticator = client.authenticator
+        self.assertEqual((authenticator.auto_refresh, authenticator.token_ttl, authenticator.refresh_margin),
+                         (True, 600.0, 30.0))
+
+    def test_timeouts(self):
+        """Test that the timeouts are forwarded to the API client."""
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", connect_timeout=3.0, read_timeout=None)
+        self.assertEqual((client.api.connect_timeout, client.api.read_timeout), (3.0, None))
+
+    def test_circuit_breaker(self):
+        """Test that the circuit breaker is forwarded to the API client."""
+        circuit_breaker = CircuitBreaker()
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", circuit_breaker=circuit_breaker)
+        self.assertIs(client.api.circuit_breaker, circuit_breaker)
+
+    def test_retry_policy(self):
+        """Test that the retry policy is forwarded to the AsyncApiClient."""
+        retry_policy = RetryPolicy(max_attempts=5)
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", retry_policy=retry_policy)
+        self.assertIs(client.api.retry_policy, retry_policy)
+
+    def test_rate_limiter(self):
+        """Test that the rate limiter is forwarded to the AsyncApiClient."""
+        rate_limiter = RateLimiter(rate=10)
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", rate_limiter=rate_limiter)
+        self.assertIs(client.api.rate_limiter, rate_limiter)
+
+    def test_cache(self):
+        """Test that the response cache is forwarded to the AsyncApiClient."""
+        cache = ResponseCache()
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", cache=cache)
+        self.assertIs(client.api.cache, cache)
+
+    def test_set_credentials(self):
+        """Test the set_credentials method."""
+        self.client.set_credentials("test_login", "test_password")
+        self.assertEqual(self.client.authenticator.login, "test_login")
+        self.assertEqual(self.client.authenticator.password, "test_password")
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.authenticate', new_callable=AsyncMock)
+    async def test_authenticate(self, mock_authenticate):
+        """Test the authenticate method."""
+        await self.client.authenticate()
+        mock_authenticate.assert_awaited_once_with(self.client.api)
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.refresh_token', new_callable=AsyncMock)
+    async def test_refresh_token(self, mock_refresh_token):
+        """Test the refresh_token method."""
+        await self.client.refresh_token()
+        mock_refresh_token.assert_awaited_once_with(self.client.api)
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.get_bearer_token', new_callable=AsyncMock)
+    @patch('whaller_client.aio.api.AsyncApiClient.call_json', new_callable=AsyncMock)
+    async def test_call_post_with_auth(self, mock_call_json, mock_get_bearer_token):
+        """Test the call_post method with authentication."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+        mock_call_json.return_value = {"success": True}
+
+        result = await self.client.call_auth_post("test/endpoint", {"data": "value"})
+
+        mock_call_json.assert_awaited_once_with(
+            "test/endpoint", "POST", {"data": "value"}, {"Authorization": "Bearer test_token"}
+        )
+        self.assertEqual(result, {"success": True})
+
+    @patch('whaller_client.aio.api.AsyncApiClient.call_json', new_callable=AsyncMock)
+    async def test_call_get_without_auth(self, mock_call_json):
+        """Test the call_get method without authentication."""
+        mock_call_json.return_value = {"success": True}
+
+        result = await self.client.call_get("test/endpoint", {"data": "value"})
+
+        mock_call_json.assert_awaited_once_with("test/endpoint", "GET", {"data": "value"}, {}, identity=None)
+        self.assertEqual(result, {"success": True})
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.get_bearer_token', new_callable=AsyncMock)
+    @patch('whaller_client.aio.api.AsyncApiClient.stream_json')
+    async def test_stream_get(self, mock_stream_json, mock_get_bearer_token):
+        """Test the stream_get method with authentication."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+        async def stream_json(endpoint, data, headers):
+            yield {"id": 1}
+        mock_stream_json.side_effect = stream_json
+
+        result = [item async for item in self.client.stream_get("me/spheres", {"limit": 10}, True)]
+
+        self.assertEqual(result, [{"id": 1}])
+        mock_stream_json.assert_called_once_with("me/spheres", {"limit": 10}, {"Authorization": "Bearer test_token"})
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.get_bearer_token', new_callable=AsyncMock)
+    @patch('whaller_client.aio.api.AsyncApiClient.call_json', new_callable=AsyncMock)
+    async def test_call_auth_get(self, mock_call_json, mock_get_bearer_token):
+        """Test the call_auth_get method."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+
+        await self.client.call_auth_get("test/endpoint")
+
+        mock_call_json.assert_awaited_once_with("test/endpoint", "GET", {}, {"Authorization": "Bearer test_token"},
+                                                identity="https://api.whaller.com/api/|test_client_id|None")
+
+    @patch('whaller_client.aio.auth.AsyncAuthenticator.get_bearer_token', new_callable=AsyncMock)
+    @patch('whaller_client.aio.api.AsyncApiClient.send_content', new_callable=AsyncMock)
+    async def test_send_post_content(self, mock_send_content, mock_get_bearer_token):
+        """Test the send_post_content method."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+        files = {'userfile': ('test.txt', b'content', 'text/plain')}
+
+        await self.client.send_post_content("upload/box_resource", {"sphere_id": "s"}, files)
+
+        mock_send_content.assert_awaited_once_with(
+            "upload/box_resource", {"sphere_id": "s"}, files, {"Authorization": "Bearer test_token"}
+        )
+
+    @patch('whaller_client.aio.client.gather', new_callable=AsyncMock)
+    async def test_gather_uses_client_concurrency(self, mock_gather):
+        """Test that the gather method defaults to the client's concurrency."""
+        await self.client.gather([])
+        mock_gather.assert_awaited_once_with([], 4, False)
+
+    @patch('whaller_client.aio.api.AsyncApiClient.close', new_callable=AsyncMock)
+    async def test_context_manager_closes_api(self, mock_close):
+        """Test that leaving the context manager closes the underlying AsyncApiClient."""
+        async with self.client:
+            pass
+        mock_close.assert_awaited_once()
+
+    @patch('whaller_client.aio.api.AsyncApiClient.call_json', new_callable=AsyncMock)
+    async def test_call_get_coalesced(self, mock_call_json):
+        """Test that identical concurrent GET requests share a single call."""
+        async def slow_call(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return {"networks": []}
+        mock_call_json.side_effect = slow_call
+
+        results = await asyncio.gather(*(self.client.call_get("me/networks", {"page": 1}) for _ in range(8)))
+
+        mock_call_json.assert_awaited_once_with("me/networks", "GET", {"page": 1}, {}, identity=None)
+        self.assertEqual(results, [{"networks": []}] * 8)
+        self.assertEqual(self.client.singleflight.snapshot(), {'calls': 1, 'hits': 7, 'coalesced': 1})
+
+    @patch('whaller_client.aio.api.AsyncApiClient.call_json', new_callable=AsyncMock)
+    async def test_call_get_without_coalescing(self, mock_call_json):
+        """Test that coalescing can be disabled."""
+        client = AsyncClient("https://api.whaller.com", "test_client_id", "test_client_token", coalesce=False)
+        mock_call_json.return_value = {}
+
+        await asyncio.gather(*(client.call_get("me/networks") for _ in range(3)))
+
+        self.assertIsNone(client.singleflight)
+        self.assertEqual(mock_call_json.await_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit tests for the lazy asynchronous pagination of list endpoints.
+"""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from whaller_client.aio.pagination import iter_items, iter_pages
+
+
+def make_fetch(total):
+    """Build a fetch coroutine function serving `total` items by limit/offset."""
+    items = list(range(total))
+    return AsyncMock(side_effect=lambda params: items[params['offset']:params['offset'] + params['limit']])
+
+
+class TestAsyncPagination(unittest.IsolatedAsyncioTestCase):
+    """Tests for the asynchronous iter_pages and iter_items."""
+
+    async def test_iter_items(self):
+        """Test that every item is yielded, with and without prefetch."""
+        for prefetch in (True, False):
+            for total in (0, 9, 10, 25):
+                with self.subTest(prefetch=prefetch, total=total):
+                    fetch = make_fetch(total)
+                    items = [item async for item in iter_items(fetch, {'q': 'x'}, 10, prefetch)]
+                    self.assertEqual(items, list(range(total)))
+                    offsets = [call[0][0]['offset'] for call in fetch.await_args_list]
+                    self.assertEqual(offsets, list(range(0, total + 1, 10)))
+
+    async def test_prefetch(self):
+        """Test that the next page is fetched while the current one is consumed, and cancelled when not needed."""
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def fetch(params):
+            if params['offset'] == 0:
+                return list(range(10))
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pages = iter_pages(fetch, page_size=10)
+        self.assertEqual(await pages.__anext__(), list(range(10)))
+        await asyncio.wait_for(started.wait(), 5)
+        await pages.aclose()
+        await asyncio.wait_for(cancelled.wait(), 5)
+
+    async def test_error(self):
+        """Test that an error fetching a page is raised when the page is reached."""
+        fetch = AsyncMock(side_effect=[list(range(10)), RuntimeError("API down")])
+        items = []
+        with self.assertRaises(RuntimeError):
+            async for item in iter_items(fetch, page_size=10):
+                items.append(item)
+        self.assertEqual(items, list(range(10)))
+
+    async def test_invalid_page_size(self):
+        """Test that the page size must be positive."""
+        with self.assertRaises(ValueError):
+            await iter_pages(make_fetch(1), page_size=0).__anext__()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,10 @@ Unit tests for the Box class.
 import unittest
 from unittest.mock import MagicMock, patch
 import os
-from whaller_client.endpoints.box import Box
+import tempfile
+import threading
+from whaller_client.endpoints.box import Box, get_tree_levels
+from whaller_client.exceptions import ApiError
 
 
 class TestBox(unittest.TestCase):
@@ -22,6 +25,12 @@ class TestBox(unittest.TestCase):
         self.assertEqual(self.box.sphere_external_id, self.sphere_external_id)
         self.assertIsNotNone(self.box.upload_client)
 
+    def test_init_with_upload_client(self):
+        """Test Box class initialization with a custom upload client."""
+        upload_client = MagicMock()
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.assertIs(box.upload_client, upload_client)
+
     def test_create_folder_without_parent(self):
         """Test the create_folder method without parent."""
         # Mock configuration
@@ -136,6 +145,213 @@ class TestBox(unittest.TestCase):
         
         self.assertEqual(result, file_response)
 
+    def test_create_file_deduplicated_gone(self):
+        """Test that a deduplicated cloudfile which cannot be referenced anymore is uploaded again."""
+        upload_client = MagicMock()
+        upload_client.boxresource.side_effect = [{"id": 1, "hash": "abc", "deduplicated": True}, {"id": 2}]
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = [ApiError("Unknown cloudfile"), {"id": 10}]
+
+        result = box.create_file("file.txt", b"content", "text/plain")
+
+        self.assertEqual(result, {"id": 10})
+        upload_client.dedup.discard.assert_called_once_with("abc")
+        self.assertEqual(self.mock_client.call_auth_post.call_args[0][1]['cloudfile_id'], 2)
+
+    def test_create_file_error(self):
+        """Test that an API error is raised when the content was actually uploaded."""
+        upload_client = MagicMock()
+        upload_client.boxresource.return_value = {"id": 1}
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = ApiError("Denied")
+
+        with self.assertRaises(ApiError):
+            box.create_file("file.txt", b"content", "text/plain")
+        upload_client.boxresource.assert_called_once()
+
+    def make_create_folder(self):
+        """Build a create_folder replacement numbering the folders and recording their parents."""
+        lock = threading.Lock()
+        created = {}
+
+        def create_folder(name, parent_id=None):
+            with lock:
+                folder_id = len(created) + 1
+                created[folder_id] = (name, parent_id)
+            return folder_id
+
+        return create_folder, created
+
+    def test_get_tree_levels(self):
+        """Test that a nested dict is listed level by level."""
+        levels = get_tree_levels({'a': {'b': {'d': None}, 'c': {}}, 'e': None})
+        self.assertEqual(levels, [
+            [('a', 'a'), ('e', 'e')],
+            [('a/b', 'b'), ('a/c', 'c')],
+            [('a/b/d', 'd')]
+        ])
+        self.assertEqual(get_tree_levels({}), [])
+
+    def test_get_tree_levels_from_directory(self):
+        """Test that the subdirectories of a local directory are listed, without files."""
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'docs', 'img'))
+            os.makedirs(os.path.join(root, 'src'))
+            with open(os.path.join(root, 'docs', 'README.md'), 'w') as f:
+                f.write('readme')
+
+            levels = get_tree_levels(root)
+
+        self.assertEqual(levels, [[('docs', 'docs'), ('src', 'src')], [('docs/img', 'img')]])
+
+    def test_create_tree(self):
+        """Test that every folder is created under the ID of its parent."""
+        create_folder, created = self.make_create_folder()
+        self.box.create_folder = MagicMock(side_effect=create_folder)
+
+        ids = self.box.create_tree({'a': {'b': {'d': None}, 'c': {}}, 'e': None}, parent_id=100, max_workers=4)
+
+        self.assertEqual(set(ids), {'a', 'a/b', 'a/c', 'a/b/d', 'e'})
+        for path, folder_id in ids.items():
+            name, parent_id = created[folder_id]
+            self.assertEqual(name, os.path.basename(path))
+            self.assertEqual(parent_id, ids.get(os.path.dirname(path), 100))
+
+    def test_create_tree_existing(self):
+        """Test that the folders which already exist are not created again."""
+        create_folder, created = self.make_create_folder()
+        self.box.create_folder = MagicMock(side_effect=create_folder)
+
+        ids = self.box.create_tree({'a': {'b': {}, 'c': {}}}, existing={'a': 50, 'a/b': 51})
+
+        self.assertEqual(ids, {'a': 50, 'a/b': 51, 'a/c': 1})
+        self.assertEqual(created, {1: ('c', 50)})
+
+    def test_create_tree_levels_in_parallel(self):
+        """Test that the folders of a level are created concurrently."""
+        barrier = threading.Barrier(3, timeout=5)
+        create_folder, _ = self.make_create_folder()
+
+        def create_level_folder(name, parent_id=None):
+            if parent_id is None:
+                barrier.wait()
+            return create_folder(name, parent_id)
+
+        self.box.create_folder = MagicMock(side_effect=create_level_folder)
+
+        ids = self.box.create_tree({'a': {'d': {}}, 'b': {}, 'c': {}}, max_workers=3)
+
+        self.assertEqual(len(ids), 4)
+
+    def test_create_tree_error(self):
+        """Test that an error creating a folder is raised and stops the tree."""
+        self.box.create_folder = MagicMock(side_effect=RuntimeError("API down"))
+
+        with self.assertRaises(RuntimeError):
+            self.box.create_tree({'a': {'b': {}}})
+        self.box.create_folder.assert_called_once_with('a', None)
+
+    def test_create_tree_error_folders(self):
+        """Test that the error tells which folders were created, those of its level included."""
+        create_folder, _ = self.make_create_folder()
+
+        def create_some_folder(name, parent_id=None):
+            if name == 'c':
+                raise RuntimeError("API down")
+            return create_folder(name, parent_id)
+
+        self.box.create_folder = MagicMock(side_effect=create_some_folder)
+
+        with self.assertRaises(RuntimeError) as context:
+            self.box.create_tree({'a': {'b': {}, 'c': {}, 'd': {'e': {}}}}, existing={'a': 50})
+        self.assertEqual(set(context.exception.folders), {'a', 'a/b', 'a/d'})
+        self.assertEqual(context.exception.folders['a'], 50)
+        self.assertEqual(self.box.create_folder.call_count, 3)
+
+
+    def test_create_files(self):
+        """Test that the results are in input order, with the errors in place of the failed files."""
+        def boxresource(name, content, mimes, sphere_external_id):
+            if name == 'b.txt':
+                raise RuntimeError("API down")
+            return {'id': content}
+        upload_client = MagicMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = lambda endpoint, resource: dict(resource)
+        progress = MagicMock()
+
+        results = box.create_files(
+            [('a.txt', 1, 'text/plain'), ('b.txt', 2, 'text/plain'), ('c.txt', 3, 'text/plain', 9)],
+            parent_id=7, max_workers=2, metadata_workers=1, progress=progress)
+
+        self.assertEqual(results[0], {'name': 'a', 'ext': 'txt', 'cloudfile_id': 1, 'type': 2, 'parent_id': 7})
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(results[2]['parent_id'], 9)
+        self.assertEqual(sorted(call[0][0] for call in progress.call_args_list), [0, 1, 2])
+        self.assertEqual(sorted(call[0][2] for call in progress.call_args_list), [1, 2, 3])
+        for call in progress.call_args_list:
+            self.assertIs(call[0][1], results[call[0][0]])
+
+    def test_create_files_lanes(self):
+        """Test that a resource is created while the next file is uploading."""
+        created = threading.Event()
+
+        def boxresource(name, content, mimes, sphere_external_id):
+            # With a single upload lane, the second upload holds it until the first resource is created
+            if name == 'b.txt':
+                self.assertTrue(created.wait(5))
+            return {'id': content}
+
+        def call_auth_post(endpoint, resource):
+            created.set()
+            return {'id': resource['cloudfile_id']}
+        upload_client = MagicMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = call_auth_post
+
+        results = box.create_files([('a.txt', 1, 'text/plain'), ('b.txt', 2, 'text/plain')],
+                                   max_workers=1, metadata_workers=1)
+
+        self.assertEqual(results, [{'id': 1}, {'id': 2}])
+
+    def test_create_files_deduplicated_gone(self):
+        """Test that a deduplicated cloudfile which cannot be referenced anymore is uploaded again."""
+        upload_client = MagicMock()
+        upload_client.boxresource.side_effect = [{"id": 1, "hash": "abc", "deduplicated": True}, {"id": 2}]
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = [ApiError("Unknown cloudfile"), {"id": 10}]
+
+        self.assertEqual(box.create_files([("file.txt", b"content", "text/plain")]), [{"id": 10}])
+        upload_client.dedup.discard.assert_called_once_with("abc")
+
+    def test_create_files_bounded(self):
+        """Test that files are uploaded in parallel, and only read from the iterable as workers free up."""
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+
+        def files():
+            for i in range(20):
+                # At most 3 files running and 3 waiting for a worker
+                self.assertLessEqual(i - len(finished), 6)
+                yield (f'{i}.txt', i, 'text/plain')
+
+        def boxresource(name, content, mimes, sphere_external_id):
+            barrier.wait()
+            return {'id': content}
+
+        def call_auth_post(endpoint, resource):
+            finished.append(resource['cloudfile_id'])
+            return {'id': resource['cloudfile_id']}
+        upload_client = MagicMock()
+        upload_client.boxresource.side_effect = boxresource
+        box = Box(self.mock_client, self.sphere_external_id, upload_client)
+        self.mock_client.call_auth_post.side_effect = call_auth_post
+
+        results = box.create_files(files(), max_workers=2, metadata_workers=1)
+
+        self.assertEqual(results, [{'id': i} for i in range(20)])
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -92,6 +92,49 @@ class TestMe(unittest.TestCase):
         self.mock_client.call_get.assert_called_once_with("me/networks", params, True)
         self.assertEqual(result, [{"id": 1, "name": "Test Network"}])
 
+    def test_stream_spheres(self):
+        """Test the stream_spheres method."""
+        self.mock_client.stream_get.return_value = iter([{"id": 1}, {"id": 2}])
+
+        result = list(self.me.stream_spheres({"limit": 10}))
+
+        self.mock_client.stream_get.assert_called_once_with("me/spheres", {"limit": 10}, True)
+        self.assertEqual(result, [{"id": 1}, {"id": 2}])
+
+    def test_stream_networks(self):
+        """Test the stream_networks method."""
+        self.mock_client.stream_get.return_value = iter([{"id": 1, "name": "Test Network"}])
+
+        result = list(self.me.stream_networks())
+
+        self.mock_client.stream_get.assert_called_once_with("me/networks", {}, True)
+        self.assertEqual(result, [{"id": 1, "name": "Test Network"}])
+
+    def test_iter_spheres(self):
+        """Test that iter_spheres fetches the pages of list_spheres."""
+        self.mock_client.call_get.side_effect = [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+
+        result = list(self.me.iter_spheres({"q": "test"}, page_size=2, prefetch=False))
+
+        self.assertEqual(result, [{"id": 1}, {"id": 2}, {"id": 3}])
+        self.mock_client.call_get.assert_any_call("me/spheres", {"q": "test", "limit": 2, "offset": 0}, True)
+        self.mock_client.call_get.assert_called_with("me/spheres", {"q": "test", "limit": 2, "offset": 2}, True)
+
+    def test_iter_networks(self):
+        """Test that iter_networks fetches the pages of list_networks."""
+        self.mock_client.call_get.return_value = [{"id": 1}]
+
+        self.assertEqual(list(self.me.iter_networks()), [{"id": 1}])
+        self.mock_client.call_get.assert_called_once_with("me/networks", {"limit": 50, "offset": 0}, True)
+
+    def test_iter_notifications(self):
+        """Test that iter_notifications fetches the pages of the notifications."""
+        self.mock_client.call_get.return_value = []
+
+        self.assertEqual(list(self.me.iter_notifications("test_login", page_size=10)), [])
+        self.mock_client.call_get.assert_called_once_with(
+            "persons/test_login/notifications", {"limit": 10, "offset": 0}, True)
+
     def test_list_phones_without_status(self):
         """Test the list_phones method without status."""
         # Mock configuration
@@ -3,9 +3,20 @@ Unit tests for the Upload class.
 """
 import unittest
 from unittest.mock import MagicMock, patch
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
 import math
-from whaller_client.endpoints.upload import Upload
+from whaller_client.endpoints.upload import AdaptiveChunking, Upload, TransferStats
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.content import BytesContent, open_content
+from whaller_client.dedup import DedupIndex
+from whaller_client.journal import UploadJournal
 
 
 class TestUpload(unittest.TestCase):
@@ -20,6 +31,10 @@ class TestUpload(unittest.TestCase):
         """Test Upload class initialization."""
         self.assertEqual(self.upload.client, self.mock_client)
         self.assertEqual(self.upload.chunksize, 10 * 1024 * 1024)  # 10 MB
+        self.assertEqual(self.upload.max_workers, 1)
+        self.assertTrue(self.upload.ordered)
+        self.assertTrue(self.upload.last_chunk_last)
+        self.assertIsNone(self.upload.last_stats)
 
     def test_upload(self):
         """Test the _upload method."""
@@ -77,6 +92,216 @@ class TestUpload(unittest.TestCase):
         # Verify the result
         self.assertEqual(result, {"id": 123})
 
+
+    def make_parallel_upload(self, delays=None, **kwargs):
+        """Build an Upload with a tiny chunk size whose client records concurrency and call order."""
+        upload = Upload(self.mock_client, **kwargs)
+        upload.chunksize = 10
+        self.started = []
+        self.finished = []
+        self.peak = 0
+        running = [0]
+        lock = threading.Lock()
+
+        def send_post_content(endpoint, params, files):
+            index = params['dzchunkindex']
+            with lock:
+                self.started.append(index)
+                running[0] += 1
+                self.peak = max(self.peak, running[0])
+            time.sleep((delays or {}).get(index, 0.01))
+            with lock:
+                running[0] -= 1
+                self.finished.append(index)
+            return {"chunk": index}
+
+        self.mock_client.send_post_content.side_effect = send_post_content
+        return upload
+
+    def test_upload_with_chunking_parallel(self):
+        """Test that chunks are sent concurrently, bounded by max_workers, with the last one sent last."""
+        upload = self.make_parallel_upload(max_workers=3)
+
+        result = upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 95, "text/plain", "sphere")
+
+        self.assertEqual(sorted(self.started), list(range(10)))
+        self.assertEqual(self.peak, 3)
+        self.assertEqual(self.started[-1], 9)
+        self.assertEqual(self.finished[-1], 9)
+        self.assertEqual(result, {"chunk": 9})
+
+    def test_upload_with_chunking_parallel_params(self):
+        """Test that parallel chunks carry the same Dropzone parameters as sequential ones."""
+        upload = self.make_parallel_upload(max_workers=4)
+
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 25, "text/plain")
+
+        params = sorted((c[0][1] for c in self.mock_client.send_post_content.call_args_list), key=lambda p: p['dzchunkindex'])
+        self.assertEqual([p['dzchunkbyteoffset'] for p in params], [0, 10, 20])
+        self.assertEqual([p['dzchunksize'] for p in params], [10, 10, 5])
+        self.assertEqual(len({p['dzuuid'] for p in params}), 1)
+        self.assertTrue(all('sphere_id' not in p for p in params))
+
+    def test_upload_with_chunking_ordered_window(self):
+        """Test that in ordered mode a slow chunk holds back the window."""
+        upload = self.make_parallel_upload(delays={0: 0.1}, max_workers=2, last_chunk_last=False)
+
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 50, "text/plain")
+
+        # Chunk 0 is slow: only chunk 1 can run next to it, chunk 2 waits for chunk 0
+        self.assertEqual(sorted(self.started[:2]), [0, 1])
+        self.assertLess(self.finished.index(0), self.started.index(2))
+
+    def test_upload_with_chunking_unordered(self):
+        """Test that in unordered mode free slots are refilled while a slow chunk is in flight."""
+        upload = self.make_parallel_upload(delays={0: 0.1}, max_workers=2, ordered=False, last_chunk_last=False)
+
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 50, "text/plain")
+
+        self.assertEqual(self.finished[-1], 0)
+        self.assertEqual(sorted(self.started), list(range(5)))
+
+    def test_upload_with_chunking_parallel_error(self):
+        """Test that a failing chunk stops the upload and is raised."""
+        upload = Upload(self.mock_client, max_workers=2)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.side_effect = RuntimeError("chunk failed")
+
+        with self.assertRaises(RuntimeError):
+            upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 100, "text/plain")
+
+        self.assertLess(self.mock_client.send_post_content.call_count, 10)
+
+    def test_upload_with_chunking_stats(self):
+        """Test that the throughput of the last upload is recorded."""
+        self.upload.chunksize = 10
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        self.upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 25, "text/plain")
+
+        self.assertEqual(self.upload.last_stats.size, 25)
+        self.assertEqual(self.upload.last_stats.chunks, 3)
+        self.assertGreater(self.upload.last_stats.seconds, 0)
+
+    def test_transfer_stats(self):
+        """Test the TransferStats throughput computation."""
+        stats = TransferStats(20 * 1024 * 1024, 2.0, 2)
+        self.assertEqual(stats.mbps, 10.0)
+        self.assertIn("mbps=10.00", repr(stats))
+        self.assertEqual(TransferStats(10, 0, 1).mbps, 0.0)
+
+
+    def test_upload_with_chunking_resume(self):
+        """Test that a failed journaled upload is resumed from the missing chunks, with the same dzuuid."""
+        journal = UploadJournal(os.path.join(tempfile.mkdtemp(), 'uploads.json'))
+        self.addCleanup(shutil.rmtree, os.path.dirname(journal.path))
+        upload = Upload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+        content = b"a" * 45
+        sent = []
+
+        def flaky(endpoint, params, files):
+            sent.append((params['dzuuid'], params['dzchunkindex']))
+            if params['dzchunkindex'] == 2 and len(sent) == 3:
+                raise RuntimeError("network down")
+            return {"id": 123}
+        self.mock_client.send_post_content.side_effect = flaky
+
+        with self.assertRaises(RuntimeError):
+            upload._upload_with_chunking("test/endpoint", "test.txt", content, "text/plain", "sphere")
+        result = upload._upload_with_chunking("test/endpoint", "test.txt", content, "text/plain", "sphere")
+
+        self.assertEqual([index for _, index in sent], [0, 1, 2, 2, 3, 4])
+        self.assertEqual(len({dzuuid for dzuuid, _ in sent}), 1)
+        self.assertEqual(upload.last_stats.chunks, 3)
+        self.assertEqual(upload.last_stats.size, 25)
+        self.assertEqual(result, {"id": 123})
+        self.assertEqual(journal._uploads, {})
+
+    def test_upload_with_chunking_concurrent_same_content(self):
+        """Test that concurrent uploads of the same content to the same sphere do not share their dzuuid."""
+        journal = UploadJournal(os.path.join(tempfile.mkdtemp(), 'uploads.json'))
+        self.addCleanup(shutil.rmtree, os.path.dirname(journal.path))
+        upload = Upload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+        barrier = threading.Barrier(2, timeout=5)
+        sent = []
+
+        def send(endpoint, params, files):
+            sent.append((files['userfile'][0], params['dzuuid']))
+            if params['dzchunkindex'] == 0:
+                barrier.wait()
+            return {"id": files['userfile'][0]}
+        self.mock_client.send_post_content.side_effect = send
+
+        results = {}
+        def run(filename):
+            results[filename] = upload._upload_with_chunking("test/endpoint", filename, b"a" * 25, "text/plain", "sphere")
+        threads = [threading.Thread(target=run, args=(filename,)) for filename in ("a.bin", "b.bin")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {"a.bin": {"id": "a.bin"}, "b.bin": {"id": "b.bin"}})
+        dzuuids = {filename: {dzuuid for name, dzuuid in sent if name == filename} for filename in results}
+        self.assertEqual([len(uuids) for uuids in dzuuids.values()], [1, 1])
+        self.assertNotEqual(dzuuids["a.bin"], dzuuids["b.bin"])
+        self.assertEqual(journal._uploads, {})
+
+    def test_upload_with_chunking_resume_parallel(self):
+        """Test that a journaled parallel upload skips acknowledged chunks but always resends the last one."""
+        journal = MagicMock()
+        journal.open.return_value = ("resumed-uuid", 10, {0, 1, 2, 4})
+        upload = self.make_parallel_upload(max_workers=2, journal=journal)
+
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 50, "text/plain", "sphere")
+
+        self.assertEqual(sorted(self.started), [3, 4])
+        self.assertEqual(self.started[-1], 4)
+        journal.ack.assert_called_once()
+        self.assertEqual(journal.ack.call_args[0][1], 3)
+        journal.discard.assert_called_once_with(journal.open.call_args[0][0])
+
+    def test_upload_with_chunking_journal_key(self):
+        """Test that the journal key depends on the content and the destination, not on the chunk size."""
+        journal = MagicMock()
+        journal.open.return_value = ("uuid", 10, set())
+        upload = Upload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+
+        for content, sphere in ((b"a" * 25, "s1"), (b"b" * 25, "s1"), (b"a" * 25, "s2")):
+            upload._upload_with_chunking("test/endpoint", "test.txt", content, "text/plain", sphere)
+
+        upload.chunksize = 5
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 25, "text/plain", "s1")
+
+        keys = [c[0][0] for c in journal.open.call_args_list]
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(keys[3], keys[0])
+        self.assertEqual(journal.open.call_args[0][1], 5)
+
+    def test_upload_with_chunking_resume_chunksize(self):
+        """Test that a resumed upload keeps the chunk size it was started with."""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        journal = UploadJournal(os.path.join(temp_dir, 'uploads.json'))
+        upload = Upload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.side_effect = [{}, RuntimeError("Timeout")]
+
+        with self.assertRaises(RuntimeError):
+            upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 25, "text/plain", "sphere")
+
+        self.mock_client.send_post_content.reset_mock(side_effect=True)
+        self.mock_client.send_post_content.return_value = {"id": 123}
+        upload._upload_with_chunking("test/endpoint", "test.txt", b"a" * 25, "text/plain", "sphere", chunksize=5)
+
+        params = [call[0][1] for call in self.mock_client.send_post_content.call_args_list]
+        self.assertEqual([(p['dzchunkindex'], p['dzchunksize'], p['dztotalchunkcount']) for p in params],
+                         [(1, 10, 3), (2, 5, 3)])
+        self.assertEqual(upload.last_stats.chunksize, 10)
+
     @patch.object(Upload, '_upload')
     def test_boxresource_small_file(self, mock_upload):
         """Test the boxresource method with a small file."""
@@ -114,14 +339,212 @@ class TestUpload(unittest.TestCase):
         result = self.upload.boxresource(filename, content, mimes, sphere_external_id)
         
         # Verifications
-        mock_upload_with_chunking.assert_called_once_with(
-            'upload/box_resource',
-            filename,
-            content,
-            mimes,
-            sphere_external_id
+        mock_upload_with_chunking.assert_called_once()
+        endpoint, called_filename, source, called_mimes, called_sphere = mock_upload_with_chunking.call_args[0]
+        self.assertEqual(endpoint, 'upload/box_resource')
+        self.assertEqual(called_filename, filename)
+        self.assertIsInstance(source, BytesContent)
+        self.assertIs(source.content, content)
+        self.assertEqual(called_mimes, mimes)
+        self.assertEqual(called_sphere, sphere_external_id)
+        self.assertEqual(result, {"id": 123})
+
+    def test_boxresource_from_path(self):
+        """Test the boxresource method streams a file given by its path."""
+        self.upload.chunksize = 10
+        self.mock_client.send_post_content.return_value = {"id": 123}
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b"0123456789abcdefghij!")
+        self.addCleanup(os.remove, f.name)
+
+        result = self.upload.boxresource("test.bin", f.name, "application/octet-stream", "sphere")
+
+        chunks = [c[0][2]['userfile'][1] for c in self.mock_client.send_post_content.call_args_list]
+        self.assertEqual(chunks, [b"0123456789", b"abcdefghij", b"!"])
+        self.assertEqual(result, {"id": 123})
+
+    def test_boxresource_small_file_object(self):
+        """Test the boxresource method with a small file object sends its whole content at once."""
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        self.upload.boxresource("test.txt", io.BytesIO(b"small"), "text/plain", "sphere")
+
+        self.mock_client.send_post_content.assert_called_once_with(
+            'upload/box_resource', {'sphere_id': 'sphere'}, {'userfile': ('test.txt', b"small", 'text/plain')}
         )
+
+    def test_boxresource_from_iterable_parallel(self):
+        """Test the boxresource method with an iterable of known size and parallel chunks."""
+        upload = self.make_parallel_upload(max_workers=3)
+        pieces = (bytes([i]) * 7 for i in range(5))
+
+        upload.boxresource("test.bin", open_content(pieces, size=35), "application/octet-stream", "sphere")
+
+        calls = sorted(self.mock_client.send_post_content.call_args_list, key=lambda c: c[0][1]['dzchunkindex'])
+        data = b"".join(bytes(c[0][2]['userfile'][1]) for c in calls)
+        self.assertEqual(data, b"".join(bytes([i]) * 7 for i in range(5)))
+
+    def test_boxresource_dedup(self):
+        """Test that a content already uploaded is not sent again."""
+        dedup = DedupIndex()
+        upload = Upload(self.mock_client, dedup=dedup)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        first = upload.boxresource("a.txt", b"same content", "text/plain", "sphere")
+        second = upload.boxresource("b.txt", io.BytesIO(b"same content"), "text/plain", "other")
+        upload.boxresource("c.txt", b"small", "text/plain", "sphere")
+
+        self.assertEqual(first, {"id": 123})
+        self.assertEqual(second, {"id": 123, "hash": hashlib.sha256(b"same content").hexdigest(), "deduplicated": True})
+        # Two chunks for the first content, one request for the small one
+        self.assertEqual(self.mock_client.send_post_content.call_count, 3)
+        self.assertEqual(dedup.snapshot(), {'hits': 1, 'misses': 2, 'entries': 2})
+
+    def test_boxresource_dedup_journal(self):
+        """Test that the hash computed for the dedup index is reused by the journal."""
+        journal = MagicMock()
+        journal.open.return_value = ("uuid", 10, set())
+        upload = Upload(self.mock_client, journal=journal, dedup=DedupIndex())
+        upload.chunksize = 10
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        with patch('whaller_client.endpoints.upload.hash_content', return_value="digest") as mock_hash:
+            upload.boxresource("a.txt", b"a" * 25, "text/plain", "sphere")
+
+        mock_hash.assert_called_once()
+        self.assertTrue(journal.open.call_args[0][0].endswith(':digest'))
+
+    def test_boxresource_journal_iterable(self):
+        """Test that an iterable, which can only be read once, is uploaded without being journaled."""
+        journal = MagicMock()
+        upload = Upload(self.mock_client, journal=journal)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        result = upload.boxresource("a.txt", open_content(iter([b"a" * 15, b"a" * 10]), size=25), "text/plain", "sphere")
+
         self.assertEqual(result, {"id": 123})
+        self.assertEqual(self.mock_client.send_post_content.call_count, 3)
+        journal.open.assert_not_called()
+        journal.discard.assert_not_called()
+
+    def test_boxresource_dedup_iterable(self):
+        """Test that an iterable, which can only be read once, is sent without being hashed."""
+        dedup = DedupIndex()
+        upload = Upload(self.mock_client, dedup=dedup)
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        upload.boxresource("a.txt", open_content(iter([b"abc"]), size=3), "text/plain", "sphere")
+
+        self.assertEqual(dedup.snapshot(), {'hits': 0, 'misses': 0, 'entries': 0})
+
+    def test_boxresource_adaptive(self):
+        """Test that the chunk size and the number of chunks in flight come from the adaptive chunking."""
+        adaptive = AdaptiveChunking(min_size=10, max_size=40, initial_size=10, step=10, max_workers=3)
+        upload = Upload(self.mock_client, adaptive=adaptive)
+        self.mock_client.send_post_content.return_value = {"id": 123}
+
+        with patch('whaller_client.endpoints.upload.perf_counter', side_effect=[0, 0, 1, 1, 2, 2, 2.5, 2.5]):
+            upload.boxresource("a.bin", b"a" * 25, "application/octet-stream", "sphere")
+
+        sizes = [call[0][1]['dzchunksize'] for call in self.mock_client.send_post_content.call_args_list]
+        self.assertEqual(sizes, [10, 10, 5])
+        self.assertEqual(upload.last_stats.chunksize, 10)
+        self.assertEqual(upload.last_stats.workers, 1)
+        # 10 bytes in 1 second, for chunks of 2 seconds
+        self.assertEqual(adaptive.snapshot(), {'chunksize': 20, 'workers': 2, 'throughput': 10.0, 'uploads': 1})
+
+        self.mock_client.send_post_content.reset_mock()
+        upload.boxresource("b.bin", b"b" * 45, "application/octet-stream", "sphere")
+        sizes = sorted(call[0][1]['dzchunksize'] for call in self.mock_client.send_post_content.call_args_list)
+        self.assertEqual(sizes, [5, 20, 20])
+        self.assertEqual(upload.last_stats.workers, 2)
+
+        upload.boxresource("c.bin", b"small", "application/octet-stream", "sphere")
+
+    def test_boxresource_adaptive_failure(self):
+        """Test that a failed chunk halves the chunk size."""
+        adaptive = AdaptiveChunking(min_size=10, max_size=40, initial_size=40, step=10)
+        upload = Upload(self.mock_client, adaptive=adaptive)
+        self.mock_client.send_post_content.side_effect = RuntimeError("Connection reset")
+
+        with self.assertRaises(RuntimeError):
+            upload.boxresource("a.bin", b"a" * 100, "application/octet-stream", "sphere")
+
+        self.assertEqual(adaptive.chunksize, 20)
+
+    def test_boxresource_metrics(self):
+        """Test that the duration and size of the chunks, and their failures, are recorded."""
+        metrics = MetricsRegistry()
+        upload = Upload(self.mock_client, metrics=metrics)
+        upload.chunksize = 10
+        self.mock_client.send_post_content.side_effect = [{"id": 1}, {"id": 1}, RuntimeError("Connection reset")]
+
+        upload.boxresource("a.bin", b"a" * 15, "application/octet-stream", "sphere")
+        with self.assertRaises(RuntimeError):
+            upload.boxresource("b.bin", b"b" * 15, "application/octet-stream", "sphere")
+
+        snapshot = metrics.snapshot()
+        counters = {counter['name']: counter['value'] for counter in snapshot['counters']}
+        self.assertEqual(counters, {'upload_bytes_total': 15, 'upload_chunk_failures_total': 1})
+        self.assertEqual(snapshot['histograms'][0]['name'], 'upload_chunk_seconds')
+        self.assertEqual(snapshot['histograms'][0]['count'], 2)
+
+    def test_metrics_default_to_the_client(self):
+        """Test that the chunks are recorded in the registry of the client, unless another one is given."""
+        metrics = MetricsRegistry()
+        self.mock_client.api.metrics = metrics
+
+        self.assertIs(Upload(self.mock_client).metrics, metrics)
+        self.assertIsNot(Upload(self.mock_client, metrics=MetricsRegistry()).metrics, metrics)
+
+class TestAdaptiveChunking(unittest.TestCase):
+    """Tests for the AdaptiveChunking class."""
+
+    def test_chunk_size(self):
+        """Test that chunks are sized for the target duration, within bounds and in steps."""
+        adaptive = AdaptiveChunking(min_size=100, max_size=1000, initial_size=550, target_seconds=2, smoothing=0.5, step=100)
+        self.assertEqual(adaptive.chunksize, 500)
+
+        adaptive.record_chunk(100, 1)  # 100 B/s
+        self.assertEqual(adaptive.chunksize, 200)
+        adaptive.record_chunk(300, 1)  # Averaged to 200 B/s
+        self.assertEqual(adaptive.chunksize, 400)
+        adaptive.record_chunk(10000, 1)
+        self.assertEqual(adaptive.chunksize, 1000)
+        adaptive.record_chunk(1000, 0)
+        self.assertEqual(adaptive.chunksize, 1000)
+
+        adaptive.record_failure()
+        self.assertEqual(adaptive.chunksize, 500)
+        self.assertEqual(adaptive.throughput, 250)
+        for _ in range(5):
+            adaptive.record_failure()
+        self.assertEqual(adaptive.chunksize, 100)
+
+    def test_workers(self):
+        """Test that the number of chunks in flight follows the throughput of the uploads."""
+        adaptive = AdaptiveChunking(max_workers=3)
+        mb = 1024 * 1024
+
+        adaptive.record_upload(TransferStats(10 * mb, 10, 10, workers=1))  # 1 MB/s
+        self.assertEqual(adaptive.workers, 2)
+        adaptive.record_upload(TransferStats(10 * mb, 5, 10, workers=2))  # Better
+        self.assertEqual(adaptive.workers, 3)
+        adaptive.record_upload(TransferStats(10 * mb, 4, 10, workers=3))  # Better, at the maximum
+        self.assertEqual(adaptive.workers, 3)
+        adaptive.record_upload(TransferStats(10 * mb, 8, 10, workers=3))  # Worse: back
+        self.assertEqual(adaptive.workers, 2)
+        adaptive.record_upload(TransferStats(mb, 8, 1, workers=2))  # A single chunk tells nothing
+        self.assertEqual(adaptive.workers, 2)
+        self.assertEqual(len(adaptive.history), 5)
+
+    def test_single_worker(self):
+        """Test that the number of chunks in flight stays at 1 without parallelism."""
+        adaptive = AdaptiveChunking()
+        adaptive.record_upload(TransferStats(100, 1, 10))
+        self.assertEqual(adaptive.workers, 1)
 
 
 if __name__ == '__main__':
@@ -2,11 +2,24 @@
 Unit tests for the ApiClient class.
 """
 import unittest
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
 from json import JSONDecodeError
 from requests import RequestException
+from requests.exceptions import ConnectionError, ConnectTimeout, HTTPError, ReadTimeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
 from whaller_client.api import ApiClient
-from whaller_client.exceptions import MethodError, ApiError, HttpError, InvalidResponseError
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.codec import JsonCodec
+from whaller_client.content import MultipartBody
+from whaller_client.deadline import deadline
+from whaller_client.exceptions import (MethodError, ApiError, CircuitOpenError, DeadlineExceededError, HttpError,
+                                       InvalidResponseError)
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.middleware import Response
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
 
 
 class TestApiClient(unittest.TestCase):
@@ -15,64 +28,73 @@ class TestApiClient(unittest.TestCase):
     def setUp(self):
         """Initial setup for each test."""
         self.base_url = "https://api.whaller.com"
+        session_patcher = patch('whaller_client.api.Session')
+        self.mock_session_cls = session_patcher.start()
+        self.addCleanup(session_patcher.stop)
+        self.mock_session = self.mock_session_cls.return_value
         self.api_client = ApiClient(self.base_url)
 
     def test_init(self):
         """Test ApiClient initialization."""
         self.assertEqual(self.api_client.api_base_url, "https://api.whaller.com/api/")
-        
+        self.assertEqual(self.api_client.pool_connections, 10)
+        self.assertEqual(self.api_client.pool_maxsize, 10)
+        self.assertEqual(self.api_client.keepalive_timeout, 60.0)
+
         # Test with a trailing slash
         api_client_with_slash = ApiClient("https://api.whaller.com/")
         self.assertEqual(api_client_with_slash.api_base_url, "https://api.whaller.com/api/")
 
-    @patch('whaller_client.api.post')
-    def test_call_json_post_success(self, mock_post):
+    def test_call_json_post_success(self):
         """Test the call_json method with POST and success."""
         # Mock configuration
+        mock_post = self.mock_session.post
         mock_response = MagicMock()
         mock_response.content = '{"result": {"success": true}}'
         mock_response.raise_for_status = MagicMock()
         mock_post.return_value = mock_response
-        
+
         # Call the method to test
         result = self.api_client.call_json(
-            "test/endpoint", 
-            "POST", 
-            {"data": "value"}, 
+            "test/endpoint",
+            "POST",
+            {"data": "value"},
             {"Custom-Header": "value"}
         )
-        
+
         # Verifications
         mock_post.assert_called_once_with(
             "https://api.whaller.com/api/test/endpoint",
-            json={"data": "value"},
-            headers={"Content-Type": "application/json", "Custom-Header": "value"}
+            data=b'{"data":"value"}',
+            headers={"Content-Type": "application/json", "Custom-Header": "value"},
+            timeout=(10.0, 60.0)
         )
         mock_response.raise_for_status.assert_called_once()
         self.assertEqual(result, {"success": True})
 
-    @patch('whaller_client.api.get')
-    def test_call_json_get_success(self, mock_get):
+    def test_call_json_get_success(self):
         """Test the call_json method with GET and success."""
         # Mock configuration
+        mock_get = self.mock_session.get
         mock_response = MagicMock()
         mock_response.content = '{"result": {"success": true}}'
         mock_response.raise_for_status = MagicMock()
         mock_get.return_value = mock_response
-        
+
         # Call the method to test
         result = self.api_client.call_json(
-            "test/endpoint", 
-            "GET", 
-            {"data": "value"}, 
+            "test/endpoint",
+            "GET",
+            {"data": "value"},
             {"Custom-Header": "value"}
         )
-        
+
         # Verifications
         mock_get.assert_called_once_with(
             "https://api.whaller.com/api/test/endpoint",
             params={"data": "value"},
-            headers={"Content-Type": "application/json", "Custom-Header": "value"}
+            headers={"Content-Type": "application/json", "Custom-Header": "value"},
+            timeout=(10.0, 60.0)
         )
         mock_response.raise_for_status.assert_called_once()
         self.assertEqual(result, {"success": True})
@@ -82,57 +104,666 @@ class TestApiClient(unittest.TestCase):
         with self.assertRaises(MethodError):
             self.api_client.call_json("test/endpoint", "INVALID", {}, {})
 
-    @patch('whaller_client.api.post')
-    def test_call_json_http_error(self, mock_post):
+    def test_call_json_http_error(self):
         """Test the call_json method with an HTTP error."""
         # Mock configuration
-        mock_post.side_effect = RequestException("HTTP Error")
-        
+        self.mock_session.post.side_effect = RequestException("HTTP Error")
+
         # Call the method to test and verification
         with self.assertRaises(HttpError):
             self.api_client.call_json("test/endpoint", "POST", {}, {})
 
-    @patch('whaller_client.api.post')
-    def test_call_json_invalid_json(self, mock_post):
+    def test_call_json_invalid_json(self):
         """Test the call_json method with an invalid JSON response."""
         # Mock configuration
         mock_response = MagicMock()
         mock_response.content = 'Invalid JSON'
         mock_response.raise_for_status = MagicMock()
-        mock_post.return_value = mock_response
-        
+        self.mock_session.post.return_value = mock_response
+
         # Call the method to test and verification
         with self.assertRaises(InvalidResponseError):
             self.api_client.call_json("test/endpoint", "POST", {}, {})
 
-    @patch('whaller_client.api.post')
-    def test_call_json_api_error(self, mock_post):
+    def test_call_json_api_error(self):
         """Test the call_json method with an API error."""
         # Mock configuration
         mock_response = MagicMock()
         mock_response.content = '{"error": {"message": "API Error"}}'
         mock_response.raise_for_status = MagicMock()
-        mock_post.return_value = mock_response
-        
+        self.mock_session.post.return_value = mock_response
+
         # Call the method to test and verification
         with self.assertRaises(ApiError):
             self.api_client.call_json("test/endpoint", "POST", {}, {})
 
-    @patch('whaller_client.api.post')
-    def test_call_json_empty_result(self, mock_post):
+    def test_call_json_empty_result(self):
         """Test the call_json method with an empty result."""
         # Mock configuration
         mock_response = MagicMock()
         mock_response.content = '{}'
         mock_response.raise_for_status = MagicMock()
-        mock_post.return_value = mock_response
-        
+        self.mock_session.post.return_value = mock_response
+
         # Call the method to test
         result = self.api_client.call_json("test/endpoint", "POST", {}, {})
-        
+
         # Verifications
         self.assertEqual(result, {})
 
+    def test_send_content_success(self):
+        """Test the send_content method sends a multipart request."""
+        # Mock configuration
+        mock_response = MagicMock()
+        mock_response.content = '{"result": {"id": 123}}'
+        self.mock_session.post.return_value = mock_response
+        files = {'userfile': ('test.txt', b'content', 'text/plain')}
+
+        # Call the method to test
+        result = self.api_client.send_content(
+            "upload/box_resource",
+            {"sphere_id": "sphere"},
+            files,
+            {"Authorization": "Bearer token"}
+        )
+
+        # Verifications
+        self.mock_session.post.assert_called_once()
+        args, kwargs = self.mock_session.post.call_args
+        self.assertEqual(args, ("https://api.whaller.com/api/upload/box_resource",))
+        body = kwargs['data']
+        self.assertIsInstance(body, MultipartBody)
+        self.assertEqual(kwargs['headers'], {"Content-Type": body.content_type, "Authorization": "Bearer token"})
+        self.assertIn(b'name="sphere_id"\r\n\r\nsphere\r\n', bytes(body))
+        self.assertIn(b'filename="test.txt"\r\nContent-Type: text/plain\r\n\r\ncontent\r\n', bytes(body))
+        self.assertEqual(result, {"id": 123})
+
+    def test_send_content_http_error(self):
+        """Test the send_content method with an HTTP error."""
+        self.mock_session.post.side_effect = RequestException("HTTP Error")
+
+        with self.assertRaises(HttpError):
+            self.api_client.send_content("upload/box_resource", {}, {})
+
+    def test_session_is_reused(self):
+        """Test that consecutive calls share a single pooled session."""
+        mock_response = MagicMock()
+        mock_response.content = '{"result": {}}'
+        self.mock_session.get.return_value = mock_response
+
+        self.api_client.call_json("test/endpoint", "GET")
+        self.api_client.call_json("test/endpoint", "GET")
+
+        self.mock_session_cls.assert_called_once()
+        self.assertEqual(self.mock_session.get.call_count, 2)
+
+    @patch('whaller_client.api.HTTPAdapter')
+    def test_session_pool_configuration(self, mock_adapter_cls):
+        """Test that the session mounts an adapter configured with the pool sizes."""
+        api_client = ApiClient(self.base_url, pool_connections=4, pool_maxsize=32)
+
+        session = api_client.session
+
+        mock_adapter_cls.assert_called_once_with(pool_connections=4, pool_maxsize=32)
+        session.mount.assert_any_call('https://', mock_adapter_cls.return_value)
+        session.mount.assert_any_call('http://', mock_adapter_cls.return_value)
+
+    @patch('whaller_client.api.monotonic')
+    def test_session_recycled_after_keepalive_timeout(self, mock_monotonic):
+        """Test that an idle session is closed and replaced after the keep-alive timeout."""
+        first_session = MagicMock()
+        second_session = MagicMock()
+        self.mock_session_cls.side_effect = [first_session, second_session]
+        api_client = ApiClient(self.base_url, keepalive_timeout=30)
+
+        mock_monotonic.return_value = 100.0
+        self.assertIs(api_client.session, first_session)
+        mock_monotonic.return_value = 120.0
+        self.assertIs(api_client.session, first_session)
+        mock_monotonic.return_value = 151.0
+        self.assertIs(api_client.session, second_session)
+
+        first_session.close.assert_called_once()
+
+    @patch('whaller_client.api.monotonic')
+    def test_session_never_recycled_without_keepalive_timeout(self, mock_monotonic):
+        """Test that the session is kept forever when keepalive_timeout is None."""
+        api_client = ApiClient(self.base_url, keepalive_timeout=None)
+
+        mock_monotonic.return_value = 0.0
+        session = api_client.session
+        mock_monotonic.return_value = 1e9
+
+        self.assertIs(api_client.session, session)
+        session.close.assert_not_called()
+
+    def test_context_manager_closes_session(self):
+        """Test that leaving the context manager closes the pooled session."""
+        with ApiClient(self.base_url) as api_client:
+            api_client.session
+
+        self.mock_session.close.assert_called_once()
+        self.assertIsNone(api_client._session)
+
+    def test_close_without_session(self):
+        """Test that close is a no-op when no session was opened."""
+        self.api_client.close()
+        self.mock_session_cls.assert_not_called()
+
+    def make_response(self, status_code, content='{"result": {"id": 1}}', headers=None):
+        """Build a mocked response with the given status."""
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = headers or {}
+        response.content = content
+        response.elapsed = timedelta(milliseconds=10)
+        if status_code >= 400:
+            response.raise_for_status.side_effect = HTTPError(f"{status_code} Error")
+        return response
+
+    @patch('whaller_client.api.sleep')
+    def test_call_json_retries_transient_status(self, mock_sleep):
+        """Test that a GET is retried on transient statuses, honouring Retry-After."""
+        first = self.make_response(503)
+        second = self.make_response(429, headers={'Retry-After': '2'})
+        self.mock_session.get.side_effect = [first, second, self.make_response(200)]
+
+        result = self.api_client.call_json("test/endpoint", "GET")
+
+        self.assertEqual(result, {"id": 1})
+        self.assertEqual(self.mock_session.get.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertLessEqual(mock_sleep.call_args_list[0][0][0], 0.5)
+        self.assertEqual(mock_sleep.call_args_list[1][0][0], 2.0)
+        first.close.assert_called_once()
+        self.assertEqual(self.api_client.retry_policy.stats.snapshot()['reasons'], {'503': 1, '429': 1})
+
+    @patch('whaller_client.api.sleep')
+    def test_call_json_gives_up_after_max_attempts(self, mock_sleep):
+        """Test that the last failure is raised once every attempt was made."""
+        self.mock_session.get.side_effect = [self.make_response(502) for _ in range(3)]
+
+        with self.assertRaises(HttpError):
+            self.api_client.call_json("test/endpoint", "GET")
+
+        self.assertEqual(self.mock_session.get.call_count, 3)
+        self.assertEqual(self.api_client.retry_policy.stats.snapshot()['exhausted'], 1)
+
+    @patch('whaller_client.api.sleep')
+    def test_call_json_retries_network_errors(self, mock_sleep):
+        """Test that a GET is retried on connection resets and timeouts."""
+        self.mock_session.get.side_effect = [
+            ConnectionError(ProtocolError("Connection reset by peer")),
+            ReadTimeout("Read timed out"),
+            self.make_response(200)
+        ]
+
+        self.assertEqual(self.api_client.call_json("test/endpoint", "GET"), {"id": 1})
+        self.assertEqual(self.mock_session.get.call_count, 3)
+
+    @patch('whaller_client.api.sleep')
+    def test_call_json_post_not_retried_once_sent(self, mock_sleep):
+        """Test that a POST that may have been processed is not sent again."""
+        self.mock_session.post.side_effect = [ConnectionError(ProtocolError("Connection reset by peer"))]
+        with self.assertRaises(HttpError):
+            self.api_client.call_json("test/endpoint", "POST")
+
+        self.mock_session.post.side_effect = [self.make_response(502)]
+        with self.assertRaises(HttpError):
+            self.api_client.call_json("test/endpoint", "POST")
+
+        self.assertEqual(self.mock_session.post.call_count, 2)
+        mock_sleep.assert_not_called()
+
+    @patch('whaller_client.api.sleep')
+    def test_call_json_post_retried_when_not_sent(self, mock_sleep):
+        """Test that a POST is retried when the connection failed or the API throttled it."""
+        refused = ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "Connection refused")))
+        self.mock_session.post.side_effect = [
+            refused, ConnectTimeout("Connect timed out"), self.make_response(200)
+        ]
+        api_client = ApiClient(self.base_url, retry_policy=RetryPolicy(max_attempts=4))
+
+        self.assertEqual(api_client.call_json("test/endpoint", "POST"), {"id": 1})
+
+        self.mock_session.post.side_effect = [self.make_response(429), self.make_response(200)]
+        self.assertEqual(api_client.call_json("test/endpoint", "POST"), {"id": 1})
+        self.assertEqual(mock_sleep.call_count, 3)
+
+    @patch('whaller_client.api.sleep')
+    def test_send_content_retries_throttled_upload(self, mock_sleep):
+        """Test that a throttled upload is sent again with the same body."""
+        self.mock_session.post.side_effect = [self.make_response(429), self.make_response(200)]
+
+        result = self.api_client.send_content("upload/box_resource", {}, {'userfile': ('a.txt', b'a', 'text/plain')})
+
+        self.assertEqual(result, {"id": 1})
+        bodies = [call[1]['data'] for call in self.mock_session.post.call_args_list]
+        self.assertEqual(bytes(bodies[0]), bytes(bodies[1]))
+
+    def test_retries_disabled(self):
+        """Test that a single attempt is made with max_attempts=1."""
+        api_client = ApiClient(self.base_url, retry_policy=RetryPolicy(max_attempts=1))
+        self.mock_session.get.side_effect = [self.make_response(503)]
+
+        with self.assertRaises(HttpError):
+            api_client.call_json("test/endpoint", "GET")
+        self.assertEqual(self.mock_session.get.call_count, 1)
+
+    @patch('whaller_client.api.sleep')
+    def test_rate_limiter(self, mock_sleep):
+        """Test that each attempt waits for the rate limiter, which learns from the responses."""
+        rate_limiter = MagicMock(spec=RateLimiter)
+        api_client = ApiClient(self.base_url, rate_limiter=rate_limiter)
+        throttled = self.make_response(429, headers={'Retry-After': '1'})
+        self.mock_session.post.side_effect = [throttled, self.make_response(200)]
+
+        api_client.send_content("upload/box_resource", {}, {})
+
+        self.assertEqual(rate_limiter.acquire.call_args_list, [(("upload/box_resource",),)] * 2)
+        rate_limiter.update.assert_any_call("upload/box_resource", 429, {'Retry-After': '1'})
+        rate_limiter.update.assert_called_with("upload/box_resource", 200, {})
+
+    def test_call_json_get_cached(self):
+        """Test that a fresh cached response is served without any request."""
+        api_client = ApiClient(self.base_url, cache=ResponseCache(ttl=60))
+        self.mock_session.get.return_value = self.make_response(200)
+
+        first = api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token"})
+        second = api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token"})
+
+        self.assertEqual(first, {"id": 1})
+        # Each caller gets its own copy, and modifying it does not alter the cache
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+        first['changed'] = second['changed'] = True
+        self.assertEqual(api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token"}), {"id": 1})
+        self.assertEqual(self.mock_session.get.call_count, 1)
+
+    def test_call_json_get_cache_per_user(self):
+        """Test that users never share cached responses."""
+        api_client = ApiClient(self.base_url, cache=ResponseCache(ttl=60))
+        self.mock_session.get.side_effect = [
+            self.make_response(200, '{"result": {"login": "alice"}}'),
+            self.make_response(200, '{"result": {"login": "bob"}}')
+        ]
+
+        self.assertEqual(api_client.call_json("me", "GET", {}, {"Authorization": "Bearer alice"}), {"login": "alice"})
+        self.assertEqual(api_client.call_json("me", "GET", {}, {"Authorization": "Bearer bob"}), {"login": "bob"})
+
+    def test_call_json_get_cache_per_identity(self):
+        """Test that cached responses are keyed by the identity of the user, which outlives its tokens."""
+        api_client = ApiClient(self.base_url, cache=ResponseCache(ttl=60))
+        self.mock_session.get.return_value = self.make_response(200)
+
+        api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token1"}, identity="api|app|alice")
+        api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token2"}, identity="api|app|alice")
+        api_client.call_json("me", "GET", {}, {"Authorization": "Bearer token2"}, identity="api|app|bob")
+
+        self.assertEqual(self.mock_session.get.call_count, 2)
+
+    def test_call_json_get_revalidated(self):
+        """Test that a stale response is revalidated with a conditional request."""
+        cache = ResponseCache(ttl=0)
+        api_client = ApiClient(self.base_url, cache=cache)
+        self.mock_session.get.side_effect = [
+            self.make_response(200, headers={'ETag': '"v1"', 'Last-Modified': 'yesterday'}),
+            self.make_response(304, content=b''),
+            self.make_response(200, '{"result": {"id": 2}}', headers={'ETag': '"v2"'})
+        ]
+
+        self.assertEqual(api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(api_client.call_json("me", "GET"), {"id": 2})
+
+        headers = [call[1]['headers'] for call in self.mock_session.get.call_args_list]
+        self.assertNotIn('If-None-Match', headers[0])
+        self.assertEqual(headers[1]['If-None-Match'], '"v1"')
+        self.assertEqual(headers[1]['If-Modified-Since'], 'yesterday')
+        self.assertEqual(headers[2]['If-None-Match'], '"v1"')
+        self.assertEqual(cache.get(cache.make_key("https://api.whaller.com/api/me", {}, {})).etag, '"v2"')
+        self.assertEqual(cache.snapshot(), {'hits': 0, 'revalidated': 1, 'misses': 2, 'entries': 1})
+
+    def test_call_json_get_cache_error(self):
+        """Test that failures are raised and not cached."""
+        cache = ResponseCache(ttl=60)
+        api_client = ApiClient(self.base_url, cache=cache)
+        self.mock_session.get.side_effect = RequestException("HTTP Error")
+
+        with self.assertRaises(HttpError):
+            api_client.call_json("me", "GET")
+        self.assertEqual(cache.snapshot()['entries'], 0)
+
+    def test_call_json_post_not_cached(self):
+        """Test that POST requests bypass the cache."""
+        api_client = ApiClient(self.base_url, cache=ResponseCache(ttl=60))
+        self.mock_session.post.side_effect = [self.make_response(200), self.make_response(200)]
+
+        api_client.call_json("me", "POST")
+        api_client.call_json("me", "POST")
+
+        self.assertEqual(self.mock_session.post.call_count, 2)
+
+    def test_codec(self):
+        """Test that the bodies are encoded and decoded with the codec of the client."""
+        json_codec = MagicMock(wraps=JsonCodec())
+        api_client = ApiClient(self.base_url, codec=json_codec)
+        self.mock_session.post.return_value = self.make_response(200, b'{"result": {"id": 1}}')
+
+        result = api_client.call_json("test/endpoint", "POST", {"data": "value"})
+
+        self.assertEqual(result, {"id": 1})
+        json_codec.dumps.assert_called_once_with({"data": "value"})
+        json_codec.loads.assert_called_once_with(b'{"result": {"id": 1}}')
+
+    def test_stream_json(self):
+        """Test that the items of the result are streamed and the response closed."""
+        response = self.make_response(200)
+        response.iter_content.return_value = iter([b'{"result": [{"id"', b': 1}, {"id": 2}]}'])
+        self.mock_session.get.return_value = response
+
+        items = self.api_client.stream_json("me/spheres", {"limit": 10}, {"Authorization": "Bearer token"})
+
+        self.mock_session.get.assert_not_called()
+        self.assertEqual(list(items), [{"id": 1}, {"id": 2}])
+        self.mock_session.get.assert_called_once_with(
+            f"{self.base_url}/api/me/spheres",
+            params={"limit": 10},
+            headers={"Content-Type": "application/json", "Authorization": "Bearer token"},
+            stream=True,
+            timeout=(10.0, 60.0)
+        )
+        response.iter_content.assert_called_once_with(65536)
+        response.close.assert_called_once()
+
+    def test_stream_json_closed_early(self):
+        """Test that the response is closed when the iteration stops early."""
+        response = self.make_response(200)
+        response.iter_content.return_value = iter([b'{"result": [1, 2, 3]}'])
+        self.mock_session.get.return_value = response
+
+        items = self.api_client.stream_json("me/spheres")
+        self.assertEqual(next(items), 1)
+        items.close()
+
+        response.close.assert_called_once()
+
+    @patch('whaller_client.api.sleep')
+    def test_stream_json_retry(self, mock_sleep):
+        """Test that the request is retried before the response is streamed."""
+        response = self.make_response(200)
+        response.iter_content.return_value = iter([b'{"result": [1]}'])
+        self.mock_session.get.side_effect = [self.make_response(503), response]
+
+        self.assertEqual(list(self.api_client.stream_json("me/spheres")), [1])
+        self.assertEqual(self.mock_session.get.call_count, 2)
+
+    def test_stream_json_errors(self):
+        """Test that HTTP errors are raised as HttpError, even in the middle of the response."""
+        self.mock_session.get.return_value = self.make_response(404)
+        with self.assertRaises(HttpError):
+            list(self.api_client.stream_json("me/spheres"))
+
+        response = self.make_response(200)
+        def iter_content(chunk_size):
+            yield b'{"result": [1, '
+            raise ConnectionError("Connection reset")
+        response.iter_content.side_effect = iter_content
+        self.mock_session.get.return_value = response
+
+        items = []
+        with self.assertRaises(HttpError):
+            for item in self.api_client.stream_json("me/spheres"):
+                items.append(item)
+        self.assertEqual(items, [1])
+        response.close.assert_called_once()
+
+
+    def get_counters(self, metrics):
+        """Return the counters of a registry by name and labels."""
+        return {(c['name'], tuple(sorted(c['labels'].items()))): c['value'] for c in metrics.snapshot()['counters']}
+
+    @patch('whaller_client.api.sleep')
+    def test_metrics(self, mock_sleep):
+        """Test that the attempts, retries, byte counts and decoding are recorded."""
+        metrics = MetricsRegistry()
+        api_client = ApiClient(self.base_url, metrics=metrics)
+        ok = self.make_response(200)
+        self.mock_session.get.side_effect = [ConnectTimeout("Timed out"), self.make_response(503), ok]
+        self.mock_session.post.return_value = ok
+
+        api_client.call_json("spheres/12/boxresources", "GET")
+        api_client.call_json("person/login", "POST", {"login": "x"})
+
+        counters = self.get_counters(metrics)
+        endpoint = ('endpoint', 'spheres/{id}/boxresources')
+        self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'GET'), ('status', 'error')))], 1)
+        self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'GET'), ('status', '503')))], 1)
+        self.assertEqual(counters[('http_requests_total', (endpoint, ('method', 'GET'), ('status', '200')))], 1)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', 'connect')))], 1)
+        self.assertEqual(counters[('http_retries_total', (endpoint, ('method', 'GET'), ('reason', '503')))], 1)
+        self.assertEqual(counters[('http_response_bytes_total', (endpoint,))], 21)
+        self.assertEqual(counters[('http_request_bytes_total', (('endpoint', 'person/login'),))], 13)
+        histograms = {(h['name'], h['labels']['endpoint']): h for h in metrics.snapshot()['histograms']}
+        self.assertEqual(histograms[('http_request_seconds', 'spheres/{id}/boxresources')]['count'], 3)
+        self.assertEqual(histograms[('http_ttfb_seconds', 'spheres/{id}/boxresources')]['sum'], 0.02)  # Once sent
+        self.assertEqual(histograms[('json_decode_seconds', 'person/login')]['count'], 1)
+
+    @patch('whaller_client.api.sleep')
+    def test_metrics_send_content_and_stream(self, mock_sleep):
+        """Test that uploads, read errors and streamed responses are recorded."""
+        metrics = MetricsRegistry()
+        api_client = ApiClient(self.base_url, metrics=metrics)
+        self.mock_session.post.side_effect = [ValueError("not a request error")]
+        with self.assertRaises(ValueError):
+            api_client.send_content("upload/box_resource", {"a": "b"}, {"userfile": ("f.txt", b"data", "text/plain")})
+
+        response = self.make_response(200)
+        response.iter_content.return_value = iter([b'{"result": [1,', b' 2]}'])
+        self.mock_session.get.side_effect = [ReadTimeout("Read timed out"), response]
+        self.assertEqual(list(api_client.stream_json("me/spheres")), [1, 2])
+
+        counters = self.get_counters(metrics)
+        self.assertGreater(counters[('http_request_bytes_total', (('endpoint', 'upload/box_resource'),))], 4)
+        self.assertEqual(counters[('http_response_bytes_total', (('endpoint', 'me/spheres'),))], 18)
+        self.assertEqual(counters[('http_retries_total', (('endpoint', 'me/spheres'), ('method', 'GET'),
+                                                          ('reason', 'read')))], 1)
+
+    def test_middleware(self):
+        """Test that the middleware wrap the transport in order, and may modify the request and the response."""
+        calls = []
+        def add_header(request, call_next):
+            calls.append(('add_header', request.method, request.endpoint))
+            request.headers['X-Trace'] = 'abc'
+            return call_next(request)
+        def rewrite(request, call_next):
+            calls.append(('rewrite', request.headers['X-Trace']))
+            response = call_next(request)
+            return Response(response.status, response.headers, response.content.replace(b'1', b'2'))
+        api_client = ApiClient(self.base_url, middleware=[add_header, rewrite])
+        self.mock_session.request.return_value = self.make_response(200, b'{"result": {"id": 1}}')
+        params = {"limit": 10}
+
+        result = api_client.call_json("me/spheres", "GET", params, {"Authorization": "Bearer t"})
+
+        self.assertEqual(result, {"id": 2})
+        self.assertEqual(calls, [('add_header', 'GET', 'me/spheres'), ('rewrite', 'abc')])
+        self.mock_session.request.assert_called_once_with(
+            "GET", "https://api.whaller.com/api/me/spheres", params={"limit": 10}, data=None,
+            headers={"Content-Type": "application/json", "Authorization": "Bearer t", "X-Trace": "abc"},
+            timeout=(10.0, 60.0)
+        )
+        self.mock_session.get.assert_not_called()
+
+    def test_middleware_short_circuit(self):
+        """Test that a middleware may answer without sending the request."""
+        def stub(request, call_next):
+            if request.endpoint == 'missing':
+                return Response(404, {}, b'')
+            return Response(200, {'ETag': '"v1"'}, b'{"result": {"stubbed": true}}')
+        api_client = ApiClient(self.base_url, middleware=[stub])
+
+        self.assertEqual(api_client.call_json("me", "POST", {"name": "x"}), {"stubbed": True})
+        with self.assertRaises(HttpError):
+            api_client.call_json("missing", "GET")
+        self.mock_session.request.assert_not_called()
+
+    @patch('whaller_client.api.sleep')
+    def test_middleware_retries(self, mock_sleep):
+        """Test that each attempt goes through the middleware, with a fresh copy of the request."""
+        requests = []
+        def record(request, call_next):
+            requests.append(request)
+            request.headers['X-Attempt'] = str(len(requests))
+            return call_next(request)
+        api_client = ApiClient(self.base_url, middleware=[record])
+        self.mock_session.request.side_effect = [self.make_response(503), self.make_response(200)]
+        headers = {"Authorization": "Bearer t"}
+
+        self.assertEqual(api_client.call_json("me", "GET", {}, headers), {"id": 1})
+
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[1].headers['X-Attempt'], '2')
+        self.assertEqual(headers, {"Authorization": "Bearer t"})
+        mock_sleep.assert_called_once()
+
+    def test_add_middleware(self):
+        """Test that middleware added later are the closest to the transport, for uploads and cached calls too."""
+        calls = []
+        def make_middleware(name):
+            def middleware(request, call_next):
+                calls.append((name, request.method))
+                return call_next(request)
+            return middleware
+        api_client = ApiClient(self.base_url, cache=ResponseCache(), middleware=[make_middleware('outer')])
+        api_client.add_middleware(make_middleware('inner'))
+        self.mock_session.request.return_value = self.make_response(200, b'{"result": {"id": 1}}')
+
+        api_client.send_content("boxresources", {"part": 1}, {"file": ("a.txt", b"abc", "text/plain")})
+        api_client.call_json("me", "GET")
+        api_client.call_json("me", "GET")
+
+        self.assertEqual(calls, [('outer', 'POST'), ('inner', 'POST'), ('outer', 'GET'), ('inner', 'GET')])
+        self.assertIsInstance(self.mock_session.request.call_args_list[0].kwargs['data'], MultipartBody)
+
+    def test_without_middleware(self):
+        """Test that requests go straight to the session when no middleware is installed."""
+        self.assertIsNone(self.api_client._chain)
+        self.mock_session.get.return_value = self.make_response(200)
+
+        self.api_client.call_json("me", "GET")
+
+        self.mock_session.request.assert_not_called()
+
+    def test_timeouts(self):
+        """Test that the connect and read timeouts are shortened to the time left before the deadline."""
+        api_client = ApiClient(self.base_url, connect_timeout=2.0, read_timeout=None)
+        self.mock_session.get.return_value = self.make_response(200)
+
+        api_client.call_json("me", "GET")
+        self.assertEqual(self.mock_session.get.call_args.kwargs['timeout'], (2.0, None))
+
+        with patch('whaller_client.deadline.monotonic', return_value=100.0):
+            with deadline(5):
+                api_client.call_json("me", "GET")
+                with deadline(1):
+                    api_client.call_json("me", "GET")
+        self.assertEqual([call.kwargs['timeout'] for call in self.mock_session.get.call_args_list[1:]],
+                         [(2.0, 5), (1, 1)])
+
+    def test_deadline_exceeded(self):
+        """Test that no request is sent once the deadline has passed."""
+        with deadline(0):
+            with self.assertRaises(DeadlineExceededError) as context:
+                self.api_client.call_json("me", "GET")
+            with self.assertRaises(DeadlineExceededError):
+                self.api_client.send_content("boxresources", {}, {"file": ("a.txt", b"abc", "text/plain")})
+
+        self.assertEqual(context.exception.message, "Deadline exceeded before calling me")
+        self.mock_session.get.assert_not_called()
+        self.mock_session.post.assert_not_called()
+
+    @patch('whaller_client.api.sleep')
+    def test_deadline_stops_retries(self, mock_sleep):
+        """Test that a request is not retried when the deadline would pass while waiting."""
+        self.mock_session.get.return_value = self.make_response(503, headers={'Retry-After': '10'})
+
+        with deadline(5):
+            with self.assertRaises(DeadlineExceededError) as context:
+                self.api_client.call_json("me", "GET")
+
+        self.assertEqual(context.exception.message, "Deadline exceeded: no time left to retry after 503 on me")
+        self.assertEqual(self.mock_session.get.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_deadline_timeout(self):
+        """Test that a timeout due to the deadline raises a DeadlineExceededError, and any other an HttpError."""
+        self.mock_session.post.side_effect = ReadTimeout("Read timed out")
+
+        with self.assertRaises(HttpError) as context:
+            self.api_client.call_json("me", "POST")
+        self.assertNotIsInstance(context.exception, DeadlineExceededError)
+
+        with deadline(5), patch('whaller_client.api.is_expired', return_value=True):
+            with self.assertRaises(DeadlineExceededError) as context:
+                self.api_client.call_json("me", "POST")
+        self.assertEqual(context.exception.message, "Deadline exceeded on me: Read timed out")
+
+    @patch('whaller_client.circuit.monotonic', return_value=100.0)
+    @patch('whaller_client.api.sleep')
+    def test_circuit_breaker(self, mock_sleep, mock_monotonic):
+        """Test that requests to an unhealthy group of endpoints fail at once, without stopping the others."""
+        breaker = CircuitBreaker(window_size=4, min_calls=2)
+        api_client = ApiClient(self.base_url, circuit_breaker=breaker)
+        self.mock_session.get.side_effect = [
+            ConnectionError(ProtocolError("Connection reset by peer")), self.make_response(503), self.make_response(200)
+        ]
+
+        with self.assertRaises(CircuitOpenError) as context:
+            api_client.call_json("upload/box_resource", "GET")
+        self.assertEqual(context.exception.message, "Circuit upload is open, retry in 30.0s")
+        self.assertEqual(self.mock_session.get.call_count, 2)  # The last attempt was not sent
+
+        with self.assertRaises(CircuitOpenError):
+            api_client.call_json("upload/chunk", "POST")
+        self.mock_session.post.assert_not_called()
+        self.assertEqual(api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(breaker.get_states(), {'upload': 'open', 'me': 'closed'})
+
+    @patch('whaller_client.circuit.monotonic', return_value=100.0)
+    def test_circuit_breaker_trial_not_sent(self, mock_monotonic):
+        """Test that the trial call of a half-open circuit is given back when the request is not sent."""
+        breaker = CircuitBreaker(window_size=1, min_calls=1, half_open_calls=1, open_timeout=10.0)
+        circuit = breaker.acquire("me")
+        circuit.record(True, 0.1)
+        mock_monotonic.return_value = 110.0
+        def failing(request, call_next):
+            raise ValueError("Broken middleware")
+        api_client = ApiClient(self.base_url, circuit_breaker=breaker, middleware=[failing])
+
+        with deadline(0), self.assertRaises(DeadlineExceededError):
+            api_client.call_json("me", "GET")
+        with self.assertRaises(ValueError):
+            api_client.call_json("me", "GET")
+        self.assertEqual(breaker.get_states(), {'me': 'half_open'})
+
+        api_client._chain = None
+        self.mock_session.get.return_value = self.make_response(200)
+        self.assertEqual(api_client.call_json("me", "GET"), {"id": 1})
+        self.assertEqual(breaker.get_states(), {'me': 'closed'})
+
+    @patch('whaller_client.circuit.monotonic', return_value=100.0)
+    def test_circuit_breaker_before_rate_limiter(self, mock_monotonic):
+        """Test that an open circuit fails at once, without waiting for the rate limiter."""
+        breaker = CircuitBreaker(window_size=1, min_calls=1)
+        breaker.acquire("upload").record(True, 0.1)
+        rate_limiter = MagicMock(spec=RateLimiter)
+        api_client = ApiClient(self.base_url, rate_limiter=rate_limiter, circuit_breaker=breaker)
+
+        with self.assertRaises(CircuitOpenError):
+            api_client.call_json("upload/chunk", "POST")
+        rate_limiter.acquire.assert_not_called()
+        self.mock_session.post.assert_not_called()
 
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
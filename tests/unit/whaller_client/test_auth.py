@@ -1,10 +1,18 @@
 """
 Unit tests for the Authenticator class.
 """
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 from base64 import b64encode
 from whaller_client.auth import Authenticator
+from whaller_client.exceptions import ApiError
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.token_store import FileTokenStore, MemoryTokenStore
 
 
 class TestAuthenticator(unittest.TestCase):
@@ -23,6 +31,10 @@ class TestAuthenticator(unittest.TestCase):
         self.assertIsNone(self.authenticator.token)
         self.assertIsNone(self.authenticator.login)
         self.assertIsNone(self.authenticator.password)
+        self.assertIsNone(self.authenticator.expires_at)
+        self.assertEqual(self.authenticator.token_ttl, 3600.0)
+        self.assertEqual(self.authenticator.refresh_margin, 60.0)
+        self.assertFalse(self.authenticator.auto_refresh)
 
     def test_set_credentials(self):
         """Test the set_credentials method."""
@@ -50,7 +62,7 @@ class TestAuthenticator(unittest.TestCase):
         
         # Verifications
         expected_token = (self.client_id + ':::' + self.client_token).encode("utf-8")
-        expected_header = {"X-Application": b64encode(expected_token)}
+        expected_header = {"X-Application": b64encode(expected_token).decode("ascii")}
         expected_data = {'signin-login': login, 'signin-password': password}
         
         mock_call_json.assert_called_once_with(
@@ -101,6 +113,19 @@ class TestAuthenticator(unittest.TestCase):
         self.authenticator.authenticate = original_authenticate
 
 
+    def test_get_bearer_token_metrics(self):
+        """Test that the time spent getting a token is recorded."""
+        self.authenticator.set_credentials("test_login", "test_password")
+        mock_api_client = MagicMock()
+        mock_api_client.metrics = MetricsRegistry()
+        mock_api_client.call_json.return_value = {"auth_token": "new_token"}
+
+        self.authenticator.get_bearer_token(mock_api_client)
+        self.authenticator.get_bearer_token(mock_api_client)
+
+        histogram = mock_api_client.metrics.snapshot()['histograms'][0]
+        self.assertEqual((histogram['name'], histogram['count']), ('auth_wait_seconds', 1))
+
     @patch('whaller_client.auth.Authenticator.get_bearer_token')
     @patch('whaller_client.api.ApiClient.call_json')
     def test_refresh_token_with_existing_token(self, mock_call_json, mock_get_bearer_token):
@@ -164,5 +189,266 @@ class TestAuthenticator(unittest.TestCase):
         # Restore original method
         self.authenticator.authenticate = original_authenticate
 
+    @patch('whaller_client.auth.time', return_value=1000.0)
+    def test_authenticate_tracks_expiry(self, mock_time):
+        """Test that the token issue and expiry times are recorded."""
+        mock_api_client = MagicMock()
+        mock_api_client.call_json.return_value = {"auth_token": "token"}
+        self.authenticator.authenticate(mock_api_client)
+        self.assertEqual(self.authenticator.issued_at, 1000.0)
+        self.assertEqual(self.authenticator.expires_at, 4600.0)
+
+        # The lifetime returned by the API wins over the default one
+        mock_api_client.call_json.return_value = {"auth_token": "token", "expires_in": 600}
+        self.authenticator.authenticate(mock_api_client)
+        self.assertEqual(self.authenticator.expires_at, 1600.0)
+
+    def test_needs_refresh(self):
+        """Test the needs_refresh method."""
+        self.assertTrue(self.authenticator.needs_refresh())
+
+        self.authenticator.token = "token"
+        self.assertFalse(self.authenticator.needs_refresh())
+
+        self.authenticator.expires_at = time.time() + 30
+        self.assertTrue(self.authenticator.needs_refresh())
+
+        self.authenticator.expires_at = time.time() + 300
+        self.assertFalse(self.authenticator.needs_refresh())
+
+    def test_get_bearer_token_refreshes_before_expiry(self):
+        """Test that a token close to its expiry is renewed through status_auth_by_token."""
+        self.authenticator.set_credentials('login_user', 'secret')
+        self.authenticator.token = 'old_token'
+        self.authenticator.expires_at = time.time() + 10
+        mock_api_client = MagicMock()
+        mock_api_client.call_json.return_value = {"auth_token": "renewed_token"}
+
+        result = self.authenticator.get_bearer_token(mock_api_client)
+
+        mock_api_client.call_json.assert_called_once_with(
+            'person/status_auth_by_token',
+            'POST',
+            {"auth_token": "old_token", "login": "login_user", "renew": True},
+            {"Authorization": "Bearer old_token"}
+        )
+        self.assertEqual(result, {"Authorization": "Bearer renewed_token"})
+        self.assertGreater(self.authenticator.expires_at, time.time() + 3000)
+
+    def test_get_bearer_token_logs_in_when_renewal_fails(self):
+        """Test that a token that cannot be renewed anymore leads to a new login."""
+        self.authenticator.token = 'expired_token'
+        self.authenticator.expires_at = time.time() - 10
+        mock_api_client = MagicMock()
+        mock_api_client.call_json.side_effect = [ApiError("expired"), {"auth_token": "new_token"}]
+
+        result = self.authenticator.get_bearer_token(mock_api_client)
+
+        self.assertEqual(mock_api_client.call_json.call_args_list[1][0][0], 'person/login')
+        self.assertEqual(result, {"Authorization": "Bearer new_token"})
+
+    def test_get_bearer_token_single_flight(self):
+        """Test that concurrent threads without a token trigger exactly one login."""
+        mock_api_client = MagicMock()
+
+        def slow_login(*args):
+            time.sleep(0.05)
+            return {"auth_token": "new_token"}
+        mock_api_client.call_json.side_effect = slow_login
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.authenticator.get_bearer_token(mock_api_client)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_api_client.call_json.call_count, 1)
+        self.assertEqual(results, [{"Authorization": "Bearer new_token"}] * 20)
+
+    def test_auto_refresh(self):
+        """Test that the token is refreshed in the background before it expires."""
+        authenticator = Authenticator(self.client_id, self.client_token, token_ttl=0.2, refresh_margin=0.15, auto_refresh=True)
+        mock_api_client = MagicMock()
+        refreshed = threading.Event()
+
+        def call_json(endpoint, *args):
+            if endpoint == 'person/status_auth_by_token':
+                refreshed.set()
+                return {"auth_token": "refreshed_token", "expires_in": None}
+            return {"auth_token": "token"}
+        mock_api_client.call_json.side_effect = call_json
+
+        authenticator.authenticate(mock_api_client)
+
+        self.assertTrue(refreshed.wait(2))
+        time.sleep(0.01)
+        self.assertEqual(authenticator.token, "refreshed_token")
+        self.assertIsNone(authenticator.expires_at)
+        self.assertIsNone(authenticator._refresh_timer)
+        authenticator.cancel_refresh()
+
+    def test_auto_refresh_failure_is_ignored(self):
+        """Test that a failing background refresh does not raise."""
+        self.authenticator.token = "token"
+        self.authenticator.expires_at = time.time()
+        mock_api_client = MagicMock()
+        mock_api_client.call_json.side_effect = RuntimeError("network down")
+
+        self.authenticator._background_refresh(mock_api_client)
+
+        self.assertEqual(self.authenticator.token, "token")
+        mock_api_client.call_json.assert_called_once()
+
+    def test_auto_refresh_shared_store(self):
+        """Test that authenticators sharing a store refresh their common token only once."""
+        store = MemoryTokenStore()
+        expires_at = time.time() + 30
+        authenticators = []
+        for _ in range(4):
+            authenticator = Authenticator(self.client_id, self.client_token, token_store=store)
+            authenticator.token, authenticator.expires_at = 'token', expires_at
+            authenticators.append(authenticator)
+        mock_api_client = self.make_store_api_client("refreshed_token")
+        store.save(authenticators[0].get_store_key(mock_api_client),
+                   {'token': 'token', 'issued_at': expires_at - 3600, 'expires_at': expires_at})
+
+        threads = [threading.Thread(target=authenticator._background_refresh, args=(mock_api_client,))
+                   for authenticator in authenticators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([c[0][0] for c in mock_api_client.call_json.call_args_list], ['person/status_auth_by_token'])
+        self.assertEqual([authenticator.token for authenticator in authenticators], ['refreshed_token'] * 4)
+
+    def test_cancel_refresh(self):
+        """Test that cancel_refresh stops the pending background refresh."""
+        authenticator = Authenticator(self.client_id, self.client_token, auto_refresh=True)
+        mock_api_client = MagicMock()
+        mock_api_client.call_json.return_value = {"auth_token": "token"}
+
+        authenticator.authenticate(mock_api_client)
+        timer = authenticator._refresh_timer
+        self.assertTrue(timer.daemon)
+        authenticator.cancel_refresh()
+
+        self.assertIsNone(authenticator._refresh_timer)
+        self.assertTrue(timer.finished.is_set())
+
+    def make_store_api_client(self, token="new_token"):
+        mock_api_client = MagicMock()
+        mock_api_client.api_base_url = "https://api.test/"
+        mock_api_client.call_json.return_value = {"auth_token": token}
+        return mock_api_client
+
+    def test_token_store_saves_token(self):
+        """Test that a new token is saved in the token store."""
+        store = MemoryTokenStore()
+        authenticator = Authenticator(self.client_id, self.client_token, token_store=store)
+        authenticator.set_credentials('login_user', 'secret')
+        mock_api_client = self.make_store_api_client()
+
+        authenticator.authenticate(mock_api_client)
+
+        key = authenticator.get_store_key(mock_api_client)
+        self.assertEqual(key, "https://api.test/|test_client_id|login_user")
+        self.assertEqual(store.load(key), {
+            'token': 'new_token', 'issued_at': authenticator.issued_at, 'expires_at': authenticator.expires_at
+        })
+
+    def test_token_store_reuses_valid_token(self):
+        """Test that a valid token of the store is reused without logging in."""
+        store = MemoryTokenStore()
+        first = Authenticator(self.client_id, self.client_token, token_store=store)
+        second = Authenticator(self.client_id, self.client_token, token_store=store)
+        first_api_client = self.make_store_api_client()
+        second_api_client = self.make_store_api_client()
+
+        first.get_bearer_token(first_api_client)
+        result = second.get_bearer_token(second_api_client)
+
+        self.assertEqual(result, {"Authorization": "Bearer new_token"})
+        second_api_client.call_json.assert_not_called()
+        self.assertEqual(second.expires_at, first.expires_at)
+
+    def test_token_store_ignores_expiring_token(self):
+        """Test that a token of the store close to its expiry is not reused."""
+        store = MemoryTokenStore()
+        authenticator = Authenticator(self.client_id, self.client_token, token_store=store)
+        mock_api_client = self.make_store_api_client()
+        key = authenticator.get_store_key(mock_api_client)
+        store.save(key, {'token': 'old_token', 'issued_at': time.time() - 3590, 'expires_at': time.time() + 10})
+
+        result = authenticator.get_bearer_token(mock_api_client)
+
+        self.assertEqual(result, {"Authorization": "Bearer new_token"})
+        self.assertEqual(mock_api_client.call_json.call_args[0][0], 'person/login')
+        self.assertEqual(store.load(key)['token'], 'new_token')
+
+    def test_token_store_adopts_refreshed_token(self):
+        """Test that a token refreshed by another authenticator is adopted instead of refreshed again."""
+        store = MemoryTokenStore()
+        authenticator = Authenticator(self.client_id, self.client_token, token_store=store)
+        authenticator.token = 'old_token'
+        authenticator.expires_at = time.time() + 10
+        mock_api_client = self.make_store_api_client()
+        store.save(authenticator.get_store_key(mock_api_client),
+                   {'token': 'refreshed_token', 'issued_at': time.time(), 'expires_at': None})
+
+        result = authenticator.get_bearer_token(mock_api_client)
+
+        self.assertEqual(result, {"Authorization": "Bearer refreshed_token"})
+        self.assertIsNone(authenticator.expires_at)
+        mock_api_client.call_json.assert_not_called()
+
+    def test_token_store_single_login_across_authenticators(self):
+        """Test that authenticators sharing a file store log in only once."""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, 'tokens.json')
+        logins = []
+
+        def slow_login(*args):
+            logins.append(args[0])
+            time.sleep(0.05)
+            return {"auth_token": "new_token"}
+
+        results = []
+
+        def worker():
+            # One store instance per worker, as separate processes would have
+            authenticator = Authenticator(self.client_id, self.client_token, token_store=FileTokenStore(path))
+            mock_api_client = self.make_store_api_client()
+            mock_api_client.call_json.side_effect = slow_login
+            results.append(authenticator.get_bearer_token(mock_api_client))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(logins, ['person/login'])
+        self.assertEqual(results, [{"Authorization": "Bearer new_token"}] * 8)
+
+    def test_token_store_auto_refresh_on_adoption(self):
+        """Test that adopting a stored token schedules its background refresh."""
+        store = MemoryTokenStore()
+        authenticator = Authenticator(self.client_id, self.client_token, auto_refresh=True, token_store=store)
+        mock_api_client = self.make_store_api_client()
+        store.save(authenticator.get_store_key(mock_api_client),
+                   {'token': 'stored_token', 'issued_at': time.time(), 'expires_at': time.time() + 3600})
+
+        authenticator.get_bearer_token(mock_api_client)
+
+        self.assertIsNotNone(authenticator._refresh_timer)
+        authenticator.cancel_refresh()
+
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
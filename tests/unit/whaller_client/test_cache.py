@@ -0,0 +1,217 @@
+"""
+Unit tests for the response cache.
+"""
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from whaller_client.cache import CachedResponse, ResponseCache
+
+
+URL = "https://api.whaller.com/api/me"
+ALICE = {"Authorization": "Bearer alice"}
+BOB = {"Authorization": "Bearer bob"}
+
+
+class TestCachedResponse(unittest.TestCase):
+    """Tests for the CachedResponse class."""
+
+    def test_conditional_headers(self):
+        """Test that the validators of the response are turned into conditional headers."""
+        entry = CachedResponse({}, etag='"v1"', last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(entry.get_conditional_headers(), {
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'
+        })
+        self.assertEqual(CachedResponse({}).get_conditional_headers(), {})
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for the ResponseCache class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.cache = ResponseCache(max_entries=2, ttl=60)
+
+    def test_make_key(self):
+        """Test that keys depend on the URL, the parameters and the sender, not on the parameters order."""
+        key = ResponseCache.make_key(URL, {"a": 1, "b": 2}, ALICE)
+
+        self.assertEqual(key, ResponseCache.make_key(URL, {"b": 2, "a": 1}, ALICE))
+        self.assertNotEqual(key, ResponseCache.make_key(URL, {"a": 1, "b": 2}, BOB))
+        self.assertNotEqual(key, ResponseCache.make_key(URL, {"a": 1}, ALICE))
+        self.assertNotIn("alice", key)
+
+        identity_key = ResponseCache.make_key(URL, {}, ALICE, identity="api|app|alice")
+        self.assertEqual(identity_key, ResponseCache.make_key(URL, {}, BOB, identity="api|app|alice"))
+        self.assertNotEqual(identity_key, ResponseCache.make_key(URL, {}, ALICE))
+        self.assertNotIn("alice", identity_key)
+
+    def test_lookup(self):
+        """Test that a stored response is fresh during the TTL, then needs revalidation."""
+        key = ResponseCache.make_key(URL, {}, ALICE)
+        self.assertEqual(self.cache.lookup(key), (None, False))
+
+        with patch('whaller_client.cache.time', return_value=1000.0):
+            self.cache.store(key, {"id": 1}, {'ETag': '"v1"'})
+        with patch('whaller_client.cache.time', return_value=1059.0):
+            entry, fresh = self.cache.lookup(key)
+        self.assertTrue(fresh)
+        self.assertEqual((entry.result, entry.etag), ({"id": 1}, '"v1"'))
+        with patch('whaller_client.cache.time', return_value=1061.0):
+            self.assertFalse(self.cache.lookup(key)[1])
+
+        self.assertEqual(self.cache.snapshot(), {'hits': 1, 'revalidated': 0, 'misses': 1, 'entries': 1})
+
+    def test_revalidate(self):
+        """Test that a 304 makes the response fresh again and updates its validators."""
+        key = ResponseCache.make_key(URL, {}, ALICE)
+        with patch('whaller_client.cache.time', return_value=1000.0):
+            self.cache.store(key, {"id": 1}, {'ETag': '"v1"', 'Last-Modified': 'yesterday'})
+            entry = self.cache.get(key)
+
+        self.cache.revalidate(key, entry, {'ETag': '"v2"'})
+
+        entry, fresh = self.cache.lookup(key)
+        self.assertTrue(fresh)
+        self.assertEqual((entry.result, entry.etag, entry.last_modified), ({"id": 1}, '"v2"', 'yesterday'))
+        self.assertEqual(self.cache.snapshot()['revalidated'], 1)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used response is evicted first."""
+        self.cache.store('a', 1, {})
+        self.cache.store('b', 2, {})
+        self.cache.get('a')
+        self.cache.store('c', 3, {})
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a').result, 1)
+        self.assertEqual(self.cache.get('c').result, 3)
+
+    def test_no_store(self):
+        """Test that responses marked no-store are not cached, and remove a previous one."""
+        self.cache.store('a', 1, {})
+        self.cache.store('a', 2, {'Cache-Control': 'private, No-Store'})
+
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_no_ttl_requires_validators(self):
+        """Test that without TTL, only responses that can be revalidated are stored."""
+        cache = ResponseCache(ttl=0)
+        cache.store('a', 1, {})
+        cache.store('b', 2, {'Last-Modified': 'yesterday'})
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.lookup('b')[1], False)
+
+    def test_delete_and_clear(self):
+        """Test that responses can be forgotten."""
+        self.cache.store('a', 1, {})
+        self.cache.store('b', 2, {})
+
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('b'))
+
+
+class TestResponseCacheOnDisk(unittest.TestCase):
+    """Tests for the ResponseCache class backed by a directory."""
+
+    def setUp(self):
+        """Create a temporary directory for the cache."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'cache')
+
+    def test_shared_between_instances(self):
+        """Test that a response stored by one cache is found by another one."""
+        ResponseCache(path=self.path).store('a', {"id": 1}, {'ETag': '"v1"'})
+
+        entry, fresh = ResponseCache(path=self.path).lookup('a')
+
+        self.assertTrue(fresh)
+        self.assertEqual((entry.result, entry.etag), ({"id": 1}, '"v1"'))
+
+    def test_files_are_private(self):
+        """Test that the cached responses are only readable by their owner."""
+        ResponseCache(path=self.path).store('a', {"id": 1}, {})
+
+        filenames = os.listdir(self.path)
+        self.assertEqual(len(filenames), 1)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.path, filenames[0])).st_mode), 0o600)
+
+    def test_invalid_files_are_ignored(self):
+        """Test that corrupted files, or files of another key, are ignored."""
+        cache = ResponseCache(path=self.path)
+        cache.store('a', 1, {})
+        filename = os.listdir(self.path)[0]
+        with open(os.path.join(self.path, filename), 'w') as f:
+            f.write('{"key": "b", "result": 2}')
+        self.assertIsNone(ResponseCache(path=self.path).get('a'))
+
+        with open(os.path.join(self.path, filename), 'w') as f:
+            f.write('{not json')
+        self.assertIsNone(ResponseCache(path=self.path).get('a'))
+
+    def test_delete_and_clear(self):
+        """Test that forgotten responses are removed from the disk."""
+        cache = ResponseCache(path=self.path)
+        cache.store('a', 1, {})
+        cache.store('b', 2, {})
+
+        cache.delete('a')
+        cache.delete('a')
+        self.assertIsNone(ResponseCache(path=self.path).get('a'))
+        cache.clear()
+        self.assertEqual(os.listdir(self.path), [])
+        ResponseCache(path=os.path.join(self.temp_dir, 'missing')).clear()
+
+    def test_prune(self):
+        """Test that old files, then the oldest ones beyond max_files, are deleted."""
+        cache = ResponseCache(path=self.path, max_files=2, max_age=100)
+        for key, mtime in (('a', 1000.0), ('b', 1080.0), ('c', 1090.0), ('d', 1095.0)):
+            cache.store(key, 1, {})
+            os.utime(cache._get_file(key), (mtime, mtime))
+        with open(os.path.join(self.path, 'stale.json.1.2.tmp'), 'w') as f:
+            f.write('{')
+        os.utime(os.path.join(self.path, 'stale.json.1.2.tmp'), (1000.0, 1000.0))
+        with open(os.path.join(self.path, 'README'), 'w') as f:
+            f.write('not a response')
+
+        with patch('whaller_client.cache.time', return_value=1150.0):
+            cache.prune()
+
+        self.assertEqual(sorted(os.listdir(self.path)),
+                         sorted(['README', os.path.basename(cache._get_file('c')), os.path.basename(cache._get_file('d'))]))
+        ResponseCache(path=os.path.join(self.temp_dir, 'missing')).prune()
+
+    @patch('whaller_client.cache._PRUNE_INTERVAL', 2)
+    def test_pruned_while_writing(self):
+        """Test that the directory is pruned every few writes, starting with the first one."""
+        cache = ResponseCache(path=self.path, max_files=1)
+        with patch.object(cache, 'prune', wraps=cache.prune) as mock_prune:
+            for key in 'abc':
+                cache.store(key, 1, {})
+
+        self.assertEqual(mock_prune.call_count, 2)
+        self.assertEqual(len(os.listdir(self.path)), 1)
+
+    def test_prune_ignores_files_deleted_meanwhile(self):
+        """Test that files deleted by another process while pruning are skipped."""
+        cache = ResponseCache(path=self.path, max_age=60)
+        cache.store('a', 1, {})
+        gone = MagicMock()
+        gone.name = 'gone.json'
+        gone.stat.side_effect = FileNotFoundError
+        with patch('whaller_client.cache.os.scandir', return_value=[gone]):
+            cache.prune()
+        with patch('whaller_client.cache.time', return_value=time.time() + 120), \
+             patch('whaller_client.cache.os.remove', side_effect=FileNotFoundError) as mock_remove:
+            cache.prune()
+        mock_remove.assert_called_once_with(cache._get_file('a'))
+
+if __name__ == '__main__':
+    unittest.main()
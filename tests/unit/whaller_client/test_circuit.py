@@ -0,0 +1,176 @@
+"""
+Unit tests for the circuit breakers of the endpoints.
+"""
+import unittest
+from unittest.mock import patch
+from whaller_client.circuit import CLOSED, HALF_OPEN, OPEN, Circuit, CircuitBreaker
+from whaller_client.exceptions import CircuitOpenError, HttpError
+
+
+class TestCircuit(unittest.TestCase):
+    """Tests for the Circuit class."""
+
+    def setUp(self):
+        """Freeze the clock."""
+        patcher = patch('whaller_client.circuit.monotonic', return_value=100.0)
+        self.mock_monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, circuit, failed=False, seconds=0.1):
+        """Let a call through the circuit and record its outcome."""
+        circuit.acquire()
+        circuit.record(failed, seconds)
+
+    def test_opens_on_failure_rate(self):
+        """Test that the circuit opens once enough of the last calls failed."""
+        circuit = Circuit('upload', failure_rate=0.5, window_size=4, min_calls=4)
+        for failed in (True, True, True):
+            self.call(circuit, failed)
+        self.assertEqual(circuit.state, CLOSED)  # Not enough calls yet
+
+        self.call(circuit, False)
+        self.assertEqual(circuit.state, OPEN)
+
+        with self.assertRaises(HttpError) as context:
+            circuit.acquire()
+        self.assertIsInstance(context.exception, CircuitOpenError)
+        self.assertEqual(context.exception.message, "Circuit upload is open, retry in 30.0s")
+
+    def test_window(self):
+        """Test that only the last calls are considered."""
+        circuit = Circuit('upload', failure_rate=0.5, window_size=4, min_calls=4)
+        for failed in (True, False, False, False, False, False, True):
+            self.call(circuit, failed)
+        self.assertEqual(circuit.state, CLOSED)
+
+        self.call(circuit, True)  # 2 of the last 4 calls failed, 3 of all of them
+        self.assertEqual(circuit.state, OPEN)
+
+    def test_opens_on_slow_call_rate(self):
+        """Test that the circuit opens once enough of the last calls were slow."""
+        circuit = Circuit('upload', slow_call_duration=2.0, slow_call_rate=0.5, window_size=4, min_calls=2)
+        self.call(circuit, seconds=0.5)
+        self.call(circuit, seconds=1.9)
+        self.assertEqual(circuit.state, CLOSED)
+
+        self.call(circuit, seconds=2.0)
+        self.call(circuit, seconds=5.0)
+        self.assertEqual(circuit.state, OPEN)
+
+    def test_half_open(self):
+        """Test that trial calls are let through after the open timeout, and close the circuit when they succeed."""
+        circuit = Circuit('upload', window_size=2, min_calls=2, open_timeout=10.0, half_open_calls=2)
+        self.call(circuit, True)
+        self.call(circuit, True)
+
+        self.mock_monotonic.return_value = 109.0
+        with self.assertRaises(CircuitOpenError):
+            circuit.acquire()
+
+        self.mock_monotonic.return_value = 110.0
+        circuit.acquire()
+        self.assertEqual(circuit.state, HALF_OPEN)
+        circuit.acquire()
+        with self.assertRaises(CircuitOpenError) as context:
+            circuit.acquire()
+        self.assertEqual(context.exception.message, "Circuit upload is half-open, waiting for its trial calls")
+
+        circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, HALF_OPEN)
+        circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, CLOSED)
+        self.call(circuit, True)
+        self.assertEqual(circuit.state, CLOSED)  # The window starts over
+
+    def test_half_open_failure(self):
+        """Test that a failed trial call opens the circuit again."""
+        circuit = Circuit('upload', window_size=1, min_calls=1, open_timeout=10.0)
+        self.call(circuit, True)
+        self.mock_monotonic.return_value = 110.0
+        self.call(circuit, False)
+        circuit.acquire()
+        circuit.acquire()
+
+        circuit.record(True, 0.1)
+        self.assertEqual(circuit.state, OPEN)
+        circuit.record(False, 0.1)  # Sent before the circuit opened: ignored
+        self.assertEqual(circuit.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            circuit.acquire()
+
+    def test_half_open_lost_trials(self):
+        """Test that trial calls which never report their outcome do not keep the circuit half-open forever."""
+        circuit = Circuit('upload', window_size=1, min_calls=1, open_timeout=10.0, half_open_calls=1)
+        self.call(circuit, True)
+        self.mock_monotonic.return_value = 110.0
+        circuit.acquire()
+        with self.assertRaises(CircuitOpenError):
+            circuit.acquire()
+
+        self.mock_monotonic.return_value = 120.0
+        circuit.acquire()
+        circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, CLOSED)
+
+    def test_release(self):
+        """Test that a trial call given back without outcome lets another one through."""
+        circuit = Circuit('upload', window_size=1, min_calls=1, open_timeout=10.0, half_open_calls=1)
+        circuit.release()  # Closed: nothing to give back
+        self.call(circuit, True)
+        self.mock_monotonic.return_value = 110.0
+        circuit.acquire()
+        circuit.release()
+        circuit.release()  # Already given back
+        circuit.acquire()
+        with self.assertRaises(CircuitOpenError):
+            circuit.acquire()
+        circuit.record(False, 0.1)
+        self.assertEqual(circuit.state, CLOSED)
+
+    def test_check(self):
+        """Test that check fails like acquire would, without taking a trial call."""
+        circuit = Circuit('upload', window_size=1, min_calls=1, open_timeout=10.0, half_open_calls=1)
+        circuit.check()
+        self.call(circuit, True)
+        with self.assertRaises(CircuitOpenError):
+            circuit.check()
+
+        self.mock_monotonic.return_value = 110.0
+        circuit.check()
+        circuit.check()
+        circuit.acquire()
+        with self.assertRaises(CircuitOpenError):
+            circuit.check()
+
+        self.mock_monotonic.return_value = 120.0  # The trial call was lost
+        circuit.check()
+        circuit.acquire()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the CircuitBreaker class."""
+
+    def test_groups(self):
+        """Test that endpoints are grouped by the longest prefix they start with, or else by their first segment."""
+        breaker = CircuitBreaker(prefixes=['spheres/', 'upload/box_resource'])
+
+        self.assertEqual(breaker.get_group('upload/box_resource?id=3'), 'upload/box_resource')
+        self.assertEqual(breaker.get_group('upload/chunk'), 'upload')
+        self.assertEqual(breaker.get_group('spheres/12/boxresources'), 'spheres/')
+        self.assertEqual(breaker.get_group('me?limit=10'), 'me')
+        self.assertIs(breaker.get_circuit('me/spheres'), breaker.get_circuit('me/networks'))
+
+    def test_acquire(self):
+        """Test that an open circuit only fails the endpoints of its group."""
+        breaker = CircuitBreaker(window_size=2, min_calls=2, open_timeout=30.0)
+        for _ in range(2):
+            breaker.acquire('upload/box_resource').record(True, 0.1)
+
+        with self.assertRaises(CircuitOpenError):
+            breaker.acquire('upload/chunk')
+        self.assertEqual(breaker.acquire('me').window_size, 2)
+        self.assertEqual(breaker.get_states(), {'upload': OPEN, 'me': CLOSED})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
 """
 Unit tests for the Client class.
 """
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 from whaller_client.client import Client
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
 
 
 class TestClient(unittest.TestCase):
@@ -23,6 +30,37 @@ class TestClient(unittest.TestCase):
         self.assertEqual(self.client.authenticator.client_token, self.client_token)
         self.assertIsNotNone(self.client.logger)
 
+    def test_metrics(self):
+        """Test that the metrics registry is forwarded to the API client."""
+        metrics = MetricsRegistry()
+        client = Client("https://api.whaller.com", self.client_id, self.client_token, metrics=metrics)
+        self.assertIs(client.api.metrics, metrics)
+
+    def test_middleware(self):
+        """Test that the middleware are forwarded to the API client."""
+        middleware = MagicMock()
+        client = Client("https://api.whaller.com", self.client_id, self.client_token, middleware=[middleware])
+        self.assertEqual(client.api.middleware, [middleware])
+
+    def test_token_refresh(self):
+        """Test that the token lifecycle settings are forwarded to the authenticator."""
+        client = Client("https://api.whaller.com", "test_client_id", "test_client_token", auto_refresh=True,
+                        token_ttl=600.0, refresh_margin=30.0)
+        authenticator = client.authenticator
+        self.assertEqual((authenticator.auto_refresh, authenticator.token_ttl, authenticator.refresh_margin),
+                         (True, 600.0, 30.0))
+
+    def test_timeouts(self):
+        """Test that the timeouts are forwarded to the API client."""
+        client = Client("https://api.whaller.com", self.client_id, self.client_token, connect_timeout=3.0, read_timeout=None)
+        self.assertEqual((client.api.connect_timeout, client.api.read_timeout), (3.0, None))
+
+    def test_circuit_breaker(self):
+        """Test that the circuit breaker is forwarded to the API client."""
+        circuit_breaker = CircuitBreaker()
+        client = Client("https://api.whaller.com", self.client_id, self.client_token, circuit_breaker=circuit_breaker)
+        self.assertIs(client.api.circuit_breaker, circuit_breaker)
+
     def test_set_credentials(self):
         """Test the set_credentials method."""
         login = "test_login"
@@ -98,10 +136,27 @@ class TestClient(unittest.TestCase):
             "test/endpoint", 
             "GET", 
             {"data": "value"}, 
-            {"Authorization": "Bearer test_token"}
+            {"Authorization": "Bearer test_token"},
+            identity="https://api.whaller.com/api/|test_client_id|None"
         )
         self.assertEqual(result, {"success": True})
 
+    @patch('whaller_client.auth.Authenticator.get_bearer_token')
+    @patch('whaller_client.api.ApiClient.stream_json')
+    def test_stream_get(self, mock_stream_json, mock_get_bearer_token):
+        """Test the stream_get method, with and without authentication."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+        mock_stream_json.return_value = iter([{"id": 1}])
+
+        result = self.client.stream_get("me/spheres", {"limit": 10}, True)
+
+        self.assertEqual(list(result), [{"id": 1}])
+        mock_stream_json.assert_called_once_with("me/spheres", {"limit": 10}, {"Authorization": "Bearer test_token"})
+
+        self.client.stream_get("me/spheres")
+        mock_stream_json.assert_called_with("me/spheres", {}, {})
+        mock_get_bearer_token.assert_called_once()
+
     @patch('whaller_client.api.ApiClient.call_json')
     def test_call_get_without_auth(self, mock_call_json):
         """Test the call_get method without authentication."""
@@ -113,10 +168,145 @@ class TestClient(unittest.TestCase):
             "test/endpoint", 
             "GET", 
             {"data": "value"}, 
-            {}
+            {},
+            identity=None
         )
         self.assertEqual(result, {"success": True})
 
+    @patch('whaller_client.client.Client.call_post')
+    def test_call_auth_post(self, mock_call_post):
+        """Test the call_auth_post method delegates to call_post with authentication."""
+        mock_call_post.return_value = {"id": 1}
+
+        result = self.client.call_auth_post("test/endpoint", {"data": "value"})
+
+        mock_call_post.assert_called_once_with("test/endpoint", {"data": "value"}, True)
+        self.assertEqual(result, {"id": 1})
+
+    @patch('whaller_client.client.Client.call_get')
+    def test_call_auth_get(self, mock_call_get):
+        """Test the call_auth_get method delegates to call_get with authentication."""
+        mock_call_get.return_value = {"id": 1}
+
+        result = self.client.call_auth_get("test/endpoint", {"data": "value"})
+
+        mock_call_get.assert_called_once_with("test/endpoint", {"data": "value"}, True)
+        self.assertEqual(result, {"id": 1})
+
+    @patch('whaller_client.auth.Authenticator.get_bearer_token')
+    @patch('whaller_client.api.ApiClient.send_content')
+    def test_send_post_content(self, mock_send_content, mock_get_bearer_token):
+        """Test the send_post_content method sends files with authentication."""
+        mock_get_bearer_token.return_value = {"Authorization": "Bearer test_token"}
+        mock_send_content.return_value = {"id": 123}
+        files = {'userfile': ('test.txt', b'content', 'text/plain')}
+
+        result = self.client.send_post_content("upload/box_resource", {"sphere_id": "s"}, files)
+
+        mock_send_content.assert_called_once_with(
+            "upload/box_resource",
+            {"sphere_id": "s"},
+            files,
+            {"Authorization": "Bearer test_token"}
+        )
+        self.assertEqual(result, {"id": 123})
+
+    def test_pool_configuration(self):
+        """Test that pool options are forwarded to the ApiClient."""
+        client = Client(self.base_url, self.client_id, self.client_token,
+                        pool_connections=2, pool_maxsize=50, keepalive_timeout=None)
+        self.assertEqual(client.api.pool_connections, 2)
+        self.assertEqual(client.api.pool_maxsize, 50)
+        self.assertIsNone(client.api.keepalive_timeout)
+
+    def test_retry_policy(self):
+        """Test that the retry policy is forwarded to the ApiClient."""
+        retry_policy = RetryPolicy(max_attempts=5)
+        client = Client(self.base_url, self.client_id, self.client_token, retry_policy=retry_policy)
+        self.assertIs(client.api.retry_policy, retry_policy)
+
+    def test_rate_limiter(self):
+        """Test that the rate limiter is forwarded to the ApiClient."""
+        rate_limiter = RateLimiter(rate=10)
+        client = Client(self.base_url, self.client_id, self.client_token, rate_limiter=rate_limiter)
+        self.assertIs(client.api.rate_limiter, rate_limiter)
+
+    def test_cache(self):
+        """Test that the response cache is forwarded to the ApiClient."""
+        cache = ResponseCache()
+        client = Client(self.base_url, self.client_id, self.client_token, cache=cache)
+        self.assertIs(client.api.cache, cache)
+
+    @patch('whaller_client.api.ApiClient.close')
+    def test_context_manager_closes_api(self, mock_close):
+        """Test that leaving the context manager closes the underlying ApiClient."""
+        with Client(self.base_url, self.client_id, self.client_token) as client:
+            self.assertIsInstance(client, Client)
+
+        mock_close.assert_called_once()
+
+    def run_call_get_threads(self, client, count, with_auth=False):
+        """Call call_get from `count` threads at once and return the results."""
+        results = []
+        barrier = threading.Barrier(count)
+
+        def worker():
+            barrier.wait()
+            results.append(client.call_get("me/networks", {"page": 1}, with_auth))
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @patch('whaller_client.api.ApiClient.call_json')
+    def test_call_get_coalesced(self, mock_call_json):
+        """Test that identical concurrent GET requests share a single call."""
+        def slow_call(*args, **kwargs):
+            time.sleep(0.05)
+            return {"networks": []}
+        mock_call_json.side_effect = slow_call
+
+        results = self.run_call_get_threads(self.client, 8)
+
+        mock_call_json.assert_called_once_with("me/networks", "GET", {"page": 1}, {}, identity=None)
+        self.assertEqual(results, [{"networks": []}] * 8)
+        self.assertEqual(self.client.singleflight.snapshot(), {'calls': 1, 'hits': 7, 'coalesced': 1})
+
+    @patch('whaller_client.auth.Authenticator.get_bearer_token')
+    @patch('whaller_client.api.ApiClient.call_json')
+    def test_call_get_coalesced_per_identity(self, mock_call_json, mock_get_bearer_token):
+        """Test that GET requests of different users are never coalesced."""
+        tokens = iter(["alice", "bob"])
+        lock = threading.Lock()
+
+        def get_bearer_token(api_client):
+            with lock:
+                return {"Authorization": "Bearer " + next(tokens)}
+        mock_get_bearer_token.side_effect = get_bearer_token
+
+        def slow_call(endpoint, method, data, headers, identity):
+            time.sleep(0.05)
+            return headers["Authorization"]
+        mock_call_json.side_effect = slow_call
+
+        results = self.run_call_get_threads(self.client, 2, with_auth=True)
+
+        self.assertEqual(sorted(results), ["Bearer alice", "Bearer bob"])
+
+    @patch('whaller_client.api.ApiClient.call_json')
+    def test_call_get_without_coalescing(self, mock_call_json):
+        """Test that coalescing can be disabled."""
+        client = Client(self.base_url, self.client_id, self.client_token, coalesce=False)
+        mock_call_json.side_effect = lambda *args, **kwargs: time.sleep(0.02)
+
+        self.run_call_get_threads(client, 3)
+
+        self.assertIsNone(client.singleflight)
+        self.assertEqual(mock_call_json.call_count, 3)
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Unit tests for the JSON codecs.
+"""
+import json
+import unittest
+from unittest.mock import patch
+from whaller_client import codec
+from whaller_client.codec import CODECS, JsonCodec, OrjsonCodec, UjsonCodec, get_codec
+
+
+PAYLOAD = {"result": [{"id": 1, "name": "Sphère", "tags": ["a", "b"], "admin": True, "parent": None}], "count": 1.5}
+
+
+class TestJsonCodec(unittest.TestCase):
+    """Tests for the JsonCodec class and its subclasses."""
+
+    def available_codecs(self):
+        """Instantiate every codec whose library is installed."""
+        codecs = []
+        for codec_cls in CODECS.values():
+            try:
+                codecs.append(codec_cls())
+            except ImportError:
+                pass
+        return codecs
+
+    def test_round_trip(self):
+        """Test that every codec encodes to bytes and decodes bytes and str."""
+        for json_codec in self.available_codecs():
+            with self.subTest(codec=json_codec.name):
+                encoded = json_codec.dumps(PAYLOAD)
+                self.assertIsInstance(encoded, bytes)
+                self.assertEqual(json_codec.loads(encoded), PAYLOAD)
+                self.assertEqual(json_codec.loads(encoded.decode('utf-8')), PAYLOAD)
+                self.assertEqual(JsonCodec().loads(encoded), PAYLOAD)
+
+    def test_compact_encoding(self):
+        """Test that bodies are encoded without whitespace."""
+        for json_codec in self.available_codecs():
+            with self.subTest(codec=json_codec.name):
+                self.assertEqual(json_codec.dumps({"a": [1, 2]}), b'{"a":[1,2]}')
+
+    def test_non_string_keys(self):
+        """Test that non-string keys are accepted, as with the standard library."""
+        for json_codec in self.available_codecs():
+            with self.subTest(codec=json_codec.name):
+                self.assertEqual(json_codec.loads(json_codec.dumps({1: "a"})), {"1": "a"})
+
+    def test_invalid_json(self):
+        """Test that every codec raises a ValueError on invalid JSON."""
+        for json_codec in self.available_codecs():
+            with self.subTest(codec=json_codec.name):
+                with self.assertRaises(ValueError):
+                    json_codec.loads(b'{invalid')
+
+    @patch('whaller_client.codec.ujson', json)
+    def test_ujson_codec(self):
+        """Test the wiring of the ujson codec, with a module of the same interface."""
+        json_codec = UjsonCodec()
+        self.assertEqual(json_codec.loads(json_codec.dumps(PAYLOAD)), PAYLOAD)
+        self.assertIn('Sphère'.encode('utf-8'), json_codec.dumps(PAYLOAD))
+
+    @patch('whaller_client.codec.orjson', None)
+    @patch('whaller_client.codec.ujson', None)
+    def test_missing_libraries(self):
+        """Test that codecs of missing libraries cannot be created."""
+        with self.assertRaises(ImportError):
+            OrjsonCodec()
+        with self.assertRaises(ImportError):
+            UjsonCodec()
+
+
+class TestGetCodec(unittest.TestCase):
+    """Tests for the get_codec function."""
+
+    def test_by_name(self):
+        """Test that a codec can be requested by name."""
+        self.assertIsInstance(get_codec('json'), JsonCodec)
+        self.assertEqual(get_codec('json').name, 'json')
+        with self.assertRaises(ValueError):
+            get_codec('yaml')
+
+    def test_default(self):
+        """Test that the fastest installed codec is the default one."""
+        expected = 'orjson' if codec.orjson is not None else 'ujson' if codec.ujson is not None else 'json'
+        self.assertEqual(get_codec().name, expected)
+        self.assertEqual(codec.default_codec.name, expected)
+
+    @patch('whaller_client.codec.orjson', None)
+    @patch('whaller_client.codec.ujson', None)
+    def test_fallback(self):
+        """Test that the standard library is used when no fast library is installed."""
+        self.assertEqual(get_codec().name, 'json')
+        with self.assertRaises(ImportError):
+            get_codec('orjson')
+
+
+if __name__ == '__main__':
+    unittest.main()
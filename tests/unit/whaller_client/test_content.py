@@ -0,0 +1,197 @@
+"""
+Unit tests for the content module.
+"""
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from urllib3.filepost import encode_multipart_formdata
+import hashlib
+from whaller_client.content import UploadContent, BytesContent, FileContent, IterableContent, MultipartBody, open_content, hash_content
+from whaller_client.exceptions import UploadError
+
+
+class NonSeekableReader:
+    """Binary reader that cannot seek, like a pipe or a socket."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def seekable(self):
+        return False
+
+
+class TestOpenContent(unittest.TestCase):
+    """Tests for the open_content function."""
+
+    def setUp(self):
+        """Create a temporary file."""
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b"0123456789")
+        self.path = f.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_bytes(self):
+        """Test that bytes are served as zero-copy memoryview windows."""
+        content = b"0123456789"
+        source = open_content(content)
+
+        self.assertIsInstance(source, BytesContent)
+        self.assertEqual(source.size, 10)
+        window = source.read(2, 3)
+        self.assertIsInstance(window, memoryview)
+        self.assertIs(window.obj, content)
+        self.assertEqual(bytes(window), b"234")
+        self.assertIs(source.read_all(), content)
+
+    def test_path(self):
+        """Test that a path is opened and closed with the content."""
+        with open_content(self.path) as source:
+            self.assertIsInstance(source, FileContent)
+            self.assertEqual(source.size, 10)
+            self.assertEqual(source.read(8, 5), b"89")
+            self.assertEqual(source.read_all(), b"0123456789")
+        self.assertTrue(source.fileobj.closed)
+
+    def test_file_object_from_current_position(self):
+        """Test that a file object is read from its current position and left open."""
+        with open(self.path, 'rb') as f:
+            f.seek(4)
+            with open_content(f) as source:
+                self.assertEqual(source.size, 6)
+                self.assertEqual(source.read(0, 2), b"45")
+            self.assertFalse(f.closed)
+            self.assertEqual(f.tell(), 4)
+
+    @patch('whaller_client.content.os', wraps=os)
+    def test_file_object_without_pread(self, mock_os):
+        """Test the seek/read fallback when pread is not available."""
+        del mock_os.pread
+        with open(self.path, 'rb') as f:
+            source = FileContent(f)
+            self.assertIsNone(source._fd)
+            self.assertEqual(source.read(3, 2), b"34")
+
+    @patch('whaller_client.content.os.pread')
+    def test_file_object_short_reads(self, mock_pread):
+        """Test that short reads from pread are completed."""
+        mock_pread.side_effect = [b"01", b"234", b""]
+        with open(self.path, 'rb') as f:
+            self.assertEqual(FileContent(f).read(0, 6), b"01234")
+
+    def test_in_memory_file_object(self):
+        """Test a seekable file object without file descriptor."""
+        source = open_content(io.BytesIO(b"abcdef"))
+        self.assertIsNone(source._fd)
+        self.assertEqual(source.read(4, 10), b"ef")
+
+    def test_iterable_with_size(self):
+        """Test that an iterable of known size is re-chunked sequentially."""
+        source = open_content(iter([b"ab", b"cde", b"f"]), size=6)
+
+        self.assertIsInstance(source, IterableContent)
+        self.assertEqual(source.read(0, 4), b"abcd")
+        self.assertEqual(source.read(4, 2), b"ef")
+
+    def test_iterable_out_of_order(self):
+        """Test that an iterable cannot be read out of order."""
+        source = open_content(iter([b"abcdef"]), size=6)
+        with self.assertRaises(UploadError):
+            source.read(2, 2)
+
+    def test_iterable_too_short(self):
+        """Test that an iterable shorter than its announced size is an error."""
+        source = open_content(iter([b"ab"]), size=6)
+        with self.assertRaises(UploadError):
+            source.read(0, 6)
+
+    def test_iterable_without_size_small(self):
+        """Test that a small iterable of unknown size stays in memory."""
+        source = open_content(iter([b"ab", b"cd"]), spool_size=10)
+        self.assertIsInstance(source, BytesContent)
+        self.assertEqual(source.read_all(), b"abcd")
+
+    def test_iterable_without_size_spooled(self):
+        """Test that a large iterable of unknown size is spooled to a temporary file."""
+        with open_content(iter([b"abcd"] * 5), spool_size=6) as source:
+            self.assertIsInstance(source, FileContent)
+            self.assertEqual(source.size, 20)
+            self.assertEqual(source.read(16, 4), b"abcd")
+        self.assertTrue(source.fileobj.closed)
+
+    def test_non_seekable_file_object(self):
+        """Test that a non seekable file object is consumed like an iterable."""
+        source = open_content(NonSeekableReader(b"x" * 25), spool_size=10)
+        self.assertEqual(source.size, 25)
+        self.assertEqual(source.read(20, 5), b"xxxxx")
+        self.assertIs(open_content(source), source)
+
+    def test_base_class(self):
+        """Test the abstract UploadContent class."""
+        with self.assertRaises(TypeError):
+            UploadContent()
+
+        class Zeros(UploadContent):
+            size = 3
+            def read(self, offset, length):
+                return bytes(length)
+
+        with Zeros() as source:
+            self.assertEqual(source.read_all(), b"\x00\x00\x00")
+
+
+class TestMultipartBody(unittest.TestCase):
+    """Tests for the MultipartBody class."""
+
+    def test_encoding_matches_urllib3(self):
+        """Test that the streamed body is byte for byte what urllib3 would encode."""
+        content = b"0123456789"
+        body = MultipartBody(
+            {'dzuuid': 'abc', 'dzchunkindex': 3},
+            {'userfile': ('my "file".txt', memoryview(content)[2:6], 'text/plain')},
+            boundary='boundary'
+        )
+
+        expected, content_type = encode_multipart_formdata(
+            [('dzuuid', 'abc'), ('dzchunkindex', '3'), ('userfile', ('my "file".txt', b"2345", 'text/plain'))],
+            boundary='boundary'
+        )
+        self.assertEqual(bytes(body), expected)
+        self.assertEqual(len(body), len(expected))
+        self.assertEqual(body.content_type, content_type)
+
+    def test_file_content_is_not_copied(self):
+        """Test that file contents are streamed as given."""
+        window = memoryview(b"x" * 100)[10:20]
+        body = MultipartBody({}, {'userfile': ('a.bin', window, 'application/octet-stream')})
+
+        self.assertTrue(any(part is window for part in body))
+
+    def test_text_file_content(self):
+        """Test that text file contents are encoded."""
+        body = MultipartBody({}, {'userfile': ('a.txt', 'été', 'text/plain')})
+        self.assertIn('été'.encode('utf-8'), bytes(body))
+        self.assertEqual(len(body), len(bytes(body)))
+
+
+class TestHashContent(unittest.TestCase):
+    """Tests for the hash_content function."""
+
+    def test_hash_content(self):
+        """Test that the content is hashed block by block."""
+        content = bytes(range(256)) * 10
+        self.assertEqual(hash_content(open_content(content), block_size=100), hashlib.sha256(content).hexdigest())
+        self.assertEqual(hash_content(open_content(io.BytesIO(content))), hashlib.sha256(content).hexdigest())
+
+    def test_hash_iterable_content(self):
+        """Test that iterable contents cannot be hashed."""
+        with self.assertRaises(UploadError):
+            hash_content(open_content(iter([b"abc"]), size=3))
+
+
+if __name__ == '__main__':
+    unittest.main()
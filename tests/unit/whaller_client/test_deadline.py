@@ -0,0 +1,123 @@
+"""
+Unit tests for the deadlines of the operations.
+"""
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from whaller_client.deadline import (check_deadline, check_retry_delay, check_wait, clip_timeout, deadline, get_remaining, hold,
+                                     hold_async, is_expired, submit)
+from whaller_client.exceptions import DeadlineExceededError, HttpError
+
+
+class TestDeadline(unittest.TestCase):
+    """Tests for the deadline context."""
+
+    def test_deadline(self):
+        """Test that the time left is only known within a deadline, and that nested ones can only shorten it."""
+        self.assertIsNone(get_remaining())
+        self.assertIsNone(check_deadline("calling me"))
+
+        with patch('whaller_client.deadline.monotonic', return_value=100.0):
+            with deadline(10):
+                self.assertEqual(get_remaining(), 10)
+                with deadline(30):
+                    self.assertEqual(get_remaining(), 10)
+                with deadline(4):
+                    self.assertEqual(check_deadline("calling me"), 4)
+                self.assertEqual(get_remaining(), 10)
+        self.assertIsNone(get_remaining())
+
+    def test_expired(self):
+        """Test that an expired deadline raises a DeadlineExceededError, which is an HttpError."""
+        self.assertFalse(is_expired())
+        with deadline(0):
+            self.assertTrue(is_expired())
+            with self.assertRaises(HttpError) as context:
+                check_deadline("calling me")
+        self.assertIsInstance(context.exception, DeadlineExceededError)
+        self.assertEqual(context.exception.message, "Deadline exceeded before calling me")
+
+    def test_check_retry_delay(self):
+        """Test that a retry is only allowed if it can start before the deadline."""
+        check_retry_delay(60, "503 on me")
+        with patch('whaller_client.deadline.monotonic', return_value=100.0):
+            with deadline(5):
+                check_retry_delay(1, "503 on me")
+                with self.assertRaises(DeadlineExceededError) as context:
+                    check_retry_delay(5, "503 on me")
+        self.assertEqual(context.exception.message, "Deadline exceeded: no time left to retry after 503 on me")
+
+    def test_check_wait(self):
+        """Test that a wait is only allowed if it ends before the deadline."""
+        check_wait(60, "the rate limit of me")
+        with patch('whaller_client.deadline.monotonic', return_value=100.0):
+            with deadline(5):
+                check_wait(1, "the rate limit of me")
+                with self.assertRaises(DeadlineExceededError) as context:
+                    check_wait(5, "the rate limit of me")
+        self.assertEqual(context.exception.message, "Deadline exceeded: no time left for the rate limit of me")
+
+    def test_clip_timeout(self):
+        """Test that timeouts are shortened to the time left."""
+        self.assertEqual(clip_timeout(10, None), 10)
+        self.assertIsNone(clip_timeout(None, None))
+        self.assertEqual(clip_timeout(10, 3), 3)
+        self.assertEqual(clip_timeout(2, 3), 2)
+        self.assertEqual(clip_timeout(None, 3), 3)
+
+    def test_submit(self):
+        """Test that the deadline follows the tasks submitted to a thread pool."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with deadline(60):
+                futures = [submit(executor, get_remaining) for _ in range(4)]
+                plain = executor.submit(get_remaining)
+            self.assertTrue(all(0 < future.result() <= 60 for future in futures))
+            self.assertIsNone(plain.result())
+
+    def test_hold(self):
+        """Test that waiting for a lock gives up at the deadline."""
+        lock = threading.Lock()
+        with hold(lock, "getting a bearer token"):
+            self.assertTrue(lock.locked())
+        self.assertFalse(lock.locked())
+
+        lock.acquire()
+        try:
+            with deadline(0.01):
+                with self.assertRaises(DeadlineExceededError) as context:
+                    with hold(lock, "getting a bearer token"):
+                        pass
+        finally:
+            lock.release()
+        self.assertEqual(context.exception.message, "Deadline exceeded before getting a bearer token")
+
+        with deadline(1):
+            with hold(lock, "getting a bearer token"):
+                self.assertTrue(lock.locked())
+
+    def test_hold_async(self):
+        """Test that waiting for an asyncio lock gives up at the deadline."""
+        async def run():
+            lock = asyncio.Lock()
+            async with hold_async(lock, "getting a bearer token"):
+                self.assertTrue(lock.locked())
+            with deadline(1):
+                async with hold_async(lock, "getting a bearer token"):
+                    self.assertTrue(lock.locked())
+            self.assertFalse(lock.locked())
+
+            await lock.acquire()
+            with deadline(0.01):
+                with self.assertRaises(DeadlineExceededError):
+                    async with hold_async(lock, "getting a bearer token"):
+                        pass
+            lock.release()
+            self.assertFalse(lock.locked())
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
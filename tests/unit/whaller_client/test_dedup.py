@@ -0,0 +1,54 @@
+"""
+Unit tests for the DedupIndex class.
+"""
+import os
+import tempfile
+import unittest
+from whaller_client.dedup import DedupIndex
+
+
+class TestDedupIndex(unittest.TestCase):
+    """Tests for the DedupIndex class."""
+
+    def setUp(self):
+        """Create a temporary directory for the index."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'state', 'dedup.json')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_memory(self):
+        """Test an index kept in memory, and its counters."""
+        index = DedupIndex()
+        self.assertIsNone(index.get('abc'))
+        index.set('abc', 42)
+        self.assertEqual(index.get('abc'), 42)
+        self.assertEqual(index.snapshot(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+        index.discard('abc')
+        index.discard('abc')
+        self.assertIsNone(index.get('abc'))
+
+    def test_persistence(self):
+        """Test that the index is stored in its file."""
+        index = DedupIndex(self.path)
+        index.set('abc', 42)
+        index.set('def', 43)
+        index.discard('def')
+
+        loaded = DedupIndex(self.path)
+        self.assertEqual(loaded.get('abc'), 42)
+        self.assertIsNone(loaded.get('def'))
+
+    def test_corrupted(self):
+        """Test that a corrupted index is ignored."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        self.assertEqual(DedupIndex(self.path).snapshot()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
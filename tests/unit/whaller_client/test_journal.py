@@ -0,0 +1,112 @@
+"""
+Unit tests for the UploadJournal class.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from whaller_client.journal import UploadJournal
+
+
+class TestUploadJournal(unittest.TestCase):
+    """Tests for the UploadJournal class."""
+
+    def setUp(self):
+        """Create a temporary directory for the journal."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'journal', 'uploads.json')
+
+    def test_open_creates_entry(self):
+        """Test that opening an unknown upload creates it with a fresh dzuuid and the given chunk size."""
+        journal = UploadJournal(self.path)
+
+        dzuuid, chunksize, acknowledged = journal.open('key', 10)
+
+        self.assertEqual((chunksize, acknowledged), (10, set()))
+        self.assertIn('key', journal)
+        journal.release('key')
+        self.assertEqual(journal.open('key', 5), (dzuuid, 10, set()))
+        self.assertNotEqual(journal.open('other', 10)[0], dzuuid)
+
+    def test_open_claims_upload(self):
+        """Test that an upload in progress cannot be opened again until it is released or discarded."""
+        journal = UploadJournal(self.path)
+        dzuuid, _, _ = journal.open('key', 10)
+
+        self.assertIsNone(journal.open('key', 10))
+        journal.release('key')
+        self.assertEqual(journal.open('key', 10)[0], dzuuid)
+        journal.discard('key')
+        self.assertNotEqual(journal.open('key', 10)[0], dzuuid)
+
+    def test_ack_unknown_upload(self):
+        """Test that acknowledging a chunk of an upload already forgotten is ignored."""
+        journal = UploadJournal(self.path)
+        journal.open('key', 10)
+        journal.discard('key')
+
+        journal.ack('key', 0)
+
+        self.assertNotIn('key', journal)
+
+    def test_ack_is_persisted(self):
+        """Test that acknowledged chunks survive a new journal instance."""
+        journal = UploadJournal(self.path)
+        dzuuid, _, _ = journal.open('key', 10)
+        journal.ack('key', 0)
+        journal.ack('key', 2)
+
+        reloaded = UploadJournal(self.path)
+
+        self.assertEqual(reloaded.open('key', 5), (dzuuid, 10, {0, 2}))
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['version'], 1)
+
+    def test_discard(self):
+        """Test that a completed upload is forgotten."""
+        journal = UploadJournal(self.path)
+        journal.open('key', 10)
+
+        journal.discard('key')
+        journal.discard('unknown')
+
+        self.assertNotIn('key', journal)
+        self.assertNotIn('key', UploadJournal(self.path))
+
+    @patch('whaller_client.journal.time')
+    def test_prune(self, mock_time):
+        """Test that uploads not updated for max_age are forgotten."""
+        mock_time.return_value = 1000.0
+        journal = UploadJournal(self.path, max_age=100)
+        journal.open('old', 10)
+        journal.open('recent', 10)
+        mock_time.return_value = 1050.0
+        journal.ack('recent', 0)
+
+        mock_time.return_value = 1120.0
+        self.assertNotIn('old', UploadJournal(self.path, max_age=100))
+        self.assertIn('old', UploadJournal(self.path, max_age=None))
+
+        journal.release('recent')
+        journal.open('recent', 10)
+        self.assertNotIn('old', journal)
+        self.assertEqual(set(UploadJournal(self.path, max_age=None)._uploads), {'recent'})
+
+    def test_corrupted_journal(self):
+        """Test that a corrupted journal is ignored."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{not json')
+
+        journal = UploadJournal(self.path)
+
+        self.assertNotIn('key', journal)
+        journal.open('key', 10)
+        self.assertIn('key', UploadJournal(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
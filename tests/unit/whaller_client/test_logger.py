@@ -5,9 +5,10 @@ import unittest
 import os
 import logging
 import tempfile
+import threading
 import shutil
 from unittest.mock import patch, MagicMock
-from whaller_client.logger import Logger
+from whaller_client.logger import BackgroundHandler, Logger
 
 
 class TestLogger(unittest.TestCase):
@@ -127,5 +128,125 @@ class TestLogger(unittest.TestCase):
             self.fail(f"Logging methods raised an exception: {e}")
 
 
+class TestBackgroundLogger(unittest.TestCase):
+    """Tests for the background mode of the Logger class."""
+
+    def setUp(self):
+        """Create a temporary directory and an isolated logger name."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.log_dir = os.path.join(self.temp_dir, 'logs') + '/'
+        self.logger_name = f"test_background_{self.id().rsplit('.', 1)[-1]}"
+        # Not propagating, so that handlers of the root logger do not prevent adding the file handler
+        logging.getLogger(self.logger_name).propagate = False
+        self.loggers = []
+
+    def tearDown(self):
+        """Close the loggers and remove the temporary directory."""
+        for logger in self.loggers:
+            logger.close()
+        shutil.rmtree(self.temp_dir)
+
+    def make_logger(self, **kwargs):
+        """Build a background logger writing to the temporary directory."""
+        logger = Logger(self.logger_name, self.log_dir, logging.INFO, background=True, **kwargs)
+        self.loggers.append(logger)
+        return logger
+
+    def read(self, suffix=''):
+        """Read the log file."""
+        with open(os.path.join(self.log_dir, f'{self.logger_name}.log{suffix}'), encoding='utf-8') as f:
+            return f.read()
+
+    def test_write(self):
+        """Test that the records are written by the writer thread, in order."""
+        logger = self.make_logger()
+        self.assertIsInstance(logger.handler, BackgroundHandler)
+
+        logger.info("first %s", 1)
+        logger.error("second")
+        logger.handler.flush()
+
+        lines = self.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(f"{self.logger_name} - INFO - first 1"))
+        self.assertTrue(lines[1].endswith("ERROR - second"))
+
+    def test_lazy_directory(self):
+        """Test that the log directory is only created when the first record is written."""
+        logger = self.make_logger()
+        self.assertFalse(os.path.exists(self.log_dir))
+
+        logger.info("created")
+        logger.close()
+
+        self.assertIn("created", self.read())
+        logger.close()
+
+    def test_level_short_circuit(self):
+        """Test that a disabled call neither formats its arguments nor queues a record."""
+        logger = self.make_logger()
+        argument = MagicMock()
+
+        with patch.object(logger.handler, 'emit') as mock_emit:
+            logger.debug("value %s", argument)
+
+        argument.__str__.assert_not_called()
+        mock_emit.assert_not_called()
+
+    def test_batches(self):
+        """Test that queued records are written in batches of up to batch_size."""
+        logger = self.make_logger(batch_size=3)
+        file_handler = logger.handler.file_handler
+        emit_batch = file_handler.emit_batch
+        started = threading.Event()
+        release = threading.Event()
+
+        def hold_first_batch(records):
+            if records and not started.is_set():
+                started.set()
+                release.wait(5)
+            emit_batch(records)
+        file_handler.emit_batch = MagicMock(side_effect=hold_first_batch)
+
+        logger.info("line 0")
+        self.assertTrue(started.wait(5))
+        # Queued while the writer thread is busy, so that they are drained together
+        for i in range(1, 8):
+            logger.info("line %d", i)
+        release.set()
+        logger.handler.flush()
+
+        sizes = [len(call[0][0]) for call in file_handler.emit_batch.call_args_list if call[0][0]]
+        self.assertEqual(sizes, [1, 3, 3, 1])
+        self.assertEqual(len(self.read().splitlines()), 8)
+
+    def test_rotation(self):
+        """Test that the log file is rotated when it exceeds max_bytes."""
+        logger = self.make_logger(max_bytes=200, backup_count=2)
+
+        for i in range(10):
+            logger.info("line %d %s", i, 'x' * 40)
+            logger.handler.flush()
+
+        self.assertLessEqual(len(self.read()), 200)
+        self.assertIn("line 9", self.read())
+        self.assertTrue(os.path.exists(os.path.join(self.log_dir, f'{self.logger_name}.log.2')))
+        self.assertFalse(os.path.exists(os.path.join(self.log_dir, f'{self.logger_name}.log.3')))
+
+    def test_write_error(self):
+        """Test that a failed write is reported through logging without stopping the writer thread."""
+        logger = self.make_logger()
+        file_handler = logger.handler.file_handler
+        file_handler.handleError = MagicMock()
+        file_handler.format = MagicMock(side_effect=[ValueError("bad record"), "ok"])
+
+        logger.info("bad")
+        logger.handler.flush()
+        logger.info("good")
+        logger.handler.flush()
+
+        file_handler.handleError.assert_called_once()
+        self.assertEqual(self.read(), "ok\n")
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
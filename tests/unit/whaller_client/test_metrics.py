@@ -0,0 +1,157 @@
+"""
+Unit tests for the metrics registry.
+"""
+import unittest
+from unittest.mock import patch
+from whaller_client.metrics import Histogram, MetricsRegistry, measure
+
+
+class TestHistogram(unittest.TestCase):
+    """Tests for the Histogram class."""
+
+    def test_snapshot(self):
+        """Test the counts, sum and cumulative buckets."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        self.assertEqual(snapshot['count'], 4)
+        self.assertAlmostEqual(snapshot['sum'], 2.65)
+        self.assertAlmostEqual(snapshot['mean'], 0.6625)
+        self.assertEqual(snapshot['buckets'], {0.1: 2, 1.0: 3, float('inf'): 4})
+
+    def test_quantile(self):
+        """Test that quantiles are interpolated within their bucket."""
+        histogram = Histogram((1.0, 2.0, 4.0))
+        self.assertIsNone(histogram.quantile(0.5))
+        self.assertIsNone(histogram.snapshot()['mean'])
+
+        for value in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.25), 1.0)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(0.9), 3.2)
+
+        histogram.observe(10.0)
+        self.assertEqual(histogram.quantile(0.99), 4.0)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Tests for the MetricsRegistry class."""
+
+    def setUp(self):
+        """Create a registry."""
+        self.metrics = MetricsRegistry(buckets=(0.1, 1.0), endpoints=['persons/*/notifications'])
+
+    def test_endpoint_label(self):
+        """Test that endpoints of the same route share a label."""
+        self.assertEqual(self.metrics.get_endpoint_label('persons/jdoe/notifications'), 'persons/*/notifications')
+        self.assertEqual(self.metrics.get_endpoint_label('spheres/ab12cd/boxresources'), 'spheres/{id}/boxresources')
+        self.assertEqual(self.metrics.get_endpoint_label('me/spheres?limit=10'), 'me/spheres')
+        self.assertEqual(self.metrics.get_endpoint_label('me/spheres?limit=10'), 'me/spheres')
+
+        with patch('whaller_client.metrics._MAX_ENDPOINT_LABELS', 2):
+            self.metrics.get_endpoint_label('person/login')
+        self.assertEqual(list(self.metrics._endpoint_labels), ['person/login'])
+
+    def test_counters_and_histograms(self):
+        """Test that values are aggregated by name and labels."""
+        self.metrics.inc('calls_total', endpoint='me')
+        self.metrics.inc('calls_total', 2, endpoint='me')
+        self.metrics.inc('calls_total', endpoint='spheres')
+        self.metrics.observe('latency_seconds', 0.5, endpoint='me')
+        with patch('whaller_client.metrics.perf_counter', side_effect=[1.0, 1.05]):
+            with self.metrics.timer('latency_seconds', endpoint='me'):
+                pass
+
+        snapshot = self.metrics.snapshot()
+
+        self.assertEqual(snapshot['counters'], [
+            {'name': 'calls_total', 'labels': {'endpoint': 'me'}, 'value': 3},
+            {'name': 'calls_total', 'labels': {'endpoint': 'spheres'}, 'value': 1},
+        ])
+        histogram = snapshot['histograms'][0]
+        self.assertEqual((histogram['name'], histogram['labels'], histogram['count']),
+                         ('latency_seconds', {'endpoint': 'me'}, 2))
+        self.assertEqual(histogram['buckets'][0.1], 1)
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot(), {'counters': [], 'histograms': []})
+
+    def test_record_request(self):
+        """Test the metrics of an HTTP attempt, a retry and byte counts."""
+        self.metrics.record_request('GET', 'spheres/12/boxresources', 503, 0.5, 0.05)
+        self.metrics.record_request('GET', 'spheres/12/boxresources', 'error', 0.2)
+        self.metrics.record_retry('GET', 'spheres/12/boxresources', 503)
+        self.metrics.record_bytes('http_response_bytes_total', 'spheres/12/boxresources', 42)
+
+        snapshot = self.metrics.snapshot()
+        counters = {(c['name'], c['labels'].get('status') or c['labels'].get('reason')): c['value']
+                    for c in snapshot['counters']}
+        self.assertEqual(counters, {('http_requests_total', '503'): 1, ('http_requests_total', 'error'): 1,
+                                    ('http_retries_total', '503'): 1, ('http_response_bytes_total', None): 42})
+        histograms = {h['name']: h['count'] for h in snapshot['histograms']}
+        self.assertEqual(histograms, {'http_request_seconds': 2, 'http_ttfb_seconds': 1})
+        self.assertTrue(all(c['labels']['endpoint'] == 'spheres/{id}/boxresources' for c in snapshot['counters']))
+
+    def test_to_prometheus(self):
+        """Test the Prometheus text exposition format."""
+        self.assertEqual(self.metrics.to_prometheus(), '')
+        self.metrics.inc('http_requests_total', endpoint='me', status='200')
+        self.metrics.inc('http_requests_total', endpoint='say "hi"', status='200')
+        self.metrics.observe('http_request_seconds', 0.5, endpoint='me')
+        self.metrics.observe('http_request_seconds', 0.25, endpoint='spheres')
+
+        lines = self.metrics.to_prometheus().splitlines()
+
+        self.assertEqual(lines[:3], [
+            '# TYPE whaller_http_requests_total counter',
+            'whaller_http_requests_total{endpoint="me",status="200"} 1',
+            'whaller_http_requests_total{endpoint="say \\"hi\\"",status="200"} 1',
+        ])
+        self.assertEqual(lines[3:8], [
+            '# TYPE whaller_http_request_seconds histogram',
+            'whaller_http_request_seconds_bucket{endpoint="me",le="0.1"} 0',
+            'whaller_http_request_seconds_bucket{endpoint="me",le="1"} 1',
+            'whaller_http_request_seconds_bucket{endpoint="me",le="+Inf"} 1',
+            'whaller_http_request_seconds_sum{endpoint="me"} 0.5',
+        ])
+        self.assertEqual(lines[8], 'whaller_http_request_seconds_count{endpoint="me"} 1')
+        self.assertEqual(lines.count('# TYPE whaller_http_request_seconds histogram'), 1)
+        self.assertEqual(len(lines), 14)
+
+        metrics = MetricsRegistry()
+        metrics.inc('upload_bytes_total', 5)
+        self.assertEqual(metrics.to_prometheus(), '# TYPE whaller_upload_bytes_total counter\nwhaller_upload_bytes_total 5\n')
+
+    def test_to_statsd(self):
+        """Test that counters are sent as increases since the previous export."""
+        self.metrics.inc('upload_bytes_total', 100)
+        self.metrics.observe('http_request_seconds', 0.5, endpoint='spheres/{id}')
+
+        lines = self.metrics.to_statsd()
+
+        self.assertIn('whaller.upload_bytes_total:100|c', lines)
+        self.assertIn('whaller.http_request_seconds.count:1|c|#endpoint:spheres/{id}', lines)
+        self.assertIn('whaller.http_request_seconds.p50:0.55|g|#endpoint:spheres/{id}', lines)
+
+        self.metrics.inc('upload_bytes_total', 20)
+        lines = self.metrics.to_statsd(prefix='app.')
+        self.assertIn('app.upload_bytes_total:20|c', lines)
+        self.assertFalse(any('.count:' in line for line in lines))
+        self.assertIn('app.http_request_seconds.p50:0.55|g|#endpoint:spheres/{id}', lines)
+
+    def test_measure(self):
+        """Test that measure records into a registry, and does nothing without one."""
+        with measure(None, 'auth_wait_seconds'):
+            pass
+        with measure(self.metrics, 'auth_wait_seconds'):
+            pass
+        self.assertEqual(self.metrics.snapshot()['histograms'][0]['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Unit tests for the middleware chain.
+"""
+import asyncio
+import unittest
+from whaller_client.middleware import Request, Response, build_chain
+
+
+class TestMiddleware(unittest.TestCase):
+    """Tests for the middleware chain."""
+
+    def test_build_chain(self):
+        """Test that the first middleware is the outermost one."""
+        calls = []
+        def make_middleware(name):
+            def middleware(request, call_next):
+                calls.append(name)
+                response = call_next(request)
+                calls.append(f'/{name}')
+                return response
+            return middleware
+        def transport(request):
+            calls.append(request.url)
+            return Response(200, {}, b'{}')
+
+        chain = build_chain([make_middleware('a'), make_middleware('b')], transport)
+        response = chain(Request('GET', 'me', 'https://api.whaller.com/api/me', {}))
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(calls, ['a', 'b', 'https://api.whaller.com/api/me', '/b', '/a'])
+
+    def test_build_chain_empty(self):
+        """Test that no chain is built without middleware."""
+        self.assertIsNone(build_chain([], lambda request: None))
+        self.assertIsNone(build_chain(iter(()), lambda request: None))
+
+    def test_build_chain_async(self):
+        """Test that coroutine functions are chained the same way."""
+        async def middleware(request, call_next):
+            request.headers['X-Trace'] = 'abc'
+            return await call_next(request)
+        async def transport(request):
+            return Response(200, request.headers, b'')
+
+        chain = build_chain([middleware], transport)
+        response = asyncio.run(chain(Request('POST', 'me', 'https://api.whaller.com/api/me', {}, data=b'{}')))
+
+        self.assertEqual(response.headers, {'X-Trace': 'abc'})
+
+    def test_repr(self):
+        """Test the representations of the requests and responses."""
+        self.assertEqual(repr(Request('GET', 'me', 'https://api.whaller.com/api/me', {})),
+                         'Request(GET https://api.whaller.com/api/me)')
+        self.assertEqual(repr(Response(200, {}, b'{}')), 'Response(200, 2 bytes)')
+
+
+if __name__ == '__main__':
+    unittest.main()
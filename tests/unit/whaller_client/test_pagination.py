@@ -0,0 +1,79 @@
+"""
+Unit tests for the lazy pagination of list endpoints.
+"""
+import threading
+import unittest
+from unittest.mock import MagicMock
+from whaller_client.pagination import get_page_params, iter_items, iter_pages
+
+
+def make_fetch(total):
+    """Build a fetch callable serving `total` items by limit/offset."""
+    items = list(range(total))
+    return MagicMock(side_effect=lambda params: items[params['offset']:params['offset'] + params['limit']])
+
+
+class TestPagination(unittest.TestCase):
+    """Tests for iter_pages and iter_items."""
+
+    def test_get_page_params(self):
+        """Test that the page parameters are added to the request parameters."""
+        self.assertEqual(get_page_params({'q': 'x', 'offset': 5}, 10, 20), {'q': 'x', 'limit': 10, 'offset': 20})
+
+    def test_iter_items(self):
+        """Test that every item is yielded, with and without prefetch."""
+        for prefetch in (True, False):
+            for total in (0, 1, 9, 10, 25):
+                with self.subTest(prefetch=prefetch, total=total):
+                    fetch = make_fetch(total)
+                    self.assertEqual(list(iter_items(fetch, {'q': 'x'}, 10, prefetch)), list(range(total)))
+                    offsets = [call[0][0]['offset'] for call in fetch.call_args_list]
+                    self.assertEqual(offsets, list(range(0, total + 1, 10)))
+                    self.assertTrue(all(call[0][0]['q'] == 'x' for call in fetch.call_args_list))
+
+    def test_iter_pages(self):
+        """Test that pages are yielded from the given offset, without empty pages."""
+        pages = list(iter_pages(make_fetch(25), {'offset': 5}, 10))
+        self.assertEqual(pages, [list(range(5, 15)), list(range(15, 25))])
+
+    def test_lazy(self):
+        """Test that pages are only fetched when needed."""
+        fetch = make_fetch(100)
+        items = iter_items(fetch, page_size=10, prefetch=False)
+        fetch.assert_not_called()
+        next(items)
+        self.assertEqual(fetch.call_count, 1)
+        items.close()
+
+    def test_prefetch(self):
+        """Test that the next page is fetched while the current one is consumed."""
+        fetched = threading.Event()
+        items = list(range(20))
+
+        def fetch(params):
+            if params['offset'] == 10:
+                fetched.set()
+            return items[params['offset']:params['offset'] + params['limit']]
+
+        pages = iter_pages(fetch, page_size=10)
+        next(pages)
+        self.assertTrue(fetched.wait(5))
+        self.assertEqual(next(pages), list(range(10, 20)))
+        pages.close()
+
+    def test_error(self):
+        """Test that an error fetching a page is raised when the page is reached."""
+        fetch = MagicMock(side_effect=[list(range(10)), RuntimeError("API down")])
+        items = iter_items(fetch, page_size=10)
+        self.assertEqual([next(items) for _ in range(10)], list(range(10)))
+        with self.assertRaises(RuntimeError):
+            next(items)
+
+    def test_invalid_page_size(self):
+        """Test that the page size must be positive."""
+        with self.assertRaises(ValueError):
+            next(iter_pages(make_fetch(1), page_size=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
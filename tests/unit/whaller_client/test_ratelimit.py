@@ -0,0 +1,273 @@
+"""
+Unit tests for the rate limiter.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch, AsyncMock
+from whaller_client.deadline import deadline
+from whaller_client.exceptions import DeadlineExceededError
+from whaller_client.ratelimit import RateLimiter, TokenBucket, parse_rate_limit_headers
+
+
+class FakeClock:
+    """Controllable replacement of time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for the TokenBucket class."""
+
+    def setUp(self):
+        """Freeze the clock of the module."""
+        self.clock = FakeClock()
+        patcher = patch('whaller_client.ratelimit.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        """Test that a full bucket allows a burst, then spaces out the requests."""
+        bucket = TokenBucket(rate=10, burst=3)
+
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+
+        self.clock.now += 1
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_default_burst(self):
+        """Test that the burst defaults to the rate, and to at least one request."""
+        self.assertEqual(TokenBucket(rate=5).burst, 5)
+        self.assertEqual(TokenBucket(rate=0.5).burst, 1.0)
+
+    def test_throttle(self):
+        """Test that a throttled bucket pauses and halves its rate."""
+        bucket = TokenBucket(rate=10, burst=10)
+
+        bucket.throttle(2.0, 0.5)
+
+        self.assertEqual(bucket.rate, 5)
+        self.assertAlmostEqual(bucket.reserve(), 2.0)
+        self.clock.now += 2
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+
+    def test_throttle_rate_floor(self):
+        """Test that repeated throttling never stops the bucket completely."""
+        bucket = TokenBucket(rate=10)
+        for _ in range(20):
+            bucket.throttle(0, 0.5)
+        self.assertEqual(bucket.rate, 0.5)
+
+    def test_recover(self):
+        """Test that the rate grows back up to its initial value."""
+        bucket = TokenBucket(rate=10)
+        bucket.throttle(0, 0.5)
+
+        bucket.recover(2)
+        self.assertEqual(bucket.rate, 7)
+        bucket.recover(5)
+        self.assertEqual(bucket.rate, 10)
+
+    def test_limit(self):
+        """Test that the quota announced by the API caps the tokens and the rate."""
+        bucket = TokenBucket(rate=10, burst=10)
+
+        bucket.limit(remaining=2, reset=10)
+
+        self.assertEqual(bucket.rate, 0.5)
+        self.assertEqual([bucket.reserve(), bucket.reserve()], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.reserve(), 2.0)
+
+        # A larger quota never raises the rate above the configured one
+        bucket.limit(remaining=1000, reset=10)
+        self.assertEqual(bucket.rate, 10)
+
+    def test_limit_exhausted(self):
+        """Test that an exhausted quota pauses the bucket until it resets."""
+        bucket = TokenBucket(rate=10, burst=10)
+
+        bucket.limit(remaining=0, reset=5)
+
+        self.assertAlmostEqual(bucket.reserve(), 5.0)
+        self.clock.now += 5
+        # Until the API announces its new quota, the rate stays at its lowest
+        self.assertAlmostEqual(bucket.reserve(), 1 / bucket.min_rate)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Tests for the RateLimiter class."""
+
+    def setUp(self):
+        """Freeze the clock of the module."""
+        self.clock = FakeClock()
+        patcher = patch('whaller_client.ratelimit.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_buckets(self):
+        """Test that an endpoint is limited by the global bucket and its first matching pattern."""
+        limiter = RateLimiter(rate=20, limits={'upload/*': 2, 'me/*': (10, 5), 'me/spheres': 1})
+
+        self.assertEqual(limiter.get_buckets('upload/box_resource'), [limiter.bucket, limiter.limits['upload/*']])
+        self.assertEqual(limiter.get_buckets('me/spheres'), [limiter.bucket, limiter.limits['me/*']])
+        self.assertEqual(limiter.get_buckets('person/login'), [limiter.bucket])
+        self.assertEqual(limiter.limits['me/*'].burst, 5)
+        self.assertEqual(RateLimiter(limits={'me/*': 1}).get_buckets('person/login'), [])
+        self.assertEqual(limiter.get_buckets('me'), [limiter.bucket, limiter.limits['me/*']])
+        self.assertEqual(limiter.get_buckets('mess'), [limiter.bucket])
+
+    @patch('whaller_client.ratelimit._MAX_CACHED_ENDPOINTS', 3)
+    def test_get_buckets_cache_is_bounded(self):
+        """Test that the buckets of at most a bounded number of endpoints are cached."""
+        limiter = RateLimiter(limits={'spheres/*': 1})
+        for sphere_id in range(10):
+            self.assertEqual(limiter.get_buckets(f'spheres/{sphere_id}/boxresources'), [limiter.limits['spheres/*']])
+            self.assertLessEqual(len(limiter._buckets), 3)
+
+    def test_reserve(self):
+        """Test that a request waits for the most limiting bucket."""
+        limiter = RateLimiter(rate=100, limits={'upload/*': (1, 1)})
+
+        self.assertEqual(limiter.reserve('upload/box_resource'), 0.0)
+        self.assertAlmostEqual(limiter.reserve('upload/box_resource'), 1.0)
+        self.assertEqual(limiter.reserve('me/spheres'), 0.0)
+        self.assertEqual(RateLimiter().reserve('me/spheres'), 0.0)
+
+    @patch('whaller_client.ratelimit.sleep')
+    def test_acquire(self, mock_sleep):
+        """Test that acquire only sleeps when the bucket is empty."""
+        limiter = RateLimiter(rate=2, burst=1)
+
+        limiter.acquire('me/spheres')
+        mock_sleep.assert_not_called()
+        limiter.acquire('me/spheres')
+        mock_sleep.assert_called_once_with(0.5)
+
+    @patch('whaller_client.ratelimit.asyncio.sleep', new_callable=AsyncMock)
+    def test_acquire_async(self, mock_sleep):
+        """Test that acquire_async waits without blocking the event loop."""
+        limiter = RateLimiter(rate=2, burst=1)
+
+        async def run():
+            await limiter.acquire_async('me/spheres')
+            await limiter.acquire_async('me/spheres')
+        asyncio.run(run())
+
+        mock_sleep.assert_awaited_once_with(0.5)
+
+    @patch('whaller_client.ratelimit.sleep')
+    def test_acquire_within_deadline(self, mock_sleep):
+        """Test that acquire fails at once rather than waiting past the deadline."""
+        limiter = RateLimiter(rate=100)
+        limiter.update('me', 429, {'Retry-After': '3'})
+
+        with deadline(0.5), self.assertRaises(DeadlineExceededError):
+            limiter.acquire('me')
+        with deadline(5):
+            limiter.acquire('me')
+        mock_sleep.assert_called_once()
+        self.assertGreater(mock_sleep.call_args[0][0], 2.5)
+
+    def test_acquire_async_within_deadline(self):
+        """Test that acquire_async fails at once rather than waiting past the deadline."""
+        limiter = RateLimiter(rate=100)
+        limiter.update('me', 429, {'Retry-After': '3'})
+
+        async def run():
+            with deadline(0.5):
+                await limiter.acquire_async('me')
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            asyncio.run(run())
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_update_on_429(self):
+        """Test that a 429 pauses the most specific bucket for the Retry-After delay."""
+        limiter = RateLimiter(rate=100, limits={'upload/*': 10})
+
+        limiter.update('upload/box_resource', 429, {'Retry-After': '3'})
+
+        self.assertEqual(limiter.limits['upload/*'].rate, 5)
+        self.assertEqual(limiter.bucket.rate, 100)
+        self.assertAlmostEqual(limiter.reserve('upload/box_resource'), 3.0)
+
+    def test_update_on_429_without_retry_after(self):
+        """Test the pause of a 429 without Retry-After: the reset header, or one request interval."""
+        limiter = RateLimiter(rate=10, burst=10)
+        limiter.update('me/spheres', 429, {'X-RateLimit-Reset': '4'})
+        self.assertAlmostEqual(limiter.reserve('me/spheres'), 4.0)
+
+        limiter = RateLimiter(rate=10, burst=10)
+        limiter.update('me/spheres', 429, {})
+        self.assertAlmostEqual(limiter.reserve('me/spheres'), 0.1)
+
+    def test_update_with_rate_headers(self):
+        """Test that rate limit headers set the rate to the remaining quota."""
+        limiter = RateLimiter(rate=10)
+
+        limiter.update('me/spheres', 200, {'RateLimit-Remaining': '30', 'RateLimit-Reset': '10'})
+
+        self.assertEqual(limiter.bucket.rate, 3)
+
+    def test_update_recovers(self):
+        """Test that successful requests raise the rate back after a 429."""
+        limiter = RateLimiter(rate=10)
+        limiter.update('me/spheres', 429, {'Retry-After': '0'})
+        self.assertEqual(limiter.bucket.rate, 5)
+
+        for _ in range(5):
+            limiter.update('me/spheres', 200, {})
+        self.assertAlmostEqual(limiter.bucket.rate, 7.5)
+        for _ in range(20):
+            limiter.update('me/spheres', 200, {})
+        self.assertEqual(limiter.bucket.rate, 10)
+
+    def test_update_without_limit(self):
+        """Test that responses of unlimited endpoints are ignored."""
+        limiter = RateLimiter(limits={'upload/*': 1})
+        limiter.update('me/spheres', 429, {'Retry-After': '3'})
+        self.assertEqual(limiter.limits['upload/*'].rate, 1)
+
+
+class TestRateLimiterThreads(unittest.TestCase):
+    """Tests for the RateLimiter class shared between threads."""
+
+    def test_threads_share_the_rate(self):
+        """Test that concurrent threads together stay under the rate."""
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+
+        threads = [threading.Thread(target=lambda: [limiter.acquire('me/spheres') for _ in range(5)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 20 requests at 50 per second, the first one without waiting
+        self.assertGreaterEqual(time.monotonic() - start, 19 / 50 - 0.01)
+
+
+class TestParseRateLimitHeaders(unittest.TestCase):
+    """Tests for the parse_rate_limit_headers function."""
+
+    def test_headers(self):
+        """Test the X- and IETF headers, and resets given as timestamps."""
+        self.assertEqual(parse_rate_limit_headers({'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '30'}), (5.0, 30.0))
+        self.assertEqual(parse_rate_limit_headers({'RateLimit-Remaining': '5'}), (5.0, None))
+        self.assertEqual(parse_rate_limit_headers({}), (None, None))
+        self.assertEqual(parse_rate_limit_headers({'X-RateLimit-Remaining': 'many'}), (None, None))
+
+        remaining, reset = parse_rate_limit_headers({'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': str(int(time.time()) + 60)})
+        self.assertGreater(reset, 55)
+        self.assertLessEqual(reset, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Unit tests for the retry policy.
+"""
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+from whaller_client.retry import CONNECT_ERROR, READ_ERROR, RetryPolicy, RetryStats, parse_retry_after
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests for the RetryPolicy class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.policy = RetryPolicy()
+
+    def test_init(self):
+        """Test the default configuration."""
+        self.assertEqual(self.policy.max_attempts, 3)
+        self.assertEqual(self.policy.retry_statuses, frozenset({429, 502, 503, 504}))
+        self.assertEqual(self.policy.post_retry_statuses, frozenset({429}))
+
+    def test_get_is_retried_on_transient_failures(self):
+        """Test that GET requests are retried on transient statuses and on any network error."""
+        for status in (429, 502, 503, 504):
+            self.assertTrue(self.policy.is_retryable('GET', status=status))
+        self.assertTrue(self.policy.is_retryable('GET', error=CONNECT_ERROR))
+        self.assertTrue(self.policy.is_retryable('GET', error=READ_ERROR))
+        self.assertFalse(self.policy.is_retryable('GET', status=200))
+        self.assertFalse(self.policy.is_retryable('GET', status=404))
+        self.assertFalse(self.policy.is_retryable('GET', status=500))
+        self.assertFalse(self.policy.is_retryable('GET'))
+
+    def test_post_is_only_retried_when_not_processed(self):
+        """Test that POST requests are only retried when the API surely did not process them."""
+        self.assertTrue(self.policy.is_retryable('POST', status=429))
+        self.assertTrue(self.policy.is_retryable('POST', error=CONNECT_ERROR))
+        self.assertFalse(self.policy.is_retryable('POST', error=READ_ERROR))
+        self.assertFalse(self.policy.is_retryable('POST', status=502))
+        self.assertFalse(self.policy.is_retryable('POST', status=503))
+
+    @patch('whaller_client.retry.random.uniform', side_effect=lambda low, high: high)
+    def test_backoff_with_full_jitter(self, mock_uniform):
+        """Test that the delay is drawn between 0 and an exponentially growing, capped, bound."""
+        policy = RetryPolicy(max_attempts=10, backoff_factor=0.5, backoff_max=3.0)
+
+        delays = [policy.get_retry_delay('GET', attempt, 503) for attempt in range(1, 6)]
+
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 3.0, 3.0])
+        mock_uniform.assert_called_with(0, 3.0)
+
+    def test_no_retry_after_max_attempts(self):
+        """Test that no delay is returned once every attempt was made."""
+        self.assertIsNotNone(self.policy.get_retry_delay('GET', 2, 503))
+        self.assertIsNone(self.policy.get_retry_delay('GET', 3, 503))
+        self.assertIsNone(self.policy.get_retry_delay('GET', 1, 404))
+
+    def test_retry_after_header(self):
+        """Test that the Retry-After header overrides the backoff, within the limit."""
+        policy = RetryPolicy(max_retry_after=10.0)
+
+        self.assertEqual(policy.get_retry_delay('GET', 1, 429, headers={'Retry-After': '4'}), 4.0)
+        self.assertEqual(policy.get_retry_delay('GET', 1, 429, headers={'Retry-After': '3600'}), 10.0)
+        self.assertLessEqual(policy.get_retry_delay('GET', 1, 429, headers={}), 0.5)
+
+    def test_stats(self):
+        """Test that retries and exhausted requests are counted."""
+        self.policy.get_retry_delay('GET', 1, 503)
+        self.policy.get_retry_delay('GET', 2, 503)
+        self.policy.get_retry_delay('POST', 1, error=CONNECT_ERROR)
+        self.policy.get_retry_delay('GET', 3, 503)
+        self.policy.get_retry_delay('GET', 1, 404)
+
+        self.assertEqual(self.policy.stats.snapshot(), {
+            'retries': 3, 'exhausted': 1, 'reasons': {'503': 2, CONNECT_ERROR: 1}
+        })
+
+
+class TestRetryStats(unittest.TestCase):
+    """Tests for the RetryStats class."""
+
+    def test_snapshot_is_a_copy(self):
+        """Test that a snapshot is not affected by later retries."""
+        stats = RetryStats()
+        stats.record_retry('503')
+        snapshot = stats.snapshot()
+        stats.record_retry('503')
+
+        self.assertEqual(snapshot, {'retries': 1, 'exhausted': 0, 'reasons': {'503': 1}})
+
+    def test_reset(self):
+        """Test that reset clears every counter."""
+        stats = RetryStats()
+        stats.record_retry('503')
+        stats.record_exhausted()
+        stats.reset()
+
+        self.assertEqual(stats.snapshot(), {'retries': 0, 'exhausted': 0, 'reasons': {}})
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    """Tests for the parse_retry_after function."""
+
+    def test_seconds(self):
+        """Test a delay given in seconds."""
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after('-5'), 0.0)
+
+    def test_http_date(self):
+        """Test a delay given as an HTTP date."""
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+        self.assertGreater(delay, 25)
+        self.assertLessEqual(delay, 30)
+
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertGreater(parse_retry_after('Wed, 21 Oct 2099 07:28:00 -0000'), 0)
+
+    def test_invalid(self):
+        """Test that missing or invalid values are ignored."""
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(''))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
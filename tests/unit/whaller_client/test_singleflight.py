@@ -0,0 +1,194 @@
+"""
+Unit tests for the single-flight helpers.
+"""
+import asyncio
+import threading
+import time
+import unittest
+from whaller_client.exceptions import DeadlineExceededError
+from whaller_client.singleflight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for the SingleFlight class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.singleflight = SingleFlight()
+        self.calls = []
+
+    def slow_call(self, result, error=None):
+        """Build a call that lasts long enough for the other threads to join it."""
+        def call():
+            self.calls.append(result)
+            time.sleep(0.05)
+            if error is not None:
+                raise error
+            return result
+        return call
+
+    def run_threads(self, key_and_calls):
+        """Run do() in one thread per (key, call) and return the results or exceptions."""
+        results = [None] * len(key_and_calls)
+        barrier = threading.Barrier(len(key_and_calls))
+
+        def worker(index, key, call):
+            barrier.wait()
+            try:
+                results[index] = self.singleflight.do(key, call)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=worker, args=(index, key, call))
+                   for index, (key, call) in enumerate(key_and_calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_are_coalesced(self):
+        """Test that concurrent calls of a key share one call and its result."""
+        result = {"id": 1, "spheres": [1, 2]}
+        results = self.run_threads([('me', self.slow_call(result))] * 10)
+
+        self.assertEqual(self.calls, [result])
+        self.assertEqual(results, [result] * 10)
+        self.assertEqual(self.singleflight.snapshot(), {'calls': 1, 'hits': 9, 'coalesced': 1})
+
+    def test_waiting_threads_get_a_copy(self):
+        """Test that the waiting threads may modify their result without affecting the others."""
+        result = {"id": 1, "spheres": [1, 2]}
+        results = self.run_threads([('me', self.slow_call(result))] * 5)
+
+        self.assertEqual(sum(r is result for r in results), 1)
+        copies = [r for r in results if r is not result]
+        self.assertEqual(len({id(r['spheres']) for r in copies}), 4)
+        copies[0]['spheres'].append(3)
+        self.assertEqual(result['spheres'], [1, 2])
+
+    def test_deadline_exceeded_is_not_shared(self):
+        """Test that the waiting threads make the call again when it ran out of the caller's time."""
+        error = DeadlineExceededError("Deadline exceeded")
+        first = threading.Event()
+
+        def call():
+            self.calls.append(1)
+            time.sleep(0.05)
+            if not first.is_set():
+                first.set()
+                raise error
+            return {"id": 1}
+
+        results = self.run_threads([('me', call)] * 5)
+
+        self.assertEqual(results.count(error), 1)
+        self.assertEqual([r for r in results if r is not error], [{"id": 1}] * 4)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_keys_are_independent(self):
+        """Test that calls of different keys are not coalesced."""
+        results = self.run_threads([('me', self.slow_call(1)), ('me/spheres', self.slow_call(2))])
+
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(self.singleflight.snapshot(), {'calls': 2, 'hits': 0, 'coalesced': 0})
+
+    def test_exception_is_shared(self):
+        """Test that the exception of the call is raised to every waiting thread."""
+        error = RuntimeError("API down")
+        results = self.run_threads([('me', self.slow_call(None, error))] * 5)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [error] * 5)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Test that a call made after the previous one completed is made again."""
+        self.assertEqual(self.singleflight.do('me', lambda: 1), 1)
+        self.assertEqual(self.singleflight.do('me', lambda: 2), 2)
+        self.assertEqual(self.singleflight.snapshot()['calls'], 2)
+
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """Tests for the AsyncSingleFlight class."""
+
+    def setUp(self):
+        """Initial setup for each test."""
+        self.singleflight = AsyncSingleFlight()
+        self.calls = 0
+
+    async def slow_call(self, result=None, error=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if error is not None:
+            raise error
+        return result
+
+    async def test_concurrent_calls_are_coalesced(self):
+        """Test that concurrent calls of a key share one call and its result."""
+        result = {"id": 1, "spheres": [1, 2]}
+        results = await asyncio.gather(*(self.singleflight.do('me', lambda: self.slow_call(result)) for _ in range(10)))
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [result] * 10)
+        self.assertIs(results[0], result)
+        self.assertTrue(all(r is not result and r['spheres'] is not result['spheres'] for r in results[1:]))
+        self.assertEqual(self.singleflight.snapshot(), {'calls': 1, 'hits': 9, 'coalesced': 1})
+
+        await self.singleflight.do('me', lambda: self.slow_call(2))
+        self.assertEqual(self.calls, 2)
+
+    async def test_exception_is_shared(self):
+        """Test that the exception of the call is raised to every waiting coroutine."""
+        error = RuntimeError("API down")
+        results = await asyncio.gather(
+            *(self.singleflight.do('me', lambda: self.slow_call(error=error)) for _ in range(5)),
+            return_exceptions=True
+        )
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [error] * 5)
+
+    async def test_deadline_exceeded_is_not_shared(self):
+        """Test that the waiting coroutines make the call again when it ran out of the caller's time."""
+        error = DeadlineExceededError("Deadline exceeded")
+        results = await asyncio.gather(
+            self.singleflight.do('me', lambda: self.slow_call(error=error)),
+            *(self.singleflight.do('me', lambda: self.slow_call({"id": 1})) for _ in range(3)),
+            return_exceptions=True
+        )
+
+        self.assertEqual(results, [error] + [{"id": 1}] * 3)
+        self.assertEqual(self.calls, 2)
+
+    async def test_lone_exception(self):
+        """Test that the exception of a call nobody else awaits is raised."""
+        with self.assertRaises(RuntimeError):
+            await self.singleflight.do('me', lambda: self.slow_call(error=RuntimeError("API down")))
+
+    async def test_cancelled_leader(self):
+        """Test that the coroutines waiting for a cancelled call make it again."""
+        leader = asyncio.ensure_future(self.singleflight.do('me', lambda: self.slow_call(1)))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(self.singleflight.do('me', lambda: self.slow_call(2)))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(await follower, 2)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 2)
+
+    async def test_cancelled_follower(self):
+        """Test that cancelling a waiting coroutine does not cancel the call."""
+        leader = asyncio.ensure_future(self.singleflight.do('me', lambda: self.slow_call(1)))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(self.singleflight.do('me', lambda: self.slow_call(2)))
+        await asyncio.sleep(0)
+        follower.cancel()
+
+        self.assertEqual(await leader, 1)
+        with self.assertRaises(asyncio.CancelledError):
+            await follower
+
+
+if __name__ == '__main__':
+    unittest.main()
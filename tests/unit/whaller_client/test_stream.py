@@ -0,0 +1,112 @@
+"""
+Unit tests for the incremental parser of result arrays.
+"""
+import json
+import random
+import unittest
+from whaller_client.codec import JsonCodec
+from whaller_client.exceptions import ApiError, InvalidResponseError
+from whaller_client.stream import ResultParser, iter_result
+
+
+ITEMS = [
+    {"id": 1, "name": "Sphère \"projet\" [interne]", "tags": ["a", "{b}"], "admin": True, "parent": None},
+    {"id": 2, "name": "back\\slash", "nested": {"list": [[1, 2], {"x": "]"}]}, "score": -1.5e3},
+    "text, with \\u00e9scapes",
+    42,
+    False,
+    None,
+    [],
+    {},
+]
+CONTENT = json.dumps({"status": "ok", "result": ITEMS, "count": len(ITEMS)}, indent=1).encode('utf-8')
+
+
+def split(content, sizes):
+    """Split the content into chunks of the given sizes, the last one taking the rest."""
+    chunks = []
+    for size in sizes:
+        chunks.append(content[:size])
+        content = content[size:]
+    return chunks + [content]
+
+
+class TestResultParser(unittest.TestCase):
+    """Tests for the ResultParser class and iter_result."""
+
+    def test_whole_content(self):
+        """Test that the items are yielded from a response received at once."""
+        self.assertEqual(list(iter_result([CONTENT], "url")), ITEMS)
+
+    def test_byte_by_byte(self):
+        """Test that items are yielded as soon as they are complete."""
+        parser = ResultParser("url")
+        items = []
+        for i in range(len(CONTENT)):
+            items.extend(parser.feed(CONTENT[i:i + 1]))
+        parser.close()
+        self.assertEqual(items, ITEMS)
+
+    def test_random_chunks(self):
+        """Test that any split of the response yields the same items."""
+        rng = random.Random(42)
+        for _ in range(50):
+            sizes = [rng.randint(0, 40) for _ in range(rng.randint(1, 30))]
+            with self.subTest(sizes=sizes):
+                self.assertEqual(list(iter_result(split(CONTENT, sizes), "url")), ITEMS)
+
+    def test_buffer_is_released(self):
+        """Test that the bytes of the items already yielded are not kept."""
+        parser = ResultParser("url")
+        parser.feed(b'{"result": [' + b','.join([b'{"id": 1}'] * 1000))
+        self.assertLess(len(parser.buffer), 16)
+
+    def test_codec(self):
+        """Test that items are decoded with the given codec."""
+        calls = []
+
+        class Codec(JsonCodec):
+            def loads(self, content):
+                calls.append(content)
+                return super().loads(content)
+
+        self.assertEqual(list(iter_result([b'{"result": [{"id": 1}, 2]}'], "url", Codec())), [{"id": 1}, 2])
+        self.assertEqual(calls[-2:], [b'{"id": 1}', b'2'])
+
+    def test_empty_result(self):
+        """Test an empty result array and a response without result."""
+        self.assertEqual(list(iter_result([b'{"result": []}'], "url")), [])
+        self.assertEqual(list(iter_result([b' { } '], "url")), [])
+
+    def test_api_error(self):
+        """Test that an error member raises ApiError."""
+        with self.assertRaises(ApiError) as context:
+            list(iter_result([b'{"error": {"message": "Denied"}}'], "url"))
+        self.assertEqual(context.exception.message, "API Error: Denied")
+
+        with self.assertRaises(ApiError):
+            list(iter_result([b'{"error": "Denied"}'], "url"))
+
+    def test_result_not_array(self):
+        """Test that a result which is not an array raises InvalidResponseError."""
+        with self.assertRaises(InvalidResponseError):
+            list(iter_result([b'{"result": {"id": 1}}'], "url"))
+
+    def test_truncated(self):
+        """Test that a truncated response raises InvalidResponseError after the complete items."""
+        items = []
+        with self.assertRaises(InvalidResponseError):
+            for item in iter_result([b'{"result": [{"id": 1}, {"id": 2'], "url"):
+                items.append(item)
+        self.assertEqual(items, [{"id": 1}])
+
+    def test_malformed(self):
+        """Test that malformed responses raise InvalidResponseError."""
+        for content in [b'[1, 2]', b'{result: []}', b'{"result": [1 2]}', b'{"result": [tru]}', b'{"a": 1 "b": 2}']:
+            with self.subTest(content=content):
+                with self.assertRaises(InvalidResponseError):
+                    list(iter_result([content], "url"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+"""
+Unit tests for the synchronization of a local directory into a Box.
+"""
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+from whaller_client.sync import BoxSync, SyncManifest, SyncReport
+
+
+class TestSyncManifest(unittest.TestCase):
+    """Tests for the SyncManifest class."""
+
+    def setUp(self):
+        """Create a temporary directory for the manifest."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'state', 'manifest.json')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_save_and_load(self):
+        """Test that the manifest is persisted."""
+        manifest = SyncManifest(self.path)
+        manifest.bind('sphere/1')
+        manifest.set_folders({'docs': 2})
+        manifest.set_file('docs/a.txt', 3, 10, 'abc', 42)
+        manifest.save()
+
+        loaded = SyncManifest(self.path)
+        self.assertEqual(loaded.destination, 'sphere/1')
+        self.assertEqual(loaded.folders, {'docs': 2})
+        self.assertEqual(loaded.files, {'docs/a.txt': {'size': 3, 'mtime': 10, 'hash': 'abc', 'resource_id': 42}})
+
+    def test_bind_other_destination(self):
+        """Test that binding to another destination forgets the previous state."""
+        manifest = SyncManifest(self.path)
+        manifest.bind('sphere/1')
+        manifest.set_file('a.txt', 3, 10, 'abc', 42)
+
+        manifest.bind('sphere/1')
+        self.assertIn('a.txt', manifest.files)
+        manifest.bind('sphere/2')
+        self.assertEqual(manifest.files, {})
+
+    def test_corrupted(self):
+        """Test that a corrupted manifest is ignored."""
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        self.assertEqual(SyncManifest(self.path).files, {})
+
+
+class TestBoxSync(unittest.TestCase):
+    """Tests for the BoxSync class."""
+
+    def setUp(self):
+        """Create a local directory and a mocked Box."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, 'share')
+        self.manifest_path = os.path.join(self.tmpdir.name, 'manifest.json')
+        self.write('a.txt', b'alpha')
+        self.write('docs/b.pdf', b'bravo')
+        self.write('docs/img/c.png', b'charlie')
+        os.makedirs(os.path.join(self.root, 'empty'))
+
+        self.box = MagicMock()
+        self.box.sphere_external_id = 'sphere'
+        self.box.create_tree.side_effect = self.create_tree
+        self.resource_ids = iter(range(100, 200))
+        self.lock = threading.Lock()
+        self.box.create_file.side_effect = self.create_file
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def write(self, path, content, mtime=None):
+        """Write a file of the local directory."""
+        path = os.path.join(self.root, *path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def create_tree(self, tree, parent_id, max_workers, existing):
+        """Number the folders of the tree."""
+        ids = dict(existing)
+        def walk(node, prefix):
+            for name, subtree in node.items():
+                path = f'{prefix}/{name}' if prefix else name
+                ids.setdefault(path, len(ids) + 1)
+                walk(subtree, path)
+        walk(tree, '')
+        return ids
+
+    def create_file(self, name, content, mimes, parent_id):
+        """Return a new resource."""
+        with self.lock:
+            return {'id': next(self.resource_ids)}
+
+    def make_sync(self, **kwargs):
+        """Build the synchronization of the local directory."""
+        return BoxSync(self.box, self.root, self.manifest_path, parent_id=7, **kwargs)
+
+    def test_first_run(self):
+        """Test that every folder and file is created on the first run."""
+        report = self.make_sync().run()
+
+        self.assertEqual(sorted(report.uploaded), ['a.txt', 'docs/b.pdf', 'docs/img/c.png'])
+        self.assertEqual(report.updated, [])
+        self.assertEqual(report.replaced, {})
+        self.assertEqual(report.unchanged, 0)
+        self.assertEqual(report.folders, 3)
+        self.assertEqual(report.size, 17)
+        self.assertEqual(report.errors, {})
+
+        tree = self.box.create_tree.call_args[0][0]
+        self.assertEqual(tree, {'docs': {'img': {}}, 'empty': {}})
+        folders = SyncManifest(self.manifest_path).folders
+        calls = {call[0][0]: call[0] for call in self.box.create_file.call_args_list}
+        self.assertEqual(calls['c.png'], ('c.png', os.path.join(self.root, 'docs', 'img', 'c.png'), 'image/png',
+                                          folders['docs/img']))
+        self.assertEqual(calls['a.txt'][3], 7)
+        self.assertEqual(calls['b.pdf'][2], 'application/pdf')
+
+        with open(self.manifest_path) as f:
+            data = json.load(f)
+        self.assertEqual(data['destination'], 'sphere/7')
+        self.assertEqual(set(data['files']), {'a.txt', 'docs/b.pdf', 'docs/img/c.png'})
+
+    def test_incremental_run(self):
+        """Test that only new and changed files are uploaded on the next runs."""
+        self.make_sync().run()
+        self.box.create_file.reset_mock()
+        self.box.create_tree.reset_mock()
+
+        report = self.make_sync().run()
+        self.assertEqual((report.uploaded, report.updated, report.unchanged, report.folders), ([], [], 3, 0))
+        self.box.create_file.assert_not_called()
+        self.box.create_tree.assert_not_called()
+
+        self.write('a.txt', b'alpha 2')
+        self.write('docs/img/c.png', b'charlie', mtime=1)  # Touched only
+        self.write('new/d.txt', b'delta')
+        resource_id = SyncManifest(self.manifest_path).files['a.txt']['resource_id']
+        report = self.make_sync().run()
+
+        self.assertEqual(report.uploaded, ['new/d.txt'])
+        self.assertEqual(report.updated, ['a.txt'])
+        self.assertEqual(report.replaced, {'a.txt': resource_id})
+        self.assertNotEqual(SyncManifest(self.manifest_path).files['a.txt']['resource_id'], resource_id)
+        self.assertEqual(report.unchanged, 2)
+        self.assertEqual(report.folders, 1)
+        self.assertEqual(self.box.create_file.call_count, 2)
+        self.assertEqual(SyncManifest(self.manifest_path).files['docs/img/c.png']['mtime'], 1)
+
+    def test_dry_run(self):
+        """Test that a dry run reports the changes without sending nor recording anything."""
+        report = self.make_sync().run(dry_run=True)
+
+        self.assertTrue(report.dry_run)
+        self.assertEqual(sorted(report.uploaded), ['a.txt', 'docs/b.pdf', 'docs/img/c.png'])
+        self.assertEqual(report.folders, 3)
+        self.box.create_tree.assert_not_called()
+        self.box.create_file.assert_not_called()
+        self.assertFalse(os.path.exists(self.manifest_path))
+
+        self.make_sync().run()
+        self.write('a.txt', b'alpha 2')
+        report = self.make_sync().run(dry_run=True)
+        self.assertEqual(report.updated, ['a.txt'])
+        self.assertEqual(report.unchanged, 2)
+
+        other = BoxSync(self.box, self.root, self.manifest_path, parent_id=8).run(dry_run=True)
+        self.assertEqual(len(other.uploaded), 3)
+
+    def test_errors(self):
+        """Test that a failed upload is reported and the others still go through."""
+        def create_file(name, content, mimes, parent_id):
+            if name == 'b.pdf':
+                raise RuntimeError("API down")
+            return {'id': 1}
+        self.box.create_file.side_effect = create_file
+
+        report = self.make_sync().run()
+
+        self.assertEqual(list(report.errors), ['docs/b.pdf'])
+        self.assertEqual(sorted(report.uploaded), ['a.txt', 'docs/img/c.png'])
+        self.assertNotIn('docs/b.pdf', SyncManifest(self.manifest_path).files)
+
+    def test_folders_error(self):
+        """Test that the folders created before an error are recorded, and not created again."""
+        error = RuntimeError("API down")
+        error.folders = {'docs': 1}
+        self.box.create_tree.side_effect = error
+
+        with self.assertRaises(RuntimeError):
+            self.make_sync().run()
+        self.assertEqual(SyncManifest(self.manifest_path).folders, {'docs': 1})
+        self.box.create_file.assert_not_called()
+
+        self.box.create_tree.side_effect = self.create_tree
+        self.make_sync().run()
+        self.assertEqual(self.box.create_tree.call_args[1]['existing'], {'docs': 1})
+
+    def test_save_interval(self):
+        """Test that the manifest is saved during the run, and not only at its end."""
+        manifest = SyncManifest(self.manifest_path)
+        manifest.save = MagicMock(wraps=manifest.save)
+
+        BoxSync(self.box, self.root, manifest, save_interval=0).run()
+
+        # Once the folders are created, after each file and at the end
+        self.assertEqual(manifest.save.call_count, 5)
+
+    def test_exclude(self):
+        """Test that excluded names and the manifest itself are not synchronized."""
+        self.write('.git/config', b'x')
+        self.write('docs/~lock.tmp', b'x')
+        sync = BoxSync(self.box, self.root, os.path.join(self.root, 'manifest.json'), exclude=['.*', '*.tmp'])
+        sync.run()
+
+        report = sync.run()
+
+        self.assertEqual(report.unchanged, 3)
+        self.assertNotIn('.git', self.box.create_tree.call_args[0][0])
+
+    def test_report(self):
+        """Test the throughput of the report."""
+        report = SyncReport()
+        self.assertEqual(report.mbps, 0.0)
+        report.size = 2 * 1024 * 1024
+        report.seconds = 2
+        self.assertEqual(report.mbps, 1.0)
+        self.assertIn('mbps=1.00', repr(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+Unit tests for the token stores.
+"""
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from whaller_client.token_store import FileTokenStore, MemoryTokenStore, SqliteTokenStore, TokenStore
+
+
+RECORD = {'token': 'token', 'issued_at': 1000.0, 'expires_at': 4600.0}
+
+
+def hold_lock(store, started, duration):
+    with store.lock('key'):
+        started.set()
+        time.sleep(duration)
+
+
+class TokenStoreTests:
+    """Tests shared by every token store."""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def test_save_and_load(self):
+        """Test that a saved record is loaded back."""
+        store = self.make_store()
+
+        self.assertIsNone(store.load('key'))
+        store.save('key', RECORD)
+
+        self.assertEqual(store.load('key'), RECORD)
+        self.assertIsNone(store.load('other'))
+
+    def test_save_replaces(self):
+        """Test that saving a key again replaces its record."""
+        store = self.make_store()
+        store.save('key', RECORD)
+        store.save('key', {'token': 'new_token', 'issued_at': 2000.0, 'expires_at': None})
+
+        self.assertEqual(store.load('key'), {'token': 'new_token', 'issued_at': 2000.0, 'expires_at': None})
+
+    def test_delete(self):
+        """Test that a deleted record is gone, and that deleting twice is harmless."""
+        store = self.make_store()
+        store.save('key', RECORD)
+
+        store.delete('key')
+        store.delete('key')
+
+        self.assertIsNone(store.load('key'))
+
+    def test_lock_is_reentrant(self):
+        """Test that the lock can be taken again by its holder, e.g. to save a token."""
+        store = self.make_store()
+
+        with store.lock('key'):
+            with store.lock('key'):
+                store.save('key', RECORD)
+
+        self.assertEqual(store.load('key'), RECORD)
+
+    def test_lock_excludes_other_threads(self):
+        """Test that the lock is exclusive between threads."""
+        store = self.make_store()
+        started = threading.Event()
+        thread = threading.Thread(target=hold_lock, args=(store, started, 0.2))
+        thread.start()
+        started.wait(2)
+
+        start = time.monotonic()
+        with store.lock('key'):
+            waited = time.monotonic() - start
+        thread.join()
+
+        self.assertGreater(waited, 0.1)
+
+
+class TestMemoryTokenStore(TokenStoreTests, unittest.TestCase):
+    """Tests for the MemoryTokenStore class."""
+
+    def make_store(self):
+        return MemoryTokenStore()
+
+    def test_records_are_copies(self):
+        """Test that mutating a loaded record does not alter the store."""
+        store = self.make_store()
+        store.save('key', RECORD)
+
+        store.load('key')['token'] = 'changed'
+
+        self.assertEqual(store.load('key'), RECORD)
+
+
+class TestFileTokenStore(TokenStoreTests, unittest.TestCase):
+    """Tests for the FileTokenStore class."""
+
+    def setUp(self):
+        """Create a temporary directory for the store."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'tokens', 'tokens.json')
+
+    def make_store(self):
+        return FileTokenStore(self.path)
+
+    def test_shared_between_instances(self):
+        """Test that a token saved by one instance is seen by another."""
+        self.make_store().save('key', RECORD)
+
+        self.assertEqual(self.make_store().load('key'), RECORD)
+
+    def test_file_is_private(self):
+        """Test that the token file is only accessible to its owner."""
+        self.make_store().save('key', RECORD)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+    def test_corrupted_file_is_ignored(self):
+        """Test that a corrupted file reads as an empty store."""
+        store = self.make_store()
+        store.save('key', RECORD)
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+
+        self.assertIsNone(store.load('key'))
+        store.save('key', RECORD)
+        self.assertEqual(store.load('key'), RECORD)
+
+    def test_lock_excludes_other_processes(self):
+        """Test that the advisory lock is exclusive between processes."""
+        context = multiprocessing.get_context('fork')
+        started = context.Event()
+        process = context.Process(target=hold_lock, args=(self.make_store(), started, 0.3))
+        process.start()
+        self.assertTrue(started.wait(5))
+
+        start = time.monotonic()
+        with self.make_store().lock('key'):
+            waited = time.monotonic() - start
+        process.join()
+
+        self.assertGreater(waited, 0.1)
+
+
+class TestSqliteTokenStore(TokenStoreTests, unittest.TestCase):
+    """Tests for the SqliteTokenStore class."""
+
+    def setUp(self):
+        """Create a temporary directory for the store."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'tokens.db')
+
+    def make_store(self):
+        store = SqliteTokenStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def test_shared_between_instances(self):
+        """Test that a token saved by one instance is seen by another."""
+        self.make_store().save('key', RECORD)
+
+        self.assertEqual(self.make_store().load('key'), RECORD)
+
+    def test_lock_rolls_back_on_error(self):
+        """Test that a failure while holding the lock discards the writes made under it."""
+        store = self.make_store()
+
+        with self.assertRaises(RuntimeError):
+            with store.lock('key'):
+                store.save('key', RECORD)
+                raise RuntimeError('login failed')
+
+        self.assertIsNone(store.load('key'))
+        with store.lock('key'):
+            pass
+
+    def test_close(self):
+        """Test that closing the store is idempotent and a new connection is opened on demand."""
+        store = self.make_store()
+        store.close()
+        store.close()
+
+        store.save('key', RECORD)
+        self.assertEqual(store.load('key'), RECORD)
+
+
+class TestTokenStore(unittest.TestCase):
+    """Tests for the TokenStore base class."""
+
+    def test_interface(self):
+        """Test that the base class methods must be implemented."""
+        with self.assertRaises(TypeError):
+            TokenStore()
+
+        class PartialStore(TokenStore):
+            def load(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            PartialStore()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,3 @@
+from .client import AsyncClient, gather
+from .auth import AsyncAuthenticator
+from .api import AsyncApiClient
@@ -0,0 +1,419 @@
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+import asyncio
+from copy import deepcopy
+from time import perf_counter
+from typing import AsyncIterator, Callable, Iterable
+from whaller_client.api import parse_result
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.codec import JsonCodec, default_codec
+from whaller_client.deadline import check_deadline, check_retry_delay, clip_timeout, is_expired
+from whaller_client.exceptions import MethodError, DeadlineExceededError, HttpError
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.middleware import Request, Response, build_chain
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import CONNECT_ERROR, READ_ERROR, RetryPolicy
+from whaller_client.stream import ResultParser
+
+class AsyncApiClient:
+    def __init__(self, base_url: str, limit: int = 100, limit_per_host: int = 0,
+                 keepalive_timeout: float = 15.0, retry_policy: RetryPolicy | None = None,
+                 rate_limiter: RateLimiter | None = None, cache: ResponseCache | None = None,
+                 codec: JsonCodec | None = None, metrics: MetricsRegistry | None = None,
+                 middleware: Iterable[Callable] = (), connect_timeout: float | None = 10.0,
+                 read_timeout: float | None = 60.0, circuit_breaker: CircuitBreaker | None = None):
+        """
+        Asynchronous client to interact with the Whaller API.
+
+        All requests share a single aiohttp session (and its connection pool),
+        created lazily on the running event loop. Within a `whaller_client.deadline.deadline`
+        block, each attempt is given the time left as its total timeout and no attempt
+        is made past the deadline.
+
+        :param base_url: Base URL of the Whaller instance
+        :param limit: Maximum number of simultaneous connections (0 for no limit)
+        :param limit_per_host: Maximum number of simultaneous connections per host (0 for no limit)
+        :param keepalive_timeout: Idle time (in seconds) after which pooled connections are dropped
+        :param retry_policy: Retry policy of the requests, RetryPolicy(max_attempts=1) to disable retries
+        :param rate_limiter: Client-side rate limiter (optional), may be shared between clients
+        :param cache: Cache of the GET responses (optional), may be shared between clients
+        :param codec: JSON codec of the bodies, defaults to the fastest one installed
+        :param metrics: Registry recording the latency, status and size of the requests, and the time
+                        spent resolving hosts and opening connections (optional)
+        :param middleware: Coroutine functions `middleware(request, call_next)` wrapping each attempt of
+                           the requests, the first one being the outermost (see whaller_client.middleware)
+        :param connect_timeout: Time (in seconds) allowed to open a connection, None to wait forever
+        :param read_timeout: Time (in seconds) allowed between two reads of the response, None to wait forever
+        :param circuit_breaker: Circuit breaker failing the requests to unhealthy endpoints at once (optional),
+                                may be shared between clients
+        :raises ImportError: If aiohttp is not installed
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncApiClient requires aiohttp: pip install whaller-client[async]")
+
+        self.api_base_url = base_url.rstrip('/') + '/api/'
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.codec = codec if codec is not None else default_codec
+        self.metrics = metrics
+        self.middleware = list(middleware)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.circuit_breaker = circuit_breaker
+        self._chain = build_chain(self.middleware, self._transport)
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        """
+        Returns the pooled HTTP session bound to the running event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            if self.metrics is None:
+                self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            else:
+                self._session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                      trace_configs=[self._make_trace_config()])
+        return self._session
+
+    def _get_timeout(self, endpoint: str) -> "aiohttp.ClientTimeout | None":
+        # Timeouts of an attempt within a deadline, None to use the ones of the session
+        remaining = check_deadline(f"calling {endpoint}")
+        if remaining is None:
+            return None
+        return aiohttp.ClientTimeout(total=remaining, sock_connect=clip_timeout(self.connect_timeout, remaining),
+                                     sock_read=clip_timeout(self.read_timeout, remaining))
+
+    def _make_trace_config(self) -> "aiohttp.TraceConfig":
+        # Times the DNS resolutions and the opening of new connections (TLS handshake included)
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_dns_start(session, context, params):
+            context.dns_started = perf_counter()
+
+        async def on_dns_end(session, context, params):
+            self.metrics.observe('http_dns_seconds', perf_counter() - context.dns_started, host=params.host)
+
+        async def on_connection_start(session, context, params):
+            context.connection_started = perf_counter()
+
+        async def on_connection_end(session, context, params):
+            self.metrics.observe('http_connect_seconds', perf_counter() - context.connection_started)
+
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connection_start)
+        trace_config.on_connection_create_end.append(on_connection_end)
+        return trace_config
+
+    async def close(self) -> None:
+        """
+        Closes the HTTP session and every pooled connection.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def add_middleware(self, middleware: Callable) -> None:
+        """
+        Adds a middleware inside the ones already installed, i.e. the closest to the transport.
+        """
+        self.middleware.append(middleware)
+        self._chain = build_chain(self.middleware, self._transport)
+
+    async def call_json(self, endpoint: str, method: str, data: dict = {}, headers: dict = {},
+                        identity: str | None = None) -> dict:
+        """
+        Sends a request to the API and returns the response in JSON format.
+
+        :param endpoint: Relative URL of the endpoint
+        :param method: HTTP method ('GET' or 'POST')
+        :param data: Data sent in the request
+        :param headers: HTTP headers
+        :param identity: Stable identity of the sender (API, application and login), keying its cached responses
+                         instead of its Authorization header, which changes each time the token is renewed
+        :return: API response as a dictionary
+        :raises MethodError: If the HTTP method is invalid
+        :raises HttpError: If the request fails
+        :raises InvalidResponseError: If the JSON response is malformed
+        :raises ApiError: If the API returns an error code
+        """
+        req_headers = {'Content-Type': 'application/json'}
+        req_headers.update(headers)
+        api_url = f'{self.api_base_url}{endpoint}'
+
+        if method == 'POST':
+            kwargs = {'data': self.codec.dumps(data)}
+            if self.metrics is not None:
+                self.metrics.record_bytes('http_request_bytes_total', endpoint, len(kwargs['data']))
+        elif method == 'GET':
+            if self.cache is not None:
+                return await self._call_cached(endpoint, api_url, data, req_headers, identity)
+            kwargs = {'params': data}
+        else:
+            raise MethodError(f"Invalid HTTP method: {method}")
+
+        return await self._request(method, endpoint, api_url, headers=req_headers, **kwargs)
+
+    async def stream_json(self, endpoint: str, data: dict = {}, headers: dict = {}) -> AsyncIterator:
+        """
+        Sends a GET request to the API and yields the items of its 'result' array as they are received,
+        without holding the whole response in memory.
+
+        The request is sent when the iteration starts. Failures before the first byte of the response
+        are retried according to the retry policy; the response cache and the middleware are not used.
+
+        :param endpoint: Relative URL of the endpoint
+        :param data: Query parameters sent in the request
+        :param headers: HTTP headers
+        :raises HttpError: If the request fails
+        :raises InvalidResponseError: If the JSON response is malformed or its result is not an array
+        :raises ApiError: If the API returns an error code
+        """
+        req_headers = {'Content-Type': 'application/json'}
+        req_headers.update(headers)
+        api_url = f'{self.api_base_url}{endpoint}'
+
+        attempt = 1
+        while True:
+            if self.circuit_breaker is not None:
+                # Shed at once, without waiting for nor spending a token of the rate limiter
+                self.circuit_breaker.check(endpoint)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(endpoint)
+            timeout = self._get_timeout(endpoint)
+            # Acquired last, so that a trial call of a half-open circuit is only taken when actually sent
+            circuit = self.circuit_breaker.acquire(endpoint) if self.circuit_breaker is not None else None
+            kwargs = {} if timeout is None else {'timeout': timeout}
+            streaming = False
+            sent_at = perf_counter()
+            status, ttfb = None, None
+            try:
+                async with self.session.request('GET', api_url, params=encode_params(data), headers=req_headers,
+                                                **kwargs) as response:
+                    status, ttfb = response.status, perf_counter() - sent_at
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.update(endpoint, response.status, response.headers)
+                    delay = self.retry_policy.get_retry_delay('GET', attempt, response.status, headers=response.headers)
+                    if delay is None:
+                        response.raise_for_status()
+                        streaming = True
+                        parser = ResultParser(api_url, self.codec)
+                        async for chunk in response.content.iter_any():
+                            if self.metrics is not None:
+                                self.metrics.record_bytes('http_response_bytes_total', endpoint, len(chunk))
+                            for item in parser.feed(chunk):
+                                yield item
+                        parser.close()
+                        return
+                    reason = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if status is None:
+                    status = 'error'  # No response was received
+                if isinstance(e, asyncio.TimeoutError) and is_expired():
+                    raise DeadlineExceededError(f"Deadline exceeded on {api_url}: {str(e)}") from e
+                # Items may already have been yielded: the request is not sent again once streaming started
+                error = _classify_error(e)
+                delay = None if streaming else self.retry_policy.get_retry_delay('GET', attempt, error=error)
+                if delay is None:
+                    raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
+                reason = error or type(e).__name__
+            finally:
+                if circuit is not None:
+                    self._record_outcome(circuit, status, ttfb, sent_at)
+                if self.metrics is not None:
+                    # Once streaming, the attempt lasts until the last item is read
+                    self.metrics.record_request('GET', endpoint, status or 'error', perf_counter() - sent_at, ttfb)
+            check_retry_delay(delay, f"{reason} on {endpoint}")
+            if self.metrics is not None:
+                self.metrics.record_retry('GET', endpoint, reason)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def send_content(self, endpoint: str, params: dict, files: dict, headers: dict = {}) -> dict:
+        """
+        Sends a multipart/form-data POST request (file upload) and returns the response in JSON format.
+
+        :param endpoint: Relative URL of the endpoint
+        :param params: Form fields sent along with the files
+        :param files: Files to send ({'field': (filename, content, mimes)})
+        :param headers: HTTP headers
+        :return: API response as a dictionary
+        :raises HttpError: If the request fails
+        :raises InvalidResponseError: If the JSON response is malformed
+        :raises ApiError: If the API returns an error code
+        """
+        api_url = f'{self.api_base_url}{endpoint}'
+
+        def make_form():
+            # A new form for each attempt, as a form may only be sent once
+            form = aiohttp.FormData()
+            for name, value in params.items():
+                form.add_field(name, str(value))
+            for name, (filename, content, mimes) in files.items():
+                form.add_field(name, content, filename=filename, content_type=mimes)
+            return form
+
+        return await self._request('POST', endpoint, api_url, headers=headers, make_data=make_form)
+
+    async def _call_cached(self, endpoint: str, api_url: str, data: dict, req_headers: dict,
+                           identity: str | None = None) -> dict:
+        # GET through the response cache, revalidating stale responses
+        key = self.cache.make_key(api_url, data, req_headers, identity)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            # A copy, so that the caller may modify it without altering the cache
+            return deepcopy(entry.result)
+
+        if entry is not None:
+            req_headers = {**req_headers, **entry.get_conditional_headers()}
+        status, headers, content = await self._fetch('GET', endpoint, api_url, headers=req_headers, params=data)
+        if entry is not None and status == 304:
+            self.cache.revalidate(key, entry, headers)
+            return deepcopy(entry.result)
+
+        result = self._parse(content, endpoint, api_url)
+        self.cache.store(key, deepcopy(result), headers)
+        return result
+
+    async def _request(self, method: str, endpoint: str, api_url: str, make_data=None, **kwargs) -> dict:
+        _, _, content = await self._fetch(method, endpoint, api_url, make_data, **kwargs)
+        return self._parse(content, endpoint, api_url)
+
+    def _parse(self, content: bytes, endpoint: str, api_url: str) -> dict:
+        if self.metrics is None:
+            return parse_result(content, api_url, self.codec)
+        self.metrics.record_bytes('http_response_bytes_total', endpoint, len(content))
+        with self.metrics.timer('json_decode_seconds', endpoint=self.metrics.get_endpoint_label(endpoint)):
+            return parse_result(content, api_url, self.codec)
+
+    async def _fetch(self, method: str, endpoint: str, api_url: str, make_data=None, **kwargs) -> tuple:
+        # Sends the request, again and again while the retry policy allows it, and returns (status, headers, body)
+        if self._chain is None and kwargs.get('params') is not None:
+            kwargs['params'] = encode_params(kwargs['params'])
+        attempt = 1
+        while True:
+            if make_data is not None:
+                kwargs['data'] = make_data()
+            if self.circuit_breaker is not None:
+                # Shed at once, without waiting for nor spending a token of the rate limiter
+                self.circuit_breaker.check(endpoint)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(endpoint)
+            timeout = self._get_timeout(endpoint)
+            # Acquired last, so that a trial call of a half-open circuit is only taken when actually sent
+            circuit = self.circuit_breaker.acquire(endpoint) if self.circuit_breaker is not None else None
+            if timeout is not None:
+                kwargs['timeout'] = timeout
+            sent_at = perf_counter()
+            status, ttfb = None, None
+            try:
+                if self._chain is None:
+                    async with self.session.request(method, api_url, **kwargs) as response:
+                        status, ttfb = response.status, perf_counter() - sent_at
+                        if self.rate_limiter is not None:
+                            self.rate_limiter.update(endpoint, response.status, response.headers)
+                        delay = self.retry_policy.get_retry_delay(method, attempt, response.status, headers=response.headers)
+                        if delay is None:
+                            # Check if the HTTP status is an error (4xx, 5xx)
+                            response.raise_for_status()
+                            return response.status, response.headers, await response.read()
+                        reason = response.status
+                else:
+                    params = kwargs.get('params')
+                    request = Request(method, endpoint, api_url, dict(kwargs['headers']),
+                                      dict(params) if params is not None else None, kwargs.get('data'), timeout)
+                    response = await self._chain(request)
+                    status, ttfb = response.status, perf_counter() - sent_at
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.update(endpoint, response.status, response.headers)
+                    delay = self.retry_policy.get_retry_delay(method, attempt, response.status, headers=response.headers)
+                    if delay is None:
+                        if response.status >= 400:
+                            raise HttpError(f"HTTP error on {api_url}: {response.status}")
+                        return response.status, response.headers, response.content
+                    reason = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if status is None:
+                    status = 'error'  # No response was received
+                if isinstance(e, asyncio.TimeoutError) and is_expired():
+                    raise DeadlineExceededError(f"Deadline exceeded on {api_url}: {str(e)}") from e
+                error = _classify_error(e)
+                delay = self.retry_policy.get_retry_delay(method, attempt, error=error)
+                if delay is None:
+                    raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
+                reason = error or type(e).__name__
+            finally:
+                if circuit is not None:
+                    self._record_outcome(circuit, status, ttfb, sent_at)
+                if self.metrics is not None:
+                    self.metrics.record_request(method, endpoint, status or 'error', perf_counter() - sent_at, ttfb)
+            check_retry_delay(delay, f"{reason} on {endpoint}")
+            if self.metrics is not None:
+                self.metrics.record_retry(method, endpoint, reason)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _record_outcome(self, circuit, status, ttfb: float | None, sent_at: float) -> None:
+        # A call fails when no response is received or on a 5xx, and lasts until its headers are received;
+        # without outcome, e.g. when a middleware raised, the call is given back to the circuit
+        if status is None:
+            circuit.release()
+            return
+        failed = status == 'error' or status >= 500
+        circuit.record(failed, ttfb if ttfb is not None else perf_counter() - sent_at)
+
+    async def _transport(self, request: Request) -> Response:
+        # Innermost handler of the middleware: sends the request through the pooled session
+        kwargs = {} if request.timeout is None else {'timeout': request.timeout}
+        async with self.session.request(request.method, request.url, params=encode_params(request.params),
+                                        data=request.data, headers=request.headers, **kwargs) as response:
+            return Response(response.status, response.headers, await response.read())
+
+def encode_params(params: dict | None) -> list[tuple[str, str]] | None:
+    """
+    Encodes query parameters the way requests does, as aiohttp only accepts str, int and float values:
+    other values are converted with str(), lists and tuples give a parameter per item, and None is left out.
+
+    :param params: Query parameters
+    :return: (name, value) pairs of the query string
+    """
+    if params is None:
+        return None
+    encoded = []
+    for name, value in params.items():
+        for item in value if isinstance(value, (list, tuple)) else (value,):
+            if item is None:
+                continue
+            if isinstance(item, bytes):
+                item = item.decode('utf-8')
+            encoded.append((name, item if isinstance(item, str) else str(item)))
+    return encoded
+
+def _classify_error(error: "aiohttp.ClientError") -> str | None:
+    # Tells whether the request could not be sent at all, or failed once sent
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return CONNECT_ERROR
+    if isinstance(error, (aiohttp.ServerConnectionError, aiohttp.ClientOSError, aiohttp.ClientPayloadError)):
+        return READ_ERROR
+    return None
@@ -0,0 +1,135 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from time import time
+from whaller_client.auth import Authenticator
+from whaller_client.aio.api import AsyncApiClient
+from whaller_client.deadline import hold_async
+from whaller_client.exceptions import ApiError, HttpError
+from whaller_client.metrics import measure
+from whaller_client.token_store import TokenStore
+
+class AsyncAuthenticator(Authenticator):
+    def __init__(self, client_id: str, client_token: str, token_ttl: float = 3600.0,
+                 refresh_margin: float = 60.0, auto_refresh: bool = False, token_store: TokenStore | None = None):
+        """
+        Asynchronous flavour of the Authenticator.
+
+        Logins and refreshes are serialized so that many coroutines waiting for a token
+        trigger a single round-trip. With a token store, a still-valid token is reused, and the store's
+        lock makes a single one of the sharing Authenticators, synchronous or not, log in or refresh.
+        The store is only used from a dedicated thread, not to block the event loop: its locks belong
+        to the thread that takes them.
+        """
+        super().__init__(client_id, client_token, token_ttl, refresh_margin, auto_refresh, token_store)
+        self._async_lock = asyncio.Lock()
+        self._store_executor = None
+
+    async def authenticate(self, api_client: AsyncApiClient):
+        data = {'signin-login': self.login, 'signin-password': self.password}
+
+        response = await api_client.call_json('person/login', 'POST', data, self.get_application_header())
+        await self._set_token_async(response, api_client)
+
+    async def get_bearer_token(self, api_client: AsyncApiClient):
+        if self.needs_refresh():
+            with measure(api_client.metrics, 'auth_wait_seconds'):
+                async with hold_async(self._async_lock, 'getting a bearer token'):
+                    await self._obtain_token_async(api_client)
+        return {"Authorization": "Bearer " + self.token}
+
+    async def _obtain_token_async(self, api_client: AsyncApiClient) -> None:
+        # Logs in or renews the token, unless another coroutine or Authenticator sharing the store already
+        # did while we were waiting (lock held)
+        if self.needs_refresh():
+            await self._load_stored_token_async(api_client)
+        if self.needs_refresh():
+            async with self._store_lock_async(api_client):
+                # Another process may have logged in or refreshed while we were waiting
+                await self._load_stored_token_async(api_client)
+                if self.token is None:
+                    await self.authenticate(api_client)
+                elif self.needs_refresh():
+                    await self._renew(api_client)
+
+    async def refresh_token(self, api_client: AsyncApiClient):
+        """
+        Refresh the token before it expires.
+        """
+        async with self._async_lock:
+            await self._refresh(api_client)
+
+    async def _refresh(self, api_client: AsyncApiClient) -> None:
+        if self.token is None:
+            await self.authenticate(api_client)
+        data = {'auth_token': self.token, 'login': self.login, 'renew': True}
+        headers = {"Authorization": "Bearer " + self.token}
+        response = await api_client.call_json('person/status_auth_by_token', 'POST', data, headers)
+        await self._set_token_async(response, api_client)
+
+    async def _renew(self, api_client: AsyncApiClient) -> None:
+        # An expired token may not be renewable anymore: log in again in that case
+        try:
+            await self._refresh(api_client)
+        except (ApiError, HttpError):
+            await self.authenticate(api_client)
+
+    async def _set_token_async(self, response: dict, api_client: AsyncApiClient) -> None:
+        record = self._update_token(response)
+        if self.token_store is not None:
+            await self._run_in_store_thread(self.token_store.save, self.get_store_key(api_client), record)
+        if self.auto_refresh:
+            self._schedule_refresh(api_client)
+
+    async def _load_stored_token_async(self, api_client: AsyncApiClient) -> bool:
+        """
+        Adopts the token of the store if it is still valid.
+        """
+        if self.token_store is None:
+            return False
+        record = await self._run_in_store_thread(self.token_store.load, self.get_store_key(api_client))
+        return self._adopt_stored_token(record, api_client)
+
+    @asynccontextmanager
+    async def _store_lock_async(self, api_client: AsyncApiClient):
+        if self.token_store is None:
+            yield
+            return
+
+        lock = self.token_store.lock(self.get_store_key(api_client))
+        try:
+            await self._run_in_store_thread(lock.__enter__)
+        except asyncio.CancelledError:
+            # The store thread still takes the lock: it releases it right after, as it runs tasks in order
+            self._store_executor.submit(lock.__exit__, None, None, None)
+            raise
+        try:
+            yield
+        except BaseException as e:
+            if not await self._run_in_store_thread(lock.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await self._run_in_store_thread(lock.__exit__, None, None, None)
+
+    def _run_in_store_thread(self, fn, *args):
+        # A single thread, so that the locks of the store are taken and released by the same thread
+        if self._store_executor is None:
+            self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='whaller-token-store')
+        return asyncio.get_running_loop().run_in_executor(self._store_executor, fn, *args)
+
+    def _schedule_refresh(self, api_client: AsyncApiClient) -> None:
+        self.cancel_refresh()
+        if self.expires_at is None:
+            return
+        delay = max(self.expires_at - self.refresh_margin - time(), 0)
+        loop = asyncio.get_running_loop()
+        self._refresh_timer = loop.call_later(delay, lambda: asyncio.ensure_future(self._background_refresh(api_client)))
+
+    async def _background_refresh(self, api_client: AsyncApiClient) -> None:
+        # Authenticators sharing a store refresh at the same time: a single one of them renews the token
+        try:
+            async with self._async_lock:
+                await self._obtain_token_async(api_client)
+        except Exception:
+            # The next call to get_bearer_token will try again
+            pass
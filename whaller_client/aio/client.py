@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+from whaller_client.aio.auth import AsyncAuthenticator
+from whaller_client.aio.api import AsyncApiClient
+from whaller_client.cache import ResponseCache, make_request_key
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.logger import Logger
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
+from whaller_client.singleflight import AsyncSingleFlight
+from whaller_client.token_store import TokenStore
+
+async def gather(aws: Iterable[Awaitable], limit: int = 10, return_exceptions: bool = False) -> list:
+    """
+    Runs awaitables concurrently with at most `limit` of them in flight at once.
+
+    :param aws: Coroutines or futures to run
+    :param limit: Maximum number of awaitables running at the same time
+    :param return_exceptions: Return exceptions as results instead of raising the first one
+    :return: Results, in the same order as `aws`
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+class AsyncClient:
+    def __init__(self, base_url:str, client_id:str, client_token:str, limit:int=100,
+                 limit_per_host:int=0, keepalive_timeout:float=15.0, concurrency:int=10,
+                 token_store:TokenStore|None=None, retry_policy:RetryPolicy|None=None,
+                 rate_limiter:RateLimiter|None=None, cache:ResponseCache|None=None,
+                 coalesce:bool=True, metrics:MetricsRegistry|None=None,
+                 middleware:Iterable[Callable]=(), connect_timeout:float|None=10.0,
+                 read_timeout:float|None=60.0, circuit_breaker:CircuitBreaker|None=None,
+                 auto_refresh:bool=False, token_ttl:float=3600.0, refresh_margin:float=60.0) -> None:
+        self.authenticator = AsyncAuthenticator(client_id, client_token, token_ttl=token_ttl,
+                                                refresh_margin=refresh_margin, auto_refresh=auto_refresh,
+                                                token_store=token_store)
+        self.api = AsyncApiClient(base_url, limit, limit_per_host, keepalive_timeout, retry_policy, rate_limiter, cache,
+                                  metrics=metrics, middleware=middleware, connect_timeout=connect_timeout,
+                                  read_timeout=read_timeout, circuit_breaker=circuit_breaker)
+        self.logger = Logger('api', level=logging.INFO, background=True, max_bytes=10 * 1024 * 1024, backup_count=3)
+        self.concurrency = concurrency
+        # Identical GET requests awaited concurrently by several coroutines share a single call
+        self.singleflight = AsyncSingleFlight() if coalesce else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self) -> None:
+        self.authenticator.cancel_refresh()
+        await self.api.close()
+
+    def set_credentials(self, login:str, password:str) -> None:
+        self.authenticator.set_credentials(login, password)
+
+    async def authenticate(self):
+        await self.authenticator.authenticate(self.api)
+
+    async def refresh_token(self):
+        await self.authenticator.refresh_token(self.api)
+
+    async def get_api_token(self):
+        return await self.authenticator.get_bearer_token(self.api)
+
+    async def call_post(self, endpoint:str, data:dict={}, with_auth:bool=False) -> dict:
+        headers = {}
+        if with_auth:
+            headers.update(await self.get_api_token())
+        return await self.api.call_json(endpoint, "POST", data, headers)
+
+    async def call_get(self, endpoint:str, data:dict={}, with_auth:bool=False) -> dict:
+        headers = {}
+        identity = None
+        if with_auth:
+            headers.update(await self.get_api_token())
+            # Cached responses outlive the token: they are keyed by user
+            identity = self.authenticator.get_store_key(self.api)
+        if self.singleflight is None:
+            return await self.api.call_json(endpoint, "GET", data, headers, identity=identity)
+        key = make_request_key(endpoint, data, headers)
+        return await self.singleflight.do(key, lambda: self.api.call_json(endpoint, "GET", data, headers, identity=identity))
+
+    async def stream_get(self, endpoint:str, data:dict={}, with_auth:bool=False) -> AsyncIterator:
+        headers = {}
+        if with_auth:
+            headers.update(await self.get_api_token())
+        async for item in self.api.stream_json(endpoint, data, headers):
+            yield item
+
+    async def call_auth_post(self, endpoint:str, data:dict={}) -> dict:
+        return await self.call_post(endpoint, data, True)
+
+    async def call_auth_get(self, endpoint:str, data:dict={}) -> dict:
+        return await self.call_get(endpoint, data, True)
+
+    async def send_post_content(self, endpoint:str, params:dict, files:dict) -> dict:
+        return await self.api.send_content(endpoint, params, files, await self.get_api_token())
+
+    async def gather(self, aws: Iterable[Awaitable], limit:int|None=None, return_exceptions:bool=False) -> list:
+        """
+        Runs API calls concurrently, bounded by `limit` (defaults to the client's concurrency).
+        """
+        return await gather(aws, limit or self.concurrency, return_exceptions)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import posixpath
+from contextlib import nullcontext
+from typing import Callable, Iterable
+from whaller_client.aio.client import AsyncClient
+from whaller_client.aio.endpoints.upload import AsyncUpload
+from whaller_client.endpoints.box import add_tree_level, get_tree_levels
+from whaller_client.exceptions import ApiError
+
+class AsyncBox:
+    def __init__(self, client: AsyncClient, external_id: str, upload_client: AsyncUpload | None = None) -> None:
+        """
+        Asynchronous flavour of the Box endpoints.
+        """
+        self.client = client
+        self.sphere_external_id = external_id
+        self.upload_client = upload_client or AsyncUpload(client)
+
+    async def create_folder(self, name: str, parent_id: int | None = None) -> int:
+        """
+        Creates a folder within the organization.
+
+        :param name: Name of the folder
+        :param parent_id: ID of the parent folder (optional)
+        :return: ID of the created folder
+        """
+        data = {
+            'name': name,
+            'type': 1
+        }
+        if parent_id is not None:
+            data['parent_id'] = parent_id
+
+        response = await self.client.call_auth_post(f'spheres/{self.sphere_external_id}/boxresources', data)
+        return response.get('id', -1)  # Returns -1 if 'id' is not in the response
+
+    async def create_tree(self, tree: dict | str, parent_id: int | None = None, limit: int | None = None,
+                          existing: dict | None = None) -> dict:
+        """
+        Creates a tree of folders, level by level: the folders of a level are created concurrently,
+        once their parents exist, so that the tree takes one round-trip per level.
+
+        :param tree: Nested dict of folder names ({'a': {'b': {}, 'c': None}}), or path of a local
+                     directory whose subdirectories are mirrored
+        :param parent_id: ID of the folder in which the tree is created (optional)
+        :param limit: Number of folders created at the same time, defaults to the client's concurrency
+        :param existing: IDs of the folders of the tree which already exist, by path: they are not created again
+        :return: ID of each folder by its path in the tree ({'a': 1, 'a/b': 2, 'a/c': 3})
+        :raises Exception: The first error creating a folder, once its level is over, with the IDs of
+                           the folders which exist by then in its `folders` attribute
+        """
+        ids = {'': parent_id, **(existing or {})}
+        for level in get_tree_levels(tree):
+            level = [folder for folder in level if folder[0] not in ids]
+            results = await self.client.gather(
+                (self.create_folder(name, ids[posixpath.dirname(path)]) for path, name in level), limit,
+                return_exceptions=True)
+            add_tree_level(ids, level, results)
+        del ids['']
+        return ids
+
+    async def create_file(self, name: str, content, mimes: str, parent_id: int | None = None) -> dict:
+        """
+        Uploads a file and creates an associated resource.
+
+        When the uploader deduplicates contents and the cloudfile of an already uploaded content
+        cannot be referenced anymore, it is forgotten and the content is uploaded again.
+
+        :param name: Name of the file
+        :param content: Content of the file (bytes, path, binary file object, iterable of bytes or UploadContent)
+        :param mimes: MIME type of the file
+        :param parent_id: ID of the parent folder (optional)
+        :return: Dictionary containing the information of the created file
+        """
+        return await self._create_file(name, content, mimes, parent_id, nullcontext(), nullcontext())
+
+    async def create_files(self, files: Iterable[tuple], parent_id: int | None = None, limit: int | None = None,
+                           metadata_limit: int | None = None,
+                           progress: Callable[[int, dict | Exception, int], None] | None = None) -> list:
+        """
+        Uploads files and creates their resources as a pipeline: as soon as a file is uploaded, its
+        resource is created while the next files are uploading.
+
+        Uploads and resource creations go through separate lanes of `limit` and `metadata_limit`
+        requests, so that slow uploads never hold back the resource creations. The iterable is consumed
+        as files complete, so it may be a generator of any length. An error on a file does not stop the
+        others: it takes the place of the file's result.
+
+        :param files: Files to create, as (name, content, mimes) or (name, content, mimes, parent_id) tuples
+        :param parent_id: ID of the parent folder of the files which do not set one (optional)
+        :param limit: Number of files uploaded at the same time, defaults to the client's concurrency
+        :param metadata_limit: Number of resources created at the same time, defaults to the client's concurrency
+        :param progress: Called as each file completes, with its index in `files`, its result or
+                         exception, and the number of files completed so far (optional)
+        :return: Result of create_file, or the exception raised, for each file in the order of `files`
+        """
+        limit = limit or self.client.concurrency
+        metadata_limit = metadata_limit or self.client.concurrency
+        uploads = asyncio.Semaphore(limit)
+        metadata = asyncio.Semaphore(metadata_limit)
+        results = []
+        pending = {}
+        completed = 0
+
+        def collect(done) -> None:
+            nonlocal completed
+            for task in done:
+                index = pending.pop(task)
+                error = task.exception()
+                results[index] = task.result() if error is None else error
+                completed += 1
+                if progress is not None:
+                    progress(index, results[index], completed)
+
+        try:
+            for index, item in enumerate(files):
+                if len(pending) >= limit + metadata_limit:
+                    collect((await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0])
+                name, content, mimes, *folder = item
+                results.append(None)
+                task = asyncio.ensure_future(self._create_file(name, content, mimes,
+                                                               folder[0] if folder else parent_id, uploads, metadata))
+                pending[task] = index
+            while pending:
+                collect((await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))[0])
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+        return results
+
+    async def _create_file(self, name: str, content, mimes: str, parent_id: int | None, uploads, metadata) -> dict:
+        """
+        Uploads a file within the `uploads` context, then creates its resource within the `metadata` one.
+        """
+        async with uploads:
+            file_data = await self.upload_client.boxresource(name, content, mimes, self.sphere_external_id)
+        try:
+            async with metadata:
+                return await self._create_file_resource(name, file_data, parent_id)
+        except ApiError:
+            if not file_data.get('deduplicated'):
+                raise
+        self.upload_client.dedup.discard(file_data['hash'])
+        async with uploads:
+            file_data = await self.upload_client.boxresource(name, content, mimes, self.sphere_external_id)
+        async with metadata:
+            return await self._create_file_resource(name, file_data, parent_id)
+
+    async def _create_file_resource(self, name: str, file_data: dict, parent_id: int | None) -> dict:
+        """
+        Creates the box resource of an uploaded file.
+        """
+        resource = {
+            'name': os.path.splitext(name)[0],  # Name without extension
+            'ext': os.path.splitext(name)[1].lstrip('.'),  # Extension without the dot
+            'cloudfile_id': file_data['id'],
+            'type': 2
+        }
+
+        if parent_id is not None:
+            resource['parent_id'] = parent_id
+
+        return await self.client.call_auth_post(f'spheres/{self.sphere_external_id}/boxresources', resource)
@@ -0,0 +1,9 @@
+from whaller_client.aio.client import AsyncClient
+
+class AsyncInvitation:
+    def __init__(self, client: AsyncClient) -> None:
+        self.client = client
+
+    async def remove_one(self, invitation_id: int) -> None:
+        data = {"id": invitation_id}
+        await self.client.call_auth_post('invitation', data=data)
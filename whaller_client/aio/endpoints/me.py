@@ -0,0 +1,125 @@
+from whaller_client.aio.client import AsyncClient
+from whaller_client.aio.pagination import iter_items
+
+class AsyncMe:
+    def __init__(self, client: AsyncClient):
+        """
+        Asynchronous flavour of the Me endpoints.
+
+        :param client: Instance of the AsyncClient class
+        """
+        self.client = client
+
+    async def get(self):
+        """
+        Retrieves the current user's information.
+
+        :return: Current user's information
+        :link: https://developer.whaller.com/#api-Me
+        """
+        return await self.client.call_get("me", {}, True)
+
+    async def get_notifications(self, login: str):
+        """
+        Retrieves notifications for a given user.
+
+        :param login: User's login identifier
+        :return: User's notifications
+        :link: https://developer.whaller.com/#api-Me-persons
+        """
+        return await self.client.call_get(f"persons/{login}/notifications", {}, True)
+
+    async def list_spheres(self, data: dict = {}):
+        """
+        Retrieves a list of spheres for the current user.
+
+        :return: List of spheres
+        :link: https://developer.whaller.com/#api-Me-spheres
+        """
+        return await self.client.call_get("me/spheres", data, True)
+
+    async def list_networks(self, data: dict = {}):
+        """
+        Retrieves a list of organizations and spheres for the current user.
+
+        :return: List of organizations and spheres
+        :link: https://developer.whaller.com/#api-Me-network
+        """
+        return await self.client.call_get("me/networks", data, True)
+
+    async def stream_spheres(self, data: dict = {}):
+        """
+        Iterates over the spheres of the current user as they are received, without loading
+        the whole list in memory.
+
+        :return: Iterator over the spheres
+        :link: https://developer.whaller.com/#api-Me-spheres
+        """
+        async for item in self.client.stream_get("me/spheres", data, True):
+            yield item
+
+    async def stream_networks(self, data: dict = {}):
+        """
+        Iterates over the organizations and spheres of the current user as they are received,
+        without loading the whole list in memory.
+
+        :return: Iterator over the organizations and spheres
+        :link: https://developer.whaller.com/#api-Me-network
+        """
+        async for item in self.client.stream_get("me/networks", data, True):
+            yield item
+
+    def iter_spheres(self, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the spheres of the current user, fetching them page by page as they are consumed.
+
+        :param data: Parameters of the request
+        :param page_size: Number of spheres per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Asynchronous iterator over the spheres
+        :link: https://developer.whaller.com/#api-Me-spheres
+        """
+        return iter_items(self.list_spheres, data, page_size, prefetch)
+
+    def iter_networks(self, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the organizations and spheres of the current user, fetching them page by page
+        as they are consumed.
+
+        :param data: Parameters of the request
+        :param page_size: Number of organizations per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Asynchronous iterator over the organizations and spheres
+        :link: https://developer.whaller.com/#api-Me-network
+        """
+        return iter_items(self.list_networks, data, page_size, prefetch)
+
+    def iter_notifications(self, login: str, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the notifications of a given user, fetching them page by page as they are consumed.
+
+        :param login: User's login identifier
+        :param data: Parameters of the request
+        :param page_size: Number of notifications per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Asynchronous iterator over the notifications
+        :link: https://developer.whaller.com/#api-Me-persons
+        """
+        async def fetch(params: dict):
+            return await self.client.call_get(f"persons/{login}/notifications", params, True)
+        return iter_items(fetch, data, page_size, prefetch)
+
+    async def list_phones(self, status: str = ""):
+        """
+        Retrieves a list of phones for the current user.
+
+        :param status: Status of the phones to retrieve (optional)
+
+        :return: List of phones
+        :link: https://developer.whaller.com/#api-Me-MyPhoneNumbers
+        """
+        if status:
+            data = {"status": status}
+        else:
+            data = {}
+        return await self.client.call_get("me/phones", data, True)
@@ -0,0 +1,250 @@
+import asyncio
+import uuid
+import math
+from collections import deque
+from time import perf_counter
+from whaller_client.aio.client import AsyncClient
+from whaller_client.endpoints.upload import AdaptiveChunking, TransferStats
+from whaller_client.content import BytesContent, IterableContent, UploadContent, open_content, hash_content
+from whaller_client.dedup import DedupIndex
+from whaller_client.journal import UploadJournal
+from whaller_client.metrics import MetricsRegistry
+
+class AsyncUpload:
+    def __init__(self, client: AsyncClient, max_workers: int = 1, ordered: bool = True, last_chunk_last: bool = True,
+                 journal: UploadJournal | None = None, dedup: DedupIndex | None = None,
+                 adaptive: AdaptiveChunking | None = None, metrics: MetricsRegistry | None = None) -> None:
+        """
+        Asynchronous flavour of the Upload endpoints.
+
+        :param client: Instance of the AsyncClient class
+        :param max_workers: Number of chunks in flight at the same time during a chunked upload
+        :param ordered: Acknowledge chunks in index order instead of refilling as soon as any chunk completes
+        :param last_chunk_last: Send the last chunk only once every other chunk has been acknowledged
+        :param journal: Journal making chunked uploads resumable (optional)
+        :param dedup: Index of the contents already uploaded, which are then not sent again (optional)
+        :param adaptive: Chooses the chunk size and the number of chunks in flight instead of `chunksize`
+                         and `max_workers` (optional)
+        :param metrics: Registry recording the duration and size of the chunks sent, defaults to the client's
+        """
+        self.client = client
+        self.chunksize = 10 * 1024 * 1024  # 10 MB
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.last_chunk_last = last_chunk_last
+        self.journal = journal
+        self.dedup = dedup
+        self.adaptive = adaptive
+        self.metrics = metrics if metrics is not None else client.api.metrics
+        self.last_stats = None
+
+    async def _upload(self, endpoint: str, params: dict, files: dict) -> dict:
+        """
+        Performs a standard file upload.
+        """
+        return await self.client.send_post_content(endpoint, params, files)
+
+    async def _upload_with_chunking(self, endpoint: str, filename: str, content, mimes: str, sphere_external_id: str = None,
+                                    digest: str | None = None, chunksize: int | None = None,
+                                    max_workers: int | None = None) -> dict:
+        """
+        Performs a chunked upload for large files.
+
+        :param endpoint: API endpoint for the upload
+        :param filename: Name of the file
+        :param content: File content (bytes, path, binary file object, iterable of bytes or UploadContent)
+        :param mimes: MIME type of the file
+        :param sphere_external_id: External ID of the sphere (optional)
+        :param digest: SHA-256 of the content, when already known
+        :param chunksize: Size of the chunks, defaults to `chunksize`
+        :param max_workers: Number of chunks in flight, defaults to `max_workers`
+        :return: API response after upload
+        """
+        chunksize = chunksize or self.chunksize
+        max_workers = max_workers or self.max_workers
+        with await self._open_content(content) as source:
+            dztotalfilesize = source.size
+
+            # An iterable can only be read once: it can neither be hashed beforehand nor resumed
+            if self.journal is not None and not isinstance(source, IterableContent):
+                digest = digest or await asyncio.to_thread(hash_content, source)
+                journal_key = f'{endpoint}:{sphere_external_id}:{digest}'
+                # A resumed upload keeps its chunks, even if the chunk size has changed since; None while the
+                # same content is being uploaded to the same destination, this upload then not being journaled
+                opened = self.journal.open(journal_key, chunksize)
+            else:
+                opened = None
+            if opened is not None:
+                dzuuid, chunksize, acknowledged = opened
+            else:
+                journal_key = None
+                dzuuid, acknowledged = str(uuid.uuid4()), set()
+            dztotalchunkcount = math.ceil(dztotalfilesize / chunksize)
+            last_chunk = dztotalchunkcount - 1
+
+            async def read_chunk(dzchunkindex: int):
+                start = dzchunkindex * chunksize
+                length = min(chunksize, dztotalfilesize - start)
+                if isinstance(source, BytesContent):
+                    return source.read(start, length)
+                # Keep file reads off the event loop
+                return await asyncio.to_thread(source.read, start, length)
+
+            async def send_chunk(dzchunkindex: int, dzcontent) -> dict:
+                files = {'userfile': (filename, dzcontent, mimes)}
+
+                params = {
+                    'dzuuid': dzuuid,
+                    'dztotalfilesize': dztotalfilesize,
+                    'dztotalchunkcount': dztotalchunkcount,
+                    'dzchunkindex': dzchunkindex,
+                    'dzchunkbyteoffset': dzchunkindex * chunksize,
+                    'dzchunksize': len(dzcontent),
+                }
+
+                if sphere_external_id:
+                    params['sphere_id'] = sphere_external_id
+
+                sent_at = perf_counter()
+                try:
+                    response = await self._upload(endpoint, params, files)
+                except Exception:
+                    if self.adaptive is not None:
+                        self.adaptive.record_failure()
+                    if self.metrics is not None:
+                        self.metrics.inc('upload_chunk_failures_total')
+                    raise
+                seconds = perf_counter() - sent_at
+                if self.adaptive is not None:
+                    self.adaptive.record_chunk(len(dzcontent), seconds)
+                if self.metrics is not None:
+                    # Throughput of the chunks: upload_bytes_total / sum of upload_chunk_seconds
+                    self.metrics.observe('upload_chunk_seconds', seconds)
+                    self.metrics.inc('upload_bytes_total', len(dzcontent))
+                # The last chunk is never journaled: it is always sent again, to get the file data back
+                if journal_key is not None and dzchunkindex != last_chunk:
+                    self.journal.ack(journal_key, dzchunkindex)
+                return response
+
+            # Missing chunks, the last chunk always being sent last
+            indexes = [i for i in range(last_chunk) if i not in acknowledged] + [last_chunk]
+
+            started = perf_counter()
+            try:
+                if max_workers > 1:
+                    response = await self._send_chunks_parallel(read_chunk, send_chunk, indexes, max_workers)
+                else:
+                    for dzchunkindex in indexes:
+                        response = await send_chunk(dzchunkindex, await read_chunk(dzchunkindex))
+                if journal_key is not None:
+                    self.journal.discard(journal_key)
+            finally:
+                if journal_key is not None:
+                    self.journal.release(journal_key)
+            sent = sum(min(chunksize, dztotalfilesize - i * chunksize) for i in indexes)
+            self.last_stats = TransferStats(sent, perf_counter() - started, len(indexes), chunksize, max_workers)
+            if self.adaptive is not None:
+                self.adaptive.record_upload(self.last_stats)
+
+        return response
+
+    async def _send_chunks_parallel(self, read_chunk, send_chunk, indexes: list[int], max_workers: int | None = None) -> dict:
+        """
+        Sends chunks with up to `max_workers` requests in flight.
+
+        :param read_chunk: Coroutine function returning the content of the chunk of the given index
+        :param send_chunk: Coroutine function sending the chunk of the given index and content
+        :param indexes: Indexes of the chunks to send, the last chunk of the file last
+        :param max_workers: Number of chunks in flight, defaults to `max_workers`
+        :return: Response of the chunk acknowledged last
+        """
+        max_workers = max_workers or self.max_workers
+        body, last = (indexes[:-1], indexes[-1:]) if self.last_chunk_last else (indexes, [])
+        pending = deque()
+        response = None
+
+        try:
+            for dzchunkindex in body:
+                if len(pending) >= max_workers:
+                    response = await self._wait_chunk(pending)
+                dzcontent = await read_chunk(dzchunkindex)
+                pending.append(asyncio.ensure_future(send_chunk(dzchunkindex, dzcontent)))
+            while pending:
+                response = await self._wait_chunk(pending)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+        for dzchunkindex in last:
+            response = await send_chunk(dzchunkindex, await read_chunk(dzchunkindex))
+
+        return response
+
+    async def _wait_chunk(self, pending: deque) -> dict:
+        """
+        Waits for one in-flight chunk (the oldest one when ordered) and returns its response.
+        """
+        if self.ordered:
+            return await pending.popleft()
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        task = done.pop()
+        pending.remove(task)
+        return task.result()
+
+    async def _open_content(self, content) -> UploadContent:
+        """
+        Wraps the content into an UploadContent, in a thread unless it is already in memory: a file object
+        which cannot seek, or an iterable of unknown size, is read whole to be spooled.
+        """
+        if isinstance(content, (UploadContent, bytes, bytearray, memoryview)):
+            return open_content(content, spool_size=self.chunksize)
+        return await asyncio.to_thread(open_content, content, spool_size=self.chunksize)
+
+    def _get_chunking(self) -> tuple[int, int]:
+        """
+        Returns the chunk size and the number of chunks in flight of the next upload.
+        """
+        if self.adaptive is None:
+            return self.chunksize, self.max_workers
+        return self.adaptive.chunksize, self.adaptive.workers
+
+    async def boxresource(self, filename: str, content, mimes: str, sphere_external_id: str) -> dict:
+        """
+        Uploads a file and creates an associated resource.
+
+        :param filename: Name of the file
+        :param content: File content (bytes, path, binary file object, iterable of bytes or UploadContent)
+        :param mimes: MIME type of the file
+        :param sphere_external_id: Sphere ID
+        :return: API response after upload (see Upload.boxresource for deduplicated contents)
+        """
+        endpoint = 'upload/box_resource'
+
+        with await self._open_content(content) as source:
+            digest = None
+            if self.dedup is not None and not isinstance(source, IterableContent):
+                # Hashed in a thread, not to block the event loop
+                digest = await asyncio.to_thread(hash_content, source)
+                cloudfile_id = self.dedup.get(digest)
+                if cloudfile_id is not None:
+                    return {'id': cloudfile_id, 'hash': digest, 'deduplicated': True}
+
+            chunksize, max_workers = self._get_chunking()
+            if source.size > chunksize:
+                response = await self._upload_with_chunking(endpoint, filename, source, mimes, sphere_external_id,
+                                                           digest=digest, chunksize=chunksize, max_workers=max_workers)
+            else:
+                params = {'sphere_id': sphere_external_id}
+                if isinstance(source, BytesContent):
+                    dzcontent = source.read_all()
+                else:
+                    # Keep file reads off the event loop
+                    dzcontent = await asyncio.to_thread(source.read_all)
+                files = {'userfile': (filename, dzcontent, mimes)}
+                response = await self._upload(endpoint, params, files)
+
+            if digest is not None and 'id' in response:
+                self.dedup.set(digest, response['id'])
+            return response
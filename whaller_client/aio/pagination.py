@@ -0,0 +1,53 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+from whaller_client.pagination import get_page_params
+
+async def iter_pages(fetch: Callable[[dict], Awaitable[list]], data: dict = {}, page_size: int = 50,
+                     prefetch: bool = True) -> AsyncIterator[list]:
+    """
+    Fetches the pages of a list endpoint lazily, with `limit`/`offset` parameters, until a page is not full.
+
+    With `prefetch`, the next page is fetched in a background task while the current one is consumed.
+
+    :param fetch: Coroutine function returning the items of the page with the given parameters
+    :param data: Parameters of the request, an `offset` sets the first item
+    :param page_size: Number of items per page
+    :param prefetch: Fetch the next page in the background
+    :return: Asynchronous iterator over the non-empty pages
+    """
+    if page_size < 1:
+        raise ValueError("The page size must be positive")
+    offset = data.get('offset', 0)
+
+    if not prefetch:
+        while True:
+            page = await fetch(get_page_params(data, page_size, offset))
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    task = asyncio.ensure_future(fetch(get_page_params(data, page_size, offset)))
+    try:
+        while True:
+            page = await task
+            if len(page) < page_size:
+                if page:
+                    yield page
+                return
+            offset += page_size
+            task = asyncio.ensure_future(fetch(get_page_params(data, page_size, offset)))
+            yield page
+    finally:
+        # The iteration may be stopped early: a page which is not needed anymore is not fetched
+        task.cancel()
+
+async def iter_items(fetch: Callable[[dict], Awaitable[list]], data: dict = {}, page_size: int = 50,
+                     prefetch: bool = True) -> AsyncIterator:
+    """
+    Iterates over the items of a list endpoint, fetching its pages lazily (see iter_pages).
+    """
+    async for page in iter_pages(fetch, data, page_size, prefetch):
+        for item in page:
+            yield item
@@ -1,15 +1,123 @@
-from requests import post, get, RequestException
-from json import JSONDecodeError, loads
-from whaller_client.exceptions import MethodError, ApiError, HttpError, InvalidResponseError
+from copy import deepcopy
+from datetime import timedelta
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import Callable, Iterable, Iterator
+from requests import Response as RequestsResponse, Session, RequestException
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.exceptions import ConnectionError as RequestsConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import NewConnectionError
+from whaller_client.cache import ResponseCache
+from whaller_client.circuit import CircuitBreaker
+from whaller_client.codec import JsonCodec, default_codec
+from whaller_client.content import MultipartBody
+from whaller_client.deadline import check_deadline, check_retry_delay, clip_timeout, is_expired
+from whaller_client.exceptions import MethodError, ApiError, DeadlineExceededError, HttpError, InvalidResponseError
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.middleware import Request, Response, build_chain
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import CONNECT_ERROR, READ_ERROR, RetryPolicy
+from whaller_client.stream import iter_result
 
 class ApiClient:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, pool_connections: int = 10, pool_maxsize: int = 10,
+                 keepalive_timeout: float | None = 60.0, retry_policy: RetryPolicy | None = None,
+                 rate_limiter: RateLimiter | None = None, cache: ResponseCache | None = None,
+                 codec: JsonCodec | None = None, metrics: MetricsRegistry | None = None,
+                 middleware: Iterable[Callable] = (), connect_timeout: float | None = 10.0,
+                 read_timeout: float | None = 60.0, circuit_breaker: CircuitBreaker | None = None):
         """
         Client to interact with the Whaller API.
+
+        Requests go through a long-lived HTTP session so that TCP and TLS
+        connections are kept alive and reused from one call to the next.
+        Transient failures (connection errors, 429, 502, 503, 504) are retried
+        according to the retry policy. Within a `whaller_client.deadline.deadline`
+        block, the timeouts are shortened to the time left and no attempt is
+        made past the deadline.
+
+        :param base_url: Base URL of the Whaller instance
+        :param pool_connections: Number of per-host connection pools to keep
+        :param pool_maxsize: Maximum number of connections kept alive per host
+        :param keepalive_timeout: Idle time (in seconds) after which pooled connections are dropped, None to never drop them
+        :param retry_policy: Retry policy of the requests, RetryPolicy(max_attempts=1) to disable retries
+        :param rate_limiter: Client-side rate limiter (optional), may be shared between clients
+        :param cache: Cache of the GET responses (optional), may be shared between clients
+        :param codec: JSON codec of the bodies, defaults to the fastest one installed
+        :param metrics: Registry recording the latency, status and size of the requests (optional)
+        :param middleware: Functions `middleware(request, call_next)` wrapping each attempt of the
+                           requests, the first one being the outermost (see whaller_client.middleware)
+        :param connect_timeout: Time (in seconds) allowed to open a connection, None to wait forever
+        :param read_timeout: Time (in seconds) allowed between two bytes of the response, None to wait forever
+        :param circuit_breaker: Circuit breaker failing the requests to unhealthy endpoints at once (optional),
+                                may be shared between clients
         """
         self.api_base_url = base_url.rstrip('/') + '/api/'
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.codec = codec if codec is not None else default_codec
+        self.metrics = metrics
+        self.middleware = list(middleware)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.circuit_breaker = circuit_breaker
+        self._chain = build_chain(self.middleware, self._transport)
+        self._session = None
+        self._last_used = 0.0
+        self._session_lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_session(self) -> Session:
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def session(self) -> Session:
+        """
+        Returns the pooled HTTP session, recycling it if it stayed idle longer than the keep-alive timeout.
+        """
+        with self._session_lock:
+            now = monotonic()
+            if (self._session is not None and self.keepalive_timeout is not None
+                    and now - self._last_used > self.keepalive_timeout):
+                self._session.close()
+                self._session = None
+            if self._session is None:
+                self._session = self._create_session()
+            self._last_used = now
+            return self._session
+
+    def close(self) -> None:
+        """
+        Closes the HTTP session and every pooled connection.
+        """
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def add_middleware(self, middleware: Callable) -> None:
+        """
+        Adds a middleware inside the ones already installed, i.e. the closest to the transport.
+        """
+        self.middleware.append(middleware)
+        self._chain = build_chain(self.middleware, self._transport)
 
-    def call_json(self, endpoint: str, method: str, data: dict = {}, headers: dict = {}) -> dict:
+    def call_json(self, endpoint: str, method: str, data: dict = {}, headers: dict = {},
+                  identity: str | None = None) -> dict:
         """
         Sends a request to the API and returns the response in JSON format.
 
@@ -17,6 +125,8 @@ class ApiClient:
         :param method: HTTP method ('GET' or 'POST')
         :param data: Data sent in the request
         :param headers: HTTP headers
+        :param identity: Stable identity of the sender (API, application and login), keying its cached responses
+                         instead of its Authorization header, which changes each time the token is renewed
         :return: API response as a dictionary
         :raises MethodError: If the HTTP method is invalid
         :raises HttpError: If the request fails
@@ -27,28 +137,258 @@ class ApiClient:
         req_headers.update(headers)
         api_url = f'{self.api_base_url}{endpoint}'
 
+        if method == 'POST':
+            body = self.codec.dumps(data)
+            if self.metrics is not None:
+                self.metrics.record_bytes('http_request_bytes_total', endpoint, len(body))
+            send = lambda timeout: self.session.post(api_url, data=body, headers=req_headers, timeout=timeout)
+            if self._chain is not None:
+                send = self._through_middleware(method, endpoint, api_url, req_headers, data=body)
+        elif method == 'GET':
+            if self.cache is not None:
+                return self._call_cached(endpoint, api_url, data, req_headers, identity)
+            send = lambda timeout: self.session.get(api_url, params=data, headers=req_headers, timeout=timeout)
+            if self._chain is not None:
+                send = self._through_middleware(method, endpoint, api_url, req_headers, params=data)
+        else:
+            raise MethodError(f"Invalid HTTP method: {method}")
+
         try:
-            if method == 'POST':
-                response = post(api_url, json=data, headers=req_headers)
-            elif method == 'GET':
-                response = get(api_url, params=data, headers=req_headers)
-            else:
-                raise MethodError(f"Invalid HTTP method: {method}")
+            response = self._send(method, endpoint, send)
+            return self._parse_response(response, endpoint, api_url)
 
-            # Check if the HTTP status is an error (4xx, 5xx)
-            response.raise_for_status()
+        except RequestException as e:
+            raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
 
+    def stream_json(self, endpoint: str, data: dict = {}, headers: dict = {}, chunk_size: int = 65536) -> Iterator:
+        """
+        Sends a GET request to the API and yields the items of its 'result' array as they are received,
+        without holding the whole response in memory.
+
+        The request is sent when the iteration starts. Failures before the first byte of the response
+        are retried according to the retry policy; the response cache and the middleware are not used.
+
+        :param endpoint: Relative URL of the endpoint
+        :param data: Query parameters sent in the request
+        :param headers: HTTP headers
+        :param chunk_size: Number of bytes read from the connection at once
+        :raises HttpError: If the request fails
+        :raises InvalidResponseError: If the JSON response is malformed or its result is not an array
+        :raises ApiError: If the API returns an error code
+        """
+        req_headers = {'Content-Type': 'application/json'}
+        req_headers.update(headers)
+        api_url = f'{self.api_base_url}{endpoint}'
+
+        try:
+            response = self._send('GET', endpoint, lambda timeout: self.session.get(
+                api_url, params=data, headers=req_headers, stream=True, timeout=timeout))
             try:
-                response_data = loads(response.content)
-            except JSONDecodeError as e:
-                raise InvalidResponseError(f"Invalid JSON response from {api_url}") from e
+                response.raise_for_status()
+                chunks = response.iter_content(chunk_size)
+                if self.metrics is not None:
+                    chunks = self._count_chunks(chunks, endpoint)
+                yield from iter_result(chunks, api_url, self.codec)
+            finally:
+                # Releases the connection, even when the iteration is stopped early
+                response.close()
 
-            # Check if the response contains an API error
-            if 'error' in response_data:
-                error_message = response_data['error'].get('message', 'Unknown error')
-                raise ApiError(f"API Error: {error_message}")
+        except RequestException as e:
+            raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
 
-            return response_data.get('result', {})
+    def send_content(self, endpoint: str, params: dict, files: dict, headers: dict = {}) -> dict:
+        """
+        Sends a multipart/form-data POST request (file upload) and returns the response in JSON format.
+
+        :param endpoint: Relative URL of the endpoint
+        :param params: Form fields sent along with the files
+        :param files: Files to send ({'field': (filename, content, mimes)}), streamed without being copied
+        :param headers: HTTP headers
+        :return: API response as a dictionary
+        :raises HttpError: If the request fails
+        :raises InvalidResponseError: If the JSON response is malformed
+        :raises ApiError: If the API returns an error code
+        """
+        api_url = f'{self.api_base_url}{endpoint}'
+        body = MultipartBody(params, files)
+        req_headers = {'Content-Type': body.content_type}
+        req_headers.update(headers)
+        if self.metrics is not None:
+            self.metrics.record_bytes('http_request_bytes_total', endpoint, len(body))
+
+        send = lambda timeout: self.session.post(api_url, data=body, headers=req_headers, timeout=timeout)
+        if self._chain is not None:
+            send = self._through_middleware('POST', endpoint, api_url, req_headers, data=body)
+
+        try:
+            response = self._send('POST', endpoint, send)
+            return self._parse_response(response, endpoint, api_url)
+
+        except RequestException as e:
+            raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
+
+    def _call_cached(self, endpoint: str, api_url: str, data: dict, req_headers: dict,
+                     identity: str | None = None) -> dict:
+        # GET through the response cache, revalidating stale responses
+        key = self.cache.make_key(api_url, data, req_headers, identity)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            # A copy, so that the caller may modify it without altering the cache
+            return deepcopy(entry.result)
+
+        if entry is not None:
+            req_headers = {**req_headers, **entry.get_conditional_headers()}
+        send = lambda timeout: self.session.get(api_url, params=data, headers=req_headers, timeout=timeout)
+        if self._chain is not None:
+            send = self._through_middleware('GET', endpoint, api_url, req_headers, params=data)
+        try:
+            response = self._send('GET', endpoint, send)
+            if entry is not None and response.status_code == 304:
+                self.cache.revalidate(key, entry, response.headers)
+                return deepcopy(entry.result)
+            result = self._parse_response(response, endpoint, api_url)
 
         except RequestException as e:
             raise HttpError(f"HTTP error on {api_url}: {str(e)}") from e
+
+        self.cache.store(key, deepcopy(result), response.headers)
+        return result
+
+    def _through_middleware(self, method: str, endpoint: str, api_url: str, headers: dict,
+                            params: dict | None = None, data=None) -> Callable:
+        # Returns the function sending an attempt of the request through the middleware
+        def send(timeout):
+            sent_at = perf_counter()
+            request = Request(method, endpoint, api_url, dict(headers), dict(params) if params is not None else None, data,
+                              timeout)
+            response = self._chain(request)
+            return _to_requests_response(response, api_url, perf_counter() - sent_at)
+        return send
+
+    def _transport(self, request: Request) -> Response:
+        # Innermost handler of the middleware: sends the request through the pooled session
+        response = self.session.request(request.method, request.url, params=request.params, data=request.data,
+                                        headers=request.headers, timeout=request.timeout)
+        return Response(response.status_code, response.headers, response.content)
+
+    def _get_timeout(self, endpoint: str) -> tuple:
+        # (connect, read) timeouts of an attempt, shortened to the time left before the deadline
+        remaining = check_deadline(f"calling {endpoint}")
+        return clip_timeout(self.connect_timeout, remaining), clip_timeout(self.read_timeout, remaining)
+
+    def _send(self, method: str, endpoint: str, send):
+        # Sends the request, again and again while the retry policy and the deadline allow it
+        attempt = 1
+        while True:
+            if self.circuit_breaker is not None:
+                # Shed at once, without waiting for nor spending a token of the rate limiter
+                self.circuit_breaker.check(endpoint)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(endpoint)
+            timeout = self._get_timeout(endpoint)
+            # Acquired last, so that a trial call of a half-open circuit is only taken when actually sent
+            circuit = self.circuit_breaker.acquire(endpoint) if self.circuit_breaker is not None else None
+            sent_at = perf_counter()
+            outcome = None
+            try:
+                response = send(timeout)
+            except RequestException as e:
+                if circuit is not None:
+                    outcome = True, perf_counter() - sent_at
+                error = _classify_error(e)
+                if self.metrics is not None:
+                    self.metrics.record_request(method, endpoint, 'error', perf_counter() - sent_at)
+                if isinstance(e, Timeout) and is_expired():
+                    raise DeadlineExceededError(f"Deadline exceeded on {endpoint}: {str(e)}") from e
+                delay = self.retry_policy.get_retry_delay(method, attempt, error=error)
+                if delay is None:
+                    raise
+                reason = error or type(e).__name__
+            else:
+                if circuit is not None:
+                    outcome = response.status_code >= 500, response.elapsed.total_seconds()
+                if self.metrics is not None:
+                    # The elapsed time of requests stops once the headers are received
+                    self.metrics.record_request(method, endpoint, response.status_code, perf_counter() - sent_at,
+                                                response.elapsed.total_seconds())
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update(endpoint, response.status_code, response.headers)
+                delay = self.retry_policy.get_retry_delay(method, attempt, response.status_code, headers=response.headers)
+                if delay is None:
+                    return response
+                response.close()
+                reason = response.status_code
+            finally:
+                if circuit is not None:
+                    # Without outcome, e.g. when a middleware raised, the call is given back to the circuit
+                    if outcome is None:
+                        circuit.release()
+                    else:
+                        circuit.record(*outcome)
+            check_retry_delay(delay, f"{reason} on {endpoint}")
+            if self.metrics is not None:
+                self.metrics.record_retry(method, endpoint, reason)
+            sleep(delay)
+            attempt += 1
+
+    def _parse_response(self, response, endpoint: str, api_url: str) -> dict:
+        # Check if the HTTP status is an error (4xx, 5xx)
+        response.raise_for_status()
+        if self.metrics is None:
+            return parse_result(response.content, api_url, self.codec)
+        content = response.content
+        self.metrics.record_bytes('http_response_bytes_total', endpoint, len(content))
+        with self.metrics.timer('json_decode_seconds', endpoint=self.metrics.get_endpoint_label(endpoint)):
+            return parse_result(content, api_url, self.codec)
+
+    def _count_chunks(self, chunks: Iterator[bytes], endpoint: str) -> Iterator[bytes]:
+        # Counts the bytes of a streamed response as they are received
+        for chunk in chunks:
+            self.metrics.record_bytes('http_response_bytes_total', endpoint, len(chunk))
+            yield chunk
+
+
+def _to_requests_response(response: Response, api_url: str, seconds: float) -> RequestsResponse:
+    # The response returned by the middleware, as the session would have returned it
+    requests_response = RequestsResponse()
+    requests_response.status_code = response.status
+    requests_response.headers = CaseInsensitiveDict(response.headers)
+    requests_response._content = response.content
+    requests_response._content_consumed = True
+    requests_response.url = api_url
+    requests_response.elapsed = timedelta(seconds=seconds)
+    return requests_response
+
+def _classify_error(error: RequestException) -> str | None:
+    # Tells whether the request could not be sent at all, or failed once sent
+    if isinstance(error, ConnectTimeout):
+        return CONNECT_ERROR
+    if isinstance(error, RequestsConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return CONNECT_ERROR if isinstance(reason, NewConnectionError) else READ_ERROR
+    if isinstance(error, Timeout):
+        return READ_ERROR
+    return None
+
+def parse_result(content: bytes, api_url: str, codec: JsonCodec | None = None) -> dict:
+    """
+    Decodes a Whaller API response body and extracts its result.
+
+    :param content: Raw response body
+    :param api_url: URL that was called, used in error messages
+    :param codec: JSON codec decoding the body, defaults to the fastest one installed
+    :return: The 'result' member of the response
+    :raises InvalidResponseError: If the JSON response is malformed
+    :raises ApiError: If the API returns an error code
+    """
+    try:
+        response_data = (codec or default_codec).loads(content)
+    except ValueError as e:
+        raise InvalidResponseError(f"Invalid JSON response from {api_url}") from e
+
+    # Check if the response contains an API error
+    if 'error' in response_data:
+        error_message = response_data['error'].get('message', 'Unknown error')
+        raise ApiError(f"API Error: {error_message}")
+
+    return response_data.get('result', {})
@@ -1,37 +1,178 @@
 from base64 import b64encode
+from contextlib import nullcontext
+from threading import RLock, Timer
+from time import time
 from whaller_client.api import ApiClient
+from whaller_client.deadline import hold
+from whaller_client.exceptions import ApiError, HttpError
+from whaller_client.metrics import measure
+from whaller_client.token_store import TokenStore
 
 class Authenticator:
-    def __init__(self, client_id: str, client_token: str):
+    def __init__(self, client_id: str, client_token: str, token_ttl: float = 3600.0,
+                 refresh_margin: float = 60.0, auto_refresh: bool = False, token_store: TokenStore | None = None):
+        """
+        Handles the login and the lifecycle of the bearer token.
+
+        The token is refreshed proactively when it gets within `refresh_margin` seconds of its expiry.
+        Logins and refreshes are serialized, so that many threads waiting for a token trigger a single
+        round-trip. With a token store, a still-valid token saved by another Authenticator (possibly in
+        another process) is reused, and the store's lock makes a single one of them log in or refresh.
+
+        :param client_id: Application client ID
+        :param client_token: Application client token
+        :param token_ttl: Lifetime of a token (in seconds) when the API does not return an 'expires_in'
+        :param refresh_margin: Time (in seconds) before expiry from which the token is refreshed
+        :param auto_refresh: Refresh the token in a background thread before it expires
+        :param token_store: Store sharing tokens between Authenticators (optional)
+        """
         self.client_id = client_id
         self.client_token = client_token
         self.token = None
         self.login = None
         self.password = None
+        self.token_ttl = token_ttl
+        self.refresh_margin = refresh_margin
+        self.auto_refresh = auto_refresh
+        self.token_store = token_store
+        self.issued_at = None
+        self.expires_at = None
+        self._lock = RLock()
+        self._refresh_timer = None
 
     def set_credentials(self, login: str, password: str):
         self.login = login
         self.password = password
 
-    def authenticate(self, api_client: ApiClient):
+    def get_application_header(self) -> dict:
         token = (self.client_id + ':::' + self.client_token).encode("utf-8")
-        header_application = {"X-Application": b64encode(token)}
+        # A str, as aiohttp does not accept bytes header values
+        return {"X-Application": b64encode(token).decode('ascii')}
+
+    def authenticate(self, api_client: ApiClient):
         data = {'signin-login': self.login, 'signin-password': self.password}
 
-        response = api_client.call_json('person/login', 'POST', data, header_application)
-        self.token = response['auth_token']
+        with self._lock:
+            response = api_client.call_json('person/login', 'POST', data, self.get_application_header())
+            self._set_token(response, api_client)
 
-    def get_bearer_token(self, api_client: ApiClient):
+    def needs_refresh(self) -> bool:
+        """
+        Tells whether the token is missing or close to its expiry.
+        """
         if self.token is None:
-            self.authenticate(api_client)
+            return True
+        return self.expires_at is not None and time() >= self.expires_at - self.refresh_margin
+
+    def get_bearer_token(self, api_client: ApiClient):
+        if self.needs_refresh():
+            with measure(api_client.metrics, 'auth_wait_seconds'), hold(self._lock, 'getting a bearer token'):
+                self._obtain_token(api_client)
         return {"Authorization": "Bearer " + self.token}
 
+    def _obtain_token(self, api_client: ApiClient) -> None:
+        # Logs in or renews the token, unless another Authenticator sharing the store already did (lock held)
+        self._load_stored_token(api_client)
+        if self.needs_refresh():
+            with self._store_lock(api_client):
+                # Another thread or process may have logged in or refreshed while we were waiting
+                self._load_stored_token(api_client)
+                if self.token is None:
+                    self.authenticate(api_client)
+                elif self.needs_refresh():
+                    self._renew(api_client)
+
+    def get_store_key(self, api_client: ApiClient) -> str:
+        """
+        Key under which the token is shared in the token store.
+        """
+        return f'{api_client.api_base_url}|{self.client_id}|{self.login}'
+
     def refresh_token(self, api_client: ApiClient):
         """
         Refresh the token before it expires.
         """
-        if self.token is None:
+        with self._lock:
+            if self.token is None:
+                self.authenticate(api_client)
+            data = {'auth_token': self.token, 'login': self.login, 'renew': True}
+            headers = {"Authorization": "Bearer " + self.token}
+            response = api_client.call_json('person/status_auth_by_token', 'POST', data, headers)
+            self._set_token(response, api_client)
+
+    def cancel_refresh(self) -> None:
+        """
+        Stops the background refresh, if any.
+        """
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+    def _renew(self, api_client: ApiClient) -> None:
+        # An expired token may not be renewable anymore: log in again in that case
+        try:
+            self.refresh_token(api_client)
+        except (ApiError, HttpError):
             self.authenticate(api_client)
-        data = {'auth_token': self.token, 'login': self.login, 'renew': True}
-        response = api_client.call_json('person/status_auth_by_token', 'POST', data, self.get_bearer_token(api_client))
+
+    def _set_token(self, response: dict, api_client: ApiClient) -> None:
+        record = self._update_token(response)
+        if self.token_store is not None:
+            self.token_store.save(self.get_store_key(api_client), record)
+        if self.auto_refresh:
+            self._schedule_refresh(api_client)
+
+    def _update_token(self, response: dict) -> dict:
+        # Takes the token of a login or refresh response, and returns its record for the token store
         self.token = response['auth_token']
+        self.issued_at = time()
+        ttl = response.get('expires_in', self.token_ttl)
+        self.expires_at = self.issued_at + float(ttl) if ttl is not None else None
+        return {'token': self.token, 'issued_at': self.issued_at, 'expires_at': self.expires_at}
+
+    def _load_stored_token(self, api_client: ApiClient) -> bool:
+        """
+        Adopts the token of the store if it is still valid.
+        """
+        if self.token_store is None:
+            return False
+        return self._adopt_stored_token(self.token_store.load(self.get_store_key(api_client)), api_client)
+
+    def _adopt_stored_token(self, record: dict | None, api_client: ApiClient) -> bool:
+        if record is None or record['token'] == self.token:
+            return False
+        expires_at = record.get('expires_at')
+        if expires_at is not None and time() >= expires_at - self.refresh_margin:
+            return False
+
+        self.token = record['token']
+        self.issued_at = record.get('issued_at')
+        self.expires_at = expires_at
+        if self.auto_refresh:
+            self._schedule_refresh(api_client)
+        return True
+
+    def _store_lock(self, api_client: ApiClient):
+        if self.token_store is None:
+            return nullcontext()
+        return self.token_store.lock(self.get_store_key(api_client))
+
+    def _schedule_refresh(self, api_client: ApiClient) -> None:
+        self.cancel_refresh()
+        if self.expires_at is None:
+            return
+        delay = max(self.expires_at - self.refresh_margin - time(), 0)
+        self._refresh_timer = Timer(delay, self._background_refresh, args=(api_client,))
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self, api_client: ApiClient) -> None:
+        # Authenticators sharing a store have the same expiry, and so refresh at the same time:
+        # like get_bearer_token, a single one of them renews the token, the others adopt it
+        try:
+            with self._lock:
+                self._obtain_token(api_client)
+        except Exception:
+            # The next call to get_bearer_token will try again
+            pass
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock, get_ident
+from time import time
+from urllib.parse import urlencode
+
+class CachedResponse:
+    def __init__(self, result, etag: str | None = None, last_modified: str | None = None,
+                 stored_at: float | None = None):
+        """
+        Result of a GET request kept in a ResponseCache, along with its validators.
+
+        :param result: Decoded result of the response
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        :param stored_at: Time (UNIX timestamp) at which the response was received or revalidated
+        """
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at if stored_at is not None else time()
+
+    def get_conditional_headers(self) -> dict:
+        """
+        Returns the headers asking the API to answer 304 if the response did not change.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_dict(self) -> dict:
+        return {'result': self.result, 'etag': self.etag, 'last_modified': self.last_modified, 'stored_at': self.stored_at}
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0, path: str | None = None,
+                 max_files: int = 4096, max_age: float = 7 * 24 * 3600):
+        """
+        Cache of the GET responses of the API: an in-memory LRU, optionally backed by a directory.
+
+        A response younger than `ttl` is served without any request. Older ones are revalidated with
+        a conditional request (If-None-Match / If-Modified-Since), and served from the cache when the
+        API answers 304. Keys include a hash of the identity of the user (or of its Authorization header),
+        so a user never gets the responses of another one. Responses marked `Cache-Control: no-store`
+        are not cached.
+
+        The directory is pruned as responses are written: files not written for `max_age` are deleted,
+        then the oldest ones beyond `max_files`.
+
+        The API clients give each caller its own copy of a cached result, which it may modify freely.
+
+        :param max_entries: Maximum number of responses kept in memory
+        :param ttl: Time (in seconds) during which a response is served without revalidation, 0 to always revalidate
+        :param path: Directory where responses are also stored, to be shared between processes and restarts (optional)
+        :param max_files: Maximum number of responses kept in the directory
+        :param max_age: Time (in seconds) after which a response not written again is deleted from the directory
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_files = max_files
+        self.max_age = max_age
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._writes = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(api_url: str, params: dict, headers: dict, identity: str | None = None) -> str:
+        """
+        Builds the key of a GET request from its URL, its parameters and the identity of its sender.
+        """
+        return make_request_key(api_url, params, headers, identity)
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time() - entry.stored_at < self.ttl
+
+    def get(self, key: str) -> CachedResponse | None:
+        """
+        Returns the response stored under `key`, fresh or not, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._read(key) if self.path is not None else None
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def lookup(self, key: str) -> tuple[CachedResponse | None, bool]:
+        """
+        Returns the response stored under `key` and whether it can be served without revalidation.
+        """
+        entry = self.get(key)
+        fresh = entry is not None and self.is_fresh(entry)
+        if fresh:
+            with self._lock:
+                self.hits += 1
+        return entry, fresh
+
+    def store(self, key: str, result, headers) -> None:
+        """
+        Stores the result of a response downloaded from the API, unless the API forbids it.
+
+        :param key: Key of the request
+        :param result: Decoded result of the response
+        :param headers: Headers of the response
+        """
+        with self._lock:
+            self.misses += 1
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            self.delete(key)
+            return
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if self.ttl <= 0 and etag is None and last_modified is None:
+            # Could neither be served nor revalidated
+            return
+        self.set(key, CachedResponse(result, etag, last_modified))
+
+    def revalidate(self, key: str, entry: CachedResponse, headers) -> None:
+        """
+        Records that the API answered 304 for a stored response, which is fresh again.
+        """
+        with self._lock:
+            self.revalidated += 1
+        self.set(key, CachedResponse(entry.result, headers.get('ETag') or entry.etag,
+                                     headers.get('Last-Modified') or entry.last_modified))
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        self._remember(key, entry)
+        if self.path is not None:
+            self._write(key, entry)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.path is not None:
+            _remove(self._get_file(key))
+
+    def clear(self) -> None:
+        """
+        Forgets every response, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.path is not None and os.path.isdir(self.path):
+            for filename in os.listdir(self.path):
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(self.path, filename))
+
+    def prune(self) -> None:
+        """
+        Deletes the files of the directory not written for `max_age`, then the oldest ones beyond `max_files`.
+        """
+        if self.path is None or not os.path.isdir(self.path):
+            return
+        oldest = time() - self.max_age
+        files = []
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(('.json', '.tmp')):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                # Deleted by another process
+                continue
+            if mtime < oldest:
+                _remove(entry.path)
+            elif entry.name.endswith('.json'):
+                files.append((mtime, entry.path))
+        if len(files) > self.max_files:
+            files.sort()
+            for _, path in files[:len(files) - self.max_files]:
+                _remove(path)
+
+    def snapshot(self) -> dict:
+        """
+        Returns the counters of the cache: {'hits': int, 'revalidated': int, 'misses': int, 'entries': int}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+                    'entries': len(self._entries)}
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read(self, key: str) -> CachedResponse | None:
+        try:
+            with open(self._get_file(key), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get('key') != key:
+            return None
+        return CachedResponse(data['result'], data.get('etag'), data.get('last_modified'), data.get('stored_at'))
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        path = self._get_file(key)
+        tmp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        # Responses hold personal data: only their owner can read them
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, **entry.to_dict()}, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_INTERVAL == 1
+        if prune:
+            self.prune()
+
+# Number of responses written between two prunings of the directory (the first write prunes)
+_PRUNE_INTERVAL = 256
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def make_request_key(url: str, params: dict, headers: dict, identity: str | None = None) -> str:
+    """
+    Identifies a GET request by its URL, its parameters (in any order) and a hash of the identity of its sender.
+
+    :param identity: Stable identity of the sender, e.g. API, application and login; defaults to its
+                     Authorization header, which changes each time the token is renewed
+    """
+    if identity is None:
+        identity = headers.get('Authorization', '')
+    identity = hashlib.sha256(identity.encode('utf-8')).hexdigest()
+    query = urlencode(sorted(params.items()), doseq=True)
+    return f'{identity}|{url}?{query}'
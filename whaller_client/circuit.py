@@ -0,0 +1,201 @@
+from collections import deque
+from threading import Lock
+from time import monotonic
+from whaller_client.exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class Circuit:
+    def __init__(self, name: str, failure_rate: float = 0.5, slow_call_duration: float | None = None,
+                 slow_call_rate: float = 0.5, window_size: int = 20, min_calls: int = 10,
+                 open_timeout: float = 30.0, half_open_calls: int = 3) -> None:
+        """
+        State of the circuit of a group of endpoints.
+
+        While closed, the outcomes of the last `window_size` calls are kept; once at least `min_calls`
+        of them are known, the circuit opens if the rate of failed or of slow calls reaches its threshold.
+        While open, calls fail at once. After `open_timeout` seconds, it lets `half_open_calls` trial
+        calls through: it closes if they all succeed, and opens again at the first failed or slow one.
+
+        :param name: Name of the group of endpoints
+        :param failure_rate: Rate of failed calls (connection errors, 5xx) from which the circuit opens
+        :param slow_call_duration: Duration (in seconds) from which a call is slow, None to ignore latency
+        :param slow_call_rate: Rate of slow calls from which the circuit opens
+        :param window_size: Number of calls whose outcome is kept
+        :param min_calls: Number of outcomes needed before the rates are considered
+        :param open_timeout: Time (in seconds) during which calls fail at once once the circuit opened
+        :param half_open_calls: Number of successful trial calls needed to close the circuit again
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._window = deque()
+        self._failures = 0
+        self._slow_calls = 0
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = Lock()
+
+    def acquire(self) -> None:
+        """
+        Lets a call through, or fails at once if the circuit is open.
+
+        :raises CircuitOpenError: If the circuit is open, or half-open with every trial call in flight
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_timeout - now
+                if remaining > 0:
+                    raise CircuitOpenError(f"Circuit {self.name} is open, retry in {remaining:.1f}s")
+                self.state = HALF_OPEN
+                self._half_opened_at = now
+                self._trials = 0
+                self._trial_successes = 0
+            elif self._trials >= self.half_open_calls and now - self._half_opened_at >= self.open_timeout:
+                # Trial calls which never reported their outcome, e.g. interrupted: new ones are allowed
+                self._half_opened_at = now
+                self._trials = self._trial_successes
+            if self._trials >= self.half_open_calls:
+                raise CircuitOpenError(f"Circuit {self.name} is half-open, waiting for its trial calls")
+            self._trials += 1
+
+    def check(self) -> None:
+        """
+        Fails at once if a call would not be let through, without taking a trial call of a half-open circuit.
+
+        :raises CircuitOpenError: If the circuit is open, or half-open with every trial call in flight
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_timeout - now
+                if remaining > 0:
+                    raise CircuitOpenError(f"Circuit {self.name} is open, retry in {remaining:.1f}s")
+            elif self._trials >= self.half_open_calls and now - self._half_opened_at < self.open_timeout:
+                raise CircuitOpenError(f"Circuit {self.name} is half-open, waiting for its trial calls")
+
+    def record(self, failed: bool, seconds: float) -> None:
+        """
+        Records the outcome of a call let through.
+
+        :param failed: Whether the call failed (connection error, 5xx)
+        :param seconds: Duration of the call
+        """
+        slow = self.slow_call_duration is not None and seconds >= self.slow_call_duration
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self.state = CLOSED
+            elif self.state == CLOSED:
+                self._window.append((failed, slow))
+                self._failures += failed
+                self._slow_calls += slow
+                if len(self._window) > self.window_size:
+                    old_failed, old_slow = self._window.popleft()
+                    self._failures -= old_failed
+                    self._slow_calls -= old_slow
+                calls = len(self._window)
+                if calls >= self.min_calls and (self._failures / calls >= self.failure_rate
+                                                or self._slow_calls / calls >= self.slow_call_rate):
+                    self._open()
+            # Outcomes of the calls sent before the circuit opened are ignored
+
+    def release(self) -> None:
+        """
+        Gives back a call let through whose outcome is unknown, e.g. interrupted before being sent.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > self._trial_successes:
+                self._trials -= 1
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = monotonic()
+        self._window.clear()
+        self._failures = 0
+        self._slow_calls = 0
+
+class CircuitBreaker:
+    def __init__(self, prefixes: list[str] | tuple = (), **settings) -> None:
+        """
+        Circuit breakers of the API client, one per group of endpoints, shared by the threads
+        and coroutines using a client.
+
+        An endpoint belongs to the group of the longest of the `prefixes` it starts with, or else
+        to the group of its first path segment: 'upload/box_resource' and 'upload/chunk' share the
+        'upload' circuit, so that a degraded service is shed as a whole without failing the others.
+
+        :param prefixes: Prefixes of the endpoints grouped together, e.g. ['spheres/', 'upload/box_resource']
+        :param settings: Thresholds of the circuits (see Circuit)
+        """
+        self.prefixes = sorted(prefixes, key=len, reverse=True)
+        self.settings = settings
+        self._circuits = {}
+        self._lock = Lock()
+
+    def get_group(self, endpoint: str) -> str:
+        """
+        Returns the name of the group of `endpoint`.
+        """
+        path = endpoint.split('?', 1)[0]
+        for prefix in self.prefixes:
+            if path.startswith(prefix):
+                return prefix
+        return path.split('/', 1)[0]
+
+    def get_circuit(self, endpoint: str) -> Circuit:
+        """
+        Returns the circuit of the group of `endpoint`.
+        """
+        group = self.get_group(endpoint)
+        circuit = self._circuits.get(group)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.get(group)
+                if circuit is None:
+                    circuit = self._circuits[group] = Circuit(group, **self.settings)
+        return circuit
+
+    def check(self, endpoint: str) -> None:
+        """
+        Fails at once if a call to `endpoint` would not be let through, without letting it through yet.
+
+        :raises CircuitOpenError: If the circuit of the endpoint is open
+        """
+        self.get_circuit(endpoint).check()
+
+    def acquire(self, endpoint: str) -> Circuit:
+        """
+        Lets a call to `endpoint` through, and returns the circuit its outcome is recorded in.
+
+        :raises CircuitOpenError: If the circuit of the endpoint is open
+        """
+        circuit = self.get_circuit(endpoint)
+        circuit.acquire()
+        return circuit
+
+    def get_states(self) -> dict:
+        """
+        Returns the state of each circuit by group: {'upload': 'open', 'me': 'closed'}
+        """
+        with self._lock:
+            return {group: circuit.state for group, circuit in self._circuits.items()}
@@ -1,13 +1,44 @@
 import logging
+from typing import Callable, Iterable, Iterator
 from whaller_client.auth import Authenticator
 from whaller_client.api import ApiClient
+from whaller_client.cache import ResponseCache, make_request_key
+from whaller_client.circuit import CircuitBreaker
 from whaller_client.logger import Logger
+from whaller_client.metrics import MetricsRegistry
+from whaller_client.ratelimit import RateLimiter
+from whaller_client.retry import RetryPolicy
+from whaller_client.singleflight import SingleFlight
+from whaller_client.token_store import TokenStore
 
 class Client:
-    def __init__(self, base_url:str, client_id:str, client_token:str) -> None:
-        self.authenticator = Authenticator(client_id, client_token)
-        self.api = ApiClient(base_url)
-        self.logger = Logger('api', level=logging.INFO)
+    def __init__(self, base_url:str, client_id:str, client_token:str, pool_connections:int=10,
+                 pool_maxsize:int=10, keepalive_timeout:float|None=60.0,
+                 token_store:TokenStore|None=None, retry_policy:RetryPolicy|None=None,
+                 rate_limiter:RateLimiter|None=None, cache:ResponseCache|None=None,
+                 coalesce:bool=True, metrics:MetricsRegistry|None=None,
+                 middleware:Iterable[Callable]=(), connect_timeout:float|None=10.0,
+                 read_timeout:float|None=60.0, circuit_breaker:CircuitBreaker|None=None,
+                 auto_refresh:bool=False, token_ttl:float=3600.0, refresh_margin:float=60.0) -> None:
+        self.authenticator = Authenticator(client_id, client_token, token_ttl=token_ttl,
+                                           refresh_margin=refresh_margin, auto_refresh=auto_refresh,
+                                           token_store=token_store)
+        self.api = ApiClient(base_url, pool_connections, pool_maxsize, keepalive_timeout, retry_policy, rate_limiter, cache,
+                             metrics=metrics, middleware=middleware, connect_timeout=connect_timeout,
+                             read_timeout=read_timeout, circuit_breaker=circuit_breaker)
+        self.logger = Logger('api', level=logging.INFO, background=True, max_bytes=10 * 1024 * 1024, backup_count=3)
+        # Identical GET requests sent concurrently by several threads share a single call
+        self.singleflight = SingleFlight() if coalesce else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self.authenticator.cancel_refresh()
+        self.api.close()
 
     def set_credentials(self, login:str, password:str) -> None:
         self.authenticator.set_credentials(login, password)
@@ -17,7 +48,7 @@ class Client:
 
     def refresh_token(self):
         self.authenticator.refresh_token(self.api)
-    
+
     def get_api_token(self):
         return self.authenticator.get_bearer_token(self.api)
 
@@ -26,9 +57,30 @@ class Client:
         if with_auth:
             headers.update(self.get_api_token())
         return self.api.call_json(endpoint, "POST", data, headers)
-    
+
     def call_get(self, endpoint:str, data:dict={}, with_auth:bool=False) -> dict:
+        headers = {}
+        identity = None
+        if with_auth:
+            headers.update(self.get_api_token())
+            # Cached responses outlive the token: they are keyed by user
+            identity = self.authenticator.get_store_key(self.api)
+        if self.singleflight is None:
+            return self.api.call_json(endpoint, "GET", data, headers, identity=identity)
+        key = make_request_key(endpoint, data, headers)
+        return self.singleflight.do(key, lambda: self.api.call_json(endpoint, "GET", data, headers, identity=identity))
+
+    def stream_get(self, endpoint:str, data:dict={}, with_auth:bool=False) -> Iterator:
         headers = {}
         if with_auth:
             headers.update(self.get_api_token())
-        return self.api.call_json(endpoint, "GET", data, headers)
+        return self.api.stream_json(endpoint, data, headers)
+
+    def call_auth_post(self, endpoint:str, data:dict={}) -> dict:
+        return self.call_post(endpoint, data, True)
+
+    def call_auth_get(self, endpoint:str, data:dict={}) -> dict:
+        return self.call_get(endpoint, data, True)
+
+    def send_post_content(self, endpoint:str, params:dict, files:dict) -> dict:
+        return self.api.send_content(endpoint, params, files, self.get_api_token())
@@ -0,0 +1,84 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+class JsonCodec:
+    """
+    JSON encoder/decoder of the API requests and responses, based on the standard library.
+
+    Subclasses plug faster libraries in. Bodies are encoded to and decoded from bytes.
+    """
+    name = 'json'
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, content: bytes | str):
+        """
+        :raises ValueError: If the content is not valid JSON
+        """
+        return json.loads(content)
+
+class OrjsonCodec(JsonCodec):
+    """
+    Codec based on orjson, which decodes straight from the response bytes.
+    """
+    name = 'orjson'
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires orjson: pip install whaller-client[speedups]")
+
+    def dumps(self, obj) -> bytes:
+        # Non-string keys are accepted, like with the standard library
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, content: bytes | str):
+        return orjson.loads(content)
+
+class UjsonCodec(JsonCodec):
+    """
+    Codec based on ujson.
+    """
+    name = 'ujson'
+
+    def __init__(self) -> None:
+        if ujson is None:
+            raise ImportError("UjsonCodec requires ujson: pip install ujson")
+
+    def dumps(self, obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def loads(self, content: bytes | str):
+        return ujson.loads(content)
+
+CODECS = {'orjson': OrjsonCodec, 'ujson': UjsonCodec, 'json': JsonCodec}
+
+def get_codec(name: str | None = None) -> JsonCodec:
+    """
+    Returns a JSON codec.
+
+    :param name: 'orjson', 'ujson' or 'json', None for the fastest one installed
+    :raises ImportError: If the requested library is not installed
+    :raises ValueError: If the name is unknown
+    """
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError(f"Unknown JSON codec: {name}")
+        return CODECS[name]()
+
+    for codec_cls in CODECS.values():
+        try:
+            return codec_cls()
+        except ImportError:
+            continue
+
+default_codec = get_codec()
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import BinaryIO, Iterable
+from whaller_client.exceptions import UploadError
+
+class UploadContent(ABC):
+    """
+    Content of a file to upload, read lazily chunk by chunk.
+
+    Subclasses only keep what is needed to read a chunk on demand, so that the memory
+    used by an upload depends on the chunk size, not on the size of the file.
+    """
+    size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abstractmethod
+    def read(self, offset: int, length: int) -> bytes | memoryview:
+        """
+        Reads `length` bytes starting at `offset`.
+        """
+
+    def read_all(self) -> bytes | memoryview:
+        return self.read(0, self.size)
+
+    def close(self) -> None:
+        """
+        Releases the resources opened for this content (never closes objects given by the caller).
+        """
+
+class BytesContent(UploadContent):
+    def __init__(self, content: bytes | bytearray | memoryview) -> None:
+        """
+        In-memory content, served as zero-copy memoryview windows.
+        """
+        self.content = content
+        self.view = memoryview(content)
+        self.size = len(self.view)
+
+    def read(self, offset: int, length: int) -> memoryview:
+        return self.view[offset:offset + length]
+
+    def read_all(self) -> bytes | bytearray | memoryview:
+        return self.content
+
+class FileContent(UploadContent):
+    def __init__(self, fileobj: BinaryIO, owned: bool = False) -> None:
+        """
+        Content of a seekable binary file, from its current position to its end.
+
+        :param fileobj: Binary file object
+        :param owned: Close the file object along with this content
+        """
+        self.fileobj = fileobj
+        self.owned = owned
+        self.start = fileobj.tell()
+        self.size = fileobj.seek(0, os.SEEK_END) - self.start
+        fileobj.seek(self.start)
+        self._lock = Lock()
+        try:
+            self._fd = fileobj.fileno() if hasattr(os, 'pread') else None
+        except (AttributeError, OSError):
+            self._fd = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        position = self.start + offset
+        if self._fd is not None:
+            # pread neither moves nor depends on the file position: safe to call from several threads
+            data = os.pread(self._fd, length, position)
+            while len(data) < length:
+                more = os.pread(self._fd, length - len(data), position + len(data))
+                if not more:
+                    break
+                data += more
+            return data
+
+        with self._lock:
+            self.fileobj.seek(position)
+            return self.fileobj.read(length)
+
+    def close(self) -> None:
+        if self.owned:
+            self.fileobj.close()
+
+class IterableContent(UploadContent):
+    def __init__(self, iterable: Iterable[bytes], size: int) -> None:
+        """
+        Content produced by an iterator of bytes whose total size is known in advance.
+
+        Chunks must be read in order, as the iterator cannot be rewound.
+        """
+        self.iterator = iter(iterable)
+        self.size = size
+        self._buffer = bytearray()
+        self._position = 0
+        self._lock = Lock()
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if offset != self._position:
+                raise UploadError(f"Iterable content must be read sequentially (expected offset {self._position}, got {offset})")
+
+            while len(self._buffer) < length:
+                piece = next(self.iterator, None)
+                if piece is None:
+                    raise UploadError(f"Iterable content ended before its announced size of {self.size} bytes")
+                self._buffer += piece
+
+            data = bytes(self._buffer[:length])
+            del self._buffer[:length]
+            self._position += length
+            return data
+
+def open_content(content, size: int | None = None, spool_size: int = 10 * 1024 * 1024) -> UploadContent:
+    """
+    Wraps content to upload into an UploadContent.
+
+    :param content: bytes-like object, path to a file, binary file object, iterable of bytes or UploadContent
+    :param size: Total size of an iterable (when unknown, the iterable is spooled to a temporary file)
+    :param spool_size: Bytes kept in memory before an iterable of unknown size is spooled to disk
+    :return: UploadContent reading the content lazily
+    """
+    if isinstance(content, UploadContent):
+        return content
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return BytesContent(content)
+    if isinstance(content, (str, os.PathLike)):
+        return FileContent(open(content, 'rb'), owned=True)
+    if hasattr(content, 'read'):
+        fileobj = content
+        if getattr(fileobj, 'seekable', lambda: False)():
+            return FileContent(fileobj)
+        content = iter(lambda: fileobj.read(spool_size), b'')
+    if size is not None:
+        return IterableContent(content, size)
+    return _spool(content, spool_size)
+
+def _spool(iterable: Iterable[bytes], spool_size: int) -> UploadContent:
+    """
+    Consumes an iterable of unknown size, in memory while it is small and in a temporary file afterwards.
+    """
+    buffer = bytearray()
+    iterator = iter(iterable)
+    for piece in iterator:
+        buffer += piece
+        if len(buffer) > spool_size:
+            break
+    else:
+        return BytesContent(bytes(buffer))
+
+    spool = tempfile.TemporaryFile()
+    spool.write(buffer)
+    del buffer
+    for piece in iterator:
+        spool.write(piece)
+    spool.seek(0)
+    return FileContent(spool, owned=True)
+
+def hash_content(source: UploadContent, block_size: int = 1024 * 1024) -> str:
+    """
+    Computes the SHA-256 of a content, reading it block by block.
+
+    :param source: Content to hash (it must be readable at any offset)
+    :param block_size: Number of bytes read at once
+    :return: Hexadecimal digest
+    :raises UploadError: If the content comes from an iterable, which can only be read once
+    """
+    if isinstance(source, IterableContent):
+        raise UploadError("Content read from an iterable cannot be hashed before being uploaded")
+
+    digest = hashlib.sha256()
+    for offset in range(0, source.size, block_size):
+        digest.update(source.read(offset, min(block_size, source.size - offset)))
+    return digest.hexdigest()
+
+class MultipartBody:
+    def __init__(self, fields: dict, files: dict, boundary: str | None = None) -> None:
+        """
+        multipart/form-data request body that is streamed part by part.
+
+        File contents are sent as they are (memoryview windows included) instead of being copied
+        into one large encoded body, and the total length is known so that a Content-Length is sent.
+
+        :param fields: Form fields
+        :param files: Files to send ({'field': (filename, content, mimes)})
+        :param boundary: Multipart boundary (random when omitted)
+        """
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.parts = []
+
+        for name, value in fields.items():
+            self.parts.append(self._header(name) + b'\r\n' + str(value).encode('utf-8') + b'\r\n')
+        for name, (filename, content, mimes) in files.items():
+            header = self._header(name, filename) + f'Content-Type: {mimes}\r\n'.encode('utf-8') + b'\r\n'
+            self.parts.extend((header, content.encode('utf-8') if isinstance(content, str) else content, b'\r\n'))
+        self.parts.append(f'--{self.boundary}--\r\n'.encode('utf-8'))
+
+    def _header(self, name: str, filename: str | None = None) -> bytes:
+        disposition = f'form-data; name="{_quote(name)}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(filename)}"'
+        return f'--{self.boundary}\r\nContent-Disposition: {disposition}\r\n'.encode('utf-8')
+
+    def __len__(self) -> int:
+        return sum(memoryview(part).nbytes for part in self.parts)
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    def __bytes__(self) -> bytes:
+        return b''.join(self.parts)
+
+def _quote(value: str) -> str:
+    # HTML5 escaping of multipart header parameters
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar, copy_context
+from time import monotonic
+from whaller_client.exceptions import DeadlineExceededError
+
+# Monotonic time at which the operation in progress must be over, None without deadline
+_expires_at: ContextVar[float | None] = ContextVar('whaller_deadline', default=None)
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Gives the block a total time budget, shared by every request it sends.
+
+    Requests are sent with their timeouts shortened to the time left, are not retried past the
+    deadline, and fail with DeadlineExceededError once it has passed. Nested deadlines can only
+    shorten the budget. The deadline follows the context: asyncio tasks created within the block
+    inherit it, and so do the worker threads of the client (see `submit`).
+
+    :param seconds: Time budget of the block
+    """
+    expires_at = monotonic() + seconds
+    current = _expires_at.get()
+    if current is not None and current < expires_at:
+        expires_at = current
+    token = _expires_at.set(expires_at)
+    try:
+        yield
+    finally:
+        _expires_at.reset(token)
+
+def get_remaining() -> float | None:
+    """
+    Returns the time (in seconds) left before the current deadline, None without deadline.
+    """
+    expires_at = _expires_at.get()
+    return None if expires_at is None else expires_at - monotonic()
+
+def is_expired() -> bool:
+    """
+    Tells whether the current deadline has passed.
+    """
+    remaining = get_remaining()
+    return remaining is not None and remaining <= 0
+
+def check_deadline(what: str) -> float | None:
+    """
+    Returns the time left before the current deadline, None without deadline.
+
+    :param what: What is about to be done, used in the error message
+    :raises DeadlineExceededError: If the deadline has passed
+    """
+    remaining = get_remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError(f"Deadline exceeded before {what}")
+    return remaining
+
+def check_retry_delay(delay: float, what: str) -> None:
+    """
+    Raises DeadlineExceededError if waiting `delay` seconds before retrying would reach the deadline.
+
+    :param delay: Time (in seconds) before the next attempt
+    :param what: What failed, used in the error message
+    """
+    remaining = get_remaining()
+    if remaining is not None and delay >= remaining:
+        raise DeadlineExceededError(f"Deadline exceeded: no time left to retry after {what}")
+
+def check_wait(delay: float, what: str) -> None:
+    """
+    Raises DeadlineExceededError if waiting `delay` seconds would reach the deadline.
+
+    :param delay: Time (in seconds) to wait
+    :param what: What is waited for, used in the error message
+    """
+    remaining = get_remaining()
+    if remaining is not None and delay >= remaining:
+        raise DeadlineExceededError(f"Deadline exceeded: no time left for {what}")
+
+def clip_timeout(timeout: float | None, remaining: float | None) -> float | None:
+    """
+    Shortens a timeout to the time left before the deadline.
+    """
+    if remaining is None:
+        return timeout
+    return remaining if timeout is None else min(timeout, remaining)
+
+def submit(executor: Executor, fn, *args, **kwargs) -> Future:
+    """
+    Submits `fn(*args, **kwargs)` to the executor, to be run in a copy of the current context
+    so that the deadline of the caller applies in the worker thread.
+    """
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+@contextmanager
+def hold(lock, what: str):
+    """
+    Holds a threading lock, giving up with DeadlineExceededError if the deadline passes first.
+    """
+    remaining = check_deadline(what)
+    if not lock.acquire(timeout=-1 if remaining is None else remaining):
+        raise DeadlineExceededError(f"Deadline exceeded before {what}")
+    try:
+        yield
+    finally:
+        lock.release()
+
+@asynccontextmanager
+async def hold_async(lock: asyncio.Lock, what: str):
+    """
+    Holds an asyncio lock, giving up with DeadlineExceededError if the deadline passes first.
+    """
+    remaining = check_deadline(what)
+    if remaining is None:
+        await lock.acquire()
+    else:
+        try:
+            await asyncio.wait_for(lock.acquire(), remaining)
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceededError(f"Deadline exceeded before {what}") from e
+    try:
+        yield
+    finally:
+        lock.release()
@@ -0,0 +1,76 @@
+import json
+import os
+from threading import Lock
+
+class DedupIndex:
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Index of the files already uploaded, by SHA-256 of their content, to the `cloudfile_id`
+        the API returned for them, so that the same content is never sent twice.
+
+        An index must only be shared by uploads to the same Whaller instance.
+
+        :param path: Path of the JSON file the index is stored in, None to keep it in memory
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._files = self._load()
+
+    def _load(self) -> dict:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # A corrupted index only costs uploading the files again
+            return {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': self._files}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, digest: str):
+        """
+        Returns the `cloudfile_id` of the content with the given SHA-256, or None.
+        """
+        with self._lock:
+            cloudfile_id = self._files.get(digest)
+            if cloudfile_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return cloudfile_id
+
+    def set(self, digest: str, cloudfile_id) -> None:
+        """
+        Records the `cloudfile_id` returned by the API for the content with the given SHA-256.
+        """
+        with self._lock:
+            self._files[digest] = cloudfile_id
+            self._save()
+
+    def discard(self, digest: str) -> None:
+        """
+        Forgets a content, e.g. once its cloudfile is known to be gone.
+        """
+        with self._lock:
+            if self._files.pop(digest, None) is not None:
+                self._save()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the counters of the index: {'hits': int, 'misses': int, 'entries': int}
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._files)}
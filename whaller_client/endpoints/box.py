@@ -1,15 +1,26 @@
 import os
+import posixpath
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from threading import BoundedSemaphore
+from typing import Callable, Iterable
 from whaller_client.client import Client
+from whaller_client.deadline import submit
 from whaller_client.endpoints.upload import Upload
+from whaller_client.exceptions import ApiError
 
 class Box:
-    def __init__(self, client: Client, external_id: str) -> None:
+    def __init__(self, client: Client, external_id: str, upload_client: Upload | None = None) -> None:
         """
         Class to manage file and folder storage within an organization.
+
+        :param client: Instance of the Client class
+        :param external_id: External ID of the sphere
+        :param upload_client: Upload instance used to send files (optional, e.g. to enable parallel chunks)
         """
         self.client = client
         self.sphere_external_id = external_id
-        self.upload_client = Upload(client)
+        self.upload_client = upload_client or Upload(client)
 
     def create_folder(self, name: str, parent_id: int | None = None) -> int:
         """
@@ -29,18 +40,126 @@ class Box:
         response = self.client.call_auth_post(f'spheres/{self.sphere_external_id}/boxresources', data)
         return response.get('id', -1)  # Returns -1 if 'id' is not in the response
 
-    def create_file(self, name: str, content: bytes, mimes: str, parent_id: int | None = None) -> dict:
+    def create_tree(self, tree: dict | str, parent_id: int | None = None, max_workers: int = 8,
+                    existing: dict | None = None) -> dict:
+        """
+        Creates a tree of folders, level by level: the folders of a level are created concurrently,
+        once their parents exist, so that the tree takes one round-trip per level.
+
+        :param tree: Nested dict of folder names ({'a': {'b': {}, 'c': None}}), or path of a local
+                     directory whose subdirectories are mirrored
+        :param parent_id: ID of the folder in which the tree is created (optional)
+        :param max_workers: Number of folders created at the same time
+        :param existing: IDs of the folders of the tree which already exist, by path: they are not created again
+        :return: ID of each folder by its path in the tree ({'a': 1, 'a/b': 2, 'a/c': 3})
+        :raises Exception: The first error creating a folder, once its level is over, with the IDs of
+                           the folders which exist by then in its `folders` attribute
+        """
+        ids = {'': parent_id, **(existing or {})}
+
+        def create(folder: tuple[str, str]) -> int:
+            path, name = folder
+            return self.create_folder(name, ids[posixpath.dirname(path)])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in get_tree_levels(tree):
+                level = [folder for folder in level if folder[0] not in ids]
+                futures = [submit(executor, create, folder) for folder in level]
+                add_tree_level(ids, level, [future.exception() or future.result() for future in futures])
+        del ids['']
+        return ids
+
+    def create_file(self, name: str, content, mimes: str, parent_id: int | None = None) -> dict:
         """
         Uploads a file and creates an associated resource.
 
+        When the uploader deduplicates contents and the cloudfile of an already uploaded content
+        cannot be referenced anymore, it is forgotten and the content is uploaded again.
+
         :param name: Name of the file
-        :param content: Content of the file as bytes
+        :param content: Content of the file (bytes, path, binary file object, iterable of bytes or UploadContent)
         :param mimes: MIME type of the file
         :param parent_id: ID of the parent folder (optional)
         :return: Dictionary containing the information of the created file
         """
-        file_data = self.upload_client.boxresource(name, content, mimes, self.sphere_external_id)
+        return self._create_file(name, content, mimes, parent_id, nullcontext(), nullcontext())
+
+    def create_files(self, files: Iterable[tuple], parent_id: int | None = None, max_workers: int = 8,
+                     metadata_workers: int = 4,
+                     progress: Callable[[int, dict | Exception, int], None] | None = None) -> list:
+        """
+        Uploads files and creates their resources as a pipeline: as soon as a file is uploaded, its
+        resource is created while the next files are uploading.
+
+        Uploads and resource creations go through separate lanes of `max_workers` and `metadata_workers`
+        requests, so that slow uploads never hold back the resource creations. The iterable is consumed
+        as files complete, so it may be a generator of any length. An error on a file does not stop the
+        others: it takes the place of the file's result.
+
+        :param files: Files to create, as (name, content, mimes) or (name, content, mimes, parent_id) tuples
+        :param parent_id: ID of the parent folder of the files which do not set one (optional)
+        :param max_workers: Number of files uploaded at the same time
+        :param metadata_workers: Number of resources created at the same time
+        :param progress: Called in the calling thread as each file completes, with its index in `files`,
+                         its result or exception, and the number of files completed so far (optional)
+        :return: Result of create_file, or the exception raised, for each file in the order of `files`
+        """
+        uploads = BoundedSemaphore(max_workers)
+        metadata = BoundedSemaphore(metadata_workers)
+        workers = max_workers + metadata_workers
+        results = []
+        pending = {}
+        completed = 0
+
+        def collect(done) -> None:
+            nonlocal completed
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = e
+                completed += 1
+                if progress is not None:
+                    progress(index, results[index], completed)
 
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, item in enumerate(files):
+                # A few files wait for a free worker, the next ones are not read from the iterable yet
+                if len(pending) >= 2 * workers:
+                    collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+                name, content, mimes, *folder = item
+                results.append(None)
+                future = submit(executor, self._create_file, name, content, mimes,
+                                folder[0] if folder else parent_id, uploads, metadata)
+                pending[future] = index
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+
+        return results
+
+    def _create_file(self, name: str, content, mimes: str, parent_id: int | None, uploads, metadata) -> dict:
+        """
+        Uploads a file within the `uploads` context, then creates its resource within the `metadata` one.
+        """
+        with uploads:
+            file_data = self.upload_client.boxresource(name, content, mimes, self.sphere_external_id)
+        try:
+            with metadata:
+                return self._create_file_resource(name, file_data, parent_id)
+        except ApiError:
+            if not file_data.get('deduplicated'):
+                raise
+        self.upload_client.dedup.discard(file_data['hash'])
+        with uploads:
+            file_data = self.upload_client.boxresource(name, content, mimes, self.sphere_external_id)
+        with metadata:
+            return self._create_file_resource(name, file_data, parent_id)
+
+    def _create_file_resource(self, name: str, file_data: dict, parent_id: int | None) -> dict:
+        """
+        Creates the box resource of an uploaded file.
+        """
         resource = {
             'name': os.path.splitext(name)[0],  # Name without extension
             'ext': os.path.splitext(name)[1].lstrip('.'),  # Extension without the dot
@@ -52,3 +171,56 @@ class Box:
             resource['parent_id'] = parent_id
 
         return self.client.call_auth_post(f'spheres/{self.sphere_external_id}/boxresources', resource)
+
+def get_tree_levels(tree: dict | str) -> list[list[tuple[str, str]]]:
+    """
+    Lists the folders of a tree level by level, as (path, name) tuples, the parent of a folder
+    being the dirname of its path.
+
+    :param tree: Nested dict of folder names, or path of a local directory
+    """
+    if not isinstance(tree, dict):
+        tree = _read_directory(tree)
+
+    levels = []
+    level = [('', tree)]
+    while level:
+        folders = []
+        next_level = []
+        for path, children in level:
+            for name, subtree in (children or {}).items():
+                folder_path = posixpath.join(path, name)
+                folders.append((folder_path, name))
+                next_level.append((folder_path, subtree))
+        if folders:
+            levels.append(folders)
+        level = next_level
+    return levels
+
+def add_tree_level(ids: dict, level: list[tuple[str, str]], results: list) -> None:
+    """
+    Records the IDs of the folders of a level of a tree, as created by create_tree.
+
+    :param ids: ID of each folder by its path, the parent of the tree under ''
+    :param level: Folders of the level, as (path, name) tuples
+    :param results: ID of each folder of the level, or the exception raised creating it
+    :raises BaseException: The first exception of the level, with the IDs of the folders created
+                           so far (without '') in its `folders` attribute
+    """
+    error = None
+    for (path, _), result in zip(level, results):
+        if isinstance(result, BaseException):
+            error = error or result
+        else:
+            ids[path] = result
+    if error is not None:
+        # The caller can still record the folders created before the error
+        error.folders = {path: folder_id for path, folder_id in ids.items() if path}
+        raise error
+
+def _read_directory(path: str) -> dict:
+    # Subdirectories of a local directory, as a nested dict (symbolic links are not followed)
+    with os.scandir(path) as entries:
+        return {entry.name: _read_directory(entry.path)
+                for entry in sorted(entries, key=lambda entry: entry.name)
+                if entry.is_dir(follow_symlinks=False)}
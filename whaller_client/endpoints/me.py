@@ -1,4 +1,5 @@
 from whaller_client.client import Client
+from whaller_client.pagination import iter_items
 
 class Me:
     def __init__(self, client: Client):
@@ -46,6 +47,65 @@ class Me:
         """
         return self.client.call_get("me/networks", data, True)
     
+    def stream_spheres(self, data: dict = {}):
+        """
+        Iterates over the spheres of the current user as they are received, without loading
+        the whole list in memory.
+
+        :return: Iterator over the spheres
+        :link: https://developer.whaller.com/#api-Me-spheres
+        """
+        return self.client.stream_get("me/spheres", data, True)
+
+    def stream_networks(self, data: dict = {}):
+        """
+        Iterates over the organizations and spheres of the current user as they are received,
+        without loading the whole list in memory.
+
+        :return: Iterator over the organizations and spheres
+        :link: https://developer.whaller.com/#api-Me-network
+        """
+        return self.client.stream_get("me/networks", data, True)
+
+    def iter_spheres(self, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the spheres of the current user, fetching them page by page as they are consumed.
+
+        :param data: Parameters of the request
+        :param page_size: Number of spheres per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Iterator over the spheres
+        :link: https://developer.whaller.com/#api-Me-spheres
+        """
+        return iter_items(self.list_spheres, data, page_size, prefetch)
+
+    def iter_networks(self, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the organizations and spheres of the current user, fetching them page by page
+        as they are consumed.
+
+        :param data: Parameters of the request
+        :param page_size: Number of organizations per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Iterator over the organizations and spheres
+        :link: https://developer.whaller.com/#api-Me-network
+        """
+        return iter_items(self.list_networks, data, page_size, prefetch)
+
+    def iter_notifications(self, login: str, data: dict = {}, page_size: int = 50, prefetch: bool = True):
+        """
+        Iterates over the notifications of a given user, fetching them page by page as they are consumed.
+
+        :param login: User's login identifier
+        :param data: Parameters of the request
+        :param page_size: Number of notifications per page
+        :param prefetch: Fetch the next page while the current one is consumed
+        :return: Iterator over the notifications
+        :link: https://developer.whaller.com/#api-Me-persons
+        """
+        fetch = lambda params: self.client.call_get(f"persons/{login}/notifications", params, True)
+        return iter_items(fetch, data, page_size, prefetch)
+
     def list_phones(self, status: str = ""):
         """
         Retrieves a list of phones for the current user.
@@ -1,14 +1,160 @@
 import uuid
 import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from threading import Lock
+from time import perf_counter
 from whaller_client.client import Client
+from whaller_client.content import IterableContent, open_content, hash_content
+from whaller_client.deadline import submit
+from whaller_client.dedup import DedupIndex
+from whaller_client.journal import UploadJournal
+from whaller_client.metrics import MetricsRegistry
+
+class TransferStats:
+    def __init__(self, size: int, seconds: float, chunks: int, chunksize: int | None = None, workers: int = 1) -> None:
+        """
+        Throughput measured for one upload.
+
+        :param size: Number of bytes sent
+        :param seconds: Wall-clock duration of the upload
+        :param chunks: Number of requests used to send the file
+        :param chunksize: Size of the chunks
+        :param workers: Number of chunks in flight at the same time
+        """
+        self.size = size
+        self.seconds = seconds
+        self.chunks = chunks
+        self.chunksize = chunksize
+        self.workers = workers
+
+    @property
+    def mbps(self) -> float:
+        """
+        Aggregate throughput in MB/s.
+        """
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / (1024 * 1024) / self.seconds
+
+    def __repr__(self) -> str:
+        return f"TransferStats(size={self.size}, seconds={self.seconds:.3f}, chunks={self.chunks}, mbps={self.mbps:.2f})"
+
+class AdaptiveChunking:
+    def __init__(self, min_size: int = 1024 * 1024, max_size: int = 50 * 1024 * 1024,
+                 initial_size: int = 10 * 1024 * 1024, target_seconds: float = 2.0, max_workers: int = 1,
+                 smoothing: float = 0.3, step: int = 256 * 1024) -> None:
+        """
+        Chooses the chunk size, and the number of chunks in flight, of the chunked uploads from the
+        throughput measured on the previous chunks.
+
+        Chunks are sized to take about `target_seconds` to be sent: large on fast links, to save
+        round-trips, and small on slow or lossy links, so that a failed chunk is cheap to send again.
+        A failed chunk halves the size. With `max_workers` > 1, the number of chunks in flight moves
+        by one after each upload, in the direction that improves its throughput.
+
+        The chunks of an upload all have the same size: sizes only change from one upload to the next.
+        May be shared by several uploaders.
+
+        :param min_size: Smallest chunk size
+        :param max_size: Largest chunk size, which must be accepted by the server
+        :param initial_size: Chunk size before any measurement
+        :param target_seconds: Time a chunk should take to be sent
+        :param max_workers: Largest number of chunks in flight
+        :param smoothing: Weight of the last chunk in the measured throughput (exponential moving average)
+        :param step: Chunk sizes are multiples of this size
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.max_workers = max_workers
+        self.smoothing = smoothing
+        self.step = step
+        self.chunksize = self._clamp(initial_size)
+        self.workers = 1
+        self.throughput = None
+        self.history = deque(maxlen=100)
+        self._last_mbps = None
+        self._direction = 1
+        self._lock = Lock()
+
+    def _clamp(self, size: float) -> int:
+        size = int(size) // self.step * self.step
+        return max(self.min_size, min(self.max_size, size))
+
+    def record_chunk(self, size: int, seconds: float) -> None:
+        """
+        Records the time taken to send a chunk.
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            rate = size / seconds
+            if self.throughput is None:
+                self.throughput = rate
+            else:
+                self.throughput = self.smoothing * rate + (1 - self.smoothing) * self.throughput
+            self.chunksize = self._clamp(self.throughput * self.target_seconds)
+
+    def record_failure(self) -> None:
+        """
+        Records that a chunk could not be sent.
+        """
+        with self._lock:
+            self.chunksize = self._clamp(self.chunksize // 2)
+            self.throughput = self.chunksize / self.target_seconds
+
+    def record_upload(self, stats: TransferStats) -> None:
+        """
+        Records the throughput of a complete upload, and tunes the number of chunks in flight.
+        """
+        with self._lock:
+            self.history.append(stats)
+            # An upload of fewer chunks than workers does not tell anything about parallelism
+            if self.max_workers <= 1 or stats.chunks <= stats.workers:
+                return
+            if self._last_mbps is not None and stats.mbps < self._last_mbps:
+                self._direction = -self._direction
+            self._last_mbps = stats.mbps
+            self.workers = max(1, min(self.max_workers, self.workers + self._direction))
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current choices and measurements:
+        {'chunksize': int, 'workers': int, 'throughput': float | None (bytes/s per chunk), 'uploads': int}
+        """
+        with self._lock:
+            return {'chunksize': self.chunksize, 'workers': self.workers, 'throughput': self.throughput,
+                    'uploads': len(self.history)}
 
 class Upload:
-    def __init__(self, client: Client) -> None:
+    def __init__(self, client: Client, max_workers: int = 1, ordered: bool = True, last_chunk_last: bool = True,
+                 journal: UploadJournal | None = None, dedup: DedupIndex | None = None,
+                 adaptive: AdaptiveChunking | None = None, metrics: MetricsRegistry | None = None) -> None:
         """
         Class that manages the upload of a document within an organization.
+
+        :param client: Instance of the Client class
+        :param max_workers: Number of chunks in flight at the same time during a chunked upload
+        :param ordered: Acknowledge chunks in index order (a new chunk starts only when the oldest in-flight one
+                        completes) instead of starting a new chunk as soon as any in-flight one completes
+        :param last_chunk_last: Send the last chunk only once every other chunk has been acknowledged
+        :param journal: Journal making chunked uploads resumable (optional)
+        :param dedup: Index of the contents already uploaded, which are then not sent again (optional)
+        :param adaptive: Chooses the chunk size and the number of chunks in flight instead of `chunksize`
+                         and `max_workers` (optional)
+        :param metrics: Registry recording the duration and size of the chunks sent, defaults to the client's
         """
         self.client = client
         self.chunksize = 10 * 1024 * 1024  # 10 MB
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.last_chunk_last = last_chunk_last
+        self.journal = journal
+        self.dedup = dedup
+        self.adaptive = adaptive
+        self.metrics = metrics if metrics is not None else client.api.metrics
+        self.last_stats = None
 
     def _upload(self, endpoint: str, params: dict, files: dict) -> dict:
         """
@@ -16,61 +162,202 @@ class Upload:
         """
         return self.client.send_post_content(endpoint, params, files)
 
-    def _upload_with_chunking(self, endpoint: str, filename: str, content: bytes, mimes: str, sphere_external_id: str = None) -> dict:
+    def _upload_with_chunking(self, endpoint: str, filename: str, content, mimes: str, sphere_external_id: str = None,
+                              digest: str | None = None, chunksize: int | None = None,
+                              max_workers: int | None = None) -> dict:
         """
         Performs a chunked upload for large files.
 
+        Chunks are read from the content only when they are about to be sent, and up to `max_workers`
+        of them are in flight at once; throughput of the upload is stored in `last_stats`.
+
+        With a journal, acknowledged chunks are recorded so that a later call for the same content
+        and destination reuses the same dzuuid and only sends the missing chunks.
+
         :param endpoint: API endpoint for the upload
         :param filename: Name of the file
-        :param content: File content in bytes
+        :param content: File content (bytes, path, binary file object, iterable of bytes or UploadContent)
         :param mimes: MIME type of the file
         :param sphere_external_id: External ID of the sphere (optional)
+        :param digest: SHA-256 of the content, when already known
+        :param chunksize: Size of the chunks, defaults to `chunksize`
+        :param max_workers: Number of chunks in flight, defaults to `max_workers`
         :return: API response after upload
         """
-        dzuuid = uuid.uuid4()
-        dztotalfilesize = len(content)
-        dztotalchunkcount = math.ceil(dztotalfilesize / self.chunksize)
+        chunksize = chunksize or self.chunksize
+        max_workers = max_workers or self.max_workers
+        with open_content(content, spool_size=self.chunksize) as source:
+            dztotalfilesize = source.size
+
+            # An iterable can only be read once: it can neither be hashed beforehand nor resumed
+            if self.journal is not None and not isinstance(source, IterableContent):
+                journal_key = f'{endpoint}:{sphere_external_id}:{digest or hash_content(source)}'
+                # A resumed upload keeps its chunks, even if the chunk size has changed since; None while the
+                # same content is being uploaded to the same destination, this upload then not being journaled
+                opened = self.journal.open(journal_key, chunksize)
+            else:
+                opened = None
+            if opened is not None:
+                dzuuid, chunksize, acknowledged = opened
+            else:
+                journal_key = None
+                dzuuid, acknowledged = str(uuid.uuid4()), set()
+            dztotalchunkcount = math.ceil(dztotalfilesize / chunksize)
+            last_chunk = dztotalchunkcount - 1
+
+            def read_chunk(dzchunkindex: int):
+                start = dzchunkindex * chunksize
+                return source.read(start, min(chunksize, dztotalfilesize - start))
+
+            def send_chunk(dzchunkindex: int, dzcontent) -> dict:
+                files = {'userfile': (filename, dzcontent, mimes)}
+
+                params = {
+                    'dzuuid': dzuuid,
+                    'dztotalfilesize': dztotalfilesize,
+                    'dztotalchunkcount': dztotalchunkcount,
+                    'dzchunkindex': dzchunkindex,
+                    'dzchunkbyteoffset': dzchunkindex * chunksize,
+                    'dzchunksize': len(dzcontent),
+                }
+
+                if sphere_external_id:
+                    params['sphere_id'] = sphere_external_id
+
+                sent_at = perf_counter()
+                try:
+                    response = self._upload(endpoint, params, files)
+                except Exception:
+                    if self.adaptive is not None:
+                        self.adaptive.record_failure()
+                    if self.metrics is not None:
+                        self.metrics.inc('upload_chunk_failures_total')
+                    raise
+                seconds = perf_counter() - sent_at
+                if self.adaptive is not None:
+                    self.adaptive.record_chunk(len(dzcontent), seconds)
+                if self.metrics is not None:
+                    # Throughput of the chunks: upload_bytes_total / sum of upload_chunk_seconds
+                    self.metrics.observe('upload_chunk_seconds', seconds)
+                    self.metrics.inc('upload_bytes_total', len(dzcontent))
+                # The last chunk is never journaled: it is always sent again, to get the file data back
+                if journal_key is not None and dzchunkindex != last_chunk:
+                    self.journal.ack(journal_key, dzchunkindex)
+                return response
+
+            # Missing chunks, the last chunk always being sent last
+            indexes = [i for i in range(last_chunk) if i not in acknowledged] + [last_chunk]
+
+            started = perf_counter()
+            try:
+                if max_workers > 1:
+                    response = self._send_chunks_parallel(read_chunk, send_chunk, indexes, max_workers)
+                else:
+                    for dzchunkindex in indexes:
+                        response = send_chunk(dzchunkindex, read_chunk(dzchunkindex))
+                if journal_key is not None:
+                    self.journal.discard(journal_key)
+            finally:
+                if journal_key is not None:
+                    self.journal.release(journal_key)
+            sent = sum(min(chunksize, dztotalfilesize - i * chunksize) for i in indexes)
+            self.last_stats = TransferStats(sent, perf_counter() - started, len(indexes), chunksize, max_workers)
+            if self.adaptive is not None:
+                self.adaptive.record_upload(self.last_stats)
+
+        return response
+
+    def _send_chunks_parallel(self, read_chunk, send_chunk, indexes: list[int], max_workers: int | None = None) -> dict:
+        """
+        Sends chunks with up to `max_workers` requests in flight.
 
-        for dzchunkindex in range(dztotalchunkcount):
-            start = dzchunkindex * self.chunksize
-            end = min(start + self.chunksize, dztotalfilesize)
-            dzcontent = content[start:end]
-            dzchunkbyteoffset = start
-            dzchunksize = len(dzcontent)
-            files = {'userfile': (filename, dzcontent, mimes)}
+        Chunks are read in order from the calling thread, right before being handed to a worker,
+        so that no more than `max_workers` chunks are held in memory.
 
-            params = {
-                'dzuuid': str(dzuuid),
-                'dztotalfilesize': dztotalfilesize,
-                'dztotalchunkcount': dztotalchunkcount,
-                'dzchunkindex': dzchunkindex,
-                'dzchunkbyteoffset': dzchunkbyteoffset,
-                'dzchunksize': dzchunksize,
-            }
+        :param read_chunk: Callable returning the content of the chunk of the given index
+        :param send_chunk: Callable sending the chunk of the given index and content
+        :param indexes: Indexes of the chunks to send, the last chunk of the file last
+        :param max_workers: Number of chunks in flight, defaults to `max_workers`
+        :return: Response of the chunk acknowledged last
+        """
+        max_workers = max_workers or self.max_workers
+        body, last = (indexes[:-1], indexes[-1:]) if self.last_chunk_last else (indexes, [])
+        pending = deque()
+        response = None
 
-            if sphere_external_id:
-                params['sphere_id'] = sphere_external_id
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for dzchunkindex in body:
+                if len(pending) >= max_workers:
+                    response = self._wait_chunk(pending)
+                pending.append(submit(executor, send_chunk, dzchunkindex, read_chunk(dzchunkindex)))
+            while pending:
+                response = self._wait_chunk(pending)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
 
-            response = self._upload(endpoint, params, files)
+        for dzchunkindex in last:
+            response = send_chunk(dzchunkindex, read_chunk(dzchunkindex))
 
         return response
 
-    def boxresource(self, filename: str, content: bytes, mimes: str, sphere_external_id: str) -> dict:
+    def _wait_chunk(self, pending: deque) -> dict:
+        """
+        Waits for one in-flight chunk (the oldest one when ordered) and returns its response.
+        """
+        if self.ordered:
+            return pending.popleft().result()
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+        return future.result()
+
+    def _get_chunking(self) -> tuple[int, int]:
+        """
+        Returns the chunk size and the number of chunks in flight of the next upload.
+        """
+        if self.adaptive is None:
+            return self.chunksize, self.max_workers
+        return self.adaptive.chunksize, self.adaptive.workers
+
+    def boxresource(self, filename: str, content, mimes: str, sphere_external_id: str) -> dict:
         """
         Uploads a file and creates an associated resource.
 
+        The content is streamed: a path or a file object is never loaded in memory as a whole.
+
+        With a dedup index, a content already uploaded is not sent again: the response then only holds
+        the `id` of its cloudfile, its `hash`, and `deduplicated` set to True. An iterable of known size,
+        which can only be read once, is always sent.
+
         :param filename: Name of the file
-        :param content: File content in bytes
+        :param content: File content (bytes, path, binary file object, iterable of bytes or UploadContent)
         :param mimes: MIME type of the file
         :param sphere_external_id: Sphere ID
         :return: API response after upload
         """
         endpoint = 'upload/box_resource'
 
-        if len(content) > self.chunksize:
-            return self._upload_with_chunking(endpoint, filename, content, mimes, sphere_external_id)
+        with open_content(content, spool_size=self.chunksize) as source:
+            digest = None
+            if self.dedup is not None and not isinstance(source, IterableContent):
+                digest = hash_content(source)
+                cloudfile_id = self.dedup.get(digest)
+                if cloudfile_id is not None:
+                    return {'id': cloudfile_id, 'hash': digest, 'deduplicated': True}
 
-        params = {'sphere_id': sphere_external_id}
-        files = {'userfile': (filename, content, mimes)}
+            chunksize, max_workers = self._get_chunking()
+            if source.size > chunksize:
+                response = self._upload_with_chunking(endpoint, filename, source, mimes, sphere_external_id,
+                                                     digest=digest, chunksize=chunksize, max_workers=max_workers)
+            else:
+                params = {'sphere_id': sphere_external_id}
+                files = {'userfile': (filename, source.read_all(), mimes)}
+                response = self._upload(endpoint, params, files)
 
-        return self._upload(endpoint, params, files)
+            if digest is not None and 'id' in response:
+                self.dedup.set(digest, response['id'])
+            return response
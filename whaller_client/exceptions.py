@@ -32,3 +32,9 @@ class UploadError(Exception):
         self.message = message
     def __str__(self):
         return repr(self.message)
+
+class DeadlineExceededError(HttpError):
+    """ Exception raised when the time budget of an operation runs out before it completes. """
+
+class CircuitOpenError(HttpError):
+    """ Exception raised when a request is not sent because the circuit of its endpoint is open. """
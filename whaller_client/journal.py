@@ -0,0 +1,111 @@
+import json
+import os
+import uuid
+from threading import Lock
+from time import time
+
+class UploadJournal:
+    def __init__(self, path: str, max_age: float | None = 7 * 24 * 3600) -> None:
+        """
+        Local journal of the chunked uploads in progress, stored as a JSON file.
+
+        For each upload it records the Dropzone `dzuuid`, the chunk size and the indexes of the chunks
+        acknowledged by the server, so that an interrupted upload can be resumed by sending the missing
+        chunks only, cut the same way even if the uploader's chunk size has changed since.
+        Uploads which are never resumed are forgotten once they have not been updated for `max_age`.
+        An upload is claimed while in progress, so that a concurrent upload of the same content to the
+        same destination (through this journal) does not share its dzuuid.
+
+        :param path: Path of the JSON journal file
+        :param max_age: Time (in seconds) after which an upload not updated is forgotten, None to keep them all
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = Lock()
+        self._claimed = set()
+        self._uploads = self._load()
+        self._prune()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('uploads', {})
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # A corrupted journal only costs a full re-upload
+            return {}
+
+    def _prune(self) -> bool:
+        # Forgets the uploads not updated for max_age, and tells whether there were any
+        if self.max_age is None:
+            return False
+        oldest = time() - self.max_age
+        expired = [key for key, entry in self._uploads.items() if entry.get('updated', 0) <= oldest]
+        for key in expired:
+            del self._uploads[key]
+        return bool(expired)
+
+    def _save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'uploads': self._uploads}, f)
+        os.replace(tmp_path, self.path)
+
+    def open(self, key: str, chunksize: int) -> tuple[str, int, set[int]] | None:
+        """
+        Claims the upload recorded under `key`, creating it if needed, until it is discarded or released.
+
+        :param key: Identifier of the upload (file fingerprint and destination)
+        :param chunksize: Size of the chunks of the upload, if it is created
+        :return: The upload's dzuuid, its chunk size and the set of chunk indexes already acknowledged,
+                 None if the upload is already claimed: the caller then uploads without journaling
+        """
+        with self._lock:
+            if key in self._claimed:
+                return None
+            self._claimed.add(key)
+            changed = self._prune()
+            entry = self._uploads.get(key)
+            if entry is None:
+                entry = {'dzuuid': str(uuid.uuid4()), 'chunksize': chunksize, 'chunks': [], 'updated': time()}
+                self._uploads[key] = entry
+                changed = True
+            if changed:
+                self._save()
+            return entry['dzuuid'], entry['chunksize'], set(entry['chunks'])
+
+    def ack(self, key: str, dzchunkindex: int) -> None:
+        """
+        Records that the chunk `dzchunkindex` of the upload `key` was acknowledged by the server.
+        """
+        with self._lock:
+            entry = self._uploads.get(key)
+            if entry is None:
+                # Pruned meanwhile: the upload is then not resumable anymore
+                return
+            entry['chunks'].append(dzchunkindex)
+            entry['updated'] = time()
+            self._save()
+
+    def discard(self, key: str) -> None:
+        """
+        Forgets the upload `key`, once it is complete.
+        """
+        with self._lock:
+            self._claimed.discard(key)
+            if self._uploads.pop(key, None) is not None:
+                self._save()
+
+    def release(self, key: str) -> None:
+        """
+        Gives up the claim on the upload `key`, which failed or was interrupted, so that it can be resumed.
+        """
+        with self._lock:
+            self._claimed.discard(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._uploads
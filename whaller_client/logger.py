@@ -1,48 +1,181 @@
 import os
 import logging
+from logging.handlers import RotatingFileHandler
+from queue import SimpleQueue
+from threading import Event, Thread
 
 class Logger():
-    def __init__(self, name: str, logger_path: str = None, level: int = logging.ERROR):
+    def __init__(self, name: str, logger_path: str = None, level: int = logging.ERROR, background: bool = False,
+                 max_bytes: int = 0, backup_count: int = 0, batch_size: int = 100):
+        """
+        Logger writing to `<logger_path>/<name>.log` (./logs/ by default).
+
+        In background mode, records are handed through a queue to a writer thread which writes them
+        in batches, so logging does no disk I/O on the calling thread, and the log directory is only
+        created when the first record is written.
+
+        :param name: Name of the logger and of its file
+        :param logger_path: Directory of the log file, ending with a separator (optional)
+        :param level: Minimum level of the records written
+        :param background: Write the records from a background thread
+        :param max_bytes: Size of the log file above which it is rotated, 0 to never rotate (background mode)
+        :param backup_count: Number of rotated files kept (background mode)
+        :param batch_size: Maximum number of records written at once (background mode)
+        """
+        self.background = background
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.handler = None
         self.current_logger = self.init(name, level, logger_path)
 
     def init(self, filename, level, logger_path = None):
         if logger_path is None:
             logger_path = os.path.abspath(os.getcwd()) + '/logs/'
 
-        if os.path.exists(logger_path) == False:
+        if not self.background and os.path.exists(logger_path) == False:
             os.makedirs(logger_path, exist_ok=True)
 
         logger = logging.getLogger(filename)
         logger.setLevel(level)
         if logger.hasHandlers() == False:
             filepath = logger_path + filename + '.log'
-            fh = logging.FileHandler(filepath)
+            if self.background:
+                fh = BackgroundHandler(filepath, self.max_bytes, self.backup_count, self.batch_size)
+            else:
+                fh = logging.FileHandler(filepath)
             fh.setLevel(level)
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             fh.setFormatter(formatter)
             logger.addHandler(fh)
+            self.handler = fh
         return logger
 
-    def debug(self, debug):
-        if self.current_logger is None:
+    def close(self):
+        """
+        Detaches and closes the handler added by this logger, writing the pending records.
+        """
+        if self.handler is None:
+            return
+        self.current_logger.removeHandler(self.handler)
+        self.handler.close()
+        self.handler = None
+
+    # Messages may use %-style arguments, only formatted when the record is written: the level is
+    # checked first, so a disabled call costs neither formatting nor a record.
+
+    def debug(self, debug, *args):
+        if self.current_logger is None or not self.current_logger.isEnabledFor(logging.DEBUG):
             return
 
-        self.current_logger.debug(debug)
+        self.current_logger.debug(debug, *args)
 
-    def info(self, info):
-        if self.current_logger is None:
+    def info(self, info, *args):
+        if self.current_logger is None or not self.current_logger.isEnabledFor(logging.INFO):
             return
 
-        self.current_logger.info(info)
+        self.current_logger.info(info, *args)
 
-    def warning(self, warning):
-        if self.current_logger is None:
+    def warning(self, warning, *args):
+        if self.current_logger is None or not self.current_logger.isEnabledFor(logging.WARNING):
             return
 
-        self.current_logger.warning(warning)
+        self.current_logger.warning(warning, *args)
 
-    def error(self, error):
-        if self.current_logger is None:
+    def error(self, error, *args):
+        if self.current_logger is None or not self.current_logger.isEnabledFor(logging.ERROR):
             return
 
-        self.current_logger.error(error)
+        self.current_logger.error(error, *args)
+
+class BackgroundHandler(logging.Handler):
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0, batch_size: int = 100) -> None:
+        """
+        Handler queuing the records for a writer thread, which formats and writes them to a file
+        in batches of up to `batch_size` records, rotating the file when it exceeds `max_bytes`.
+
+        Records are formatted in the writer thread: the arguments of a log call must not be mutated
+        afterwards. The pending records are written when the handler is closed, which logging does
+        at exit.
+
+        :param filename: Path of the log file, whose directory is created with the file
+        :param max_bytes: Size of the file above which it is rotated, 0 to never rotate
+        :param backup_count: Number of rotated files kept
+        :param batch_size: Maximum number of records written at once
+        """
+        super().__init__()
+        self.batch_size = batch_size
+        self.queue = SimpleQueue()
+        self.file_handler = BatchFileHandler(filename, max_bytes, backup_count)
+        self._thread = Thread(target=self._run, name=f'whaller-logger-{os.path.basename(filename)}', daemon=True)
+        self._thread.start()
+
+    def setFormatter(self, fmt: logging.Formatter | None) -> None:
+        super().setFormatter(fmt)
+        self.file_handler.setFormatter(fmt)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+    def flush(self) -> None:
+        """
+        Waits until the records queued so far are written.
+        """
+        if self._thread.is_alive():
+            written = Event()
+            self.queue.put(written)
+            written.wait()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+            self.file_handler.close()
+        super().close()
+
+    def _run(self) -> None:
+        # Queue items are records, flush events, and None to stop
+        while True:
+            items = [self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get())
+            records = []
+            for item in items:
+                if isinstance(item, logging.LogRecord):
+                    records.append(item)
+                    continue
+                self.file_handler.emit_batch(records)
+                records = []
+                if item is None:
+                    return
+                item.set()
+            self.file_handler.emit_batch(records)
+
+class BatchFileHandler(RotatingFileHandler):
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0) -> None:
+        """
+        Rotating file handler writing a batch of records with a single write, and creating the
+        directory of the file when it is first opened.
+        """
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.baseFilename)), exist_ok=True)
+        return super()._open()
+
+    def emit_batch(self, records: list) -> None:
+        if not records:
+            return
+        try:
+            data = ''.join(self.format(record) + self.terminator for record in records)
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()
+            if self.maxBytes > 0 and size > 0 and size + len(data) > self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(data)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
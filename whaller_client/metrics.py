@@ -0,0 +1,259 @@
+import re
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from fnmatch import fnmatchcase
+from threading import Lock
+from time import perf_counter
+from typing import Iterable
+
+# Upper bounds (in seconds) of the latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Distribution of observed values, counted in buckets of increasing upper bounds.
+
+        :param buckets: Upper bounds of the buckets, in increasing order (an unbounded bucket is added)
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimates the q-quantile (0 < q < 1) by linear interpolation within its bucket, as Prometheus does.
+        Values of the unbounded bucket are estimated at the largest bound.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            count = self.counts[i]
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+        # The quantile is in the unbounded bucket
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        """
+        Returns {'count', 'sum', 'mean', 'p50', 'p95', 'p99', 'buckets': {upper bound: cumulative count}}
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+class MetricsRegistry:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, endpoints: Iterable[str] = ()) -> None:
+        """
+        In-process registry of counters and latency histograms, labelled by endpoint, method, status...
+
+        Clients given a registry record, for each HTTP attempt, its latency, time to first byte, status
+        and byte counts, plus retries, JSON decoding time and the time spent waiting for a token;
+        uploaders record the throughput of their chunks. Endpoints are grouped under the first of the
+        `endpoints` patterns they match, or else with the segments holding digits replaced by '{id}',
+        so that a label does not get a value per resource.
+
+        A registry may be shared between clients.
+
+        :param buckets: Upper bounds (in seconds) of the buckets of the histograms
+        :param endpoints: Patterns grouping the endpoints, e.g. ['spheres/*/boxresources', 'persons/*/notifications']
+        """
+        self.buckets = tuple(buckets)
+        self.endpoints = list(endpoints)
+        self._lock = Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._endpoint_labels = {}
+        self._exported = {}
+
+    def get_endpoint_label(self, endpoint: str) -> str:
+        """
+        Returns the label grouping `endpoint` with the endpoints of the same route.
+        """
+        label = self._endpoint_labels.get(endpoint)
+        if label is None:
+            path = endpoint.split('?', 1)[0]
+            label = next((pattern for pattern in self.endpoints if fnmatchcase(path, pattern)), None)
+            if label is None:
+                label = '/'.join('{id}' if _ID_SEGMENT.search(segment) else segment for segment in path.split('/'))
+            if len(self._endpoint_labels) >= _MAX_ENDPOINT_LABELS:
+                self._endpoint_labels.clear()
+            self._endpoint_labels[endpoint] = label
+        return label
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Adds `value` to a counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records a value (e.g. a duration in seconds) in a histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Records the duration of the block in a histogram.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def record_request(self, method: str, endpoint: str, status, seconds: float, ttfb: float | None = None) -> None:
+        """
+        Records an HTTP attempt.
+
+        :param method: HTTP method
+        :param endpoint: Endpoint called
+        :param status: HTTP status of the response, 'error' when none was received
+        :param seconds: Duration of the attempt
+        :param ttfb: Time until the headers of the response were received, connection included (optional)
+        """
+        endpoint = self.get_endpoint_label(endpoint)
+        self.inc('http_requests_total', method=method, endpoint=endpoint, status=str(status))
+        self.observe('http_request_seconds', seconds, method=method, endpoint=endpoint)
+        if ttfb is not None:
+            self.observe('http_ttfb_seconds', ttfb, method=method, endpoint=endpoint)
+
+    def record_retry(self, method: str, endpoint: str, reason) -> None:
+        """
+        Records that an attempt is retried, because of its status or of the kind of error.
+        """
+        self.inc('http_retries_total', method=method, endpoint=self.get_endpoint_label(endpoint), reason=str(reason))
+
+    def record_bytes(self, name: str, endpoint: str, size: int) -> None:
+        """
+        Adds `size` to the byte counter `name` of an endpoint.
+        """
+        self.inc(name, size, endpoint=self.get_endpoint_label(endpoint))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._exported.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current values:
+        {'counters': [{'name', 'labels', 'value'}], 'histograms': [{'name', 'labels', **Histogram.snapshot()}]}
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                          for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0])]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self, prefix: str = 'whaller_') -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for counter in snapshot['counters']:
+            name = _metric_name(prefix + counter['name'])
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f"{name}{_prometheus_labels(counter['labels'])} {_format_value(counter['value'])}")
+        for histogram in snapshot['histograms']:
+            name = _metric_name(prefix + histogram['name'])
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            labels = histogram['labels']
+            for bound, count in histogram['buckets'].items():
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{name}_bucket{_prometheus_labels({**labels, 'le': le})} {count}")
+            lines.append(f"{name}_sum{_prometheus_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def to_statsd(self, prefix: str = 'whaller.') -> list[str]:
+        """
+        Renders the metrics as StatsD lines with DogStatsD-style tags, to be sent e.g. over UDP.
+
+        Counters, and the count and sum of the histograms, are sent as the increase since the
+        previous call; the quantiles of the histograms are sent as gauges.
+        """
+        snapshot = self.snapshot()
+        values = []
+        for counter in snapshot['counters']:
+            values.append((counter['name'], counter['labels'], counter['value'], 'c'))
+        for histogram in snapshot['histograms']:
+            for stat in ('count', 'sum'):
+                values.append((f"{histogram['name']}.{stat}", histogram['labels'], histogram[stat], 'c'))
+            for stat in ('p50', 'p95', 'p99'):
+                values.append((f"{histogram['name']}.{stat}", histogram['labels'], histogram[stat], 'g'))
+
+        lines = []
+        with self._lock:
+            for name, labels, value, kind in values:
+                if kind == 'c':
+                    key = (name, tuple(sorted(labels.items())))
+                    value, self._exported[key] = value - self._exported.get(key, 0), value
+                    if not value:
+                        continue
+                tags = ','.join(f'{_statsd_name(key)}:{_statsd_name(str(tag))}' for key, tag in labels.items())
+                line = f'{_statsd_name(prefix + name)}:{_format_value(value)}|{kind}'
+                lines.append(f'{line}|#{tags}' if tags else line)
+        return lines
+
+def measure(metrics: MetricsRegistry | None, name: str, **labels):
+    """
+    Records the duration of the block in a histogram of `metrics`, if any.
+    """
+    return nullcontext() if metrics is None else metrics.timer(name, **labels)
+
+_ID_SEGMENT = re.compile(r'\d')
+_MAX_ENDPOINT_LABELS = 4096
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+def _statsd_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_.{}/\-]', '_', name)
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{_metric_name(key)}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
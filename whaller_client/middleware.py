@@ -0,0 +1,67 @@
+from typing import Callable, Iterable
+
+class Request:
+    __slots__ = ('method', 'endpoint', 'url', 'headers', 'params', 'data', 'timeout')
+
+    def __init__(self, method: str, endpoint: str, url: str, headers: dict, params=None, data=None,
+                 timeout=None) -> None:
+        """
+        HTTP request about to be sent to the API, which middleware may modify in place.
+
+        :param method: HTTP method
+        :param endpoint: Relative URL of the endpoint
+        :param url: Absolute URL of the request
+        :param headers: HTTP headers, a copy owned by this request
+        :param params: Query parameters (GET)
+        :param data: Encoded body (POST)
+        :param timeout: Timeout of the transport, as given to requests or aiohttp
+        """
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.headers = headers
+        self.params = params
+        self.data = data
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        return f'Request({self.method} {self.url})'
+
+class Response:
+    __slots__ = ('status', 'headers', 'content')
+
+    def __init__(self, status: int, headers, content: bytes) -> None:
+        """
+        HTTP response of the API, read in full.
+
+        :param status: HTTP status
+        :param headers: HTTP headers
+        :param content: Raw body
+        """
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    def __repr__(self) -> str:
+        return f'Response({self.status}, {len(self.content)} bytes)'
+
+def build_chain(middleware: Iterable[Callable], transport: Callable) -> Callable | None:
+    """
+    Composes the middleware around the transport, the first one being the outermost, and returns
+    the resulting `handler(request)`, or None without middleware.
+
+    A middleware is called as `middleware(request, call_next)` and returns a Response: it may modify
+    the request before handing it to `call_next(request)`, wrap or replace the response it gets back,
+    or return a response of its own without calling `call_next` at all. With an asynchronous client,
+    middleware are coroutine functions and await `call_next(request)`.
+    """
+    middleware = list(middleware)
+    if not middleware:
+        return None
+    handler = transport
+    for mw in reversed(middleware):
+        handler = _link(mw, handler)
+    return handler
+
+def _link(middleware: Callable, call_next: Callable) -> Callable:
+    return lambda request: middleware(request, call_next)
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+from whaller_client.deadline import submit
+
+def get_page_params(data: dict, page_size: int, offset: int) -> dict:
+    """
+    Returns the parameters of the page starting at `offset`.
+    """
+    return {**data, 'limit': page_size, 'offset': offset}
+
+def iter_pages(fetch: Callable[[dict], list], data: dict = {}, page_size: int = 50,
+               prefetch: bool = True) -> Iterator[list]:
+    """
+    Fetches the pages of a list endpoint lazily, with `limit`/`offset` parameters, until a page is not full.
+
+    With `prefetch`, the next page is fetched in a background thread while the current one is consumed.
+
+    :param fetch: Callable returning the items of the page with the given parameters
+    :param data: Parameters of the request, an `offset` sets the first item
+    :param page_size: Number of items per page
+    :param prefetch: Fetch the next page in the background
+    :return: Iterator over the non-empty pages
+    """
+    if page_size < 1:
+        raise ValueError("The page size must be positive")
+    offset = data.get('offset', 0)
+
+    if not prefetch:
+        while True:
+            page = fetch(get_page_params(data, page_size, offset))
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = submit(executor, fetch, get_page_params(data, page_size, offset))
+        while True:
+            page = future.result()
+            if len(page) < page_size:
+                if page:
+                    yield page
+                return
+            offset += page_size
+            future = submit(executor, fetch, get_page_params(data, page_size, offset))
+            yield page
+    finally:
+        # The iteration may be stopped early: a page which is not needed anymore is not waited for
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_items(fetch: Callable[[dict], list], data: dict = {}, page_size: int = 50,
+               prefetch: bool = True) -> Iterator:
+    """
+    Iterates over the items of a list endpoint, fetching its pages lazily (see iter_pages).
+    """
+    for page in iter_pages(fetch, data, page_size, prefetch):
+        yield from page
@@ -0,0 +1,203 @@
+import asyncio
+from fnmatch import fnmatchcase
+from threading import Lock
+from time import monotonic, sleep, time
+from whaller_client.deadline import check_wait
+from whaller_client.retry import parse_retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float | None = None):
+        """
+        Token bucket allowing `rate` requests per second, with bursts of up to `burst` requests.
+
+        The rate adapts to the API: it is lowered when the API throttles the client and
+        raised back, up to its initial value, as requests succeed.
+
+        :param rate: Sustained number of requests per second
+        :param burst: Maximum number of requests sent at once (defaults to max(rate, 1))
+        """
+        self.max_rate = rate
+        self.min_rate = rate / 20
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._blocked_until = 0.0
+        self._lock = Lock()
+
+    def _refill(self, now: float) -> None:
+        # No token is earned while the bucket is paused
+        elapsed = now - max(self._updated, self._blocked_until)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Takes `tokens` from the bucket, possibly ahead of time.
+
+        :return: Time (in seconds) to wait before sending the request
+        """
+        with self._lock:
+            now = monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return wait + max(self._blocked_until - now, 0.0)
+
+    def throttle(self, delay: float, decrease_factor: float) -> None:
+        """
+        Pauses the bucket for `delay` seconds and lowers its rate, after the API throttled the client.
+        """
+        with self._lock:
+            now = monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 1.0)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self.rate = max(self.rate * decrease_factor, self.min_rate)
+
+    def limit(self, remaining: float, reset: float | None) -> None:
+        """
+        Aligns the bucket on the quota announced by the API: `remaining` requests for the next `reset` seconds.
+        """
+        with self._lock:
+            now = monotonic()
+            self._refill(now)
+            if reset:
+                self.rate = min(max(remaining / reset, self.min_rate), self.max_rate)
+            if remaining < 1 and reset:
+                # The quota is exhausted: a single request when it resets
+                self._tokens = min(self._tokens, 1.0)
+                self._blocked_until = max(self._blocked_until, now + reset)
+            else:
+                self._tokens = min(self._tokens, remaining)
+
+    def recover(self, increase: float) -> None:
+        """
+        Raises the rate by `increase`, up to its initial value.
+        """
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(monotonic())
+                self.rate = min(self.rate + increase, self.max_rate)
+
+class RateLimiter:
+    def __init__(self, rate: float | None = None, burst: float | None = None, limits: dict | None = None,
+                 decrease_factor: float = 0.5, increase_ratio: float = 0.05):
+        """
+        Client-side rate limiter, shared by the threads and coroutines using a client.
+
+        A request waits for a token of the global bucket and of the bucket of the first
+        endpoint pattern it matches. When the API answers 429, the most specific bucket pauses
+        for the Retry-After delay and halves its rate; its rate then grows back by
+        `increase_ratio` of the configured rate per successful request. Rate limit headers
+        (X-RateLimit-Remaining / X-RateLimit-Reset, or RateLimit-Remaining / RateLimit-Reset)
+        directly set the rate to the remaining quota.
+
+        :param rate: Requests per second allowed for all the endpoints together, None for no global limit
+        :param burst: Maximum number of requests sent at once for all the endpoints together
+        :param limits: Limits per endpoint pattern, as a rate or a (rate, burst) tuple, e.g. {'upload/*': 2, 'me/*': (10, 20)};
+                       a pattern ending with '/*' also matches the bare endpoint ('me/*' matches 'me')
+        :param decrease_factor: Factor applied to the rate when the API throttles the client
+        :param increase_ratio: Part of the configured rate recovered after each successful request
+        """
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        self.limits = {}
+        for pattern, limit in (limits or {}).items():
+            self.limits[pattern] = TokenBucket(*limit) if isinstance(limit, tuple) else TokenBucket(limit)
+        self.decrease_factor = decrease_factor
+        self.increase_ratio = increase_ratio
+        self._buckets = {}
+
+    def get_buckets(self, endpoint: str) -> list[TokenBucket]:
+        """
+        Returns the buckets limiting `endpoint`, the most specific one last.
+        """
+        buckets = self._buckets.get(endpoint)
+        if buckets is None:
+            buckets = [self.bucket] if self.bucket is not None else []
+            for pattern, bucket in self.limits.items():
+                if fnmatchcase(endpoint, pattern) or (pattern.endswith('/*') and endpoint == pattern[:-2]):
+                    buckets.append(bucket)
+                    break
+            # Endpoints hold IDs: the cache is bounded for long-running clients
+            if len(self._buckets) >= _MAX_CACHED_ENDPOINTS:
+                self._buckets.clear()
+            self._buckets[endpoint] = buckets
+        return buckets
+
+    def reserve(self, endpoint: str) -> float:
+        """
+        Takes a token from every bucket limiting `endpoint`.
+
+        :return: Time (in seconds) to wait before sending the request
+        """
+        return max((bucket.reserve() for bucket in self.get_buckets(endpoint)), default=0.0)
+
+    def acquire(self, endpoint: str) -> None:
+        """
+        Blocks until a request to `endpoint` may be sent.
+
+        :raises DeadlineExceededError: At once, if the wait would reach the deadline of the caller
+        """
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            check_wait(delay, f"waiting for the rate limit of {endpoint}")
+            sleep(delay)
+
+    async def acquire_async(self, endpoint: str) -> None:
+        """
+        Waits, without blocking the event loop, until a request to `endpoint` may be sent.
+
+        :raises DeadlineExceededError: At once, if the wait would reach the deadline of the caller
+        """
+        delay = self.reserve(endpoint)
+        if delay > 0:
+            check_wait(delay, f"waiting for the rate limit of {endpoint}")
+            await asyncio.sleep(delay)
+
+    def update(self, endpoint: str, status: int, headers) -> None:
+        """
+        Adapts the limits to the response of the API.
+
+        :param endpoint: Endpoint that was called
+        :param status: HTTP status of the response
+        :param headers: Headers of the response
+        """
+        buckets = self.get_buckets(endpoint)
+        if not buckets:
+            return
+        bucket = buckets[-1]
+        remaining, reset = parse_rate_limit_headers(headers)
+
+        if status == 429:
+            delay = parse_retry_after(headers.get('Retry-After'))
+            if delay is None:
+                delay = reset if reset is not None else 1 / bucket.rate
+            bucket.throttle(delay, self.decrease_factor)
+        elif remaining is not None:
+            bucket.limit(remaining, reset)
+        else:
+            bucket.recover(bucket.max_rate * self.increase_ratio)
+
+_MAX_CACHED_ENDPOINTS = 4096
+
+def parse_rate_limit_headers(headers) -> tuple[float | None, float | None]:
+    """
+    Reads the remaining quota and the time (in seconds) until it resets from rate limit headers.
+
+    The reset may be given as a number of seconds or as a UNIX timestamp.
+
+    :return: (remaining, reset), each None when missing or invalid
+    """
+    remaining = _parse_float(headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining')))
+    reset = _parse_float(headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset')))
+    if reset is not None and reset > 1e9:
+        reset = max(reset - time(), 0.0)
+    return remaining, reset
+
+def _parse_float(value) -> float | None:
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,126 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
+CONNECT_ERROR = 'connect'
+READ_ERROR = 'read'
+
+class RetryStats:
+    def __init__(self) -> None:
+        """
+        Counters of the retries made by a RetryPolicy.
+        """
+        self.retries = 0
+        self.exhausted = 0
+        self.reasons = {}
+        self._lock = Lock()
+
+    def record_retry(self, reason: str) -> None:
+        with self._lock:
+            self.retries += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def record_exhausted(self) -> None:
+        with self._lock:
+            self.exhausted += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the counters: {'retries': int, 'exhausted': int, 'reasons': {reason: int}}
+        """
+        with self._lock:
+            return {'retries': self.retries, 'exhausted': self.exhausted, 'reasons': dict(self.reasons)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.retries = 0
+            self.exhausted = 0
+            self.reasons = {}
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, backoff_factor: float = 0.5, backoff_max: float = 30.0,
+                 retry_statuses: tuple = (429, 502, 503, 504), post_retry_statuses: tuple = (429,),
+                 max_retry_after: float = 120.0):
+        """
+        Decides whether a failed request is sent again, and how long to wait before doing so.
+
+        The delay follows an exponential backoff with full jitter: a random duration between 0 and
+        `backoff_factor * 2 ** (attempt - 1)` seconds, capped to `backoff_max`. A `Retry-After` header
+        sent by the API takes precedence.
+
+        GET requests are idempotent: they are retried on connection errors, timeouts and `retry_statuses`.
+        A POST may have been processed when it failed, so it is only retried when it surely was not:
+        when the connection could not be established, or on `post_retry_statuses`.
+
+        :param max_attempts: Maximum number of attempts per request, 1 to disable retries
+        :param backoff_factor: Base delay (in seconds) of the exponential backoff
+        :param backoff_max: Maximum delay (in seconds) between two attempts
+        :param retry_statuses: HTTP statuses on which a GET is retried
+        :param post_retry_statuses: HTTP statuses on which a POST is retried
+        :param max_retry_after: Maximum delay (in seconds) honoured from a Retry-After header
+        """
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.post_retry_statuses = frozenset(post_retry_statuses)
+        self.max_retry_after = max_retry_after
+        self.stats = RetryStats()
+
+    def is_retryable(self, method: str, status: int | None = None, error: str | None = None) -> bool:
+        """
+        Tells whether a request that failed that way may be sent again.
+
+        :param method: HTTP method of the request
+        :param status: HTTP status of the response, if any
+        :param error: CONNECT_ERROR if the connection could not be established, READ_ERROR if it failed afterwards
+        """
+        if error == CONNECT_ERROR:
+            return True
+        if method == 'GET':
+            return error == READ_ERROR or status in self.retry_statuses
+        return status in self.post_retry_statuses
+
+    def get_retry_delay(self, method: str, attempt: int, status: int | None = None,
+                        error: str | None = None, headers=None) -> float | None:
+        """
+        Returns the time to wait before the next attempt, or None if the request must not be retried.
+
+        :param method: HTTP method of the request
+        :param attempt: Number of the attempt that just failed, starting at 1
+        :param status: HTTP status of the response, if any
+        :param error: CONNECT_ERROR or READ_ERROR if no response was received
+        :param headers: Headers of the response, if any
+        """
+        if not self.is_retryable(method, status, error):
+            return None
+        if attempt >= self.max_attempts:
+            self.stats.record_exhausted()
+            return None
+
+        self.stats.record_retry(str(status) if status is not None else error)
+        retry_after = parse_retry_after(headers.get('Retry-After')) if headers is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** (attempt - 1)))
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses a Retry-After header, given either in seconds or as an HTTP date.
+
+    :return: The delay in seconds, None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,127 @@
+import asyncio
+from copy import deepcopy
+from threading import Event, Lock
+from typing import Awaitable, Callable
+from whaller_client.exceptions import DeadlineExceededError
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result = None
+        self.error = None
+        self.shared = False
+
+class _Counters:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.coalesced = 0
+
+    def snapshot(self) -> dict:
+        """
+        Returns the counters: {'calls': int, 'hits': int, 'coalesced': int}
+
+        `calls` is the number of calls actually made, `hits` the number of callers served by the call
+        of another one, and `coalesced` the number of calls shared by several callers.
+        """
+        return {'calls': self.calls, 'hits': self.hits, 'coalesced': self.coalesced}
+
+class SingleFlight(_Counters):
+    def __init__(self) -> None:
+        """
+        Coalesces identical concurrent calls: while a call is in flight for a key, the other threads
+        asking for the same key wait for it and share its result (or its exception).
+
+        Each waiting thread gets its own copy of the result, so that it may modify it freely. A
+        DeadlineExceededError is not shared: the deadline was the caller's, not the waiting thread's,
+        which makes the call again.
+        """
+        super().__init__()
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key: str, fn: Callable):
+        """
+        Returns the result of `fn()`, or of the call in flight for `key`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.hits += 1
+                if not call.shared:
+                    call.shared = True
+                    self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if isinstance(call.error, DeadlineExceededError):
+                return self.do(key, fn)
+            if call.error is not None:
+                raise call.error
+            return deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AsyncSingleFlight(_Counters):
+    def __init__(self) -> None:
+        """
+        Coalesces identical concurrent coroutine calls: while a call is in flight for a key, the other
+        coroutines asking for the same key await it and share its result (or its exception).
+
+        As with SingleFlight, each waiting coroutine gets its own copy of the result, and makes the
+        call again when it failed with a DeadlineExceededError.
+        """
+        super().__init__()
+        self._futures = {}
+        self._shared = set()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """
+        Returns the result of `await fn()`, or of the call in flight for `key`.
+        """
+        future = self._futures.get(key)
+        if future is not None:
+            self.hits += 1
+            if key not in self._shared:
+                self._shared.add(key)
+                self.coalesced += 1
+            try:
+                return deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            except DeadlineExceededError:
+                pass
+            # The coroutine making the call was cancelled or ran out of time, not this one: make the call again
+            return await self.do(key, fn)
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        self.calls += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here, so that it is not reported when no other coroutine awaits it
+            future.exception()
+            raise
+        finally:
+            del self._futures[key]
+            self._shared.discard(key)
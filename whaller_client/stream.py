@@ -0,0 +1,187 @@
+import re
+from typing import Iterable, Iterator
+from whaller_client.codec import JsonCodec, default_codec
+from whaller_client.exceptions import ApiError, InvalidResponseError
+
+_STRING_END = re.compile(rb'["\\]')
+_STRUCTURE = re.compile(rb'["\[\]{}]')
+_SCALAR_END = re.compile(rb'[\s,\]}]')
+_WHITESPACE = b' \t\r\n'
+
+# Parser states
+_START, _KEY, _VALUE, _ITEMS, _NEXT_ITEM, _NEXT_KEY, _END = range(7)
+
+class _Incomplete(Exception):
+    """ Raised when the bytes received so far end in the middle of a token. """
+
+class ResultParser:
+    def __init__(self, api_url: str, codec: JsonCodec | None = None) -> None:
+        """
+        Incremental parser of a Whaller API response, yielding the items of its 'result' array
+        as soon as their bytes are received.
+
+        Only the item being received is buffered: each one is decoded on its own with the codec,
+        so memory does not grow with the size of the response.
+
+        :param api_url: URL that was called, used in error messages
+        :param codec: JSON codec decoding the items, defaults to the fastest one installed
+        """
+        self.api_url = api_url
+        self.codec = codec or default_codec
+        self.buffer = bytearray()
+        self.pos = 0
+        self.state = _START
+        self.key = None
+
+    def feed(self, chunk: bytes) -> list:
+        """
+        Parses the next bytes of the response.
+
+        :param chunk: Next bytes of the response
+        :return: The items of the 'result' array completed by these bytes
+        :raises InvalidResponseError: If the response is malformed
+        :raises ApiError: If the API returns an error code
+        """
+        self.buffer += chunk
+        items = []
+        checkpoint = self.pos
+        try:
+            while self.state != _END:
+                checkpoint = self.pos
+                self._step(items)
+        except _Incomplete:
+            # Parsed again from the start of the token when more bytes arrive
+            self.pos = checkpoint
+        del self.buffer[:self.pos]
+        self.pos = 0
+        return items
+
+    def close(self) -> None:
+        """
+        Checks that the whole response was received.
+
+        :raises InvalidResponseError: If the response is truncated
+        """
+        if self.state != _END:
+            raise InvalidResponseError(f"Invalid JSON response from {self.api_url}")
+
+    def _step(self, items: list) -> None:
+        state = self.state
+        if state == _START:
+            self._expect(b'{')
+            self.state = _KEY
+        elif state == _KEY:
+            if self._peek() == ord('}'):
+                self.pos += 1
+                self.state = _END
+                return
+            self.key = self._decode(self._read_string())
+            self._expect(b':')
+            self.state = _VALUE
+        elif state == _VALUE:
+            if self.key == 'result':
+                if self._peek() != ord('['):
+                    raise InvalidResponseError(f"The result of {self.api_url} is not an array")
+                self.pos += 1
+                self.state = _ITEMS
+                return
+            value = self._read_value()
+            if self.key == 'error':
+                error = self._decode(value)
+                error_message = error.get('message', 'Unknown error') if isinstance(error, dict) else 'Unknown error'
+                raise ApiError(f"API Error: {error_message}")
+            self.state = _NEXT_KEY
+        elif state == _ITEMS:
+            if self._peek() == ord(']'):
+                self.pos += 1
+                self.state = _NEXT_KEY
+                return
+            items.append(self._decode(self._read_value()))
+            self.state = _NEXT_ITEM
+        elif state == _NEXT_ITEM:
+            self.state = _ITEMS if self._expect(b',]') == ord(',') else _NEXT_KEY
+        elif state == _NEXT_KEY:
+            self.state = _KEY if self._expect(b',}') == ord(',') else _END
+
+    def _decode(self, value: bytes):
+        try:
+            return self.codec.loads(value)
+        except ValueError as e:
+            raise InvalidResponseError(f"Invalid JSON response from {self.api_url}") from e
+
+    def _peek(self) -> int:
+        # Skips whitespace and returns the next byte, without consuming it
+        buffer = self.buffer
+        while self.pos < len(buffer) and buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+        if self.pos >= len(buffer):
+            raise _Incomplete()
+        return buffer[self.pos]
+
+    def _expect(self, chars: bytes) -> int:
+        c = self._peek()
+        if c not in chars:
+            raise InvalidResponseError(f"Invalid JSON response from {self.api_url}")
+        self.pos += 1
+        return c
+
+    def _string_end(self, pos: int) -> int:
+        # Position following the closing quote of the string whose content starts at `pos`
+        while True:
+            match = _STRING_END.search(self.buffer, pos)
+            if match is None:
+                raise _Incomplete()
+            if match.group() == b'"':
+                return match.end()
+            pos = match.end() + 1
+
+    def _read_string(self) -> bytes:
+        if self._peek() != ord('"'):
+            raise InvalidResponseError(f"Invalid JSON response from {self.api_url}")
+        start = self.pos
+        self.pos = self._string_end(start + 1)
+        return bytes(self.buffer[start:self.pos])
+
+    def _read_value(self) -> bytes:
+        c = self._peek()
+        start = self.pos
+        if c == ord('"'):
+            end = self._string_end(start + 1)
+        elif c in b'{[':
+            depth = 0
+            pos = start
+            while True:
+                match = _STRUCTURE.search(self.buffer, pos)
+                if match is None:
+                    raise _Incomplete()
+                char = self.buffer[match.start()]
+                if char == ord('"'):
+                    pos = self._string_end(match.end())
+                    continue
+                pos = match.end()
+                depth += 1 if char in b'{[' else -1
+                if depth == 0:
+                    end = pos
+                    break
+        else:
+            match = _SCALAR_END.search(self.buffer, start)
+            if match is None:
+                raise _Incomplete()
+            end = match.start()
+        self.pos = end
+        return bytes(self.buffer[start:end])
+
+def iter_result(chunks: Iterable[bytes], api_url: str, codec: JsonCodec | None = None) -> Iterator:
+    """
+    Yields the items of the 'result' array of a response, as its bytes are received.
+
+    :param chunks: Bytes of the response
+    :param api_url: URL that was called, used in error messages
+    :param codec: JSON codec decoding the items, defaults to the fastest one installed
+    :raises InvalidResponseError: If the response is malformed
+    :raises ApiError: If the API returns an error code
+    """
+    parser = ResultParser(api_url, codec)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
@@ -0,0 +1,274 @@
+import json
+import mimetypes
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatch
+from threading import Lock
+from time import perf_counter
+from typing import Iterable
+from whaller_client.content import hash_content, open_content
+from whaller_client.deadline import submit
+from whaller_client.endpoints.box import Box
+
+class SyncManifest:
+    def __init__(self, path: str) -> None:
+        """
+        Local manifest of a directory synchronized into a Box, stored as a JSON file.
+
+        It records the folders created for the directory and, for each file uploaded, its size,
+        modification time, SHA-256 and resource ID, so that unchanged files are not uploaded again.
+
+        :param path: Path of the JSON manifest file
+        """
+        self.path = path
+        self._lock = Lock()
+        self.destination = None
+        self.folders = {}
+        self.files = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            # A corrupted manifest only costs a full upload
+            return
+        self.destination = data.get('destination')
+        self.folders = data.get('folders', {})
+        self.files = data.get('files', {})
+
+    def bind(self, destination: str) -> None:
+        """
+        Binds the manifest to a destination, forgetting what was synchronized to another one.
+
+        :param destination: Identifier of the Box folder the directory is synchronized into
+        """
+        with self._lock:
+            if self.destination != destination:
+                self.destination = destination
+                self.folders = {}
+                self.files = {}
+
+    def set_folders(self, folders: dict) -> None:
+        with self._lock:
+            self.folders = dict(folders)
+
+    def set_file(self, path: str, size: int, mtime: int, digest: str, resource_id) -> None:
+        """
+        Records the state of a file, as last uploaded.
+
+        :param path: Path of the file, relative to the synchronized directory
+        :param size: Size of the file
+        :param mtime: Modification time of the file, in nanoseconds
+        :param digest: SHA-256 of the file
+        :param resource_id: ID of the Box resource of the file
+        """
+        with self._lock:
+            self.files[path] = {'size': size, 'mtime': mtime, 'hash': digest, 'resource_id': resource_id}
+
+    def save(self) -> None:
+        with self._lock:
+            data = {'version': 1, 'destination': self.destination, 'folders': self.folders, 'files': self.files}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+class SyncReport:
+    def __init__(self, dry_run: bool = False) -> None:
+        """
+        Outcome of a synchronization run.
+
+        In a dry run, `uploaded`, `updated`, `folders` and `size` tell what would have been sent.
+        `replaced` maps each updated file to the ID of its previous resource, which is not deleted.
+
+        :param dry_run: Whether nothing was actually sent
+        """
+        self.dry_run = dry_run
+        self.uploaded = []
+        self.updated = []
+        self.replaced = {}
+        self.unchanged = 0
+        self.folders = 0
+        self.errors = {}
+        self.size = 0
+        self.seconds = 0.0
+
+    @property
+    def mbps(self) -> float:
+        """
+        Aggregate upload throughput of the run in MB/s.
+        """
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / (1024 * 1024) / self.seconds
+
+    def __repr__(self) -> str:
+        return (f"SyncReport(dry_run={self.dry_run}, uploaded={len(self.uploaded)}, updated={len(self.updated)}, "
+                f"unchanged={self.unchanged}, folders={self.folders}, errors={len(self.errors)}, "
+                f"size={self.size}, seconds={self.seconds:.3f}, mbps={self.mbps:.2f})")
+
+class BoxSync:
+    def __init__(self, box: Box, root: str, manifest: SyncManifest | str, parent_id: int | None = None,
+                 max_workers: int = 4, exclude: Iterable[str] = (), save_interval: float = 5.0) -> None:
+        """
+        One-way synchronization of a local directory into a Box.
+
+        Each run mirrors the subdirectories of `root` and uploads the files which are new or changed
+        since the previous run, `max_workers` at a time. A file whose size and modification time did
+        not change is skipped without being read; otherwise its SHA-256 tells whether it changed.
+        A changed file is uploaded as a new resource, and the ID of its previous resource is reported
+        in `replaced`. Files are streamed, so memory stays bounded by
+        `max_workers` uploads whatever the size of the files.
+
+        :param box: Box the directory is synchronized into
+        :param root: Path of the local directory
+        :param manifest: Manifest of the previous runs, or the path of its file
+        :param parent_id: ID of the folder the directory is synchronized into (optional)
+        :param max_workers: Number of files uploaded at the same time
+        :param exclude: Patterns of the names of the files and directories not to synchronize (e.g. '.*', '*.tmp')
+        :param save_interval: Time (in seconds) between two saves of the manifest during a run
+        """
+        self.box = box
+        self.root = root
+        self.manifest = manifest if isinstance(manifest, SyncManifest) else SyncManifest(manifest)
+        self.parent_id = parent_id
+        self.max_workers = max_workers
+        self.exclude = list(exclude)
+        self.save_interval = save_interval
+
+    def run(self, dry_run: bool = False) -> SyncReport:
+        """
+        Synchronizes the directory.
+
+        A file which cannot be uploaded is reported in `errors`, and the other files are still uploaded.
+
+        :param dry_run: Only report what would be uploaded, without sending anything
+        :return: Report of the run
+        """
+        start = perf_counter()
+        report = SyncReport(dry_run)
+        tree, files = self._scan()
+
+        manifest = self.manifest
+        destination = f'{self.box.sphere_external_id}/{self.parent_id}'
+        if not dry_run:
+            manifest.bind(destination)
+        # A dry run does not rebind the manifest: it only relies on it for the same destination
+        known = manifest.destination == destination
+        folders = manifest.folders if known else {}
+        uploaded = manifest.files if known else {}
+
+        report.folders = sum(1 for path in _iter_paths(tree) if path not in folders)
+        if report.folders and not dry_run:
+            try:
+                folders = self.box.create_tree(tree, self.parent_id, self.max_workers, existing=folders)
+            except Exception as e:
+                # The folders created before the error are not created again by the next run
+                folders = getattr(e, 'folders', folders)
+                raise
+            finally:
+                manifest.set_folders(folders)
+                manifest.save()
+
+        changed = []
+        for path, size, mtime in files:
+            entry = uploaded.get(path)
+            if entry is not None and entry['size'] == size and entry['mtime'] == mtime:
+                report.unchanged += 1
+            else:
+                changed.append((path, size, mtime, entry))
+
+        # Manifest entries of the files before the run, as they are replaced during it
+        previous = {path: entry for path, _, _, entry in changed}
+        last_save = perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {submit(executor, self._sync_file, folders, path, size, mtime, entry, dry_run): path
+                       for path, size, mtime, entry in changed}
+            try:
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        status, size = future.result()
+                    except Exception as e:
+                        report.errors[path] = e
+                        continue
+                    if status == 'unchanged':
+                        report.unchanged += 1
+                    elif status == 'new':
+                        report.uploaded.append(path)
+                        report.size += size
+                    else:
+                        report.updated.append(path)
+                        report.replaced[path] = previous[path]['resource_id']
+                        report.size += size
+                    if not dry_run and perf_counter() - last_save >= self.save_interval:
+                        manifest.save()
+                        last_save = perf_counter()
+            finally:
+                # Files not started yet when the run is interrupted are left for the next one
+                for future in futures:
+                    future.cancel()
+                if not dry_run:
+                    manifest.save()
+
+        report.seconds = perf_counter() - start
+        return report
+
+    def _scan(self) -> tuple[dict, list]:
+        # Nested dict of the subdirectories, and (path, size, mtime) of the files, with paths relative to the root
+        tree = {}
+        files = []
+        manifest_path = os.path.abspath(self.manifest.path)
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(name for name in dirnames if not self._is_excluded(name))
+            relative = os.path.relpath(dirpath, self.root)
+            relative = '' if relative == os.curdir else relative.replace(os.sep, '/')
+            node = tree
+            for name in relative.split('/') if relative else []:
+                node = node[name]
+            for name in dirnames:
+                node[name] = {}
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if self._is_excluded(name) or os.path.abspath(path).startswith(manifest_path):
+                    continue
+                stat = os.stat(path)
+                files.append((posixpath.join(relative, name), stat.st_size, stat.st_mtime_ns))
+        return tree, files
+
+    def _is_excluded(self, name: str) -> bool:
+        return any(fnmatch(name, pattern) for pattern in self.exclude)
+
+    def _sync_file(self, folders: dict, path: str, size: int, mtime: int, entry: dict | None,
+                   dry_run: bool) -> tuple[str, int]:
+        # Uploads a file whose size or modification time changed, unless its content did not
+        local_path = os.path.join(self.root, *path.split('/'))
+        with open_content(local_path) as source:
+            digest = hash_content(source)
+
+        if entry is not None and entry['hash'] == digest:
+            if not dry_run:
+                self.manifest.set_file(path, size, mtime, digest, entry['resource_id'])
+            return 'unchanged', size
+
+        status = 'new' if entry is None else 'updated'
+        if not dry_run:
+            name = posixpath.basename(path)
+            mimes = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            resource = self.box.create_file(name, local_path, mimes, folders.get(posixpath.dirname(path), self.parent_id))
+            self.manifest.set_file(path, size, mtime, digest, resource.get('id'))
+        return status, size
+
+def _iter_paths(tree: dict, prefix: str = ''):
+    # Paths of the folders of a nested dict
+    for name, subtree in tree.items():
+        path = posixpath.join(prefix, name)
+        yield path
+        yield from _iter_paths(subtree, path)
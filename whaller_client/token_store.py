@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+class TokenStore(ABC):
+    """
+    Storage for bearer tokens shared between Authenticator instances.
+
+    A token is stored as a record {'token': str, 'issued_at': float, 'expires_at': float | None}
+    under a key identifying the API, the application and the user. `lock` provides the mutual
+    exclusion used to make sure only one of the sharing parties logs in at a time.
+    """
+
+    @abstractmethod
+    def load(self, key: str) -> dict | None:
+        """
+        Returns the record stored under `key`, None if there is none.
+        """
+
+    @abstractmethod
+    def save(self, key: str, record: dict) -> None:
+        """
+        Stores `record` under `key`, replacing any previous one.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Removes the record stored under `key`, if any.
+        """
+
+    @abstractmethod
+    def lock(self, key: str):
+        """
+        Returns a context manager holding the store's exclusive lock.
+        """
+
+class MemoryTokenStore(TokenStore):
+    def __init__(self) -> None:
+        """
+        Token store shared by the Authenticators of one process.
+        """
+        self._records = {}
+        self._lock = threading.RLock()
+
+    def load(self, key: str) -> dict | None:
+        record = self._records.get(key)
+        return dict(record) if record is not None else None
+
+    def save(self, key: str, record: dict) -> None:
+        self._records[key] = dict(record)
+
+    def delete(self, key: str) -> None:
+        self._records.pop(key, None)
+
+    def lock(self, key: str):
+        return self._lock
+
+class FileTokenStore(TokenStore):
+    def __init__(self, path: str) -> None:
+        """
+        Token store shared by the processes of a host, kept in a JSON file.
+
+        Writes and refresh coordination go through an advisory lock on `<path>.lock`.
+        The file is only readable by its owner, as it holds credentials.
+
+        :param path: Path of the JSON file
+        """
+        self.path = path
+        self.lock_path = path + '.lock'
+        self._local = threading.local()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, records: dict) -> None:
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self, key: str) -> dict | None:
+        return self._read().get(key)
+
+    def save(self, key: str, record: dict) -> None:
+        with self.lock(key):
+            records = self._read()
+            records[key] = record
+            self._write(records)
+
+    def delete(self, key: str) -> None:
+        with self.lock(key):
+            records = self._read()
+            if records.pop(key, None) is not None:
+                self._write(records)
+
+    @contextmanager
+    def lock(self, key: str):
+        # Re-entrant within a thread: the advisory lock is taken once, by the outermost call
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        with open(self.lock_path, 'a+b') as f:
+            _lock_file(f)
+            self._local.depth = 1
+            try:
+                yield
+            finally:
+                self._local.depth = 0
+                _unlock_file(f)
+
+class SqliteTokenStore(TokenStore):
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        """
+        Token store shared by the processes of a host, kept in a SQLite database.
+
+        Refresh coordination relies on an immediate (write) transaction.
+
+        :param path: Path of the database file
+        :param timeout: Time (in seconds) to wait for another process holding the lock
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, token TEXT NOT NULL, '
+            'issued_at REAL, expires_at REAL)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def load(self, key: str) -> dict | None:
+        row = self._connection().execute(
+            'SELECT token, issued_at, expires_at FROM tokens WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'token': row[0], 'issued_at': row[1], 'expires_at': row[2]}
+
+    def save(self, key: str, record: dict) -> None:
+        self._connection().execute(
+            'INSERT OR REPLACE INTO tokens (key, token, issued_at, expires_at) VALUES (?, ?, ?, ?)',
+            (key, record['token'], record.get('issued_at'), record.get('expires_at'))
+        )
+
+    def delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM tokens WHERE key = ?', (key,))
+
+    @contextmanager
+    def lock(self, key: str):
+        connection = self._connection()
+        if connection.in_transaction:
+            yield
+            return
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+def _lock_file(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:  # pragma: no cover
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+def _unlock_file(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:  # pragma: no cover
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)